@@ -16,7 +16,7 @@ import type { ExtractedData, Confidence, AIProvider } from '../../../drizzle/sch
 interface AgentExtractionResult {
   provider: AIProvider;
   extractedData: ExtractedData | null;
-  status: 'pending' | 'extracting' | 'completed' | 'failed';
+  status: 'pending' | 'extracting' | 'completed' | 'failed' | 'cancelled';
   error?: string;
 }
 
@@ -153,7 +153,7 @@ export function AgentComparisonView({
                     ae.status === 'completed' && 'bg-emerald-100 text-emerald-700',
                     ae.status === 'extracting' && 'bg-blue-100 text-blue-700',
                     ae.status === 'failed' && 'bg-red-100 text-red-700',
-                    ae.status === 'pending' && 'bg-slate-100 text-slate-500'
+                    (ae.status === 'pending' || ae.status === 'cancelled') && 'bg-slate-100 text-slate-500'
                   )}
                 >
                   {ae.status === 'extracting' && <Loader2 className="h-2 w-2 mr-1 animate-spin" />}
@@ -6,6 +6,9 @@ import { Label } from '@/components/ui/label';
 import { Checkbox } from '@/components/ui/checkbox';
 import { Download, FileSpreadsheet, FileText, Table } from 'lucide-react';
 import type { ClinicalStudyExtraction, ExtractedData, AIProvider } from '../../../drizzle/schema';
+import {
+  delimitedLine, exportFieldLocation, exportFieldValue, flattenExportFields, separatorOf
+} from '@shared/extractionExport';
 
 interface ExportDataModalProps {
   isOpen: boolean;
@@ -170,77 +173,41 @@ export function ExportDataModal({
 
 // Helper functions for export generation
 
-function flattenExtractedData(data: any, prefix = ''): Record<string, any> {
-  const result: Record<string, any> = {};
-  
-  for (const [key, value] of Object.entries(data)) {
-    const fullKey = prefix ? `${prefix}.${key}` : key;
-    
-    if (Array.isArray(value)) {
-      value.forEach((item, idx) => {
-        if (item && typeof item === 'object') {
-          Object.assign(result, flattenExtractedData(item, `${fullKey}[${idx}]`));
-        }
-      });
-    } else if (value && typeof value === 'object') {
-      if ('content' in value || 'value' in value) {
-        // This is an extracted field
-        result[fullKey] = value;
-      } else {
-        // Nested object
-        Object.assign(result, flattenExtractedData(value, fullKey));
-      }
-    }
-  }
-  
-  return result;
-}
-
 function generateSingleExport(
   data: ExtractedData | ClinicalStudyExtraction,
   format: ExportFormat,
   includeConfidence: boolean,
   includeSourceLocation: boolean
 ): string {
-  const flattened = flattenExtractedData(data);
-  
   if (format === 'json') {
     return JSON.stringify(data, null, 2);
   }
   
-  const separator = format === 'tsv' ? '\t' : ',';
-  const rows: string[][] = [];
+  const separator = separatorOf(format);
   
   // Header row
   const headers = ['Field', 'Value'];
   if (includeConfidence) headers.push('Confidence');
   if (includeSourceLocation) headers.push('Page', 'Section', 'Exact Text');
-  rows.push(headers);
+  const lines = [delimitedLine(headers, separator)];
   
   // Data rows
-  for (const [field, fieldData] of Object.entries(flattened)) {
-    if (!fieldData) continue;
-    
-    const value = fieldData.content ?? fieldData.value ?? '';
-    const row = [field, escapeValue(String(value), separator)];
+  for (const [field, fieldData] of Object.entries(flattenExportFields(data))) {
+    const row = [field, exportFieldValue(fieldData)];
     
     if (includeConfidence) {
       row.push(fieldData.confidence || '');
     }
     
     if (includeSourceLocation) {
-      const loc = fieldData.source_location || fieldData.location;
-      row.push(
-        loc?.page?.toString() || '',
-        loc?.section || '',
-        escapeValue(loc?.exact_text_reference || loc?.exact || '', separator)
-      );
+      const loc = exportFieldLocation(fieldData);
+      row.push(loc.page, loc.section, loc.exactText);
     }
     
-    rows.push(row);
+    lines.push(delimitedLine(row, separator));
   }
   
-  return rows.map(row => row.join(separator)).join('\n');
+  return lines.join('');
 }
 
 function generateComparisonExport(
@@ -250,8 +217,6 @@ function generateComparisonExport(
   includeConfidence: boolean,
   includeSourceLocation: boolean
 ): string {
-  const primaryFlattened = flattenExtractedData(primaryData);
-  
   if (format === 'json') {
     return JSON.stringify({
       primary: primaryData,
@@ -262,8 +227,9 @@ function generateComparisonExport(
     }, null, 2);
   }
   
-  const separator = format === 'tsv' ? '\t' : ',';
-  const rows: string[][] = [];
+  const separator = separatorOf(format);
+  const primaryFlattened = flattenExportFields(primaryData);
+  const agentFlattened = agentExtractions.map(ae => flattenExportFields(ae.extractedData));
   
   // Header row
   const headers = ['Field', 'Consensus Value'];
@@ -273,62 +239,41 @@ function generateComparisonExport(
     if (includeSourceLocation) headers.push(`${ae.provider.toUpperCase()} Page`);
   }
   headers.push('Agreement');
-  rows.push(headers);
+  const lines = [delimitedLine(headers, separator)];
   
   // Get all fields from all sources
-  const allFields = new Set<string>();
-  Object.keys(primaryFlattened).forEach(k => allFields.add(k));
-  agentExtractions.forEach(ae => {
-    if (ae.extractedData) {
-      Object.keys(flattenExtractedData(ae.extractedData)).forEach(k => allFields.add(k));
-    }
-  });
+  const allFields = new Set<string>(Object.keys(primaryFlattened));
+  agentFlattened.forEach(fields => Object.keys(fields).forEach(k => allFields.add(k)));
   
   // Data rows
   for (const field of Array.from(allFields).sort()) {
-    const primaryField = primaryFlattened[field];
-    const primaryValue = primaryField?.content ?? primaryField?.value ?? '';
-    
-    const row = [field, escapeValue(String(primaryValue), separator)];
+    const row = [field, exportFieldValue(primaryFlattened[field])];
     
     const values: string[] = [];
     
-    for (const ae of agentExtractions) {
-      const agentFlattened = ae.extractedData ? flattenExtractedData(ae.extractedData) : {};
-      const agentField = agentFlattened[field];
-      const agentValue = agentField?.content ?? agentField?.value ?? '';
+    agentFlattened.forEach(fields => {
+      const agentField = fields[field];
+      const agentValue = exportFieldValue(agentField);
       
-      row.push(escapeValue(String(agentValue), separator));
-      values.push(String(agentValue));
+      row.push(agentValue);
+      values.push(agentValue);
       
       if (includeConfidence) {
         row.push(agentField?.confidence || '');
       }
       
       if (includeSourceLocation) {
-        const loc = agentField?.source_location || agentField?.location;
-        row.push(loc?.page?.toString() || '');
+        row.push(exportFieldLocation(agentField).page);
       }
-    }
+    });
     
     // Calculate agreement
     const uniqueValues = new Set(values.filter(v => v !== ''));
     const agreement = uniqueValues.size <= 1 ? 'Full' : uniqueValues.size === values.length ? 'None' : 'Partial';
     row.push(agreement);
     
-    rows.push(row);
-  }
-  
-  return rows.map(row => row.join(separator)).join('\n');
-}
-
-function escapeValue(value: string, separator: string): string {
-  if (!value) return '';
-  
-  // Escape quotes and wrap in quotes if contains separator, newline, or quote
-  if (value.includes(separator) || value.includes('\n') || value.includes('"')) {
-    return `"${value.replace(/"/g, '""')}"`;
+    lines.push(delimitedLine(row, separator));
   }
   
-  return value;
+  return lines.join('');
 }
@@ -2,18 +2,8 @@ import { useRef, useEffect, useCallback, useState } from 'react';
 import { ChevronLeft, ChevronRight, ZoomIn, ZoomOut, Loader2 } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { cn } from '@/lib/utils';
-
-// PDF.js configuration - Using CDN
-const PDF_JS_VERSION = '3.11.174';
-const PDF_JS_URL = `https://cdnjs.cloudflare.com/ajax/libs/pdf.js/${PDF_JS_VERSION}/pdf.min.js`;
-const PDF_JS_WORKER_URL = `https://cdnjs.cloudflare.com/ajax/libs/pdf.js/${PDF_JS_VERSION}/pdf.worker.min.js`;
-const PDF_JS_CSS_URL = `https://cdnjs.cloudflare.com/ajax/libs/pdf.js/${PDF_JS_VERSION}/pdf_viewer.min.css`;
-
-declare global {
-  interface Window {
-    pdfjsLib: any;
-  }
-}
+import { getPageTextContent, getPageViewport, getPdfDocument, getPdfPage, loadPdfJs } from '@/lib/pdfDocumentService';
+import { indexPdfText, type PdfPageText } from '@/lib/pdfTextWorker';
 
 export interface HighlightLocation {
   page: number;
@@ -23,17 +13,20 @@ export interface HighlightLocation {
 interface PdfViewerProps {
   pdfUrl: string | null;
   onTextExtracted?: (text: string) => void;
+  /** Each page's text as soon as it is read, before the whole document is */
+  onPageText?: (page: PdfPageText) => void;
   highlightLocation?: HighlightLocation | null;
   className?: string;
 }
 
-export function PdfViewer({ pdfUrl, onTextExtracted, highlightLocation, className }: PdfViewerProps) {
+export function PdfViewer({ pdfUrl, onTextExtracted, onPageText, highlightLocation, className }: PdfViewerProps) {
   const [pdf, setPdf] = useState<any>(null);
   const [pageNum, setPageNum] = useState(1);
   const [numPages, setNumPages] = useState(0);
   const [scale, setScale] = useState(1.2);
   const [isLoading, setIsLoading] = useState(false);
   const [pdfJsLoaded, setPdfJsLoaded] = useState(false);
+  const [textProgress, setTextProgress] = useState<{ pagesDone: number; pageCount: number } | null>(null);
 
   const canvasRef = useRef<HTMLCanvasElement>(null);
   const textLayerRef = useRef<HTMLDivElement>(null);
@@ -42,91 +35,64 @@ export function PdfViewer({ pdfUrl, onTextExtracted, highlightLocation, classNam
 
   // Load PDF.js resources
   useEffect(() => {
-    const loadPdfJs = () => {
-      // Load CSS
-      if (!document.querySelector(`link[href="${PDF_JS_CSS_URL}"]`)) {
-        const link = document.createElement('link');
-        link.rel = 'stylesheet';
-        link.href = PDF_JS_CSS_URL;
-        document.head.appendChild(link);
-      }
-
-      // Check if already loaded
-      if (window.pdfjsLib) {
-        window.pdfjsLib.GlobalWorkerOptions.workerSrc = PDF_JS_WORKER_URL;
-        setPdfJsLoaded(true);
-        return;
-      }
-
-      // Load JS
-      const existingScript = document.querySelector(`script[src="${PDF_JS_URL}"]`);
-      if (existingScript) {
-        existingScript.addEventListener('load', () => {
-          if (window.pdfjsLib) {
-            window.pdfjsLib.GlobalWorkerOptions.workerSrc = PDF_JS_WORKER_URL;
-            setPdfJsLoaded(true);
-          }
-        });
-        return;
-      }
-
-      const script = document.createElement('script');
-      script.src = PDF_JS_URL;
-      script.async = true;
-      script.onload = () => {
-        if (window.pdfjsLib) {
-          window.pdfjsLib.GlobalWorkerOptions.workerSrc = PDF_JS_WORKER_URL;
-          setPdfJsLoaded(true);
-        }
-      };
-      document.head.appendChild(script);
-    };
-
-    loadPdfJs();
+    loadPdfJs()
+      .then(() => setPdfJsLoaded(true))
+      .catch(error => console.error('Error loading PDF.js:', error));
   }, []);
 
   // Load PDF when URL changes
   useEffect(() => {
-    if (!pdfUrl || !pdfJsLoaded || !window.pdfjsLib) return;
+    if (!pdfUrl || !pdfJsLoaded) return;
+    let cancelled = false;
 
     const loadPdf = async () => {
       setIsLoading(true);
       try {
-        const loadingTask = window.pdfjsLib.getDocument(pdfUrl);
-        const pdfDoc = await loadingTask.promise;
+        const pdfDoc = await getPdfDocument(pdfUrl);
+        if (cancelled) return;
         setPdf(pdfDoc);
         setNumPages(pdfDoc.numPages);
         setPageNum(1);
-
-        // Extract all text for AI processing
-        if (onTextExtracted) {
-          let fullText = '';
-          const limit = Math.min(pdfDoc.numPages, 30);
-          for (let i = 1; i <= limit; i++) {
-            const page = await pdfDoc.getPage(i);
-            const content = await page.getTextContent();
-            const strings = content.items.map((item: any) => item.str);
-            fullText += `--- Page ${i} ---\n` + strings.join(' ') + '\n';
-          }
-          onTextExtracted(fullText);
-        }
       } catch (error) {
         console.error('Error loading PDF:', error);
       } finally {
-        setIsLoading(false);
+        if (!cancelled) setIsLoading(false);
+      }
+    };
+
+    // Extract all text for AI processing, in the text worker so the page stays
+    // responsive; pages stream in as they are read
+    const extractText = async () => {
+      if (!onTextExtracted && !onPageText) return;
+      let pagesDone = 0;
+      try {
+        const text = await indexPdfText(pdfUrl, page => {
+          if (cancelled) return;
+          pagesDone++;
+          setTextProgress({ pagesDone, pageCount: page.pageCount });
+          onPageText?.(page);
+        });
+        if (!cancelled) onTextExtracted?.(text);
+      } catch (error) {
+        console.error('Error extracting PDF text:', error);
+      } finally {
+        if (!cancelled) setTextProgress(null);
       }
     };
 
     loadPdf();
-  }, [pdfUrl, pdfJsLoaded, onTextExtracted]);
+    extractText();
+    return () => {
+      cancelled = true;
+    };
+  }, [pdfUrl, pdfJsLoaded, onTextExtracted, onPageText]);
 
   // Render page
   const renderPage = useCallback(async (num: number) => {
-    if (!pdf || !canvasRef.current || !textLayerRef.current) return;
+    if (!pdf || !pdfUrl || !canvasRef.current || !textLayerRef.current) return;
 
     try {
-      const page = await pdf.getPage(num);
-      const viewport = page.getViewport({ scale });
+      const [page, viewport] = await Promise.all([getPdfPage(pdfUrl, num), getPageViewport(pdfUrl, num, scale)]);
 
       // Canvas
       const canvas = canvasRef.current;
@@ -139,7 +105,7 @@ export function PdfViewer({ pdfUrl, onTextExtracted, highlightLocation, classNam
       await page.render({ canvasContext: context, viewport }).promise;
 
       // Text Layer
-      const textContent = await page.getTextContent();
+      const textContent = await getPageTextContent(pdfUrl, num);
       textLayerRef.current.innerHTML = '';
       textLayerRef.current.style.width = `${viewport.width}px`;
       textLayerRef.current.style.height = `${viewport.height}px`;
@@ -160,7 +126,7 @@ export function PdfViewer({ pdfUrl, onTextExtracted, highlightLocation, classNam
     } catch (error) {
       console.error('Error rendering page:', error);
     }
-  }, [pdf, scale]);
+  }, [pdf, pdfUrl, scale]);
 
   useEffect(() => {
     if (pdf) renderPage(pageNum);
@@ -168,11 +134,10 @@ export function PdfViewer({ pdfUrl, onTextExtracted, highlightLocation, classNam
 
   // Draw highlight when location changes
   useEffect(() => {
-    if (!highlightLocation || !pdf || highlightLocation.page !== pageNum) return;
+    if (!highlightLocation || !pdf || !pdfUrl || highlightLocation.page !== pageNum) return;
 
     const drawHighlight = async () => {
-      const page = await pdf.getPage(highlightLocation.page);
-      const viewport = page.getViewport({ scale });
+      const viewport = await getPageViewport(pdfUrl, highlightLocation.page, scale);
       const highlightLayer = highlightLayerRef.current;
 
       if (!highlightLayer) return;
@@ -200,7 +165,7 @@ export function PdfViewer({ pdfUrl, onTextExtracted, highlightLocation, classNam
     };
 
     drawHighlight();
-  }, [highlightLocation, pdf, pageNum, scale]);
+  }, [highlightLocation, pdf, pdfUrl, pageNum, scale]);
 
   // Navigate to highlight page
   useEffect(() => {
@@ -228,6 +193,11 @@ export function PdfViewer({ pdfUrl, onTextExtracted, highlightLocation, classNam
           <Button variant="outline" size="icon" onClick={handleNextPage} disabled={pageNum >= numPages}>
             <ChevronRight className="h-4 w-4" />
           </Button>
+          {textProgress && (
+            <span className="text-xs text-slate-500">
+              Reading text {textProgress.pagesDone}/{textProgress.pageCount}
+            </span>
+          )}
         </div>
         <div className="flex items-center gap-2">
           <Button variant="outline" size="icon" onClick={handleZoomOut} disabled={scale <= 0.5}>
@@ -263,86 +233,3 @@ export function PdfViewer({ pdfUrl, onTextExtracted, highlightLocation, classNam
     </div>
   );
 }
-
-/**
- * Robust text locator algorithm to find AI-extracted quotes in PDF text content
- * Reconstructs page text map to find phrases that span multiple PDF text items
- */
-export async function locateTextInPdf(
-  pdf: any,
-  searchText: string,
-  maxPages: number = 30
-): Promise<{ page: number; rect: number[] } | null> {
-  if (!pdf || !searchText) return null;
-
-  // Normalize spaces and case
-  const cleanSearch = searchText.replace(/\s+/g, ' ').trim().toLowerCase();
-  const isNumber = /^\d+$/.test(cleanSearch);
-  if (cleanSearch.length < 3 && !isNumber) return null;
-
-  const limit = Math.min(pdf.numPages, maxPages);
-
-  for (let i = 1; i <= limit; i++) {
-    const page = await pdf.getPage(i);
-    const content = await page.getTextContent();
-
-    // Build a searchable map of the page
-    let fullPageText = '';
-    const itemMap: { start: number; end: number; item: any }[] = [];
-
-    for (const item of content.items) {
-      const str = item.str;
-      if (!str.trim()) continue;
-
-      const startIdx = fullPageText.length;
-      fullPageText += str + ' ';
-      const endIdx = fullPageText.length;
-
-      itemMap.push({
-        start: startIdx,
-        end: endIdx - 1,
-        item: item,
-      });
-    }
-
-    // Search in the full string
-    const matchIndex = fullPageText.toLowerCase().indexOf(cleanSearch);
-
-    if (matchIndex !== -1) {
-      const matchEnd = matchIndex + cleanSearch.length;
-
-      // Find which PDF items correspond to this match
-      const involvedItems = itemMap.filter(
-        (m) => m.end >= matchIndex && m.start < matchEnd
-      );
-
-      if (involvedItems.length > 0) {
-        // Calculate bounding box
-        let minX = Infinity,
-          minY = Infinity,
-          maxX = -Infinity,
-          maxY = -Infinity;
-
-        involvedItems.forEach(({ item }) => {
-          const x = item.transform[4];
-          const y = item.transform[5];
-          const w = item.width;
-          const h = item.height || 10;
-
-          minX = Math.min(minX, x);
-          minY = Math.min(minY, y);
-          maxX = Math.max(maxX, x + w);
-          maxY = Math.max(maxY, y + h);
-        });
-
-        const padding = 2;
-        return {
-          page: i,
-          rect: [minX - padding, minY - padding, maxX + padding, maxY + padding],
-        };
-      }
-    }
-  }
-
-  return null;
-}
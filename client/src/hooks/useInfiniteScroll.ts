@@ -0,0 +1,28 @@
+import { useEffect, useRef } from "react";
+import { usePersistFn } from "./usePersistFn";
+
+/**
+ * Calls `onReachEnd` whenever the element holding the returned ref scrolls
+ * near the viewport. Put it after the last item of a list.
+ */
+export function useInfiniteScroll<T extends Element>(onReachEnd: () => void, enabled: boolean) {
+  const sentinelRef = useRef<T>(null);
+  const reachEnd = usePersistFn(onReachEnd);
+
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !enabled) return;
+
+    // Start loading a little before the end becomes visible
+    const observer = new IntersectionObserver(
+      entries => {
+        if (entries.some(entry => entry.isIntersecting)) reachEnd();
+      },
+      { rootMargin: "400px 0px" }
+    );
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [enabled, reachEnd]);
+
+  return sentinelRef;
+}
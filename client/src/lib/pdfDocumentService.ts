@@ -0,0 +1,131 @@
+// PDF.js configuration - Using CDN
+const PDF_JS_VERSION = "3.11.174";
+const PDF_JS_URL = `https://cdnjs.cloudflare.com/ajax/libs/pdf.js/${PDF_JS_VERSION}/pdf.min.js`;
+const PDF_JS_WORKER_URL = `https://cdnjs.cloudflare.com/ajax/libs/pdf.js/${PDF_JS_VERSION}/pdf.worker.min.js`;
+const PDF_JS_CSS_URL = `https://cdnjs.cloudflare.com/ajax/libs/pdf.js/${PDF_JS_VERSION}/pdf_viewer.min.css`;
+
+/** Loaded documents kept open; the least recently used one is destroyed past this */
+const MAX_OPEN_DOCUMENTS = 3;
+
+declare global {
+  interface Window {
+    pdfjsLib: any;
+  }
+}
+
+type OpenDocument = {
+  pdf: Promise<any>;
+  pages: Map<number, Promise<any>>;
+  textContents: Map<number, Promise<any>>;
+  /** By `${page}@${scale}` */
+  viewports: Map<string, Promise<any>>;
+};
+
+let pdfJs: Promise<any> | null = null;
+const documents = new Map<string, OpenDocument>();
+
+/** PDF.js from the CDN, with its stylesheet; the script is added to the page once */
+export function loadPdfJs(): Promise<any> {
+  if (pdfJs) return pdfJs;
+
+  if (!document.querySelector(`link[href="${PDF_JS_CSS_URL}"]`)) {
+    const link = document.createElement("link");
+    link.rel = "stylesheet";
+    link.href = PDF_JS_CSS_URL;
+    document.head.appendChild(link);
+  }
+
+  pdfJs = new Promise((resolve, reject) => {
+    const ready = () => {
+      if (!window.pdfjsLib) return reject(new Error("PDF.js did not load"));
+      window.pdfjsLib.GlobalWorkerOptions.workerSrc = PDF_JS_WORKER_URL;
+      resolve(window.pdfjsLib);
+    };
+    if (window.pdfjsLib) return ready();
+
+    let script = document.querySelector<HTMLScriptElement>(`script[src="${PDF_JS_URL}"]`);
+    if (!script) {
+      script = document.createElement("script");
+      script.src = PDF_JS_URL;
+      script.async = true;
+      document.head.appendChild(script);
+    }
+    script.addEventListener("load", ready);
+    script.addEventListener("error", () => reject(new Error("PDF.js failed to load")));
+  });
+  // Let a later call retry after a network error
+  pdfJs.catch(() => {
+    pdfJs = null;
+  });
+  return pdfJs;
+}
+
+/** Memoize `load` under `key`, forgetting it again if it fails */
+function memo<K, V>(cache: Map<K, Promise<V>>, key: K, load: () => Promise<V>): Promise<V> {
+  let value = cache.get(key);
+  if (!value) {
+    value = load();
+    cache.set(key, value);
+    value.catch(() => cache.delete(key));
+  }
+  return value;
+}
+
+function openDocument(url: string): OpenDocument {
+  const open = documents.get(url);
+  if (open) {
+    // Most recently used last
+    documents.delete(url);
+    documents.set(url, open);
+    return open;
+  }
+
+  const pdf = loadPdfJs().then(pdfjsLib => pdfjsLib.getDocument(url).promise);
+  const opened: OpenDocument = { pdf, pages: new Map(), textContents: new Map(), viewports: new Map() };
+  documents.set(url, opened);
+  pdf.catch(() => {
+    if (documents.get(url) === opened) documents.delete(url);
+  });
+
+  for (const [oldUrl] of Array.from(documents)) {
+    if (documents.size <= MAX_OPEN_DOCUMENTS) break;
+    releasePdfDocument(oldUrl);
+  }
+  return opened;
+}
+
+/**
+ * The loaded PDF at `url` (PDFDocumentProxy). Every caller shares one download
+ * and parse per URL: the viewer, grounding and source navigation.
+ */
+export function getPdfDocument(url: string): Promise<any> {
+  return openDocument(url).pdf;
+}
+
+/** Page `pageNumber` (1-based) of the PDF at `url` */
+export function getPdfPage(url: string, pageNumber: number): Promise<any> {
+  const open = openDocument(url);
+  return memo(open.pages, pageNumber, () => open.pdf.then(pdf => pdf.getPage(pageNumber)));
+}
+
+/** The page's PDF.js text content, read once */
+export function getPageTextContent(url: string, pageNumber: number): Promise<any> {
+  const open = openDocument(url);
+  return memo(open.textContents, pageNumber, () => getPdfPage(url, pageNumber).then(page => page.getTextContent()));
+}
+
+/** The page's viewport at `scale` */
+export function getPageViewport(url: string, pageNumber: number, scale: number): Promise<any> {
+  const open = openDocument(url);
+  return memo(open.viewports, `${pageNumber}@${scale}`, () =>
+    getPdfPage(url, pageNumber).then(page => page.getViewport({ scale }))
+  );
+}
+
+/** Close the PDF at `url` and drop everything cached for it */
+export function releasePdfDocument(url: string) {
+  const open = documents.get(url);
+  if (!open) return;
+  documents.delete(url);
+  open.pdf.then(pdf => pdf.destroy()).catch(() => {});
+}
@@ -0,0 +1,125 @@
+import { buildDocumentText } from "@shared/pdfPageText";
+import type { ExtractedData, LocationData } from "../../../drizzle/schema";
+import type { PdfTextRequest, PdfTextResponse } from "@/workers/pdfText.worker";
+import { getPdfDocument } from "./pdfDocumentService";
+
+/** The text of one page, delivered as soon as the worker has read it */
+export type PdfPageText = { pageNumber: number; pageCount: number; text: string };
+
+/** Documents kept indexed in the worker, as many as the document service keeps open */
+const MAX_INDEXED_DOCUMENTS = 3;
+
+type Reply<T extends PdfTextResponse["type"]> = Extract<PdfTextResponse, { type: T }>;
+type PendingCall = { resolve: (response: PdfTextResponse) => void; reject: (error: Error) => void };
+
+let worker: Worker | null = null;
+let nextId = 1;
+const decoder = new TextDecoder();
+const pending = new Map<number, PendingCall>();
+
+/** Indexing of one PDF: the pages read so far, who hears of the next ones, and the document text */
+type IndexJob = {
+  pages: PdfPageText[];
+  listeners: Set<(page: PdfPageText) => void>;
+  text: Promise<string>;
+};
+const indexed = new Map<string, IndexJob>();
+
+function getWorker(): Worker {
+  if (worker) return worker;
+
+  worker = new Worker(new URL("../workers/pdfText.worker.ts", import.meta.url), { type: "module" });
+  worker.onmessage = (event: MessageEvent<PdfTextResponse>) => {
+    const response = event.data;
+    if (response.type === "page") {
+      const job = indexed.get(response.url);
+      if (!job) return;
+      const page = { pageNumber: response.pageNumber, pageCount: response.pageCount, text: decoder.decode(response.text) };
+      job.pages.push(page);
+      job.listeners.forEach(listener => listener(page));
+      return;
+    }
+    const call = pending.get(response.id);
+    if (!call) return;
+    pending.delete(response.id);
+    if (response.type === "error") call.reject(new Error(response.message));
+    else call.resolve(response);
+  };
+  worker.onerror = event => {
+    // The worker failed to load or crashed: fail the calls in flight and start a new one next time
+    const error = new Error(event.message || "PDF text worker failed");
+    pending.forEach(call => call.reject(error));
+    pending.clear();
+    indexed.clear();
+    worker?.terminate();
+    worker = null;
+  };
+  return worker;
+}
+
+function call<T extends PdfTextResponse["type"]>(request: PdfTextRequest & { id: number }, transfer: Transferable[] = []) {
+  return new Promise<Reply<T>>((resolve, reject) => {
+    const target = getWorker();
+    pending.set(request.id, { resolve: resolve as PendingCall["resolve"], reject });
+    target.postMessage(request, transfer);
+  });
+}
+
+/**
+ * Have the worker read and index the PDF at `url` (once per URL) and resolve
+ * to its document text. The bytes come from the document the viewer loaded
+ * and are transferred, not copied. Pages are read a few at a time and
+ * `onPage` hears of each one as it arrives (pages read earlier are replayed),
+ * so callers can start before the whole document is read.
+ */
+export async function indexPdfText(url: string, onPage?: (page: PdfPageText) => void): Promise<string> {
+  let job = indexed.get(url);
+  if (!job) {
+    const pages: PdfPageText[] = [];
+    const text = (async () => {
+      const pdf = await getPdfDocument(url);
+      const data: Uint8Array = await pdf.getData();
+      await call<"indexed">({ type: "index", id: nextId++, url, pdf: data.buffer as ArrayBuffer }, [data.buffer]);
+      // Joined once, in page order, when every page is in
+      return buildDocumentText([...pages].sort((a, b) => a.pageNumber - b.pageNumber));
+    })();
+    const started: IndexJob = { pages, listeners: new Set(), text };
+    job = started;
+    indexed.set(url, started);
+    text.catch(() => {
+      if (indexed.get(url) === started) indexed.delete(url);
+    });
+
+    for (const [oldUrl] of Array.from(indexed)) {
+      if (indexed.size <= MAX_INDEXED_DOCUMENTS) break;
+      indexed.delete(oldUrl);
+      worker?.postMessage({ type: "release", url: oldUrl } satisfies PdfTextRequest);
+    }
+  }
+
+  if (!onPage) return job.text;
+  job.pages.forEach(onPage);
+  job.listeners.add(onPage);
+  try {
+    return await job.text;
+  } finally {
+    job.listeners.delete(onPage);
+  }
+}
+
+/** Locate quotes in the PDF at `url` (see locateQuotes), indexing it first if needed */
+export async function locateQuotesInPdf(
+  url: string,
+  quotes: Record<string, string | string[]>
+): Promise<Record<string, LocationData | null>> {
+  await indexPdfText(url);
+  const reply = await call<"located">({ type: "locate", id: nextId++, url, quotes });
+  return reply.located;
+}
+
+/** Set the PDF location of every field of `data` found in the PDF at `url` (see groundExtractedData) */
+export async function groundInPdf(url: string, data: ExtractedData): Promise<ExtractedData> {
+  await indexPdfText(url);
+  const reply = await call<"grounded">({ type: "ground", id: nextId++, url, data });
+  return reply.data;
+}
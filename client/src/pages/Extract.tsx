@@ -1,11 +1,13 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useLocation } from 'wouter';
-import { FileText, Download, ArrowLeft, Loader2, Bot, Sparkles, FileSpreadsheet, LayoutGrid, List } from 'lucide-react';
+import { FileText, Download, ArrowLeft, Loader2, Bot, Sparkles, FileSpreadsheet, LayoutGrid, List, X } from 'lucide-react';
+import { TRPCClientError } from '@trpc/client';
 import { trpc } from '@/lib/trpc';
 import { Button } from '@/components/ui/button';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { toast } from 'sonner';
-import { PdfViewer, locateTextInPdf, HighlightLocation } from '@/components/PdfViewer';
+import { PdfViewer, HighlightLocation } from '@/components/PdfViewer';
+import { groundInPdf, indexPdfText, locateQuotesInPdf } from '@/lib/pdfTextWorker';
 import { ExtractionSidebar } from '@/components/ExtractionSidebar';
 import { ClinicalExtractionForm } from '@/components/ClinicalExtractionForm';
 import { AgentComparisonView } from '@/components/AgentComparisonView';
@@ -19,21 +21,33 @@ import {
   type LocationData, type ClinicalStudyExtraction, type AIProvider 
 } from '../../../drizzle/schema';
 
-declare global {
-  interface Window {
-    pdfjsLib: any;
-  }
-}
-
 type ViewMode = 'simple' | 'clinical' | 'comparison';
 
 interface AgentExtractionResult {
   provider: AIProvider;
   extractedData: ExtractedData | null;
-  status: 'pending' | 'extracting' | 'completed' | 'failed';
+  status: 'pending' | 'extracting' | 'completed' | 'failed' | 'cancelled';
   error?: string;
 }
 
+// An AI run in flight, tracked so it can be cancelled
+interface ActiveRun {
+  extractionId: number;
+  cancelled: boolean;
+  stopStream?: () => void;
+}
+
+// JSON with sorted keys: stored JSON does not keep the key order it was written in
+const canonicalJson = (value: unknown) => JSON.stringify(value, (_key, v) =>
+  v && typeof v === 'object' && !Array.isArray(v)
+    ? Object.fromEntries(Object.entries(v).sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0)))
+    : v
+);
+
+// Whether two versions of a field hold the same data
+const sameFieldData = (a: ExtractedFieldData | undefined, b: ExtractedFieldData | undefined) =>
+  canonicalJson(a) === canonicalJson(b);
+
 export default function Extract() {
   const params = useParams<{ id: string }>();
   const [, navigate] = useLocation();
@@ -43,6 +57,7 @@ export default function Extract() {
   const [schema, setSchema] = useState<ExtractionSchema>(CLINICAL_MASTER_SCHEMA);
   const [extractedData, setExtractedData] = useState<ExtractedData | ClinicalStudyExtraction | null>(null);
   const [documentText, setDocumentText] = useState<string>('');
+  const [pagesRead, setPagesRead] = useState(0);
   const [highlightLocation, setHighlightLocation] = useState<HighlightLocation | null>(null);
   const [isExtracting, setIsExtracting] = useState(false);
   const [isSummarizing, setIsSummarizing] = useState(false);
@@ -63,6 +78,12 @@ export default function Extract() {
   // PDF reference for text location
   const pdfRef = useRef<any>(null);
 
+  // Runs to cancel from the Cancel button or when leaving the page
+  const activeRunsRef = useRef(new Set<ActiveRun>());
+
+  // Version of the saved extracted data this page's copy is at, checked by field patches
+  const dataVersionRef = useRef<number | null>(null);
+
   // Queries
   const { data: document, isLoading: isLoadingDoc } = trpc.documents.get.useQuery(
     { id: documentId! },
@@ -74,18 +95,47 @@ export default function Extract() {
     { enabled: !!documentId }
   );
 
+  const utils = trpc.useUtils();
+
   // Mutations
   const createExtractionMutation = trpc.extractions.create.useMutation();
   const updateExtractionMutation = trpc.extractions.update.useMutation();
+  const patchFieldsMutation = trpc.extractions.patchFields.useMutation();
+  const groundMutation = trpc.documents.ground.useMutation();
   const extractMutation = trpc.ai.extract.useMutation();
   const multiAgentExtractMutation = trpc.ai.multiAgentExtract.useMutation();
   const summarizeMutation = trpc.ai.summarize.useMutation();
 
+  const beginRun = (extId: number): ActiveRun => {
+    const run: ActiveRun = { extractionId: extId, cancelled: false };
+    activeRunsRef.current.add(run);
+    return run;
+  };
+
+  // Abort server-side work (LLM calls included) for every run in flight
+  const cancelRuns = useCallback(() => {
+    const extractionIds = new Set<number>();
+    activeRunsRef.current.forEach(run => {
+      run.cancelled = true;
+      run.stopStream?.();
+      extractionIds.add(run.extractionId);
+    });
+    extractionIds.forEach(extractionId => {
+      utils.client.ai.cancel.mutate({ extractionId }).catch(error => {
+        console.warn('Failed to cancel extraction:', error);
+      });
+    });
+  }, [utils]);
+
+  // Leaving the page stops extractions that are still running
+  useEffect(() => cancelRuns, [cancelRuns]);
+
   // Load existing extraction if available
   useEffect(() => {
     if (existingExtractions && existingExtractions.length > 0) {
       const latest = existingExtractions[0];
       setExtractionId(latest.id);
+      dataVersionRef.current = latest.version;
       setSchema(latest.schema as ExtractionSchema);
       if (latest.extractedData) {
         setExtractedData(latest.extractedData as ExtractedData);
@@ -96,11 +146,27 @@ export default function Extract() {
     }
   }, [existingExtractions]);
 
+  // Documents parsed on upload have their text on the server, so the client
+  // doesn't need to wait for (or send) its own text pass
+  const hasServerText = !!document?.pageCount;
+  // Runs can start once the first pages are read; requestText waits for the rest
+  const canRunAi = hasServerText || !!documentText || pagesRead > 0;
+
+  const requestText = async (): Promise<string | undefined> => {
+    if (hasServerText) return undefined;
+    if (documentText || !document?.s3Url) return documentText;
+    return indexPdfText(document.s3Url);
+  };
+
   // Handle text extraction from PDF
   const handleTextExtracted = useCallback((text: string) => {
     setDocumentText(text);
   }, []);
 
+  const handlePageText = useCallback(() => {
+    setPagesRead(count => count + 1);
+  }, []);
+
   // Create or get extraction session
   const ensureExtraction = async (): Promise<number> => {
     if (extractionId) return extractionId;
@@ -113,49 +179,89 @@ export default function Extract() {
     });
 
     setExtractionId(extraction.id);
+    dataVersionRef.current = extraction.version;
     return extraction.id;
   };
 
+  // Stream the extraction, filling fields in as the server sends them
+  const streamExtraction = (extId: number, run: ActiveRun) =>
+    new Promise<ExtractedData>((resolve, reject) => {
+      const live: ExtractedData = {};
+      const subscription = utils.client.ai.extractStream.subscribe(
+        { extractionId: extId },
+        {
+          onData: event => {
+            if (event.type === 'started') {
+              setExtractedData({});
+            } else if (event.type === 'field') {
+              live[event.fieldName] = event.field;
+              setExtractedData({ ...live });
+            } else if (event.type === 'done') {
+              subscription.unsubscribe();
+              resolve(event.extractedData);
+            }
+          },
+          onError: reject,
+          onComplete: () => reject(new Error('Extraction stream ended early')),
+        }
+      );
+      run.stopStream = () => {
+        subscription.unsubscribe();
+        reject(new Error('Extraction cancelled'));
+      };
+    });
+
   // Single Agent AI Auto-Extract
   const handleExtract = async () => {
-    if (!documentText) {
+    if (!canRunAi) {
       toast.error('Please wait for the PDF to load');
       return;
     }
 
     setIsExtracting(true);
+    let run: ActiveRun | null = null;
     try {
       const extId = await ensureExtraction();
+      run = beginRun(extId);
 
-      const result = await extractMutation.mutateAsync({
-        extractionId: extId,
-        documentText,
-      });
+      // Server-parsed documents stream field by field; others send their text
+      const resultData = hasServerText
+        ? await streamExtraction(extId, run)
+        : (await extractMutation.mutateAsync({
+            extractionId: extId,
+            documentText: await requestText(),
+          })).extractedData;
 
-      if (result.extractedData) {
+      if (resultData) {
         // Ground the extracted data by finding locations in PDF
-        const groundedData = await groundExtractedData(result.extractedData as ExtractedData);
+        const groundedData = await groundExtractedData(resultData as ExtractedData);
         setExtractedData(groundedData);
 
         // Save grounded data
-        await updateExtractionMutation.mutateAsync({
+        const saved = await updateExtractionMutation.mutateAsync({
           id: extId,
           extractedData: groundedData,
         });
+        dataVersionRef.current = saved.version;
 
         toast.success('Extraction completed successfully');
       }
     } catch (error) {
-      console.error('Extraction failed:', error);
-      toast.error('Extraction failed. Please try again.');
+      if (run?.cancelled) {
+        toast.info('Extraction cancelled');
+      } else {
+        console.error('Extraction failed:', error);
+        toast.error('Extraction failed. Please try again.');
+      }
     } finally {
+      if (run) activeRunsRef.current.delete(run);
       setIsExtracting(false);
     }
   };
 
   // Multi-Agent Extraction (3 providers)
   const handleMultiAgentExtract = async () => {
-    if (!documentText) {
+    if (!canRunAi) {
       toast.error('Please wait for the PDF to load');
       return;
     }
@@ -171,15 +277,17 @@ export default function Extract() {
       status: 'pending',
     })));
 
+    let run: ActiveRun | null = null;
     try {
       const extId = await ensureExtraction();
+      run = beginRun(extId);
 
       // Update status to extracting
       setAgentExtractions(prev => prev.map(ae => ({ ...ae, status: 'extracting' as const })));
 
       const result = await multiAgentExtractMutation.mutateAsync({
         extractionId: extId,
-        documentText,
+        documentText: await requestText(),
         providers,
       });
 
@@ -187,7 +295,7 @@ export default function Extract() {
       setAgentExtractions(result.results.map(r => ({
         provider: r.provider as AIProvider,
         extractedData: r.extractedData as ExtractedData | null,
-        status: r.status as 'pending' | 'extracting' | 'completed' | 'failed',
+        status: r.status as AgentExtractionResult['status'],
         error: r.error || undefined,
       })));
 
@@ -196,74 +304,57 @@ export default function Extract() {
         const groundedData = await groundExtractedData(result.consensus as ExtractedData);
         setExtractedData(groundedData);
         
-        await updateExtractionMutation.mutateAsync({
+        const saved = await updateExtractionMutation.mutateAsync({
           id: extId,
           extractedData: groundedData,
         });
+        dataVersionRef.current = saved.version;
       }
 
       const successCount = result.results.filter(r => r.status === 'completed').length;
       toast.success(`Multi-agent extraction completed (${successCount}/${providers.length} agents)`);
     } catch (error) {
-      console.error('Multi-agent extraction failed:', error);
-      toast.error('Multi-agent extraction failed. Please try again.');
-      setAgentExtractions(prev => prev.map(ae => ({ ...ae, status: 'failed' as const })));
+      if (run?.cancelled) {
+        toast.info('Multi-agent extraction cancelled');
+        setAgentExtractions(prev => prev.map(ae => ({ ...ae, status: 'cancelled' as const })));
+      } else {
+        console.error('Multi-agent extraction failed:', error);
+        toast.error('Multi-agent extraction failed. Please try again.');
+        setAgentExtractions(prev => prev.map(ae => ({ ...ae, status: 'failed' as const })));
+      }
     } finally {
+      if (run) activeRunsRef.current.delete(run);
       setIsMultiAgentExtracting(false);
     }
   };
 
-  // Ground extracted data by finding text locations in PDF
+  // Ground extracted data by finding text locations in the PDF. The server
+  // locates every field in one pass over the text stored at upload; documents
+  // without stored text are searched by the browser's text worker.
   const groundExtractedData = async (data: ExtractedData): Promise<ExtractedData> => {
-    if (!window.pdfjsLib || !document?.s3Url) return data;
-
-    const groundedData: ExtractedData = {};
-
-    // Load PDF for text location
-    const loadingTask = window.pdfjsLib.getDocument(document.s3Url);
-    const pdf = await loadingTask.promise;
-
-    for (const [key, fieldData] of Object.entries(data)) {
-      // Get the text to search for - use exact_text_reference from source_location if available
-      const searchText = fieldData.source_location?.exact_text_reference || String(fieldData.value);
-      
-      // Try to find location in PDF
-      let location = null;
-      if (searchText) {
-        location = await locateTextInPdf(pdf, searchText);
-      }
-
-      // Build the grounded field data
-      const groundedField: ExtractedFieldData = {
-        value: fieldData.value,
-        confidence: fieldData.confidence,
-        source_location: fieldData.source_location,
-        notes: fieldData.notes,
-      };
-
-      // Add PDF location data if found
-      if (location) {
-        groundedField.location = {
-          page: location.page,
-          exact: searchText,
-          rects: [location.rect],
-          selector: {
-            type: 'FragmentSelector',
-            conformsTo: 'http://tools.ietf.org/rfc/rfc3778',
-            value: `page=${location.page}&rect=${location.rect.join(',')}`,
-          },
-        };
-      }
-
-      groundedData[key] = groundedField;
+    if (!document) return data;
+    try {
+      const result = await groundMutation.mutateAsync({ documentId: document.id, data });
+      if (result.grounded) return result.data;
+    } catch (error) {
+      console.warn('Server-side grounding failed, locating in the browser:', error);
     }
+    return groundInBrowser(data);
+  };
 
-    return groundedData;
+  const groundInBrowser = async (data: ExtractedData): Promise<ExtractedData> => {
+    if (!document?.s3Url) return data;
+    try {
+      return await groundInPdf(document.s3Url, data);
+    } catch (error) {
+      console.warn('Locating fields in the browser failed:', error);
+      return data;
+    }
   };
 
   // AI Summarize
   const handleSummarize = async () => {
-    if (!documentText) {
+    if (!canRunAi) {
       toast.error('Please wait for the PDF to load');
       return;
     }
@@ -275,7 +366,7 @@ export default function Extract() {
 
       const result = await summarizeMutation.mutateAsync({
         extractionId: extId,
-        documentText,
+        documentText: await requestText(),
       });
 
       setSummary(result.summary);
@@ -296,26 +387,33 @@ export default function Extract() {
   };
 
   // View source by page and text (for clinical form)
-  const handleViewSourceByPage = (page: number, exactText: string) => {
-    // Try to find the text in the PDF and highlight it
-    if (window.pdfjsLib && document?.s3Url) {
-      const loadingTask = window.pdfjsLib.getDocument(document.s3Url);
-      loadingTask.promise.then(async (pdf: any) => {
-        const location = await locateTextInPdf(pdf, exactText);
-        if (location) {
-          setHighlightLocation({
-            page: location.page,
-            rects: [location.rect],
-          });
-        } else {
-          // Just go to the page
-          setHighlightLocation({
-            page,
-            rects: [],
-          });
+  const handleViewSourceByPage = async (page: number, exactText: string) => {
+    if (document) {
+      try {
+        const result = await utils.documents.locate.fetch({ documentId: document.id, quote: exactText });
+        if (result.available) {
+          setHighlightLocation(result.location
+            ? { page: result.location.page, rects: result.location.rects }
+            : { page, rects: [] });
+          return;
         }
+      } catch (error) {
+        console.warn('Server-side locate failed, searching in the browser:', error);
+      }
+    }
+
+    // Try to find the text in the PDF the viewer has loaded and highlight it
+    const located = document?.s3Url
+      ? await locateQuotesInPdf(document.s3Url, { quote: exactText }).catch(() => null)
+      : null;
+    const location = located?.quote;
+    if (location) {
+      setHighlightLocation({
+        page: location.page,
+        rects: location.rects,
       });
     } else {
+      // Just go to the page
       setHighlightLocation({
         page,
         rects: [],
@@ -323,24 +421,67 @@ export default function Extract() {
     }
   };
 
+  // Save one edited field; `original` is its value before the edit. If the data
+  // was saved elsewhere since this page loaded it, re-apply the edit on top of
+  // the latest data only when that field itself is unchanged there; otherwise
+  // show the other value and let the user choose.
+  const saveField = async (
+    extId: number,
+    fieldName: string,
+    field: ExtractedFieldData,
+    original: ExtractedFieldData | undefined
+  ) => {
+    const patch = { id: extId, set: { [fieldName]: field } };
+    try {
+      const saved = await patchFieldsMutation.mutateAsync({
+        ...patch,
+        expectedVersion: dataVersionRef.current ?? undefined,
+      });
+      dataVersionRef.current = saved.version;
+    } catch (error) {
+      if (!(error instanceof TRPCClientError) || error.data?.code !== 'CONFLICT') throw error;
+
+      const latest = await utils.extractions.get.fetch({ id: extId });
+      const latestData = (latest.extractedData ?? {}) as ExtractedData;
+      if (sameFieldData(latestData[fieldName], original)) {
+        const saved = await patchFieldsMutation.mutateAsync({ ...patch, expectedVersion: latest.version });
+        dataVersionRef.current = saved.version;
+        setExtractedData({ ...latestData, [fieldName]: field });
+        toast.info('This extraction was changed elsewhere; your edit was applied to the latest data');
+        return;
+      }
+
+      dataVersionRef.current = latest.version;
+      setExtractedData(latestData);
+      toast.warning(`"${fieldName}" was changed elsewhere`, {
+        description: 'Showing the other value. Keep yours to overwrite it.',
+        duration: Infinity,
+        action: {
+          label: 'Keep mine',
+          onClick: () => {
+            setExtractedData(data => ({ ...(data as ExtractedData), [fieldName]: field }));
+            saveField(extId, fieldName, field, latestData[fieldName]).catch(error => {
+              console.error('Failed to save:', error);
+            });
+          },
+        },
+      });
+    }
+  };
+
   // Update field value (simple mode)
   const handleUpdateField = async (fieldName: string, value: string) => {
-    const newData: ExtractedData = {
-      ...(extractedData as ExtractedData),
-      [fieldName]: {
-        ...(extractedData as ExtractedData)?.[fieldName],
-        value,
-      },
+    const original = (extractedData as ExtractedData)?.[fieldName];
+    const field: ExtractedFieldData = {
+      ...original,
+      value,
     };
-    setExtractedData(newData);
+    setExtractedData({ ...(extractedData as ExtractedData), [fieldName]: field });
 
-    // Auto-save if we have an extraction
+    // Auto-save if we have an extraction, sending only the edited field
     if (extractionId) {
       try {
-        await updateExtractionMutation.mutateAsync({
-          id: extractionId,
-          extractedData: newData,
-        });
+        await saveField(extractionId, fieldName, field, original);
       } catch (error) {
         console.error('Failed to save:', error);
       }
@@ -365,13 +506,14 @@ export default function Extract() {
     current[parts[parts.length - 1]] = value;
     setExtractedData(newData);
 
-    // Auto-save
+    // Auto-save (clinical data is nested, so the whole object is written)
     if (extractionId) {
       try {
-        await updateExtractionMutation.mutateAsync({
+        const saved = await updateExtractionMutation.mutateAsync({
           id: extractionId,
           extractedData: newData as any,
         });
+        dataVersionRef.current = saved.version;
       } catch (error) {
         console.error('Failed to save:', error);
       }
@@ -466,11 +608,18 @@ export default function Extract() {
             </Button>
           </div>
 
+          {(isExtracting || isMultiAgentExtracting) && (
+            <Button variant="ghost" onClick={cancelRuns}>
+              <X className="h-4 w-4 mr-2" />
+              Cancel
+            </Button>
+          )}
+
           {/* Multi-Agent Extract Button */}
           <Button 
             variant="outline" 
             onClick={handleMultiAgentExtract}
-            disabled={!documentText || isMultiAgentExtracting}
+            disabled={!canRunAi || isMultiAgentExtracting}
           >
             {isMultiAgentExtracting ? (
               <Loader2 className="h-4 w-4 mr-2 animate-spin" />
@@ -498,6 +647,7 @@ export default function Extract() {
         <PdfViewer
           pdfUrl={document?.s3Url || null}
           onTextExtracted={handleTextExtracted}
+          onPageText={handlePageText}
           highlightLocation={highlightLocation}
           className="flex-1"
         />
@@ -515,7 +665,7 @@ export default function Extract() {
               onViewSource={handleViewSource}
               onUpdateField={handleUpdateField}
               onEditSchema={() => setShowSchemaEditor(true)}
-              disabled={!documentText}
+              disabled={!canRunAi}
             />
           )}
           
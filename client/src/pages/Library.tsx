@@ -1,10 +1,19 @@
-import { useState, useRef } from 'react';
+import { useState, useRef, useEffect, useMemo } from 'react';
 import { useLocation } from 'wouter';
-import { FileText, Upload, Trash2, Loader2, Calendar, HardDrive, ExternalLink, BookOpen } from 'lucide-react';
+import { FileText, Upload, Trash2, Loader2, Calendar, HardDrive, ExternalLink, BookOpen, Search, Download } from 'lucide-react';
 import { Link } from 'wouter';
 import { trpc } from '@/lib/trpc';
+import { useInfiniteScroll } from '@/hooks/useInfiniteScroll';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent } from '@/components/ui/card';
+import { Input } from '@/components/ui/input';
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
+import {
+  DropdownMenu,
+  DropdownMenuContent,
+  DropdownMenuItem,
+  DropdownMenuTrigger,
+} from '@/components/ui/dropdown-menu';
 import { toast } from 'sonner';
 import {
   AlertDialog,
@@ -17,13 +26,75 @@ import {
   AlertDialogTitle,
 } from '@/components/ui/alert-dialog';
 
+const SORT_OPTIONS = {
+  newest: { label: 'Newest first', sort: 'createdAt', direction: 'desc' },
+  oldest: { label: 'Oldest first', sort: 'createdAt', direction: 'asc' },
+  name: { label: 'Name (A-Z)', sort: 'filename', direction: 'asc' },
+  largest: { label: 'Largest first', sort: 'fileSize', direction: 'desc' },
+} as const;
+
+const DATE_RANGES = {
+  all: { label: 'Any time', days: null },
+  week: { label: 'Last 7 days', days: 7 },
+  month: { label: 'Last 30 days', days: 30 },
+  year: { label: 'Last year', days: 365 },
+} as const;
+
+const PAGE_SIZE = 30;
+
+// Streamed by the server straight to a download, so large libraries never load in the page
+const LIBRARY_EXPORTS = [
+  { label: 'CSV (all extractions)', href: '/api/export/extractions?format=csv' },
+  { label: 'CSV with agent results', href: '/api/export/extractions?format=csv&agents=true' },
+  { label: 'TSV (all extractions)', href: '/api/export/extractions?format=tsv' },
+  { label: 'NDJSON with agent results', href: '/api/export/extractions?format=ndjson&agents=true' },
+  { label: 'Arrow (typed, for R/pandas)', href: '/api/export/extractions?format=arrow&agents=true' },
+] as const;
+
 export default function Library() {
   const [, navigate] = useLocation();
   const [isUploading, setIsUploading] = useState(false);
   const [deleteId, setDeleteId] = useState<number | null>(null);
+  const [searchInput, setSearchInput] = useState('');
+  const [search, setSearch] = useState('');
+  const [sortKey, setSortKey] = useState<keyof typeof SORT_OPTIONS>('newest');
+  const [dateRange, setDateRange] = useState<keyof typeof DATE_RANGES>('all');
   const fileInputRef = useRef<HTMLInputElement>(null);
 
-  const { data: documents, isLoading, refetch } = trpc.documents.list.useQuery();
+  // Filter on the server once typing pauses
+  useEffect(() => {
+    const timer = setTimeout(() => setSearch(searchInput.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [searchInput]);
+
+  // Computed once per range choice so the query key stays stable
+  const createdFrom = useMemo(() => {
+    const days = DATE_RANGES[dateRange].days;
+    return days === null ? undefined : new Date(Date.now() - days * 24 * 60 * 60 * 1000);
+  }, [dateRange]);
+
+  const utils = trpc.useUtils();
+  const documentsQuery = trpc.documents.listPage.useInfiniteQuery(
+    {
+      limit: PAGE_SIZE,
+      sort: SORT_OPTIONS[sortKey].sort,
+      direction: SORT_OPTIONS[sortKey].direction,
+      search: search || undefined,
+      createdFrom,
+    },
+    { getNextPageParam: lastPage => lastPage.nextCursor }
+  );
+  const { isLoading, hasNextPage, isFetchingNextPage, fetchNextPage } = documentsQuery;
+  const documents = useMemo(
+    () => documentsQuery.data?.pages.flatMap(page => page.items),
+    [documentsQuery.data]
+  );
+  const refetch = () => utils.documents.listPage.invalidate();
+  const loadMoreRef = useInfiniteScroll<HTMLDivElement>(
+    () => void fetchNextPage(),
+    !!hasNextPage && !isFetchingNextPage
+  );
+  const isFiltered = search !== '' || dateRange !== 'all';
   const uploadMutation = trpc.documents.upload.useMutation();
   const deleteMutation = trpc.documents.delete.useMutation();
 
@@ -120,6 +191,21 @@ export default function Library() {
                   Templates
                 </Button>
               </Link>
+              <DropdownMenu>
+                <DropdownMenuTrigger asChild>
+                  <Button variant="outline">
+                    <Download className="h-4 w-4 mr-2" />
+                    Export
+                  </Button>
+                </DropdownMenuTrigger>
+                <DropdownMenuContent align="end">
+                  {LIBRARY_EXPORTS.map(option => (
+                    <DropdownMenuItem key={option.href} asChild>
+                      <a href={option.href} download>{option.label}</a>
+                    </DropdownMenuItem>
+                  ))}
+                </DropdownMenuContent>
+              </DropdownMenu>
               <input
                 ref={fileInputRef}
                 type="file"
@@ -145,6 +231,38 @@ export default function Library() {
 
       {/* Content */}
       <main className="container py-8">
+        <div className="flex flex-wrap items-center gap-3 mb-6">
+          <div className="relative flex-1 min-w-[200px] max-w-sm">
+            <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-4 w-4 text-slate-400" />
+            <Input
+              value={searchInput}
+              onChange={(e) => setSearchInput(e.target.value)}
+              placeholder="Search by filename..."
+              className="pl-9 bg-white"
+            />
+          </div>
+          <Select value={dateRange} onValueChange={(value) => setDateRange(value as keyof typeof DATE_RANGES)}>
+            <SelectTrigger className="w-[150px] bg-white">
+              <SelectValue />
+            </SelectTrigger>
+            <SelectContent>
+              {Object.entries(DATE_RANGES).map(([key, range]) => (
+                <SelectItem key={key} value={key}>{range.label}</SelectItem>
+              ))}
+            </SelectContent>
+          </Select>
+          <Select value={sortKey} onValueChange={(value) => setSortKey(value as keyof typeof SORT_OPTIONS)}>
+            <SelectTrigger className="w-[160px] bg-white">
+              <SelectValue />
+            </SelectTrigger>
+            <SelectContent>
+              {Object.entries(SORT_OPTIONS).map(([key, option]) => (
+                <SelectItem key={key} value={key}>{option.label}</SelectItem>
+              ))}
+            </SelectContent>
+          </Select>
+        </div>
+
         {isLoading ? (
           <div className="flex items-center justify-center h-64">
             <Loader2 className="h-8 w-8 animate-spin text-slate-400" />
@@ -208,6 +326,12 @@ export default function Library() {
               </Card>
             ))}
           </div>
+        ) : isFiltered ? (
+          <div className="flex flex-col items-center justify-center h-64 text-slate-400">
+            <Search className="h-16 w-16 mb-4 opacity-20" />
+            <p className="text-lg font-medium">No matching documents</p>
+            <p className="text-sm">Try a different search or date range</p>
+          </div>
         ) : (
           <div className="flex flex-col items-center justify-center h-64 text-slate-400">
             <FileText className="h-16 w-16 mb-4 opacity-20" />
@@ -215,6 +339,11 @@ export default function Library() {
             <p className="text-sm">Upload a PDF to get started</p>
           </div>
         )}
+
+        {/* Loads the next page when scrolled into view */}
+        <div ref={loadMoreRef} className="flex justify-center py-6">
+          {isFetchingNextPage && <Loader2 className="h-6 w-6 animate-spin text-slate-400" />}
+        </div>
       </main>
 
       {/* Delete Confirmation Dialog */}
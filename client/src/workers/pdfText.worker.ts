@@ -0,0 +1,102 @@
+/**
+ * Text worker: reads the text of PDFs and locates quotes in it off the main
+ * thread, with the same page layout and matching as the server uses for
+ * documents parsed on upload.
+ */
+
+import { GlobalWorkerOptions, getDocument } from "pdfjs-dist";
+import pdfJsWorkerUrl from "pdfjs-dist/build/pdf.worker.min.mjs?url";
+import { buildGroundingIndex, groundExtractedData, locateQuotes, type GroundingIndex } from "@shared/grounding";
+import { buildPageText, type ParsedPdfPage, type RawTextItem } from "@shared/pdfPageText";
+import type { ExtractedData, LocationData } from "../../../drizzle/schema";
+
+/** Pages read at once; bounds the text content held in flight */
+const PAGE_CONCURRENCY = 4;
+/** Documents kept indexed; the least recently indexed is dropped past this */
+const MAX_INDEXES = 3;
+
+export type PdfTextRequest =
+  /** Read and index a PDF; `pdf` is its bytes, transferred */
+  | { type: "index"; id: number; url: string; pdf: ArrayBuffer }
+  | { type: "locate"; id: number; url: string; quotes: Record<string, string | string[]> }
+  | { type: "ground"; id: number; url: string; data: ExtractedData }
+  | { type: "release"; url: string };
+
+export type PdfTextResponse =
+  /** One page's text as soon as it is read (in no set order); `text` is UTF-8, transferred */
+  | { type: "page"; url: string; pageNumber: number; pageCount: number; text: ArrayBuffer }
+  /** Sent after the last page */
+  | { type: "indexed"; id: number; pageCount: number }
+  | { type: "located"; id: number; located: Record<string, LocationData | null> }
+  | { type: "grounded"; id: number; data: ExtractedData }
+  | { type: "error"; id: number; message: string };
+
+GlobalWorkerOptions.workerSrc = pdfJsWorkerUrl;
+
+const indexes = new Map<string, GroundingIndex>();
+
+const post = (response: PdfTextResponse, transfer: Transferable[] = []) => self.postMessage(response, { transfer });
+
+function indexOf(url: string): GroundingIndex {
+  const index = indexes.get(url);
+  if (!index) throw new Error(`${url} is not indexed`);
+  return index;
+}
+
+async function indexPdf(url: string, data: ArrayBuffer): Promise<number> {
+  const pdf = await getDocument({ data: new Uint8Array(data), isEvalSupported: false, disableFontFace: true }).promise;
+  try {
+    const pageCount: number = pdf.numPages;
+    const pages = new Array<ParsedPdfPage>(pageCount);
+    let next = 1;
+
+    // Readers take the next page in turn, so pages finish roughly in order
+    const readPages = async () => {
+      while (next <= pageCount) {
+        const pageNumber = next++;
+        const page = await pdf.getPage(pageNumber);
+        const content = await page.getTextContent();
+        pages[pageNumber - 1] = buildPageText(pageNumber, content.items as RawTextItem[]);
+        page.cleanup();
+
+        const { buffer } = new TextEncoder().encode(pages[pageNumber - 1].text);
+        post({ type: "page", url, pageNumber, pageCount, text: buffer as ArrayBuffer }, [buffer]);
+      }
+    };
+    await Promise.all(Array.from({ length: Math.min(PAGE_CONCURRENCY, pageCount) }, readPages));
+
+    indexes.delete(url);
+    indexes.set(url, buildGroundingIndex(pages));
+    for (const [oldUrl] of Array.from(indexes)) {
+      if (indexes.size <= MAX_INDEXES) break;
+      indexes.delete(oldUrl);
+    }
+    return pageCount;
+  } finally {
+    await pdf.destroy();
+  }
+}
+
+self.onmessage = async (event: MessageEvent<PdfTextRequest>) => {
+  const request = event.data;
+  if (request.type === "release") {
+    indexes.delete(request.url);
+    return;
+  }
+
+  try {
+    switch (request.type) {
+      case "index":
+        post({ type: "indexed", id: request.id, pageCount: await indexPdf(request.url, request.pdf) });
+        break;
+      case "locate":
+        post({ type: "located", id: request.id, located: locateQuotes(indexOf(request.url), request.quotes) });
+        break;
+      case "ground":
+        post({ type: "grounded", id: request.id, data: groundExtractedData(indexOf(request.url), request.data) });
+        break;
+    }
+  } catch (error) {
+    post({ type: "error", id: request.id, message: error instanceof Error ? error.message : String(error) });
+  }
+};
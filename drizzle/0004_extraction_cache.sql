@@ -0,0 +1,18 @@
+CREATE TABLE `extraction_cache` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`cacheKey` varchar(64) NOT NULL,
+	`provider` enum('gemini','claude','openrouter') NOT NULL,
+	`modelName` varchar(128) NOT NULL,
+	`documentHash` varchar(64) NOT NULL,
+	`schemaHash` varchar(64) NOT NULL,
+	`extractedData` json NOT NULL,
+	`hitCount` int NOT NULL DEFAULT 0,
+	`lastAccessedAt` timestamp NOT NULL DEFAULT (now()),
+	`expiresAt` timestamp NOT NULL,
+	`createdAt` timestamp NOT NULL DEFAULT (now()),
+	CONSTRAINT `extraction_cache_id` PRIMARY KEY(`id`),
+	CONSTRAINT `extraction_cache_cacheKey_unique` UNIQUE(`cacheKey`)
+);
+--> statement-breakpoint
+CREATE INDEX `extraction_cache_lastAccessedAt_idx` ON `extraction_cache` (`lastAccessedAt`);--> statement-breakpoint
+CREATE INDEX `extraction_cache_expiresAt_idx` ON `extraction_cache` (`expiresAt`);
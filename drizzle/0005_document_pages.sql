@@ -0,0 +1,12 @@
+CREATE TABLE `document_pages` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`documentId` int NOT NULL,
+	`pageNumber` int NOT NULL,
+	`charCount` int NOT NULL,
+	`textData` longblob NOT NULL,
+	`itemsData` longblob NOT NULL,
+	`createdAt` timestamp NOT NULL DEFAULT (now()),
+	CONSTRAINT `document_pages_id` PRIMARY KEY(`id`)
+);
+--> statement-breakpoint
+CREATE UNIQUE INDEX `document_pages_documentId_pageNumber_unique` ON `document_pages` (`documentId`,`pageNumber`);
@@ -0,0 +1,23 @@
+CREATE TABLE `extraction_jobs` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`extractionId` int NOT NULL,
+	`userId` int NOT NULL,
+	`agentExtractionId` int NOT NULL,
+	`provider` enum('gemini','claude','openrouter') NOT NULL,
+	`status` enum('queued','running','completed','failed') NOT NULL DEFAULT 'queued',
+	`attempts` int NOT NULL DEFAULT 0,
+	`maxAttempts` int NOT NULL DEFAULT 3,
+	`bypassCache` boolean NOT NULL DEFAULT false,
+	`documentTextData` longblob,
+	`lockedBy` varchar(64),
+	`lockedAt` timestamp,
+	`runAfter` timestamp NOT NULL DEFAULT (now()),
+	`lastError` text,
+	`completedAt` timestamp,
+	`createdAt` timestamp NOT NULL DEFAULT (now()),
+	`updatedAt` timestamp NOT NULL DEFAULT (now()) ON UPDATE CURRENT_TIMESTAMP,
+	CONSTRAINT `extraction_jobs_id` PRIMARY KEY(`id`)
+);
+--> statement-breakpoint
+CREATE INDEX `extraction_jobs_status_runAfter_idx` ON `extraction_jobs` (`status`,`runAfter`);--> statement-breakpoint
+CREATE INDEX `extraction_jobs_extractionId_idx` ON `extraction_jobs` (`extractionId`);
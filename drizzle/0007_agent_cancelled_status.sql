@@ -0,0 +1 @@
+ALTER TABLE `agent_extractions` MODIFY COLUMN `status` enum('pending','extracting','completed','failed','cancelled') NOT NULL DEFAULT 'pending';
@@ -0,0 +1,2 @@
+ALTER TABLE `extractions` MODIFY COLUMN `status` enum('pending','extracting','completed','failed','cancelled') NOT NULL DEFAULT 'pending';--> statement-breakpoint
+ALTER TABLE `extractions` ADD `processingTimeMs` int;
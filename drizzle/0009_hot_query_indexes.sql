@@ -0,0 +1,8 @@
+DELETE `older` FROM `agent_extractions` `older` JOIN `agent_extractions` `newer` ON `older`.`extractionId` = `newer`.`extractionId` AND `older`.`provider` = `newer`.`provider` AND `older`.`id` < `newer`.`id`;--> statement-breakpoint
+CREATE UNIQUE INDEX `agent_extractions_extractionId_provider_unique` ON `agent_extractions` (`extractionId`,`provider`);--> statement-breakpoint
+CREATE INDEX `documents_userId_createdAt_idx` ON `documents` (`userId`,`createdAt`);--> statement-breakpoint
+CREATE INDEX `extractions_documentId_userId_createdAt_idx` ON `extractions` (`documentId`,`userId`,`createdAt`);--> statement-breakpoint
+CREATE INDEX `schema_templates_userId_createdAt_idx` ON `schema_templates` (`userId`,`createdAt`);--> statement-breakpoint
+CREATE INDEX `schema_templates_isBuiltIn_idx` ON `schema_templates` (`isBuiltIn`);--> statement-breakpoint
+CREATE INDEX `schema_templates_isPublic_idx` ON `schema_templates` (`isPublic`);--> statement-breakpoint
+CREATE INDEX `schema_templates_studyType_idx` ON `schema_templates` (`studyType`);
@@ -0,0 +1 @@
+CREATE INDEX `extractions_userId_createdAt_idx` ON `extractions` (`userId`,`createdAt`);
\ No newline at end of file
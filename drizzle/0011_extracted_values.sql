@@ -0,0 +1,19 @@
+CREATE TABLE `extracted_values` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`extractionId` int NOT NULL,
+	`provider` enum('final','gemini','claude','openrouter') NOT NULL,
+	`fieldName` varchar(128) NOT NULL,
+	`valueType` enum('text','number','boolean','empty') NOT NULL,
+	`textValue` text,
+	`textKey` varchar(191),
+	`numberValue` double,
+	`booleanValue` boolean,
+	`confidence` enum('high','medium','low'),
+	`page` int,
+	`createdAt` timestamp NOT NULL DEFAULT (now()),
+	CONSTRAINT `extracted_values_id` PRIMARY KEY(`id`)
+);
+--> statement-breakpoint
+CREATE UNIQUE INDEX `extracted_values_extractionId_provider_fieldName_unique` ON `extracted_values` (`extractionId`,`provider`,`fieldName`);--> statement-breakpoint
+CREATE INDEX `extracted_values_fieldName_provider_numberValue_idx` ON `extracted_values` (`fieldName`,`provider`,`numberValue`);--> statement-breakpoint
+CREATE INDEX `extracted_values_fieldName_provider_textKey_idx` ON `extracted_values` (`fieldName`,`provider`,`textKey`);
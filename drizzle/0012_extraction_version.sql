@@ -0,0 +1 @@
+ALTER TABLE `extractions` ADD `version` int DEFAULT 1 NOT NULL;
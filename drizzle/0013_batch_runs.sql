@@ -0,0 +1,36 @@
+CREATE TABLE `batch_run_items` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`batchRunId` int NOT NULL,
+	`userId` int NOT NULL,
+	`documentId` int NOT NULL,
+	`extractionId` int,
+	`status` enum('pending','running','completed','failed','cancelled') NOT NULL DEFAULT 'pending',
+	`attempts` int NOT NULL DEFAULT 0,
+	`lastError` text,
+	`startedAt` timestamp,
+	`completedAt` timestamp,
+	`createdAt` timestamp NOT NULL DEFAULT (now()),
+	CONSTRAINT `batch_run_items_id` PRIMARY KEY(`id`)
+);
+--> statement-breakpoint
+CREATE TABLE `batch_runs` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`userId` int NOT NULL,
+	`name` varchar(255) NOT NULL,
+	`templateId` int,
+	`schema` json NOT NULL,
+	`providers` json NOT NULL,
+	`bypassCache` boolean NOT NULL DEFAULT false,
+	`status` enum('running','completed','cancelled') NOT NULL DEFAULT 'running',
+	`completedAt` timestamp,
+	`createdAt` timestamp NOT NULL DEFAULT (now()),
+	`updatedAt` timestamp NOT NULL DEFAULT (now()) ON UPDATE CURRENT_TIMESTAMP,
+	CONSTRAINT `batch_runs_id` PRIMARY KEY(`id`)
+);
+--> statement-breakpoint
+CREATE UNIQUE INDEX `batch_run_items_batchRunId_documentId_unique` ON `batch_run_items` (`batchRunId`,`documentId`);--> statement-breakpoint
+CREATE INDEX `batch_run_items_batchRunId_status_idx` ON `batch_run_items` (`batchRunId`,`status`);--> statement-breakpoint
+CREATE INDEX `batch_run_items_status_userId_idx` ON `batch_run_items` (`status`,`userId`);--> statement-breakpoint
+CREATE INDEX `batch_run_items_extractionId_idx` ON `batch_run_items` (`extractionId`);--> statement-breakpoint
+CREATE INDEX `batch_runs_userId_createdAt_idx` ON `batch_runs` (`userId`,`createdAt`);--> statement-breakpoint
+CREATE INDEX `batch_runs_status_idx` ON `batch_runs` (`status`);
@@ -1,4 +1,13 @@
-import { int, mysqlEnum, mysqlTable, text, timestamp, varchar, json, bigint, boolean } from "drizzle-orm/mysql-core";
+import { int, mysqlEnum, mysqlTable, text, timestamp, varchar, json, bigint, boolean, double, index, uniqueIndex, customType } from "drizzle-orm/mysql-core";
+
+/**
+ * Binary column for compressed payloads (gzip)
+ */
+const longblob = customType<{ data: Buffer; driverData: Buffer }>({
+  dataType() {
+    return "longblob";
+  },
+});
 
 /**
  * Core user table backing auth flow.
@@ -32,11 +41,35 @@ export const documents = mysqlTable("documents", {
   pageCount: int("pageCount"),
   createdAt: timestamp("createdAt").defaultNow().notNull(),
   updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
-});
+}, (table) => [
+  index("documents_userId_createdAt_idx").on(table.userId, table.createdAt),
+]);
 
 export type Document = typeof documents.$inferSelect;
 export type InsertDocument = typeof documents.$inferInsert;
 
+/**
+ * Document pages table - server-side parsed text per PDF page
+ */
+export const documentPages = mysqlTable("document_pages", {
+  id: int("id").autoincrement().primaryKey(),
+  documentId: int("documentId").notNull(),
+  /** Page number in the document (1-indexed) */
+  pageNumber: int("pageNumber").notNull(),
+  /** Length of the uncompressed page text */
+  charCount: int("charCount").notNull(),
+  /** gzip-compressed UTF-8 page text (text items joined with single spaces) */
+  textData: longblob("textData").notNull(),
+  /** gzip-compressed JSON of PdfTextItem tuples: [start, end, x, y, width, height] */
+  itemsData: longblob("itemsData").notNull(),
+  createdAt: timestamp("createdAt").defaultNow().notNull(),
+}, (table) => [
+  uniqueIndex("document_pages_documentId_pageNumber_unique").on(table.documentId, table.pageNumber),
+]);
+
+export type DocumentPage = typeof documentPages.$inferSelect;
+export type InsertDocumentPage = typeof documentPages.$inferInsert;
+
 /**
  * Extractions table - stores extraction sessions with schema and extracted data
  */
@@ -50,10 +83,17 @@ export const extractions = mysqlTable("extractions", {
   extractedData: json("extractedData").$type<ExtractedData>(),
   /** AI-generated document summary */
   summary: text("summary"),
-  status: mysqlEnum("status", ["pending", "extracting", "completed", "failed"]).default("pending").notNull(),
+  status: mysqlEnum("status", ["pending", "extracting", "completed", "failed", "cancelled"]).default("pending").notNull(),
+  /** Duration of the last AI run (completed, failed or cancelled) */
+  processingTimeMs: int("processingTimeMs"),
+  /** Incremented by every write of extractedData, for optimistic concurrency checks */
+  version: int("version").default(1).notNull(),
   createdAt: timestamp("createdAt").defaultNow().notNull(),
   updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
-});
+}, (table) => [
+  index("extractions_documentId_userId_createdAt_idx").on(table.documentId, table.userId, table.createdAt),
+  index("extractions_userId_createdAt_idx").on(table.userId, table.createdAt),
+]);
 
 export type ExtractionRecord = typeof extractions.$inferSelect;
 export type InsertExtraction = typeof extractions.$inferInsert;
@@ -100,16 +140,57 @@ export const agentExtractions = mysqlTable("agent_extractions", {
   /** Processing time in milliseconds */
   processingTimeMs: int("processingTimeMs"),
   /** Status of this agent's extraction */
-  status: mysqlEnum("status", ["pending", "extracting", "completed", "failed"]).default("pending").notNull(),
-  /** Error message if failed */
+  status: mysqlEnum("status", ["pending", "extracting", "completed", "failed", "cancelled"]).default("pending").notNull(),
+  /** Error message if failed, or why the run was cancelled */
   errorMessage: text("errorMessage"),
   createdAt: timestamp("createdAt").defaultNow().notNull(),
   updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
-});
+}, (table) => [
+  // One row per provider per extraction; re-runs update it in place
+  uniqueIndex("agent_extractions_extractionId_provider_unique").on(table.extractionId, table.provider),
+]);
 
 export type AgentExtraction = typeof agentExtractions.$inferSelect;
 export type InsertAgentExtraction = typeof agentExtractions.$inferInsert;
 
+/** Whose values an extracted_values row holds: the extraction's own (final) data or an agent's */
+export const EXTRACTED_VALUE_PROVIDERS = ["final", "gemini", "claude", "openrouter"] as const;
+export type ExtractedValueProvider = typeof EXTRACTED_VALUE_PROVIDERS[number];
+
+/**
+ * Extracted values table - one row per extraction, provider and field, flattened from
+ * the extractedData JSON so values can be filtered with indexes. Rewritten on every
+ * write of the source JSON (see syncExtractedValues in server/db.ts).
+ */
+export const extractedValues = mysqlTable("extracted_values", {
+  id: int("id").autoincrement().primaryKey(),
+  /** Extraction session the value belongs to (ownership comes from extractions.userId) */
+  extractionId: int("extractionId").notNull(),
+  provider: mysqlEnum("provider", EXTRACTED_VALUE_PROVIDERS).notNull(),
+  fieldName: varchar("fieldName", { length: 128 }).notNull(),
+  /** JSON type of the value; "empty" for blank strings (not found) */
+  valueType: mysqlEnum("valueType", ["text", "number", "boolean", "empty"]).notNull(),
+  /** The value as text */
+  textValue: text("textValue"),
+  /** Lowercased, whitespace-collapsed value (truncated) for equality filters and grouping */
+  textKey: varchar("textKey", { length: 191 }),
+  /** Numeric value, also set for numeric strings such as "1,200" or "45%" */
+  numberValue: double("numberValue"),
+  /** Boolean value, also set for yes/no and true/false strings */
+  booleanValue: boolean("booleanValue"),
+  confidence: mysqlEnum("confidence", ["high", "medium", "low"]),
+  /** Page the value was found on */
+  page: int("page"),
+  createdAt: timestamp("createdAt").defaultNow().notNull(),
+}, (table) => [
+  uniqueIndex("extracted_values_extractionId_provider_fieldName_unique").on(table.extractionId, table.provider, table.fieldName),
+  index("extracted_values_fieldName_provider_numberValue_idx").on(table.fieldName, table.provider, table.numberValue),
+  index("extracted_values_fieldName_provider_textKey_idx").on(table.fieldName, table.provider, table.textKey),
+]);
+
+export type ExtractedValue = typeof extractedValues.$inferSelect;
+export type InsertExtractedValue = typeof extractedValues.$inferInsert;
+
 export type StudyType = typeof STUDY_TYPES[number];
 
 /**
@@ -136,11 +217,152 @@ export const schemaTemplates = mysqlTable("schema_templates", {
   isPublic: boolean("isPublic").default(false).notNull(),
   createdAt: timestamp("createdAt").defaultNow().notNull(),
   updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
-});
+}, (table) => [
+  // One index per OR branch of the visibility filter, so MySQL can index-merge them
+  index("schema_templates_userId_createdAt_idx").on(table.userId, table.createdAt),
+  index("schema_templates_isBuiltIn_idx").on(table.isBuiltIn),
+  index("schema_templates_isPublic_idx").on(table.isPublic),
+  index("schema_templates_studyType_idx").on(table.studyType),
+]);
 
 export type SchemaTemplate = typeof schemaTemplates.$inferSelect;
 export type InsertSchemaTemplate = typeof schemaTemplates.$inferInsert;
 
+/**
+ * Extraction cache table - content-addressed LLM results keyed by document, schema and model
+ */
+export const extractionCache = mysqlTable("extraction_cache", {
+  id: int("id").autoincrement().primaryKey(),
+  /** sha256 over the document hash, schema hash, provider, model and prompt variant */
+  cacheKey: varchar("cacheKey", { length: 64 }).notNull().unique(),
+  /** AI provider that produced the result */
+  provider: mysqlEnum("provider", ["gemini", "claude", "openrouter"]).notNull(),
+  /** Model name/version used */
+  modelName: varchar("modelName", { length: 128 }).notNull(),
+  /** sha256 of the normalized document text */
+  documentHash: varchar("documentHash", { length: 64 }).notNull(),
+  /** sha256 of the canonical extraction schema */
+  schemaHash: varchar("schemaHash", { length: 64 }).notNull(),
+  /** Cached extraction result */
+  extractedData: json("extractedData").$type<ExtractedData>().notNull(),
+  /** Number of times this entry was served */
+  hitCount: int("hitCount").default(0).notNull(),
+  /** Last time the entry was served (drives LRU eviction) */
+  lastAccessedAt: timestamp("lastAccessedAt").defaultNow().notNull(),
+  /** Entry is treated as a miss after this time */
+  expiresAt: timestamp("expiresAt").notNull(),
+  createdAt: timestamp("createdAt").defaultNow().notNull(),
+}, (table) => [
+  index("extraction_cache_lastAccessedAt_idx").on(table.lastAccessedAt),
+  index("extraction_cache_expiresAt_idx").on(table.expiresAt),
+]);
+
+export type ExtractionCacheEntry = typeof extractionCache.$inferSelect;
+export type InsertExtractionCacheEntry = typeof extractionCache.$inferInsert;
+
+export const EXTRACTION_JOB_STATUSES = ["queued", "running", "completed", "failed"] as const;
+export type ExtractionJobStatus = typeof EXTRACTION_JOB_STATUSES[number];
+
+/**
+ * Extraction jobs table - durable queue of per-provider agent extractions run by background workers
+ */
+export const extractionJobs = mysqlTable("extraction_jobs", {
+  id: int("id").autoincrement().primaryKey(),
+  /** Parent extraction session */
+  extractionId: int("extractionId").notNull(),
+  /** Owner of the extraction (jobs run outside a request context) */
+  userId: int("userId").notNull(),
+  /** Agent extraction row this job fills in */
+  agentExtractionId: int("agentExtractionId").notNull(),
+  /** AI provider to run */
+  provider: mysqlEnum("provider", ["gemini", "claude", "openrouter"]).notNull(),
+  status: mysqlEnum("status", EXTRACTION_JOB_STATUSES).default("queued").notNull(),
+  /** Number of times a worker has claimed this job */
+  attempts: int("attempts").default(0).notNull(),
+  maxAttempts: int("maxAttempts").default(3).notNull(),
+  /** Skip the extraction cache lookup */
+  bypassCache: boolean("bypassCache").default(false).notNull(),
+  /** gzip-compressed document text, only when the document has no parsed pages */
+  documentTextData: longblob("documentTextData"),
+  /** Worker holding the lease while running */
+  lockedBy: varchar("lockedBy", { length: 64 }),
+  /** Lease start; running jobs with an old lease are requeued */
+  lockedAt: timestamp("lockedAt"),
+  /** Earliest time the job may be claimed (retry backoff) */
+  runAfter: timestamp("runAfter").defaultNow().notNull(),
+  lastError: text("lastError"),
+  completedAt: timestamp("completedAt"),
+  createdAt: timestamp("createdAt").defaultNow().notNull(),
+  updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
+}, (table) => [
+  index("extraction_jobs_status_runAfter_idx").on(table.status, table.runAfter),
+  index("extraction_jobs_extractionId_idx").on(table.extractionId),
+]);
+
+export type ExtractionJob = typeof extractionJobs.$inferSelect;
+export type InsertExtractionJob = typeof extractionJobs.$inferInsert;
+
+export const BATCH_RUN_STATUSES = ["running", "completed", "cancelled"] as const;
+export type BatchRunStatus = typeof BATCH_RUN_STATUSES[number];
+
+/**
+ * Batch runs table - one schema extracted from many documents. Items are started
+ * a few at a time by the batch scheduler (server/batches.ts), each as a queued
+ * multi-agent extraction.
+ */
+export const batchRuns = mysqlTable("batch_runs", {
+  id: int("id").autoincrement().primaryKey(),
+  userId: int("userId").notNull(),
+  name: varchar("name", { length: 255 }).notNull(),
+  /** Template the schema was taken from, if any */
+  templateId: int("templateId"),
+  /** Schema every item is extracted with (copied, so template edits don't affect the run) */
+  schema: json("schema").$type<ExtractionSchema>().notNull(),
+  providers: json("providers").$type<AIProvider[]>().notNull(),
+  bypassCache: boolean("bypassCache").default(false).notNull(),
+  status: mysqlEnum("status", BATCH_RUN_STATUSES).default("running").notNull(),
+  completedAt: timestamp("completedAt"),
+  createdAt: timestamp("createdAt").defaultNow().notNull(),
+  updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
+}, (table) => [
+  index("batch_runs_userId_createdAt_idx").on(table.userId, table.createdAt),
+  index("batch_runs_status_idx").on(table.status),
+]);
+
+export type BatchRun = typeof batchRuns.$inferSelect;
+export type InsertBatchRun = typeof batchRuns.$inferInsert;
+
+export const BATCH_RUN_ITEM_STATUSES = ["pending", "running", "completed", "failed", "cancelled"] as const;
+export type BatchRunItemStatus = typeof BATCH_RUN_ITEM_STATUSES[number];
+
+/**
+ * Batch run items table - one document of a batch run and the extraction made for it
+ */
+export const batchRunItems = mysqlTable("batch_run_items", {
+  id: int("id").autoincrement().primaryKey(),
+  batchRunId: int("batchRunId").notNull(),
+  /** Owner of the run, for the per-user concurrency limit */
+  userId: int("userId").notNull(),
+  documentId: int("documentId").notNull(),
+  /** Extraction session of the current attempt (null until the item starts) */
+  extractionId: int("extractionId"),
+  status: mysqlEnum("status", BATCH_RUN_ITEM_STATUSES).default("pending").notNull(),
+  /** Number of times the item was started */
+  attempts: int("attempts").default(0).notNull(),
+  lastError: text("lastError"),
+  startedAt: timestamp("startedAt"),
+  completedAt: timestamp("completedAt"),
+  createdAt: timestamp("createdAt").defaultNow().notNull(),
+}, (table) => [
+  uniqueIndex("batch_run_items_batchRunId_documentId_unique").on(table.batchRunId, table.documentId),
+  index("batch_run_items_batchRunId_status_idx").on(table.batchRunId, table.status),
+  index("batch_run_items_status_userId_idx").on(table.status, table.userId),
+  index("batch_run_items_extractionId_idx").on(table.extractionId),
+]);
+
+export type BatchRunItem = typeof batchRunItems.$inferSelect;
+export type InsertBatchRunItem = typeof batchRunItems.$inferInsert;
+
 // ============================================================================
 // RIGOROUS CLINICAL EXTRACTION SCHEMA TYPES
 // Based on clinical-study-master-extraction.schema.json
@@ -423,6 +645,17 @@ export interface LocationData {
     conformsTo?: string;
     value: string;
   };
+  /** Similarity of the located text to the quote (1 for an exact match); set by server-side grounding */
+  similarity?: number;
+}
+
+/**
+ * Document chunk a value was taken from (set by chunked extraction of long documents)
+ */
+export interface ChunkProvenance {
+  index: number;
+  pageStart: number | null;
+  pageEnd: number | null;
 }
 
 /**
@@ -439,6 +672,8 @@ export interface ExtractedFieldData {
   location?: LocationData;
   /** Additional notes */
   notes?: string;
+  /** Chunk the value came from, for documents extracted in several chunks */
+  chunk?: ChunkProvenance;
 }
 
 export interface ExtractedData {
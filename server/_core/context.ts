@@ -1,28 +1,31 @@
 import type { CreateExpressContextOptions } from "@trpc/server/adapters/express";
 import type { User } from "../../drizzle/schema";
 import { sdk } from "./sdk";
+import { createRequestLoaders, type RequestLoaders } from "../loaders";
 
 export type TrpcContext = {
   req: CreateExpressContextOptions["req"];
   res: CreateExpressContextOptions["res"];
+  /** Signed-in user; stays null until a procedure asks for it via loadUser */
   user: User | null;
+  /** Authenticate the request's session (once per request) */
+  loadUser?: () => Promise<User | null>;
+  /** Batched, cached row lookups shared by the procedures of one (batched) request */
+  loaders?: RequestLoaders;
 };
 
 export async function createContext(
   opts: CreateExpressContextOptions
 ): Promise<TrpcContext> {
-  let user: User | null = null;
-
-  try {
-    user = await sdk.authenticateRequest(opts.req);
-  } catch (error) {
-    // Authentication is optional for public procedures.
-    user = null;
-  }
+  let pending: Promise<User | null> | null = null;
 
   return {
     req: opts.req,
     res: opts.res,
-    user,
+    user: null,
+    // Authentication is optional for public procedures, so it only runs when needed.
+    loadUser: () =>
+      (pending ??= sdk.authenticateRequest(opts.req).catch(() => null)),
+    loaders: createRequestLoaders(),
   };
 }
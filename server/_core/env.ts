@@ -7,4 +7,38 @@ export const ENV = {
   isProduction: process.env.NODE_ENV === "production",
   forgeApiUrl: process.env.BUILT_IN_FORGE_API_URL ?? "",
   forgeApiKey: process.env.BUILT_IN_FORGE_API_KEY ?? "",
+  extractionCacheTtlMs: Number(process.env.EXTRACTION_CACHE_TTL_MS ?? 7 * 24 * 60 * 60 * 1000),
+  extractionCacheMaxEntries: Number(process.env.EXTRACTION_CACHE_MAX_ENTRIES ?? 5000),
+  extractionChunkConcurrency: Number(process.env.EXTRACTION_CHUNK_CONCURRENCY ?? 4),
+  extractionWorkerConcurrency: Number(process.env.EXTRACTION_WORKER_CONCURRENCY ?? 3),
+  extractionWorkerPollMs: Number(process.env.EXTRACTION_WORKER_POLL_MS ?? 2000),
+  extractionJobLeaseMs: Number(process.env.EXTRACTION_JOB_LEASE_MS ?? 5 * 60 * 1000),
+  extractionJobMaxAttempts: Number(process.env.EXTRACTION_JOB_MAX_ATTEMPTS ?? 3),
+  extractionJobRetryBaseMs: Number(process.env.EXTRACTION_JOB_RETRY_BASE_MS ?? 5000),
+  batchMaxActiveItems: Number(process.env.BATCH_MAX_ACTIVE_ITEMS ?? 12),
+  batchUserMaxActiveItems: Number(process.env.BATCH_USER_MAX_ACTIVE_ITEMS ?? 4),
+  batchSchedulerPollMs: Number(process.env.BATCH_SCHEDULER_POLL_MS ?? 5000),
+  httpPoolConnections: Number(process.env.HTTP_POOL_CONNECTIONS ?? 32),
+  httpPoolOverrides: process.env.HTTP_POOL_OVERRIDES ?? "",
+  httpKeepAliveTimeoutMs: Number(process.env.HTTP_KEEPALIVE_TIMEOUT_MS ?? 30_000),
+  authCacheTtlMs: Number(process.env.AUTH_CACHE_TTL_MS ?? 60_000),
+  authCacheMaxEntries: Number(process.env.AUTH_CACHE_MAX_ENTRIES ?? 1000),
+  lastSignedInWriteIntervalMs: Number(process.env.LAST_SIGNED_IN_WRITE_INTERVAL_MS ?? 15 * 60 * 1000),
+  llmLimits: {
+    gemini: {
+      requestsPerMinute: Number(process.env.GEMINI_RPM ?? 300),
+      tokensPerMinute: Number(process.env.GEMINI_TPM ?? 2_000_000),
+      maxInFlight: Number(process.env.GEMINI_MAX_IN_FLIGHT ?? 16),
+    },
+    claude: {
+      requestsPerMinute: Number(process.env.CLAUDE_RPM ?? 50),
+      tokensPerMinute: Number(process.env.CLAUDE_TPM ?? 200_000),
+      maxInFlight: Number(process.env.CLAUDE_MAX_IN_FLIGHT ?? 4),
+    },
+    openrouter: {
+      requestsPerMinute: Number(process.env.OPENROUTER_RPM ?? 60),
+      tokensPerMinute: Number(process.env.OPENROUTER_TPM ?? 400_000),
+      maxInFlight: Number(process.env.OPENROUTER_MAX_IN_FLIGHT ?? 8),
+    },
+  },
 };
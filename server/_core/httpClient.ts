@@ -0,0 +1,107 @@
+import Anthropic from "@anthropic-ai/sdk";
+import { Agent, Pool, fetch as undiciFetch } from "undici";
+import { ENV } from "./env";
+
+/**
+ * Shared keep-alive transport for outbound HTTP. One connection pool per
+ * upstream origin, so repeated LLM/storage calls reuse warm TLS connections
+ * instead of handshaking on every request. Only the configured upstreams get
+ * a dedicated pool; other origins (e.g. user-supplied audio URLs) go through
+ * the default fetch, so the pools and their metrics stay bounded.
+ */
+
+const pools = new Map<string, Pool>();
+const requestCounts = new Map<string, number>();
+
+/** "host=connections" overrides, e.g. HTTP_POOL_OVERRIDES="openrouter.ai=16,api.anthropic.com=8" */
+function parsePoolOverrides(value: string): Map<string, number> {
+  const overrides = new Map<string, number>();
+  for (const entry of value.split(",")) {
+    const [host, size] = entry.split("=").map(part => part.trim());
+    if (host && Number(size) > 0) overrides.set(host, Number(size));
+  }
+  return overrides;
+}
+
+const poolOverrides = parsePoolOverrides(ENV.httpPoolOverrides);
+
+const hostOf = (url: string) => {
+  try {
+    return new URL(url).host;
+  } catch {
+    return null;
+  }
+};
+
+/** Hosts with a dedicated pool: the LLM/storage API, OpenRouter, Anthropic, and every overridden host */
+const upstreamHosts = new Set(
+  [
+    ENV.forgeApiUrl.trim() || "https://forge.manus.im",
+    "https://openrouter.ai",
+    process.env.ANTHROPIC_BASE_URL || "https://api.anthropic.com",
+  ]
+    .map(hostOf)
+    .filter((host): host is string => host !== null)
+    .concat(Array.from(poolOverrides.keys()))
+);
+
+const connectionsFor = (origin: string) =>
+  poolOverrides.get(new URL(origin).host) ?? ENV.httpPoolConnections;
+
+const dispatcher = new Agent({
+  keepAliveTimeout: ENV.httpKeepAliveTimeoutMs,
+  keepAliveMaxTimeout: ENV.httpKeepAliveTimeoutMs * 2,
+  factory: (origin, options) => {
+    const key = String(origin);
+    const pool = new Pool(origin, { ...options, connections: connectionsFor(key) });
+    // Redirects can lead elsewhere; only the upstreams' pools are reported
+    if (upstreamHosts.has(new URL(key).host)) pools.set(key, pool);
+    return pool;
+  },
+});
+
+/**
+ * Drop-in `fetch` that routes the configured upstreams through the pooled
+ * keep-alive dispatcher and everything else through the default one
+ */
+export async function pooledFetch(input: string | URL, init: RequestInit = {}): Promise<Response> {
+  const url = new URL(String(input));
+  if (!upstreamHosts.has(url.host)) return fetch(input, init);
+
+  requestCounts.set(url.origin, (requestCounts.get(url.origin) ?? 0) + 1);
+  const response = await undiciFetch(input, { ...(init as any), dispatcher });
+  return response as unknown as Response;
+}
+
+/**
+ * Per-origin connection metrics
+ */
+export function getHttpPoolStats() {
+  return Array.from(pools.entries()).map(([origin, pool]) => {
+    const { connected, free, pending, queued, running, size } = pool.stats;
+    return {
+      origin,
+      maxConnections: connectionsFor(origin),
+      connected,
+      free,
+      pending,
+      queued,
+      running,
+      size,
+      requests: requestCounts.get(origin) ?? 0,
+    };
+  });
+}
+
+let anthropicClient: Anthropic | null = null;
+
+/**
+ * Process-wide Anthropic client on the pooled transport (created on first use
+ * so the API key is read after env loading)
+ */
+export function getAnthropicClient(): Anthropic {
+  if (!anthropicClient) {
+    anthropicClient = new Anthropic({ fetch: pooledFetch as any });
+  }
+  return anthropicClient;
+}
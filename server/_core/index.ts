@@ -7,6 +7,10 @@ import { registerOAuthRoutes } from "./oauth";
 import { appRouter } from "../routers";
 import { createContext } from "./context";
 import { serveStatic, setupVite } from "./vite";
+import { extractionWorkers } from "../jobs";
+import { batchScheduler } from "../batches";
+import { backfillExtractedValues } from "../db";
+import { registerExportRoutes } from "../extractionExport";
 
 function isPortAvailable(port: number): Promise<boolean> {
   return new Promise(resolve => {
@@ -35,6 +39,8 @@ async function startServer() {
   app.use(express.urlencoded({ limit: "50mb", extended: true }));
   // OAuth callback under /api/oauth/callback
   registerOAuthRoutes(app);
+  // Streaming library export under /api/export/extractions
+  registerExportRoutes(app);
   // tRPC API
   app.use(
     "/api/trpc",
@@ -60,6 +66,18 @@ async function startServer() {
   server.listen(port, () => {
     console.log(`Server running on http://localhost:${port}/`);
   });
+
+  // Background workers for queued extractions (EXTRACTION_WORKER_CONCURRENCY=0 disables them)
+  extractionWorkers.start();
+  // Starts the items of batch runs as queued extractions
+  batchScheduler.start();
+
+  // Flatten extraction data saved before the extracted_values table existed
+  backfillExtractedValues()
+    .then(count => {
+      if (count > 0) console.log(`[ExtractedValues] Backfilled ${count} extraction results`);
+    })
+    .catch(error => console.error("[ExtractedValues] Backfill failed:", error));
 }
 
 startServer().catch(console.error);
@@ -1,4 +1,6 @@
 import { ENV } from "./env";
+import { estimateTokens, limitLLMCall, llmLimiters } from "./rateLimiter";
+import { pooledFetch } from "./httpClient";
 
 export type Role = "system" | "user" | "assistant" | "tool" | "function";
 
@@ -66,6 +68,8 @@ export type InvokeParams = {
   output_schema?: OutputSchema;
   responseFormat?: ResponseFormat;
   response_format?: ResponseFormat;
+  /** Cancels the request, including its wait for a rate-limit slot */
+  signal?: AbortSignal;
 };
 
 export type ToolCall = {
@@ -265,9 +269,7 @@ const normalizeResponseFormat = ({
   };
 };
 
-export async function invokeLLM(params: InvokeParams): Promise<InvokeResult> {
-  assertApiKey();
-
+const buildPayload = (params: InvokeParams): Record<string, unknown> => {
   const {
     messages,
     tools,
@@ -312,21 +314,104 @@ export async function invokeLLM(params: InvokeParams): Promise<InvokeResult> {
     payload.response_format = normalizedResponseFormat;
   }
 
-  const response = await fetch(resolveApiUrl(), {
+  return payload;
+};
+
+const postCompletion = async (body: string, signal?: AbortSignal) => {
+  const response = await pooledFetch(resolveApiUrl(), {
     method: "POST",
     headers: {
       "content-type": "application/json",
       authorization: `Bearer ${ENV.forgeApiKey}`,
     },
-    body: JSON.stringify(payload),
+    body,
+    signal,
   });
 
   if (!response.ok) {
     const errorText = await response.text();
-    throw new Error(
-      `LLM invoke failed: ${response.status} ${response.statusText} – ${errorText}`
+    throw Object.assign(
+      new Error(
+        `LLM invoke failed: ${response.status} ${response.statusText} – ${errorText}`
+      ),
+      { status: response.status, headers: response.headers }
     );
   }
 
-  return (await response.json()) as InvokeResult;
+  return response;
+};
+
+export async function invokeLLM(params: InvokeParams): Promise<InvokeResult> {
+  assertApiKey();
+
+  const body = JSON.stringify(buildPayload(params));
+
+  return limitLLMCall(
+    "gemini",
+    async () => (await (await postCompletion(body, params.signal)).json()) as InvokeResult,
+    {
+      promptTokens: estimateTokens(body),
+      signal: params.signal,
+      usedTokens: result => result.usage?.total_tokens,
+    }
+  );
+}
+
+/**
+ * Stream a completion, yielding content deltas as they arrive (OpenAI-style SSE).
+ * Holds a limiter slot until the stream ends or is abandoned.
+ */
+export async function* streamLLM(
+  params: InvokeParams & { userKey?: string }
+): AsyncGenerator<string> {
+  assertApiKey();
+
+  const body = JSON.stringify({
+    ...buildPayload(params),
+    stream: true,
+    stream_options: { include_usage: true },
+  });
+  const release = await llmLimiters.gemini.acquire(estimateTokens(body), {
+    userKey: params.userKey,
+    signal: params.signal,
+  });
+  let usedTokens: number | undefined;
+
+  try {
+    const response = await postCompletion(body, params.signal);
+    if (!response.body) throw new Error("LLM stream returned no body");
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let pending = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      pending += decoder.decode(value, { stream: true });
+
+      const lines = pending.split("\n");
+      pending = lines.pop() ?? "";
+
+      for (const line of lines) {
+        const data = line.trim();
+        if (!data.startsWith("data:")) continue;
+        const payload = data.slice(5).trim();
+        if (payload === "[DONE]") return;
+
+        const event = JSON.parse(payload) as {
+          choices?: Array<{ delta?: { content?: string | null } }>;
+          usage?: InvokeResult["usage"];
+        };
+        if (event.usage) usedTokens = event.usage.total_tokens;
+        const delta = event.choices?.[0]?.delta?.content;
+        if (delta) yield delta;
+      }
+    }
+  } catch (error) {
+    release({ error });
+    throw error;
+  } finally {
+    release({ usedTokens });
+  }
 }
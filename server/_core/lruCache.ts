@@ -0,0 +1,49 @@
+type Entry<V> = { value: V; expiresAt: number };
+
+/**
+ * Bounded in-memory cache: least recently used entries are evicted first and
+ * entries expire after their TTL
+ */
+export class LruCache<K, V> {
+  /** Map order is recency order (oldest first) */
+  private readonly entries = new Map<K, Entry<V>>();
+
+  constructor(
+    private readonly maxEntries: number,
+    private readonly ttlMs: number,
+    private readonly now: () => number = Date.now
+  ) {}
+
+  get size(): number {
+    return this.entries.size;
+  }
+
+  get(key: K): V | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) return undefined;
+    if (entry.expiresAt <= this.now()) {
+      this.entries.delete(key);
+      return undefined;
+    }
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return entry.value;
+  }
+
+  /** Store a value; `ttlMs` can only shorten the cache's default TTL */
+  set(key: K, value: V, ttlMs: number = this.ttlMs) {
+    this.entries.delete(key);
+    this.entries.set(key, { value, expiresAt: this.now() + Math.min(ttlMs, this.ttlMs) });
+    if (this.entries.size > this.maxEntries) {
+      this.entries.delete(this.entries.keys().next().value as K);
+    }
+  }
+
+  delete(key: K): boolean {
+    return this.entries.delete(key);
+  }
+
+  clear() {
+    this.entries.clear();
+  }
+}
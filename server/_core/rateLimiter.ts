@@ -0,0 +1,300 @@
+import { AsyncLocalStorage } from "async_hooks";
+import type { AIProvider } from "../../drizzle/schema";
+import { ENV } from "./env";
+
+export type ProviderLimits = {
+  requestsPerMinute: number;
+  tokensPerMinute: number;
+  maxInFlight: number;
+};
+
+/** Output tokens reserved per call until the provider reports actual usage */
+const OUTPUT_TOKEN_ESTIMATE = 2048;
+
+/** Pause after a 429 without a Retry-After header */
+const DEFAULT_RATE_LIMIT_PAUSE_MS = 15_000;
+
+const MINUTE_MS = 60_000;
+
+type Clock = () => number;
+
+/**
+ * Continuously refilling bucket holding at most one minute of quota.
+ * The level may go negative when actual usage exceeds the reservation.
+ */
+export class TokenBucket {
+  private available: number;
+  private updatedAt: number;
+
+  constructor(readonly capacity: number, private readonly now: Clock = Date.now) {
+    this.available = capacity;
+    this.updatedAt = now();
+  }
+
+  private refill() {
+    const t = this.now();
+    this.available = Math.min(this.capacity, this.available + ((t - this.updatedAt) * this.capacity) / MINUTE_MS);
+    this.updatedAt = t;
+  }
+
+  get level(): number {
+    this.refill();
+    return this.available;
+  }
+
+  /** Milliseconds until `amount` can be taken (requests larger than the bucket wait for a full bucket) */
+  delayFor(amount: number): number {
+    this.refill();
+    const missing = Math.min(amount, this.capacity) - this.available;
+    return missing <= 0 ? 0 : Math.ceil((missing * MINUTE_MS) / this.capacity);
+  }
+
+  take(amount: number) {
+    this.refill();
+    this.available -= amount;
+  }
+
+  /** Return (negative delta) or charge extra (positive delta) tokens after the fact */
+  adjust(delta: number) {
+    this.refill();
+    this.available = Math.min(this.capacity, this.available - delta);
+  }
+}
+
+type Waiter = {
+  tokens: number;
+  enqueuedAt: number;
+  start: () => void;
+};
+
+type AcquireOptions = {
+  userKey?: string;
+  /** Leaves the queue (rejecting with the abort reason) if aborted before admission */
+  signal?: AbortSignal;
+};
+
+export type RunOptions<T> = {
+  /** Prompt size; an output allowance is added and reconciled against `usedTokens` */
+  promptTokens: number;
+  /** Fair-queue key, defaults to the current request's user */
+  userKey?: string;
+  /** Actual tokens billed, read from the provider response */
+  usedTokens?: (result: T) => number | undefined;
+  signal?: AbortSignal;
+};
+
+/**
+ * Admission control for one provider: request and token buckets, a max
+ * in-flight semaphore and a round-robin queue across users, so one user's
+ * batch cannot starve everyone else.
+ */
+export class ProviderLimiter {
+  private readonly requestBucket: TokenBucket;
+  private readonly tokenBucket: TokenBucket;
+  /** Per-user FIFO queues; Map order is the round-robin order */
+  private readonly queues = new Map<string, Waiter[]>();
+  private inFlight = 0;
+  private pausedUntil = 0;
+  private timer: ReturnType<typeof setTimeout> | null = null;
+  private readonly counters = { started: 0, completed: 0, failed: 0, rateLimited: 0 };
+  private readonly waits = { totalMs: 0, maxMs: 0, lastMs: 0 };
+
+  constructor(
+    readonly provider: string,
+    readonly limits: ProviderLimits,
+    private readonly now: Clock = Date.now
+  ) {
+    this.requestBucket = new TokenBucket(limits.requestsPerMinute, now);
+    this.tokenBucket = new TokenBucket(limits.tokensPerMinute, now);
+  }
+
+  async run<T>(call: () => Promise<T>, options: RunOptions<T>): Promise<T> {
+    const release = await this.acquire(options.promptTokens, options);
+    try {
+      const result = await call();
+      release({ usedTokens: options.usedTokens?.(result) });
+      return result;
+    } catch (error) {
+      release({ error });
+      throw error;
+    }
+  }
+
+  /**
+   * Wait for a slot and hold it until the returned release is called, for calls
+   * that outlive a single promise (streaming responses)
+   */
+  async acquire(
+    promptTokens: number,
+    { userKey = currentRateLimitUser(), signal }: AcquireOptions = {}
+  ): Promise<(outcome?: { usedTokens?: number; error?: unknown }) => void> {
+    const reserved = promptTokens + OUTPUT_TOKEN_ESTIMATE;
+    await this.enqueue(userKey, reserved, signal);
+
+    let released = false;
+    return (outcome = {}) => {
+      if (released) return;
+      released = true;
+
+      if (outcome.error !== undefined) {
+        const pauseMs = rateLimitPauseMs(outcome.error);
+        if (pauseMs !== null) this.pause(pauseMs);
+        this.counters.failed++;
+      } else {
+        if (outcome.usedTokens) this.tokenBucket.adjust(outcome.usedTokens - reserved);
+        this.counters.completed++;
+      }
+      this.inFlight--;
+      this.pump();
+    };
+  }
+
+  /** Stop admitting calls for a while (e.g. after the provider answered 429) */
+  pause(ms: number) {
+    this.counters.rateLimited++;
+    this.pausedUntil = Math.max(this.pausedUntil, this.now() + ms);
+    console.warn(`[RateLimiter] ${this.provider} rate limited, pausing ${ms}ms`);
+  }
+
+  stats() {
+    let queueDepth = 0;
+    for (const queue of Array.from(this.queues.values())) queueDepth += queue.length;
+    const admitted = this.counters.started;
+
+    return {
+      provider: this.provider,
+      limits: this.limits,
+      inFlight: this.inFlight,
+      queueDepth,
+      queuedUsers: this.queues.size,
+      requestsAvailable: Math.floor(this.requestBucket.level),
+      tokensAvailable: Math.floor(this.tokenBucket.level),
+      pausedForMs: Math.max(0, this.pausedUntil - this.now()),
+      ...this.counters,
+      avgWaitMs: admitted > 0 ? Math.round(this.waits.totalMs / admitted) : 0,
+      maxWaitMs: this.waits.maxMs,
+      lastWaitMs: this.waits.lastMs,
+    };
+  }
+
+  private enqueue(userKey: string, tokens: number, signal?: AbortSignal): Promise<void> {
+    return new Promise((resolve, reject) => {
+      if (signal?.aborted) {
+        reject(signal.reason);
+        return;
+      }
+
+      const onAbort = () => {
+        const queue = this.queues.get(userKey);
+        const index = queue ? queue.indexOf(waiter) : -1;
+        if (index < 0) return;
+        queue!.splice(index, 1);
+        if (queue!.length === 0) this.queues.delete(userKey);
+        reject(signal!.reason);
+        this.pump();
+      };
+      const waiter: Waiter = {
+        tokens,
+        enqueuedAt: this.now(),
+        start: () => {
+          signal?.removeEventListener("abort", onAbort);
+          resolve();
+        },
+      };
+      signal?.addEventListener("abort", onAbort, { once: true });
+
+      const queue = this.queues.get(userKey);
+      if (queue) queue.push(waiter);
+      else this.queues.set(userKey, [waiter]);
+      this.pump();
+    });
+  }
+
+  /** Admit queued calls while capacity allows, otherwise wake up when it will */
+  private pump() {
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+
+    while (this.inFlight < this.limits.maxInFlight && this.queues.size > 0) {
+      const userKey = this.queues.keys().next().value as string;
+      const queue = this.queues.get(userKey)!;
+      const waiter = queue[0];
+
+      const delay = Math.max(
+        this.pausedUntil - this.now(),
+        this.requestBucket.delayFor(1),
+        this.tokenBucket.delayFor(waiter.tokens)
+      );
+      if (delay > 0) {
+        this.timer = setTimeout(() => this.pump(), delay);
+        this.timer.unref?.();
+        return;
+      }
+
+      // Admit and move this user to the back of the rotation
+      queue.shift();
+      this.queues.delete(userKey);
+      if (queue.length > 0) this.queues.set(userKey, queue);
+
+      this.requestBucket.take(1);
+      this.tokenBucket.take(waiter.tokens);
+      this.inFlight++;
+      this.counters.started++;
+
+      const waited = this.now() - waiter.enqueuedAt;
+      this.waits.totalMs += waited;
+      this.waits.lastMs = waited;
+      this.waits.maxMs = Math.max(this.waits.maxMs, waited);
+
+      waiter.start();
+    }
+  }
+}
+
+/**
+ * Pause length for a provider 429 (honoring Retry-After), or null for other errors
+ */
+export function rateLimitPauseMs(error: unknown): number | null {
+  const e = error as { status?: number; message?: string; headers?: any } | null;
+  if (!e || (e.status !== 429 && !/\b429\b/.test(e.message ?? ""))) return null;
+
+  const retryAfter = typeof e.headers?.get === "function" ? e.headers.get("retry-after") : e.headers?.["retry-after"];
+  const seconds = Number(retryAfter);
+  return retryAfter && Number.isFinite(seconds) && seconds > 0 ? seconds * 1000 : DEFAULT_RATE_LIMIT_PAUSE_MS;
+}
+
+/** Rough prompt size in tokens (~4 characters per token) */
+export const estimateTokens = (...texts: string[]) =>
+  Math.ceil(texts.reduce((sum, text) => sum + text.length, 0) / 4);
+
+const userContext = new AsyncLocalStorage<string>();
+
+/** Run `fn` with `userKey` as the fair-queue key for every LLM call it makes */
+export function runWithRateLimitUser<T>(userKey: string, fn: () => T): T {
+  return userContext.run(userKey, fn);
+}
+
+export const currentRateLimitUser = () => userContext.getStore() ?? "system";
+
+export const llmLimiters: Record<AIProvider, ProviderLimiter> = {
+  gemini: new ProviderLimiter("gemini", ENV.llmLimits.gemini),
+  claude: new ProviderLimiter("claude", ENV.llmLimits.claude),
+  openrouter: new ProviderLimiter("openrouter", ENV.llmLimits.openrouter),
+};
+
+/**
+ * Run an LLM call through the provider's shared limiter
+ */
+export function limitLLMCall<T>(
+  provider: AIProvider,
+  call: () => Promise<T>,
+  options: RunOptions<T>
+): Promise<T> {
+  return llmLimiters[provider].run(call, options);
+}
+
+export function getLLMLimiterStats() {
+  return Object.values(llmLimiters).map(limiter => limiter.stats());
+}
@@ -2,11 +2,13 @@ import { AXIOS_TIMEOUT_MS, COOKIE_NAME, ONE_YEAR_MS } from "@shared/const";
 import { ForbiddenError } from "@shared/_core/errors";
 import axios, { type AxiosInstance } from "axios";
 import { parse as parseCookieHeader } from "cookie";
+import { createHash } from "crypto";
 import type { Request } from "express";
-import { SignJWT, jwtVerify } from "jose";
+import { SignJWT, decodeJwt, jwtVerify } from "jose";
 import type { User } from "../../drizzle/schema";
 import * as db from "../db";
 import { ENV } from "./env";
+import { LruCache } from "./lruCache";
 import type {
   ExchangeTokenRequest,
   ExchangeTokenResponse,
@@ -82,9 +84,15 @@ const createOAuthHttpClient = (): AxiosInstance =>
     timeout: AXIOS_TIMEOUT_MS,
   });
 
+const sessionCacheKey = (token: string) => createHash("sha256").update(token).digest("hex");
+
 class SDKServer {
   private readonly client: AxiosInstance;
   private readonly oauthService: OAuthService;
+  /** Verified session payloads, keyed by a hash of the session token */
+  private readonly sessionCache = new LruCache<string, SessionPayload>(ENV.authCacheMaxEntries, ENV.authCacheTtlMs);
+  /** User rows by openId */
+  private readonly userCache = new LruCache<string, User>(ENV.authCacheMaxEntries, ENV.authCacheTtlMs);
 
   constructor(client: AxiosInstance = createOAuthHttpClient()) {
     this.client = client;
@@ -232,6 +240,49 @@ class SDKServer {
     }
   }
 
+  /**
+   * verifySession with the result cached until the cache TTL or the token's
+   * expiry, whichever comes first
+   */
+  private async verifySessionCached(cookieValue: string | undefined | null): Promise<SessionPayload | null> {
+    if (!cookieValue) return this.verifySession(cookieValue);
+
+    const key = sessionCacheKey(cookieValue);
+    const cached = this.sessionCache.get(key);
+    if (cached) return cached;
+
+    const session = await this.verifySession(cookieValue);
+    if (session) {
+      const { exp } = decodeJwt(cookieValue);
+      this.sessionCache.set(key, session, exp ? exp * 1000 - Date.now() : undefined);
+    }
+    return session;
+  }
+
+  /** Forget a session token (logout) */
+  invalidateSession(cookieValue: string | undefined | null) {
+    if (cookieValue) this.sessionCache.delete(sessionCacheKey(cookieValue));
+  }
+
+  /** Session token carried by a request's cookie header */
+  getSessionCookie(req: Pick<Request, "headers">): string | undefined {
+    return this.parseCookies(req.headers.cookie).get(COOKIE_NAME);
+  }
+
+  /** Drop a cached user row after it changed in the database */
+  invalidateUser(openId: string) {
+    this.userCache.delete(openId);
+  }
+
+  private async getUserCached(openId: string): Promise<User | undefined> {
+    const cached = this.userCache.get(openId);
+    if (cached) return cached;
+
+    const user = await db.getUserByOpenId(openId);
+    if (user) this.userCache.set(openId, user);
+    return user;
+  }
+
   async getUserInfoWithJwt(
     jwtToken: string
   ): Promise<GetUserInfoWithJwtResponse> {
@@ -258,9 +309,8 @@ class SDKServer {
 
   async authenticateRequest(req: Request): Promise<User> {
     // Regular authentication flow
-    const cookies = this.parseCookies(req.headers.cookie);
-    const sessionCookie = cookies.get(COOKIE_NAME);
-    const session = await this.verifySession(sessionCookie);
+    const sessionCookie = this.getSessionCookie(req);
+    const session = await this.verifySessionCached(sessionCookie);
 
     if (!session) {
       throw ForbiddenError("Invalid session cookie");
@@ -268,7 +318,7 @@ class SDKServer {
 
     const sessionUserId = session.openId;
     const signedInAt = new Date();
-    let user = await db.getUserByOpenId(sessionUserId);
+    let user = await this.getUserCached(sessionUserId);
 
     // If user not in DB, sync from OAuth server automatically
     if (!user) {
@@ -281,7 +331,8 @@ class SDKServer {
           loginMethod: userInfo.loginMethod ?? userInfo.platform ?? null,
           lastSignedIn: signedInAt,
         });
-        user = await db.getUserByOpenId(userInfo.openId);
+        this.invalidateUser(userInfo.openId);
+        user = await this.getUserCached(userInfo.openId);
       } catch (error) {
         console.error("[Auth] Failed to sync user from OAuth:", error);
         throw ForbiddenError("Failed to sync user info");
@@ -292,10 +343,15 @@ class SDKServer {
       throw ForbiddenError("User not found");
     }
 
-    await db.upsertUser({
-      openId: user.openId,
-      lastSignedIn: signedInAt,
-    });
+    // lastSignedIn is activity tracking; write it at most once per interval
+    if (signedInAt.getTime() - user.lastSignedIn.getTime() >= ENV.lastSignedInWriteIntervalMs) {
+      user = { ...user, lastSignedIn: signedInAt };
+      this.userCache.set(user.openId, user);
+      await db.upsertUser({
+        openId: user.openId,
+        lastSignedIn: signedInAt,
+      });
+    }
 
     return user;
   }
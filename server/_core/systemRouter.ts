@@ -1,5 +1,7 @@
 import { z } from "zod";
 import { notifyOwner } from "./notification";
+import { getLLMLimiterStats } from "./rateLimiter";
+import { getHttpPoolStats } from "./httpClient";
 import { adminProcedure, publicProcedure, router } from "./trpc";
 
 export const systemRouter = router({
@@ -13,6 +15,12 @@ export const systemRouter = router({
       ok: true,
     })),
 
+  /** Per-provider LLM limiter state: in-flight calls, queue depth, wait times */
+  llmLimiterStats: adminProcedure.query(() => getLLMLimiterStats()),
+
+  /** Keep-alive connection pool metrics per upstream origin */
+  httpPoolStats: adminProcedure.query(() => getHttpPoolStats()),
+
   notifyOwner: adminProcedure
     .input(
       z.object({
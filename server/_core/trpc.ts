@@ -2,6 +2,8 @@ import { NOT_ADMIN_ERR_MSG, UNAUTHED_ERR_MSG } from '@shared/const';
 import { initTRPC, TRPCError } from "@trpc/server";
 import superjson from "superjson";
 import type { TrpcContext } from "./context";
+import { runWithRateLimitUser } from "./rateLimiter";
+import { createRequestLoaders } from "../loaders";
 
 const t = initTRPC.context<TrpcContext>().create({
   transformer: superjson,
@@ -10,24 +12,45 @@ const t = initTRPC.context<TrpcContext>().create({
 export const router = t.router;
 export const publicProcedure = t.procedure;
 
-const requireUser = t.middleware(async opts => {
+/** Resolve the session user on demand, so procedures that don't need it skip auth */
+const withUser = t.middleware(async opts => {
   const { ctx, next } = opts;
-
-  if (!ctx.user) {
-    throw new TRPCError({ code: "UNAUTHORIZED", message: UNAUTHED_ERR_MSG });
-  }
+  const user = ctx.user ?? (await ctx.loadUser?.()) ?? null;
 
   return next({
     ctx: {
       ...ctx,
-      user: ctx.user,
+      user,
     },
   });
 });
 
-export const protectedProcedure = t.procedure.use(requireUser);
+/** Public procedure that still sees the signed-in user, if there is one */
+export const optionalUserProcedure = t.procedure.use(withUser);
+
+const requireUser = t.middleware(async opts => {
+  const { ctx, next } = opts;
+
+  if (!ctx.user) {
+    throw new TRPCError({ code: "UNAUTHORIZED", message: UNAUTHED_ERR_MSG });
+  }
+
+  // LLM calls made by this procedure queue fairly under the caller's user id
+  return runWithRateLimitUser(String(ctx.user.id), () =>
+    next({
+      ctx: {
+        ...ctx,
+        user: ctx.user,
+        // Contexts built outside createContext (tests, scripts) get their own loaders
+        loaders: ctx.loaders ?? createRequestLoaders(),
+      },
+    })
+  );
+});
+
+export const protectedProcedure = t.procedure.use(withUser).use(requireUser);
 
-export const adminProcedure = t.procedure.use(
+export const adminProcedure = t.procedure.use(withUser).use(
   t.middleware(async opts => {
     const { ctx, next } = opts;
 
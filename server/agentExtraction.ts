@@ -0,0 +1,144 @@
+import type { AIProvider, ExtractedData, ExtractionSchema } from "../drizzle/schema";
+import { invokeLLM } from "./_core/llm";
+import { estimateTokens, limitLLMCall } from "./_core/rateLimiter";
+import { getAnthropicClient, pooledFetch } from "./_core/httpClient";
+import { extractInChunks } from "./chunking";
+import { withExtractionCache } from "./extractionCache";
+import { compileExtractionSchema, parseModelJson, toExtractedData, EXTRACTION_PROMPT_VERSION } from "./extractionPrompt";
+
+// Helper function to get model name for each provider. OpenRouter stays on a
+// non-Claude model so the three agents remain independent for consensus.
+export function getModelName(provider: AIProvider): string {
+  switch (provider) {
+    case "gemini": return "gemini-1.5-flash";
+    case "claude": return "claude-sonnet-4-20250514";
+    case "openrouter": return "openai/gpt-4o";
+    default: return "unknown";
+  }
+}
+
+// Helper function to run extraction with a specific provider, reusing cached results
+export async function runCachedAgentExtraction(
+  provider: AIProvider,
+  schema: ExtractionSchema,
+  documentText: string,
+  bypassCache?: boolean,
+  signal?: AbortSignal
+) {
+  return withExtractionCache(
+    { documentText, schema, provider, modelName: getModelName(provider), variant: EXTRACTION_PROMPT_VERSION },
+    () => runAgentExtraction(provider, schema, documentText, signal),
+    { bypass: bypassCache }
+  );
+}
+
+// Helper function to run extraction with a specific provider, chunking long documents
+export async function runAgentExtraction(
+  provider: AIProvider,
+  schema: ExtractionSchema,
+  documentText: string,
+  signal?: AbortSignal
+): Promise<ExtractedData> {
+  return extractInChunks(documentText, chunkText => extractChunkWithAgent(provider, schema, chunkText, signal));
+}
+
+// Helper function to extract one document chunk with a specific provider
+async function extractChunkWithAgent(
+  provider: AIProvider,
+  schema: ExtractionSchema,
+  chunkText: string,
+  signal?: AbortSignal
+): Promise<ExtractedData> {
+  const prompt = compileExtractionSchema(schema);
+  const systemPrompt = prompt.systemPrompt;
+  const userPrompt = prompt.buildUserPrompt(chunkText, provider);
+
+  let parsed: any;
+
+  if (provider === "gemini") {
+    // Use built-in LLM (Gemini)
+    const response = await invokeLLM({
+      messages: [
+        { role: "system", content: systemPrompt },
+        { role: "user", content: userPrompt }
+      ],
+      response_format: prompt.responseFormat,
+      signal,
+    });
+
+    const content = response.choices[0]?.message?.content;
+    if (!content || typeof content !== 'string') throw new Error("No response from Gemini");
+    parsed = JSON.parse(content);
+
+  } else if (provider === "claude") {
+    // Use Anthropic Claude
+    const anthropic = getAnthropicClient();
+    const response = await limitLLMCall(
+      "claude",
+      () => anthropic.messages.create({
+        model: getModelName("claude"),
+        max_tokens: 8192,
+        system: systemPrompt,
+        messages: [
+          { role: "user", content: userPrompt }
+        ]
+      }, { signal }),
+      {
+        promptTokens: estimateTokens(systemPrompt, userPrompt),
+        usedTokens: r => r.usage.input_tokens + r.usage.output_tokens,
+        signal,
+      }
+    );
+
+    const content = response.content[0];
+    if (content.type !== 'text') throw new Error("No text response from Claude");
+    // Claude might wrap the JSON in markdown
+    parsed = parseModelJson(content.text);
+
+  } else if (provider === "openrouter") {
+    // Use OpenRouter API
+    const data = await limitLLMCall(
+      "openrouter",
+      async () => {
+        const response = await pooledFetch("https://openrouter.ai/api/v1/chat/completions", {
+          method: "POST",
+          headers: {
+            "Authorization": `Bearer ${process.env.OPENROUTER_API_KEY}`,
+            "Content-Type": "application/json",
+            "HTTP-Referer": process.env.VITE_FRONTEND_FORGE_API_URL || "https://manus.im",
+          },
+          body: JSON.stringify({
+            model: getModelName("openrouter"),
+            messages: [
+              { role: "system", content: systemPrompt },
+              { role: "user", content: userPrompt }
+            ],
+            max_tokens: 8192,
+          }),
+          signal,
+        });
+
+        if (!response.ok) {
+          const error = await response.text();
+          throw Object.assign(new Error(`OpenRouter API error: ${response.status} ${error}`), {
+            status: response.status,
+            headers: response.headers,
+          });
+        }
+
+        return response.json();
+      },
+      {
+        promptTokens: estimateTokens(systemPrompt, userPrompt),
+        usedTokens: (d: any) => d.usage?.total_tokens,
+        signal,
+      }
+    );
+
+    parsed = parseModelJson(data.choices?.[0]?.message?.content || "");
+  } else {
+    throw new Error(`Unknown provider: ${provider}`);
+  }
+
+  return toExtractedData(parsed);
+}
@@ -0,0 +1,63 @@
+import { describe, expect, it } from "vitest";
+import { Table, tableFromIPC, tableToIPC } from "apache-arrow";
+import { arrowExportSchema, toArrowRecordBatch } from "./arrowExport";
+
+const columns = { includeConfidence: true, includeSourceLocation: true };
+
+const source = (extractionId: number, sourceName: string, data: unknown) => ({
+  extractionId,
+  documentId: extractionId * 10,
+  document: `study-${extractionId}.pdf`,
+  status: "completed",
+  source: sourceName,
+  data,
+});
+
+describe("toArrowRecordBatch", () => {
+  it("writes one typed row per extraction, source and field", () => {
+    const batch = toArrowRecordBatch(arrowExportSchema(columns), [
+      source(1, "final", {
+        total_n: { value: "1,200", confidence: "high", source_location: { page: 3, section: "Methods" } },
+        blinded: { value: true, confidence: "medium" },
+      }),
+      source(1, "gemini", { total_n: { value: 1180, confidence: "low" } }),
+    ]);
+
+    expect(batch.numRows).toBe(3);
+    expect(batch.toArray().map(row => row.toJSON())).toEqual([
+      expect.objectContaining({ extraction_id: 1, source: "final", field: "total_n", value: "1,200", number_value: 1200, page: 3, section: "Methods" }),
+      expect.objectContaining({ source: "final", field: "blinded", value: "true", number_value: null, boolean_value: true, page: null }),
+      expect.objectContaining({ source: "gemini", field: "total_n", number_value: 1180, confidence: "low" }),
+    ]);
+  });
+
+  it("dictionary-encodes repeated strings", () => {
+    const schema = arrowExportSchema(columns);
+    const batch = toArrowRecordBatch(schema, [source(1, "final", { a: { value: 1 }, b: { value: 2 } })]);
+
+    const document = batch.getChild("document")!;
+    expect(document.type.toString()).toMatch(/^Dictionary/);
+    expect(document.data[0].dictionary?.length).toBe(1);
+  });
+
+  it("leaves out the columns that are not asked for", () => {
+    const schema = arrowExportSchema({ includeConfidence: false, includeSourceLocation: false });
+    expect(schema.fields.map(field => field.name)).not.toContain("confidence");
+    expect(schema.fields.map(field => field.name)).not.toContain("page");
+  });
+
+  it("round-trips batches of one stream through Arrow IPC", () => {
+    const schema = arrowExportSchema(columns);
+    const table = new Table([
+      toArrowRecordBatch(schema, [source(1, "final", { total_n: { value: 120 } })]),
+      toArrowRecordBatch(schema, [source(2, "claude", { total_n: { value: 98 } })]),
+      toArrowRecordBatch(schema, []),
+    ]);
+
+    const read = tableFromIPC(tableToIPC(table, "stream"));
+
+    expect(read.numRows).toBe(2);
+    expect(read.getChild("source")!.toArray()).toEqual(["final", "claude"]);
+    expect(Array.from(read.getChild("number_value")!.toArray())).toEqual([120, 98]);
+  });
+});
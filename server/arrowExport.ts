@@ -0,0 +1,77 @@
+import {
+  Bool, Dictionary, Field, Float64, Int32, RecordBatch, Schema, Struct, Utf8, makeData, vectorFromArray
+} from "apache-arrow";
+import {
+  exportFieldLocation, exportFieldValue, flattenExportFields,
+  type LibraryExportColumns, type LibraryExportSource
+} from "@shared/extractionExport";
+import { parseNumericText } from "./extractedValues";
+
+/** Strings that repeat across rows (documents, providers, field names) are stored once per batch */
+const dictionaryUtf8 = () => new Dictionary(new Utf8(), new Int32());
+
+/**
+ * Schema of the Arrow library export: one row per extraction, source and field,
+ * like the CSV export, with the value also as a number and a boolean when it
+ * is one. Dictionary types are created here once so every batch of a stream
+ * shares their ids.
+ */
+export function arrowExportSchema(columns: LibraryExportColumns): Schema {
+  const fields = [
+    new Field("extraction_id", new Int32(), false),
+    new Field("document_id", new Int32(), false),
+    new Field("document", dictionaryUtf8(), false),
+    new Field("status", dictionaryUtf8(), false),
+    new Field("source", dictionaryUtf8(), false),
+    new Field("field", dictionaryUtf8(), false),
+    new Field("value", new Utf8(), true),
+    new Field("number_value", new Float64(), true),
+    new Field("boolean_value", new Bool(), true),
+  ];
+  if (columns.includeConfidence) fields.push(new Field("confidence", dictionaryUtf8(), true));
+  if (columns.includeSourceLocation) {
+    fields.push(
+      new Field("page", new Int32(), true),
+      new Field("section", dictionaryUtf8(), true),
+      new Field("exact_text", new Utf8(), true)
+    );
+  }
+  return new Schema(fields);
+}
+
+function typedValue(value: unknown): { number: number | null; boolean: boolean | null } {
+  if (typeof value === "number") return { number: Number.isFinite(value) ? value : null, boolean: null };
+  if (typeof value === "boolean") return { number: null, boolean: value };
+  return { number: typeof value === "string" ? parseNumericText(value) : null, boolean: null };
+}
+
+/** One record batch holding the rows of `sources`, in arrowExportSchema order */
+export function toArrowRecordBatch(schema: Schema, sources: LibraryExportSource[]): RecordBatch {
+  const columns = new Map<string, unknown[]>(schema.fields.map(field => [field.name, []]));
+  const push = (name: string, value: unknown) => columns.get(name)?.push(value);
+
+  for (const source of sources) {
+    for (const [fieldName, field] of Object.entries(flattenExportFields(source.data))) {
+      const text = exportFieldValue(field);
+      const typed = typedValue(field.content ?? field.value);
+      const loc = exportFieldLocation(field);
+      push("extraction_id", source.extractionId);
+      push("document_id", source.documentId);
+      push("document", source.document);
+      push("status", source.status);
+      push("source", source.source);
+      push("field", fieldName);
+      push("value", text === "" ? null : text);
+      push("number_value", typed.number);
+      push("boolean_value", typed.boolean);
+      push("confidence", field.confidence ?? null);
+      push("page", loc.page !== "" && Number.isInteger(Number(loc.page)) ? Number(loc.page) : null);
+      push("section", loc.section || null);
+      push("exact_text", loc.exactText || null);
+    }
+  }
+
+  const children = schema.fields.map(field => vectorFromArray(columns.get(field.name)!, field.type).data[0]);
+  const length = columns.get("extraction_id")!.length;
+  return new RecordBatch(schema, makeData({ type: new Struct(schema.fields), length, nullCount: 0, children }));
+}
@@ -0,0 +1,78 @@
+import { beforeEach, describe, expect, it, vi } from "vitest";
+import type { Request } from "express";
+import type { User } from "../drizzle/schema";
+import { COOKIE_NAME } from "../shared/const";
+
+vi.hoisted(() => {
+  process.env.JWT_SECRET = "test-session-secret";
+  process.env.VITE_APP_ID = "test-app";
+});
+
+vi.mock("./db", () => ({
+  getUserByOpenId: vi.fn(),
+  upsertUser: vi.fn().mockResolvedValue(undefined),
+}));
+
+import * as db from "./db";
+import { sdk } from "./_core/sdk";
+
+const makeUser = (openId: string, lastSignedIn: Date): User => ({
+  id: 1,
+  openId,
+  email: "sample@example.com",
+  name: "Sample User",
+  loginMethod: "manus",
+  role: "user",
+  createdAt: new Date(),
+  updatedAt: new Date(),
+  lastSignedIn,
+});
+
+const requestFor = (token: string) => ({ headers: { cookie: `${COOKIE_NAME}=${token}` } }) as Request;
+
+describe("sdk.authenticateRequest caching", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it("reuses the verified session and user row across requests", async () => {
+    vi.mocked(db.getUserByOpenId).mockResolvedValue(makeUser("cached-user", new Date()));
+    const token = await sdk.createSessionToken("cached-user", { name: "Sample User" });
+
+    const first = await sdk.authenticateRequest(requestFor(token));
+    const second = await sdk.authenticateRequest(requestFor(token));
+
+    expect(second).toEqual(first);
+    expect(db.getUserByOpenId).toHaveBeenCalledTimes(1);
+    expect(db.upsertUser).not.toHaveBeenCalled();
+  });
+
+  it("writes lastSignedIn at most once per interval", async () => {
+    const stale = new Date(Date.now() - 24 * 60 * 60 * 1000);
+    vi.mocked(db.getUserByOpenId).mockResolvedValue(makeUser("stale-user", stale));
+    const token = await sdk.createSessionToken("stale-user", { name: "Sample User" });
+
+    await sdk.authenticateRequest(requestFor(token));
+    await sdk.authenticateRequest(requestFor(token));
+
+    expect(db.upsertUser).toHaveBeenCalledTimes(1);
+    expect(db.upsertUser).toHaveBeenCalledWith({ openId: "stale-user", lastSignedIn: expect.any(Date) });
+  });
+
+  it("reloads the user after invalidation", async () => {
+    vi.mocked(db.getUserByOpenId).mockResolvedValue(makeUser("changed-user", new Date()));
+    const token = await sdk.createSessionToken("changed-user", { name: "Sample User" });
+
+    await sdk.authenticateRequest(requestFor(token));
+    sdk.invalidateUser("changed-user");
+    sdk.invalidateSession(token);
+    await sdk.authenticateRequest(requestFor(token));
+
+    expect(db.getUserByOpenId).toHaveBeenCalledTimes(2);
+  });
+
+  it("rejects requests without a valid session", async () => {
+    await expect(sdk.authenticateRequest(requestFor("not-a-jwt"))).rejects.toThrow("Invalid session cookie");
+    expect(db.getUserByOpenId).not.toHaveBeenCalled();
+  });
+});
@@ -0,0 +1,159 @@
+import { describe, expect, it, vi, beforeEach } from "vitest";
+import type { BatchRun, BatchRunItem } from "../drizzle/schema";
+import { BatchScheduler, startBatchItem, summarizeBatchProgress } from "./batches";
+import {
+  claimPendingBatchItems, completeFinishedBatchRuns, countRunningBatchItems, createExtraction, failBatchItem,
+  finishBatchItems, getBatchRunsWithPendingItems, hasDocumentPages, setBatchItemExtraction
+} from "./db";
+import { enqueueAgentExtractions } from "./jobs";
+
+vi.mock("./db", () => ({
+  createExtraction: vi.fn(async (extraction: object) => ({ id: 500, ...extraction })),
+  hasDocumentPages: vi.fn().mockResolvedValue(true),
+  setBatchItemExtraction: vi.fn(),
+  failBatchItem: vi.fn(),
+  finishBatchItems: vi.fn().mockResolvedValue([]),
+  completeFinishedBatchRuns: vi.fn().mockResolvedValue(0),
+  requeueStaleBatchItems: vi.fn().mockResolvedValue(0),
+  countRunningBatchItems: vi.fn(),
+  getBatchRunsWithPendingItems: vi.fn(),
+  claimPendingBatchItems: vi.fn(),
+}));
+
+vi.mock("./jobs", () => ({
+  enqueueAgentExtractions: vi.fn().mockResolvedValue([]),
+  onExtractionFinalized: vi.fn(() => () => {}),
+}));
+
+const schema = { fields: [{ name: "total_n", label: "Total N", type: "integer" as const }] };
+
+const makeRun = (overrides: Partial<BatchRun> = {}): BatchRun => ({
+  id: 1,
+  userId: 1,
+  name: "Review",
+  templateId: null,
+  schema,
+  providers: ["gemini", "claude"],
+  bypassCache: false,
+  status: "running",
+  completedAt: null,
+  createdAt: new Date(),
+  updatedAt: new Date(),
+  ...overrides,
+});
+
+const makeItem = (overrides: Partial<BatchRunItem> = {}): BatchRunItem => ({
+  id: 1,
+  batchRunId: 1,
+  userId: 1,
+  documentId: 7,
+  extractionId: null,
+  status: "running",
+  attempts: 1,
+  lastError: null,
+  startedAt: new Date(),
+  completedAt: null,
+  createdAt: new Date(),
+  ...overrides,
+});
+
+const statusRow = (status: BatchRunItem["status"], count: number, timing: Partial<{ firstStartedAt: Date; lastCompletedAt: Date; avgDurationMs: number }> = {}) => ({
+  batchRunId: 1,
+  status,
+  count,
+  firstStartedAt: timing.firstStartedAt ?? null,
+  lastCompletedAt: timing.lastCompletedAt ?? null,
+  avgDurationMs: timing.avgDurationMs ?? null,
+});
+
+describe("summarizeBatchProgress", () => {
+  it("reports throughput and the time left from the finished items", () => {
+    const start = new Date("2026-05-01T10:00:00Z");
+    const now = start.getTime() + 10 * 60_000;
+
+    const progress = summarizeBatchProgress([
+      statusRow("completed", 18, { firstStartedAt: start, lastCompletedAt: new Date(now), avgDurationMs: 90_000 }),
+      statusRow("failed", 2, { firstStartedAt: start, lastCompletedAt: new Date(now), avgDurationMs: 30_000 }),
+      statusRow("running", 4, { firstStartedAt: new Date(now - 60_000) }),
+      statusRow("pending", 16),
+    ], now);
+
+    expect(progress).toMatchObject({ total: 40, done: 20, percent: 50, itemsPerMinute: 2, avgItemMs: 84_000 });
+    expect(progress.counts).toEqual({ pending: 16, running: 4, completed: 18, failed: 2, cancelled: 0 });
+    expect(progress.etaMs).toBe(10 * 60_000);
+  });
+
+  it("has no estimate before an item finished", () => {
+    const progress = summarizeBatchProgress([statusRow("pending", 5)]);
+
+    expect(progress).toMatchObject({ total: 5, done: 0, percent: 0, itemsPerMinute: null, etaMs: null });
+  });
+});
+
+describe("startBatchItem", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it("queues an extraction for the item's document", async () => {
+    await startBatchItem(makeRun(), makeItem());
+
+    expect(createExtraction).toHaveBeenCalledWith({ documentId: 7, userId: 1, schema });
+    expect(enqueueAgentExtractions).toHaveBeenCalledWith(expect.objectContaining({
+      userId: 1,
+      providers: ["gemini", "claude"],
+      bypassCache: false,
+    }));
+    expect(setBatchItemExtraction).toHaveBeenCalledWith(1, 500);
+  });
+
+  it("fails items whose document has no parsed text", async () => {
+    vi.mocked(hasDocumentPages).mockResolvedValueOnce(false);
+
+    await startBatchItem(makeRun(), makeItem());
+
+    expect(createExtraction).not.toHaveBeenCalled();
+    expect(failBatchItem).toHaveBeenCalledWith(1, expect.stringContaining("Document text is not available"));
+  });
+});
+
+describe("BatchScheduler", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  const scheduler = (startItem = vi.fn().mockResolvedValue(undefined)) =>
+    new BatchScheduler({ maxActiveItems: 5, userMaxActiveItems: 3, pollIntervalMs: 60_000, leaseMs: 60_000 }, startItem);
+
+  it("starts pending items up to the global and per-user limits", async () => {
+    vi.mocked(countRunningBatchItems).mockResolvedValueOnce({ total: 1, byUser: new Map([[1, 1]]) });
+    vi.mocked(getBatchRunsWithPendingItems).mockResolvedValueOnce([
+      makeRun({ id: 1, userId: 1 }),
+      makeRun({ id: 2, userId: 1 }),
+      makeRun({ id: 3, userId: 2 }),
+    ]);
+    vi.mocked(claimPendingBatchItems).mockImplementation(async (batchRunId, limit) =>
+      Array.from({ length: limit }, (_, i) => makeItem({ id: batchRunId * 10 + i, batchRunId }))
+    );
+    const startItem = vi.fn().mockResolvedValue(undefined);
+
+    const started = await scheduler(startItem).tick();
+
+    // User 1 has one running item and may start two more; user 2 gets the remaining two global slots
+    expect(vi.mocked(claimPendingBatchItems).mock.calls).toEqual([[1, 2], [3, 2]]);
+    expect(started).toBe(4);
+    expect(startItem).toHaveBeenCalledTimes(4);
+    expect(completeFinishedBatchRuns).toHaveBeenCalledWith([1, 3]);
+  });
+
+  it("settles finished items without starting more when the slots are full", async () => {
+    vi.mocked(finishBatchItems).mockResolvedValueOnce([4]);
+    vi.mocked(countRunningBatchItems).mockResolvedValueOnce({ total: 5, byUser: new Map([[1, 5]]) });
+
+    const started = await scheduler().tick();
+
+    expect(started).toBe(0);
+    expect(getBatchRunsWithPendingItems).not.toHaveBeenCalled();
+    expect(completeFinishedBatchRuns).toHaveBeenCalledWith([4]);
+  });
+});
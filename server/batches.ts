@@ -0,0 +1,193 @@
+import { BATCH_RUN_ITEM_STATUSES, type BatchRun, type BatchRunItem, type BatchRunItemStatus } from "../drizzle/schema";
+import {
+  createExtraction, hasDocumentPages,
+  setBatchItemExtraction, failBatchItem, finishBatchItems, completeFinishedBatchRuns, requeueStaleBatchItems,
+  countRunningBatchItems, getBatchRunsWithPendingItems, claimPendingBatchItems,
+  type BatchItemStatusCount
+} from "./db";
+import { enqueueAgentExtractions, onExtractionFinalized } from "./jobs";
+import { ENV } from "./_core/env";
+
+export type BatchProgress = {
+  total: number;
+  counts: Record<BatchRunItemStatus, number>;
+  /** Items that reached a final status (completed, failed or cancelled) */
+  done: number;
+  percent: number;
+  /** Completed and failed items per minute since the first item started */
+  itemsPerMinute: number | null;
+  /** Average start-to-finish time of a completed or failed item */
+  avgItemMs: number | null;
+  /** Estimated time until the pending and running items finish, at the current throughput */
+  etaMs: number | null;
+};
+
+/**
+ * Aggregate progress and throughput of a batch run from its per-status item counts
+ */
+export function summarizeBatchProgress(rows: BatchItemStatusCount[], now = Date.now()): BatchProgress {
+  const counts = Object.fromEntries(BATCH_RUN_ITEM_STATUSES.map(status => [status, 0])) as Record<BatchRunItemStatus, number>;
+  for (const row of rows) counts[row.status] += row.count;
+
+  const total = rows.reduce((sum, row) => sum + row.count, 0);
+  const done = counts.completed + counts.failed + counts.cancelled;
+  const remaining = counts.pending + counts.running;
+  const finishedRows = rows.filter(row => row.status === "completed" || row.status === "failed");
+  const finished = counts.completed + counts.failed;
+
+  const startTimes = rows.flatMap(row => (row.firstStartedAt ? [row.firstStartedAt.getTime()] : []));
+  const endTimes = finishedRows.flatMap(row => (row.lastCompletedAt ? [row.lastCompletedAt.getTime()] : []));
+  const startedAt = startTimes.length > 0 ? Math.min(...startTimes) : null;
+  const endedAt = remaining > 0 ? now : endTimes.length > 0 ? Math.max(...endTimes) : null;
+  const elapsedMs = startedAt !== null && endedAt !== null ? endedAt - startedAt : 0;
+  const itemsPerMinute = finished > 0 && elapsedMs > 0 ? finished / (elapsedMs / 60_000) : null;
+
+  const timed = finishedRows.filter(row => row.avgDurationMs !== null);
+  const timedCount = timed.reduce((sum, row) => sum + row.count, 0);
+  const avgItemMs = timedCount > 0
+    ? timed.reduce((sum, row) => sum + row.avgDurationMs! * row.count, 0) / timedCount
+    : null;
+
+  return {
+    total,
+    counts,
+    done,
+    percent: total > 0 ? Math.round((done / total) * 100) : 100,
+    itemsPerMinute,
+    avgItemMs,
+    etaMs: remaining === 0 ? 0 : itemsPerMinute ? (remaining / itemsPerMinute) * 60_000 : null,
+  };
+}
+
+/**
+ * Start a claimed item: a new extraction session with one queued job per
+ * provider. An item that cannot start is failed.
+ */
+export async function startBatchItem(run: BatchRun, item: BatchRunItem): Promise<void> {
+  try {
+    if (!(await hasDocumentPages(item.documentId))) {
+      throw new Error("Document text is not available (the PDF was not parsed on upload)");
+    }
+    const extraction = await createExtraction({ documentId: item.documentId, userId: run.userId, schema: run.schema });
+    await enqueueAgentExtractions({
+      extraction,
+      userId: run.userId,
+      providers: run.providers,
+      bypassCache: run.bypassCache,
+    });
+    // Set last: an item claimed but never linked is requeued (see requeueStaleBatchItems)
+    await setBatchItemExtraction(item.id, extraction.id);
+  } catch (error) {
+    const message = error instanceof Error ? error.message : "Unknown error";
+    console.warn(`[Batches] Item ${item.id} of run ${run.id} could not start:`, message);
+    await failBatchItem(item.id, message);
+  }
+}
+
+export type BatchSchedulerOptions = {
+  /** Items running at once across all users */
+  maxActiveItems: number;
+  /** Items running at once per user */
+  userMaxActiveItems: number;
+  pollIntervalMs: number;
+  /** Items claimed this long ago without an extraction are requeued */
+  leaseMs: number;
+};
+
+/**
+ * Starts the items of batch runs as queued extractions, keeping the number of
+ * running items under a global and a per-user limit. The job workers do the
+ * extraction (and its retries); the scheduler settles items once their
+ * extraction is final and starts the next ones. Limits are per process.
+ */
+export class BatchScheduler {
+  private started = false;
+  private filling = false;
+  private refill = false;
+  private pollTimer: ReturnType<typeof setInterval> | null = null;
+  private unsubscribe: (() => void) | null = null;
+
+  constructor(
+    private readonly options: BatchSchedulerOptions,
+    private readonly startItem: (run: BatchRun, item: BatchRunItem) => Promise<void> = startBatchItem
+  ) {}
+
+  start(): void {
+    if (this.started) return;
+    this.started = true;
+
+    this.unsubscribe = onExtractionFinalized(() => this.wake());
+    this.pollTimer = setInterval(() => this.wake(), this.options.pollIntervalMs);
+    this.pollTimer.unref?.();
+    this.wake();
+  }
+
+  stop(): void {
+    this.started = false;
+    this.unsubscribe?.();
+    if (this.pollTimer) clearInterval(this.pollTimer);
+    this.pollTimer = this.unsubscribe = null;
+  }
+
+  wake(): void {
+    if (!this.started) return;
+    void this.fill();
+  }
+
+  private async fill(): Promise<void> {
+    if (this.filling) {
+      this.refill = true;
+      return;
+    }
+    this.filling = true;
+    try {
+      do {
+        this.refill = false;
+        await this.tick();
+      } while (this.refill && this.started);
+    } catch (error) {
+      console.warn("[Batches] Scheduling failed:", error);
+    } finally {
+      this.filling = false;
+    }
+  }
+
+  /**
+   * Settle the items whose extraction finished, then start pending items (oldest
+   * run first) up to the limits. Returns the number of started items.
+   */
+  async tick(): Promise<number> {
+    const touchedRuns = new Set(await finishBatchItems());
+    await requeueStaleBatchItems(new Date(Date.now() - this.options.leaseMs));
+
+    const running = await countRunningBatchItems();
+    let free = this.options.maxActiveItems - running.total;
+    let started = 0;
+    if (free > 0) {
+      for (const run of await getBatchRunsWithPendingItems()) {
+        const userRunning = running.byUser.get(run.userId) ?? 0;
+        const limit = Math.min(free, this.options.userMaxActiveItems - userRunning);
+        if (limit <= 0) continue;
+        const items = await claimPendingBatchItems(run.id, limit);
+        if (items.length === 0) continue;
+
+        await Promise.all(items.map(item => this.startItem(run, item)));
+        running.byUser.set(run.userId, userRunning + items.length);
+        touchedRuns.add(run.id);
+        free -= items.length;
+        started += items.length;
+        if (free <= 0) break;
+      }
+    }
+
+    await completeFinishedBatchRuns(Array.from(touchedRuns));
+    return started;
+  }
+}
+
+export const batchScheduler = new BatchScheduler({
+  maxActiveItems: ENV.batchMaxActiveItems,
+  userMaxActiveItems: ENV.batchUserMaxActiveItems,
+  pollIntervalMs: ENV.batchSchedulerPollMs,
+  leaseMs: ENV.extractionJobLeaseMs,
+});
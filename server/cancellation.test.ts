@@ -0,0 +1,52 @@
+import { EventEmitter } from "events";
+import { describe, expect, it } from "vitest";
+import { beginExtractionRun, cancelExtractionRuns } from "./cancellation";
+
+const fakeResponse = (writableFinished = false) =>
+  Object.assign(new EventEmitter(), { writableFinished }) as EventEmitter & { writableFinished: boolean };
+
+describe("extraction cancellation", () => {
+  it("aborts only the owner's runs for the extraction", () => {
+    const mine = beginExtractionRun(1, 10);
+    const other = beginExtractionRun(2, 10);
+
+    expect(cancelExtractionRuns(1, 99)).toBe(0);
+    expect(cancelExtractionRuns(1, 10)).toBe(1);
+
+    expect(mine.signal.aborted).toBe(true);
+    expect(mine.cancelReason()).toBe("Cancelled by user");
+    expect(other.signal.aborted).toBe(false);
+
+    mine.end();
+    other.end();
+    expect(cancelExtractionRuns(2, 10)).toBe(0);
+  });
+
+  it("aborts when the client disconnects before the response is written", () => {
+    const res = fakeResponse();
+    const run = beginExtractionRun(3, 10, { res });
+
+    res.emit("close");
+    expect(run.cancelReason()).toBe("Client disconnected");
+    run.end();
+    expect(res.listenerCount("close")).toBe(0);
+  });
+
+  it("ignores the close that follows a finished response", () => {
+    const res = fakeResponse(true);
+    const run = beginExtractionRun(4, 10, { res });
+
+    res.emit("close");
+    expect(run.signal.aborted).toBe(false);
+    run.end();
+  });
+
+  it("follows the procedure's abort signal", () => {
+    const parent = new AbortController();
+    const run = beginExtractionRun(5, 10, { signal: parent.signal });
+
+    parent.abort();
+    expect(run.cancelReason()).toBe("Request aborted");
+    run.end();
+  });
+});
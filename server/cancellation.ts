@@ -0,0 +1,97 @@
+/** Abort reason for runs stopped by the user or by a client disconnect */
+export class ExtractionCancelledError extends Error {
+  constructor(message: string) {
+    super(message);
+    this.name = "ExtractionCancelledError";
+  }
+}
+
+/** The parts of an HTTP response used to detect a client disconnect */
+type ClosableResponse = {
+  once(event: "close", listener: () => void): unknown;
+  off(event: "close", listener: () => void): unknown;
+  writableFinished: boolean;
+};
+
+type ActiveRun = {
+  userId: number;
+  controller: AbortController;
+};
+
+/** In-flight AI runs per extraction id (this process only) */
+const activeRuns = new Map<number, Set<ActiveRun>>();
+
+export interface ExtractionRun {
+  /** Aborted on user cancel, client disconnect or when the parent signal aborts */
+  signal: AbortSignal;
+  /** Milliseconds since the run started */
+  elapsedMs: () => number;
+  /** Cancellation message once the signal has aborted, otherwise null */
+  cancelReason: () => string | null;
+  /** Unregister the run; call in a finally block */
+  end: () => void;
+}
+
+/**
+ * Register an AI run for an extraction so it can be cancelled. Pass the HTTP
+ * response to abort when the client goes away before the answer is written,
+ * and/or the procedure's own signal.
+ */
+export function beginExtractionRun(
+  extractionId: number,
+  userId: number,
+  options: { res?: ClosableResponse; signal?: AbortSignal } = {}
+): ExtractionRun {
+  const startedAt = Date.now();
+  const controller = new AbortController();
+  const run: ActiveRun = { userId, controller };
+
+  const runs = activeRuns.get(extractionId);
+  if (runs) runs.add(run);
+  else activeRuns.set(extractionId, new Set([run]));
+
+  const onClose = () => {
+    if (!options.res?.writableFinished) {
+      controller.abort(new ExtractionCancelledError("Client disconnected"));
+    }
+  };
+  const onParentAbort = () => {
+    controller.abort(new ExtractionCancelledError("Request aborted"));
+  };
+
+  // Test contexts pass a bare object as the response
+  const res = typeof options.res?.once === "function" ? options.res : null;
+  res?.once("close", onClose);
+  if (options.signal?.aborted) onParentAbort();
+  else options.signal?.addEventListener("abort", onParentAbort, { once: true });
+
+  return {
+    signal: controller.signal,
+    elapsedMs: () => Date.now() - startedAt,
+    cancelReason: () => {
+      if (!controller.signal.aborted) return null;
+      const reason = controller.signal.reason;
+      return reason instanceof Error ? reason.message : "Cancelled";
+    },
+    end: () => {
+      res?.off("close", onClose);
+      options.signal?.removeEventListener("abort", onParentAbort);
+      const current = activeRuns.get(extractionId);
+      current?.delete(run);
+      if (current?.size === 0) activeRuns.delete(extractionId);
+    },
+  };
+}
+
+/**
+ * Abort the user's in-flight runs for an extraction; returns how many were running
+ */
+export function cancelExtractionRuns(extractionId: number, userId: number, reason = "Cancelled by user"): number {
+  let cancelled = 0;
+  for (const run of Array.from(activeRuns.get(extractionId) ?? [])) {
+    if (run.userId !== userId || run.controller.signal.aborted) continue;
+    run.controller.abort(new ExtractionCancelledError(reason));
+    cancelled++;
+  }
+  return cancelled;
+}
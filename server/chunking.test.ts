@@ -0,0 +1,103 @@
+import { describe, expect, it, vi } from "vitest";
+import type { ExtractedData } from "../drizzle/schema";
+import { splitDocumentIntoChunks, mergeChunkResults, extractInChunks, isBetterField } from "./chunking";
+
+const page = (n: number, body: string) => `--- Page ${n} ---\n${body}\n`;
+
+describe("document chunking", () => {
+  it("keeps short documents in a single chunk", () => {
+    const text = page(1, "Abstract") + page(2, "Methods");
+    const chunks = splitDocumentIntoChunks(text, 1000);
+
+    expect(chunks).toHaveLength(1);
+    expect(chunks[0]).toMatchObject({ index: 0, text, pageStart: 1, pageEnd: 2 });
+  });
+
+  it("splits along page boundaries without losing text", () => {
+    const pages = Array.from({ length: 6 }, (_, i) => page(i + 1, "x".repeat(300)));
+    const text = pages.join("");
+    const chunks = splitDocumentIntoChunks(text, 700);
+
+    expect(chunks.map(c => [c.pageStart, c.pageEnd])).toEqual([[1, 2], [3, 4], [5, 6]]);
+    expect(chunks.map(c => c.text).join("")).toBe(text);
+    expect(chunks.every(c => c.text.length <= 700)).toBe(true);
+  });
+
+  it("splits an oversized page at sentence breaks and repeats its marker", () => {
+    const sentences = Array.from({ length: 40 }, (_, i) => `Sentence number ${i} of the results.`).join(" ");
+    const chunks = splitDocumentIntoChunks(page(7, sentences), 400);
+
+    expect(chunks.length).toBeGreaterThan(1);
+    for (const chunk of chunks) {
+      expect(chunk.text.startsWith("--- Page 7 ---\n")).toBe(true);
+      expect(chunk.text.length).toBeLessThanOrEqual(400);
+      expect(chunk.pageStart).toBe(7);
+    }
+  });
+
+  it("merges fields by confidence and records the source chunk", () => {
+    const chunks = splitDocumentIntoChunks(page(1, "a".repeat(50)) + page(2, "b".repeat(50)), 70);
+    const first: ExtractedData = {
+      total_n: { value: "", confidence: "low", notes: "Not reported in this part" },
+      citation: { value: "Smith et al., 2020", confidence: "high" },
+    };
+    const second: ExtractedData = {
+      total_n: { value: 240, confidence: "high", source_location: { page: 2, exact_text_reference: "240 patients" } },
+      citation: { value: "Smith 2020", confidence: "medium" },
+    };
+
+    const merged = mergeChunkResults([
+      { chunk: chunks[0], extractedData: first },
+      { chunk: chunks[1], extractedData: second },
+    ]);
+
+    expect(merged.total_n.value).toBe(240);
+    expect(merged.total_n.chunk).toEqual({ index: 1, pageStart: 2, pageEnd: 2 });
+    expect(merged.citation.value).toBe("Smith et al., 2020");
+    expect(merged.citation.chunk?.index).toBe(0);
+  });
+
+  it("breaks ties by chunk index, as the live stream does", () => {
+    const chunks = splitDocumentIntoChunks(page(1, "a".repeat(50)) + page(2, "b".repeat(50)), 70);
+    const earlier = { value: "Smith et al., 2020", confidence: "high" as const, chunk: { index: 0, pageStart: 1, pageEnd: 1 } };
+    const later = { value: "Smith 2020", confidence: "high" as const, chunk: { index: 1, pageStart: 2, pageEnd: 2 } };
+
+    // The stream sees chunks in the order they finish
+    expect(isBetterField(earlier, later)).toBe(true);
+    expect(isBetterField(later, earlier)).toBe(false);
+
+    const merged = mergeChunkResults([
+      { chunk: chunks[1], extractedData: { citation: { value: "Smith 2020", confidence: "high" } } },
+      { chunk: chunks[0], extractedData: { citation: { value: "Smith et al., 2020", confidence: "high" } } },
+    ]);
+    expect(merged.citation).toEqual(earlier);
+  });
+
+  it("keeps the not-found answer when no chunk has a value", () => {
+    const chunks = splitDocumentIntoChunks(page(1, "a") + page(2, "b"), 20);
+    const empty: ExtractedData = { doi: { value: "", confidence: "low" } };
+
+    const merged = mergeChunkResults(chunks.map(chunk => ({ chunk, extractedData: empty })));
+
+    expect(merged.doi).toEqual({ value: "", confidence: "low" });
+  });
+
+  it("extracts every chunk under the concurrency limit", async () => {
+    const text = Array.from({ length: 8 }, (_, i) => page(i + 1, "y".repeat(100))).join("");
+    let inFlight = 0;
+    let maxInFlight = 0;
+    const extractChunk = vi.fn(async () => {
+      inFlight++;
+      maxInFlight = Math.max(maxInFlight, inFlight);
+      await new Promise(resolve => setTimeout(resolve, 5));
+      inFlight--;
+      return { total_n: { value: 10, confidence: "medium" as const } };
+    });
+
+    const result = await extractInChunks(text, extractChunk, { maxChars: 150, concurrency: 3 });
+
+    expect(extractChunk).toHaveBeenCalledTimes(8);
+    expect(maxInFlight).toBeLessThanOrEqual(3);
+    expect(result.total_n.chunk?.index).toBe(0);
+  });
+});
@@ -0,0 +1,196 @@
+import type { Confidence, ExtractedData, ExtractedFieldData } from "../drizzle/schema";
+import { mapWithConcurrency } from "./concurrency";
+import { ENV } from "./_core/env";
+
+/** Largest document slice sent to a model in one prompt */
+export const MAX_CHUNK_CHARS = 50000;
+
+export interface DocumentChunk {
+  index: number;
+  text: string;
+  /** First and last page covered, null when the text has no page markers */
+  pageStart: number | null;
+  pageEnd: number | null;
+}
+
+type Segment = { text: string; page: number | null };
+
+const PAGE_MARKER = /--- Page (\d+) ---\n?/g;
+
+const CONFIDENCE_RANK: Record<Confidence, number> = { high: 3, medium: 2, low: 1 };
+
+/**
+ * Split text at the "--- Page N ---" markers, keeping each marker with its page
+ */
+function splitIntoPages(text: string): Segment[] {
+  const markers = Array.from(text.matchAll(PAGE_MARKER));
+  if (markers.length === 0) return [{ text, page: null }];
+
+  const segments: Segment[] = [];
+  const preamble = text.slice(0, markers[0].index);
+  if (preamble.trim()) segments.push({ text: preamble, page: null });
+
+  markers.forEach((marker, i) => {
+    const end = i + 1 < markers.length ? markers[i + 1].index : text.length;
+    segments.push({ text: text.slice(marker.index, end), page: Number(marker[1]) });
+  });
+  return segments;
+}
+
+/**
+ * Find the last paragraph, line, sentence or word break that keeps the head under maxChars
+ */
+function findBreak(text: string, maxChars: number): number {
+  const head = text.slice(0, maxChars);
+  for (const separator of ["\n\n", "\n", ". ", " "]) {
+    const idx = head.lastIndexOf(separator);
+    if (idx > maxChars / 2) return idx + separator.length;
+  }
+  return maxChars;
+}
+
+/**
+ * Break a page that alone exceeds maxChars, repeating the page marker on each part
+ */
+function splitOversizedPage(segment: Segment, maxChars: number): Segment[] {
+  const marker = segment.page !== null ? `--- Page ${segment.page} ---\n` : "";
+  const parts: Segment[] = [];
+  let rest = segment.text;
+  let prefix = "";
+
+  while (prefix.length + rest.length > maxChars) {
+    const cut = findBreak(rest, maxChars - prefix.length);
+    parts.push({ text: prefix + rest.slice(0, cut), page: segment.page });
+    rest = rest.slice(cut);
+    prefix = marker;
+  }
+  if (rest.trim()) parts.push({ text: prefix + rest, page: segment.page });
+  return parts;
+}
+
+/**
+ * Split a document along page boundaries into chunks of at most maxChars.
+ * Pages larger than a chunk are split at paragraph/sentence breaks.
+ */
+export function splitDocumentIntoChunks(text: string, maxChars: number = MAX_CHUNK_CHARS): DocumentChunk[] {
+  const segments = splitIntoPages(text).flatMap(segment =>
+    segment.text.length > maxChars ? splitOversizedPage(segment, maxChars) : [segment]
+  );
+
+  const chunks: DocumentChunk[] = [];
+  let current: Segment[] = [];
+  let size = 0;
+
+  const flush = () => {
+    if (current.length === 0) return;
+    const pages = current.map(s => s.page).filter((p): p is number => p !== null);
+    chunks.push({
+      index: chunks.length,
+      text: current.map(s => s.text).join(""),
+      pageStart: pages.length > 0 ? Math.min(...pages) : null,
+      pageEnd: pages.length > 0 ? Math.max(...pages) : null,
+    });
+    current = [];
+    size = 0;
+  };
+
+  for (const segment of segments) {
+    if (size + segment.text.length > maxChars) flush();
+    current.push(segment);
+    size += segment.text.length;
+  }
+  flush();
+
+  return chunks.length > 0 ? chunks : [{ index: 0, text, pageStart: null, pageEnd: null }];
+}
+
+/**
+ * Chunk layout without the text, for API responses
+ */
+export function describeChunks(text: string, maxChars: number = MAX_CHUNK_CHARS) {
+  return splitDocumentIntoChunks(text, maxChars).map(({ index, text: chunkText, pageStart, pageEnd }) => ({
+    index,
+    pageStart,
+    pageEnd,
+    charCount: chunkText.length,
+  }));
+}
+
+const isEmptyValue = (field: ExtractedFieldData | undefined) =>
+  !field || field.value === undefined || field.value === null || field.value === "";
+
+/**
+ * Rank a candidate value: confidence first, then whether it carries a verbatim quote
+ */
+const scoreField = (field: ExtractedFieldData) =>
+  CONFIDENCE_RANK[field.confidence ?? "low"] * 2 + (field.source_location?.exact_text_reference ? 1 : 0);
+
+/**
+ * Whether a candidate value should replace the current best for a field:
+ * non-empty beats empty, then the higher score wins, and ties go to the
+ * earlier chunk (by chunk index), whatever order the chunks finished in
+ */
+export function isBetterField(candidate: ExtractedFieldData, current: ExtractedFieldData | undefined): boolean {
+  if (!current) return true;
+  const candidateEmpty = isEmptyValue(candidate);
+  if (candidateEmpty !== isEmptyValue(current)) return !candidateEmpty;
+  const scoreDiff = candidateEmpty ? 0 : scoreField(candidate) - scoreField(current);
+  if (scoreDiff !== 0) return scoreDiff > 0;
+  return (candidate.chunk?.index ?? Infinity) < (current.chunk?.index ?? Infinity);
+}
+
+/**
+ * Merge per-chunk results field by field, keeping the best-supported non-empty
+ * value (see isBetterField, which the live stream uses too) and recording the
+ * chunk it came from.
+ */
+export function mergeChunkResults(
+  results: Array<{ chunk: DocumentChunk; extractedData: ExtractedData }>
+): ExtractedData {
+  const merged: ExtractedData = {};
+  const fieldNames = new Set(results.flatMap(r => Object.keys(r.extractedData)));
+
+  for (const fieldName of Array.from(fieldNames)) {
+    let best: ExtractedFieldData | undefined;
+
+    for (const { chunk, extractedData } of results) {
+      const field = extractedData[fieldName];
+      if (!field) continue;
+      const candidate = { ...field, chunk: { index: chunk.index, pageStart: chunk.pageStart, pageEnd: chunk.pageEnd } };
+      if (isBetterField(candidate, best)) best = candidate;
+    }
+    if (!best) continue;
+
+    if (isEmptyValue(best)) {
+      // Not found in any chunk: keep the earliest chunk's "not found" answer, with no source chunk
+      const { chunk: _notFoundIn, ...notFound } = best;
+      merged[fieldName] = notFound;
+    } else {
+      merged[fieldName] = best;
+    }
+  }
+
+  return merged;
+}
+
+/**
+ * Map-reduce extraction: run `extractChunk` over each chunk with bounded
+ * parallelism and merge the results. Short documents make a single call.
+ */
+export async function extractInChunks(
+  documentText: string,
+  extractChunk: (chunkText: string, chunk: DocumentChunk) => Promise<ExtractedData>,
+  options: { maxChars?: number; concurrency?: number } = {}
+): Promise<ExtractedData> {
+  const chunks = splitDocumentIntoChunks(documentText, options.maxChars);
+  if (chunks.length === 1) {
+    return extractChunk(chunks[0].text, chunks[0]);
+  }
+
+  const results = await mapWithConcurrency(
+    chunks,
+    options.concurrency ?? ENV.extractionChunkConcurrency,
+    async chunk => ({ chunk, extractedData: await extractChunk(chunk.text, chunk) })
+  );
+  return mergeChunkResults(results);
+}
@@ -0,0 +1,60 @@
+import { describe, expect, it } from "vitest";
+import type { ExtractedData } from "../drizzle/schema";
+import { consensusKey, findQuorumConsensus, runWithQuorum, QuorumReachedError } from "./consensus";
+
+const data = (fields: Record<string, unknown>, confidence: "high" | "medium" | "low" = "medium"): ExtractedData =>
+  Object.fromEntries(Object.entries(fields).map(([name, value]) => [name, { value: value as string, confidence }]));
+
+describe("agent consensus", () => {
+  it("compares values ignoring case, whitespace and number formatting", () => {
+    expect(consensusKey(" Double  Blind ")).toBe(consensusKey("double blind"));
+    expect(consensusKey(120)).toBe(consensusKey("120"));
+    expect(consensusKey(null)).toBe(consensusKey(""));
+  });
+
+  it("requires the quorum on every field", () => {
+    const a = data({ total_n: 120, design: "RCT" }, "high");
+    const b = data({ total_n: "120", design: "rct" });
+    const c = data({ total_n: 118, design: "cohort" });
+
+    expect(findQuorumConsensus([a, c], ["total_n", "design"], 2)).toBeNull();
+
+    const consensus = findQuorumConsensus([a, c, b], ["total_n", "design"], 2);
+    expect(consensus).toMatchObject({ total_n: { value: 120, confidence: "high" }, design: { value: "RCT" } });
+  });
+
+  it("aborts stragglers once the quorum agrees", async () => {
+    const cancelled: number[] = [];
+    const { results, consensus } = await runWithQuorum(
+      3,
+      (index, signal) => {
+        if (index < 2) return Promise.resolve(data({ total_n: 120 }));
+        return new Promise(resolve => {
+          signal.addEventListener("abort", () => {
+            expect(signal.reason).toBeInstanceOf(QuorumReachedError);
+            cancelled.push(index);
+            resolve(null);
+          });
+        });
+      },
+      { quorum: 2, fieldNames: ["total_n"], dataOf: result => result }
+    );
+
+    expect(cancelled).toEqual([2]);
+    expect(consensus).toMatchObject({ total_n: { value: 120 } });
+    expect(results.map(r => r.status)).toEqual(["fulfilled", "fulfilled", "fulfilled"]);
+  });
+
+  it("waits for every agent without a quorum", async () => {
+    const { consensus } = await runWithQuorum(
+      2,
+      async (_index, signal) => {
+        expect(signal.aborted).toBe(false);
+        return data({ total_n: 120 });
+      },
+      { quorum: null, fieldNames: ["total_n"], dataOf: result => result }
+    );
+
+    expect(consensus).toBeNull();
+  });
+});
@@ -0,0 +1,104 @@
+import type { ExtractedData, ExtractedFieldData } from "../drizzle/schema";
+import { isBetterField } from "./chunking";
+
+/** Abort reason given to agents still running when the quorum is reached */
+export class QuorumReachedError extends Error {
+  constructor() {
+    super("Cancelled: quorum reached");
+    this.name = "QuorumReachedError";
+  }
+}
+
+/**
+ * Comparison key for a field value: case and whitespace are ignored, and
+ * numbers match their string form ("120" agrees with 120)
+ */
+export function consensusKey(value: unknown): string {
+  if (value === undefined || value === null) return "";
+  if (typeof value === "string") return value.trim().replace(/\s+/g, " ").toLowerCase();
+  if (typeof value === "number" || typeof value === "boolean") return String(value).toLowerCase();
+  return JSON.stringify(value);
+}
+
+/**
+ * Consensus once at least `quorum` agents agree on every field, otherwise null.
+ * Agreeing on "not found" counts; the best-supported agreeing answer is kept.
+ */
+export function findQuorumConsensus(
+  results: ExtractedData[],
+  fieldNames: string[],
+  quorum: number
+): ExtractedData | null {
+  if (results.length < quorum) return null;
+
+  const consensus: ExtractedData = {};
+  for (const fieldName of fieldNames) {
+    const groups = new Map<string, ExtractedFieldData[]>();
+    for (const extractedData of results) {
+      const field = extractedData[fieldName] ?? { value: "", confidence: "low" as const };
+      const key = consensusKey(field.value);
+      const group = groups.get(key);
+      if (group) group.push(field);
+      else groups.set(key, [field]);
+    }
+
+    const agreeing = Array.from(groups.values()).find(group => group.length >= quorum);
+    if (!agreeing) return null;
+
+    let best: ExtractedFieldData | undefined;
+    for (const field of agreeing) {
+      if (isBetterField(field, best)) best = field;
+    }
+    consensus[fieldName] = best!;
+  }
+  return consensus;
+}
+
+/**
+ * Run agents in parallel. With a quorum, every completed result is checked for
+ * per-field agreement and the stragglers are aborted as soon as it is reached;
+ * `run` sees the abort through its signal (reason: QuorumReachedError, or the
+ * reason of `options.signal` when the whole run is cancelled).
+ */
+export async function runWithQuorum<R>(
+  count: number,
+  run: (index: number, signal: AbortSignal) => Promise<R>,
+  options: {
+    quorum: number | null;
+    fieldNames: string[];
+    /** Extracted data of a successful result, null for failed/cancelled ones */
+    dataOf: (result: R) => ExtractedData | null;
+    signal?: AbortSignal;
+  }
+): Promise<{ results: PromiseSettledResult<R>[]; consensus: ExtractedData | null }> {
+  const controllers = Array.from({ length: count }, () => new AbortController());
+  const completed: ExtractedData[] = [];
+  let consensus: ExtractedData | null = null;
+
+  const abortAll = () => {
+    for (const controller of controllers) controller.abort(options.signal!.reason);
+  };
+  if (options.signal?.aborted) abortAll();
+  else options.signal?.addEventListener("abort", abortAll, { once: true });
+
+  const results = await Promise.allSettled(
+    controllers.map(async (controller, index) => {
+      const result = await run(index, controller.signal);
+      const data = options.dataOf(result);
+
+      if (data && options.quorum && !consensus) {
+        completed.push(data);
+        consensus = findQuorumConsensus(completed, options.fieldNames, options.quorum);
+        if (consensus) {
+          for (const other of controllers) {
+            if (other !== controller) other.abort(new QuorumReachedError());
+          }
+        }
+      }
+      return result;
+    })
+  );
+
+  options.signal?.removeEventListener("abort", abortAll);
+  return { results, consensus };
+}
@@ -1,13 +1,22 @@
-import { eq, desc, and } from "drizzle-orm";
+import { eq, ne, desc, and, asc, lt, gt, lte, gte, like, sql, inArray, isNotNull, exists, notExists, getTableColumns, is, SQL, type InferInsertModel, type InferSelectModel } from "drizzle-orm";
 import { drizzle } from "drizzle-orm/mysql2";
+import type { AnyMySqlColumn, MySqlTable } from "drizzle-orm/mysql-core";
 import { 
   InsertUser, users, 
   documents, InsertDocument, Document,
+  documentPages, InsertDocumentPage, DocumentPage,
   extractions, InsertExtraction, ExtractionRecord,
-  schemaTemplates, InsertSchemaTemplate, SchemaTemplate,
-  agentExtractions, InsertAgentExtraction, AgentExtraction, AIProvider
+  schemaTemplates, InsertSchemaTemplate, SchemaTemplate, StudyType,
+  agentExtractions, InsertAgentExtraction, AgentExtraction, AIProvider,
+  extractionCache, InsertExtractionCacheEntry, ExtractionCacheEntry,
+  extractionJobs, InsertExtractionJob, ExtractionJob,
+  extractedValues, InsertExtractedValue, ExtractedValue, ExtractedValueProvider,
+  ExtractedData, ExtractedFieldData,
+  batchRuns, InsertBatchRun, BatchRun, batchRunItems, BatchRunItem
 } from "../drizzle/schema";
 import { ENV } from './_core/env';
+import { keysetAfter, keysetOrderBy, toPage, type Page, type PageCursor, type SortDirection } from "./pagination";
+import { flattenExtractedData, textKeyOf } from "./extractedValues";
 
 let _db: ReturnType<typeof drizzle> | null = null;
 
@@ -23,6 +32,80 @@ export async function getDb() {
   return _db;
 }
 
+// ============ Write Helpers ============
+
+/** Current time as TIMESTAMP columns store it (whole seconds) */
+function currentTimestamp(): Date {
+  return new Date(Math.floor(Date.now() / 1000) * 1000);
+}
+
+type TableWithId = MySqlTable & { id: AnyMySqlColumn };
+
+/**
+ * Values to insert plus the row the database will hold, built from the values
+ * and the column defaults. `defaultNow()` columns are written with the app's
+ * clock so the built timestamps match the stored ones. Returns null when a
+ * default is only known to the database (other SQL expressions, $defaultFn).
+ */
+function buildInsertedRow(
+  table: MySqlTable,
+  values: Record<string, unknown>
+): { values: Record<string, unknown>; row: Record<string, unknown> } | null {
+  const now = currentTimestamp();
+  const written: Record<string, unknown> = { ...values };
+  const row: Record<string, unknown> = {};
+
+  for (const [key, column] of Object.entries(getTableColumns(table))) {
+    let value = values[key];
+    if (value === undefined) {
+      if (key === "id") continue;
+      if (column.defaultFn || column.onUpdateFn) return null;
+      if (is(column.default, SQL)) {
+        if (column.columnType !== "MySqlTimestamp") return null;
+        value = written[key] = now;
+      } else {
+        value = column.default ?? null;
+      }
+    } else if (value instanceof Date && column.columnType === "MySqlTimestamp") {
+      value = written[key] = new Date(Math.floor(value.getTime() / 1000) * 1000);
+    }
+    row[key] = value;
+  }
+  return { values: written, row };
+}
+
+/**
+ * Insert a row and return it without reading it back (falls back to a SELECT
+ * when the row cannot be built locally, see buildInsertedRow)
+ */
+async function insertReturning<T extends TableWithId>(
+  table: T,
+  values: InferInsertModel<T>
+): Promise<InferSelectModel<T>> {
+  const db = await getDb();
+  if (!db) throw new Error("Database not available");
+
+  const built = buildInsertedRow(table, values as Record<string, unknown>);
+  const result = await db.insert(table).values((built?.values ?? values) as any);
+  const insertId = result[0].insertId;
+  if (built) return { ...built.row, id: (values as { id?: number }).id ?? insertId } as InferSelectModel<T>;
+
+  const [created] = await db.select().from(table as MySqlTable).where(eq(table.id, insertId));
+  return created as InferSelectModel<T>;
+}
+
+/**
+ * A loaded row with an update applied, as it is stored after that update
+ * (fields not in `data` are as of when the row was loaded)
+ */
+function applyUpdate<T extends { updatedAt: Date }>(row: T, data: Partial<T>, updatedAt: Date): T {
+  const applied = { ...row, updatedAt };
+  for (const [key, value] of Object.entries(data)) {
+    if (value !== undefined) (applied as Record<string, unknown>)[key] = value;
+  }
+  return applied;
+}
+
 // ============ User Queries ============
 
 export async function upsertUser(user: InsertUser): Promise<void> {
@@ -98,14 +181,7 @@ export async function getUserByOpenId(openId: string) {
 // ============ Document Queries ============
 
 export async function createDocument(doc: InsertDocument): Promise<Document> {
-  const db = await getDb();
-  if (!db) throw new Error("Database not available");
-
-  const result = await db.insert(documents).values(doc);
-  const insertId = result[0].insertId;
-  
-  const [created] = await db.select().from(documents).where(eq(documents.id, insertId));
-  return created;
+  return insertReturning(documents, doc);
 }
 
 export async function getDocumentsByUser(userId: number): Promise<Document[]> {
@@ -117,6 +193,45 @@ export async function getDocumentsByUser(userId: number): Promise<Document[]> {
     .orderBy(desc(documents.createdAt));
 }
 
+/** Options shared by the keyset-paginated list queries */
+type PageOptions<TSort extends string> = {
+  limit: number;
+  cursor: PageCursor | null;
+  sort: TSort;
+  direction: SortDirection;
+  createdFrom?: Date;
+  createdTo?: Date;
+};
+
+/** LIKE pattern matching `text` anywhere, with wildcards in it escaped */
+const containsPattern = (text: string) => `%${text.replace(/[\\%_]/g, "\\$&")}%`;
+
+export type DocumentPageOptions = PageOptions<"createdAt" | "filename" | "fileSize"> & {
+  /** Part of the filename */
+  search?: string;
+};
+
+/**
+ * One page of the user's documents (keyset pagination on the sort column + id)
+ */
+export async function listDocumentsPage(userId: number, options: DocumentPageOptions): Promise<Page<Document>> {
+  const db = await getDb();
+  if (!db) return { items: [], nextCursor: null };
+
+  const sortColumn = documents[options.sort];
+  const rows = await db.select().from(documents)
+    .where(and(
+      eq(documents.userId, userId),
+      options.createdFrom ? gte(documents.createdAt, options.createdFrom) : undefined,
+      options.createdTo ? lte(documents.createdAt, options.createdTo) : undefined,
+      options.search ? like(documents.filename, containsPattern(options.search)) : undefined,
+      options.cursor ? keysetAfter(sortColumn, documents.id, options.direction, options.cursor) : undefined
+    ))
+    .orderBy(...keysetOrderBy(sortColumn, documents.id, options.direction))
+    .limit(options.limit + 1);
+  return toPage(rows, options.limit, row => row[options.sort]);
+}
+
 export async function getDocumentById(id: number, userId: number): Promise<Document | undefined> {
   const db = await getDb();
   if (!db) return undefined;
@@ -126,25 +241,75 @@ export async function getDocumentById(id: number, userId: number): Promise<Docum
   return doc;
 }
 
+/**
+ * Documents by id, without an ownership filter (request loaders check ownership)
+ */
+export async function getDocumentsByIds(ids: number[]): Promise<Document[]> {
+  const db = await getDb();
+  if (!db || ids.length === 0) return [];
+
+  return db.select().from(documents).where(inArray(documents.id, ids));
+}
+
 export async function deleteDocument(id: number, userId: number): Promise<boolean> {
   const db = await getDb();
   if (!db) return false;
 
   const result = await db.delete(documents)
     .where(and(eq(documents.id, id), eq(documents.userId, userId)));
-  return result[0].affectedRows > 0;
+  if (result[0].affectedRows === 0) return false;
+
+  await db.delete(documentPages).where(eq(documentPages.documentId, id));
+  return true;
 }
 
-// ============ Extraction Queries ============
+/** Rows per INSERT when persisting parsed pages, keeps packets well below max_allowed_packet */
+const PAGE_INSERT_BATCH_SIZE = 25;
 
-export async function createExtraction(extraction: InsertExtraction): Promise<ExtractionRecord> {
+/**
+ * Persist parsed page text for a document
+ */
+export async function saveDocumentPages(pages: InsertDocumentPage[]): Promise<void> {
   const db = await getDb();
   if (!db) throw new Error("Database not available");
 
-  const result = await db.insert(extractions).values(extraction);
-  const insertId = result[0].insertId;
-  
-  const [created] = await db.select().from(extractions).where(eq(extractions.id, insertId));
+  for (let i = 0; i < pages.length; i += PAGE_INSERT_BATCH_SIZE) {
+    await db.insert(documentPages).values(pages.slice(i, i + PAGE_INSERT_BATCH_SIZE));
+  }
+}
+
+/**
+ * Get parsed pages for a document, in page order
+ */
+export async function getDocumentPages(documentId: number): Promise<DocumentPage[]> {
+  const db = await getDb();
+  if (!db) return [];
+
+  return db.select().from(documentPages)
+    .where(eq(documentPages.documentId, documentId))
+    .orderBy(asc(documentPages.pageNumber));
+}
+
+/**
+ * Whether the document has parsed pages stored
+ */
+export async function hasDocumentPages(documentId: number): Promise<boolean> {
+  const db = await getDb();
+  if (!db) return false;
+
+  const [row] = await db.select({ id: documentPages.id }).from(documentPages)
+    .where(eq(documentPages.documentId, documentId))
+    .limit(1);
+  return !!row;
+}
+
+// ============ Extraction Queries ============
+
+export async function createExtraction(extraction: InsertExtraction): Promise<ExtractionRecord> {
+  const created = await insertReturning(extractions, extraction);
+  if (created.extractedData) {
+    await insertExtractedValues(extractedValueRows(created.id, "final", created.extractedData));
+  }
   return created;
 }
 
@@ -157,6 +322,61 @@ export async function getExtractionsByDocument(documentId: number, userId: numbe
     .orderBy(desc(extractions.createdAt));
 }
 
+/** Extraction list columns: the schema, extracted data and summary are reduced to counts/flags */
+const extractionSummaryColumns = {
+  id: extractions.id,
+  documentId: extractions.documentId,
+  status: extractions.status,
+  processingTimeMs: extractions.processingTimeMs,
+  fieldCount: sql<number>`coalesce(json_length(${extractions.schema}, '$.fields'), 0)`.mapWith(Number),
+  extractedFieldCount: sql<number>`coalesce(json_length(${extractions.extractedData}), 0)`.mapWith(Number),
+  hasSummary: sql<boolean>`${extractions.summary} is not null`.mapWith(value => Number(value) === 1),
+  createdAt: extractions.createdAt,
+  updatedAt: extractions.updatedAt,
+};
+
+export type ExtractionSummary = {
+  id: number;
+  documentId: number;
+  status: ExtractionRecord["status"];
+  processingTimeMs: number | null;
+  fieldCount: number;
+  extractedFieldCount: number;
+  hasSummary: boolean;
+  createdAt: Date;
+  updatedAt: Date;
+};
+
+export type ExtractionPageOptions = PageOptions<"createdAt" | "updatedAt"> & {
+  documentId?: number;
+  status?: ExtractionRecord["status"][];
+};
+
+/**
+ * One page of the user's extractions without the heavy JSON columns
+ */
+export async function listExtractionsPage(
+  userId: number,
+  options: ExtractionPageOptions
+): Promise<Page<ExtractionSummary>> {
+  const db = await getDb();
+  if (!db) return { items: [], nextCursor: null };
+
+  const sortColumn = extractions[options.sort];
+  const rows = await db.select(extractionSummaryColumns).from(extractions)
+    .where(and(
+      eq(extractions.userId, userId),
+      options.documentId !== undefined ? eq(extractions.documentId, options.documentId) : undefined,
+      options.status?.length ? inArray(extractions.status, options.status) : undefined,
+      options.createdFrom ? gte(extractions.createdAt, options.createdFrom) : undefined,
+      options.createdTo ? lte(extractions.createdAt, options.createdTo) : undefined,
+      options.cursor ? keysetAfter(sortColumn, extractions.id, options.direction, options.cursor) : undefined
+    ))
+    .orderBy(...keysetOrderBy(sortColumn, extractions.id, options.direction))
+    .limit(options.limit + 1);
+  return toPage(rows, options.limit, row => row[options.sort]);
+}
+
 export async function getExtractionById(id: number, userId: number): Promise<ExtractionRecord | undefined> {
   const db = await getDb();
   if (!db) return undefined;
@@ -166,19 +386,164 @@ export async function getExtractionById(id: number, userId: number): Promise<Ext
   return extraction;
 }
 
-export async function updateExtraction(
-  id: number, 
-  userId: number, 
-  data: Partial<Pick<ExtractionRecord, 'extractedData' | 'summary' | 'status'>>
-): Promise<ExtractionRecord | undefined> {
+/**
+ * Extractions by id, without an ownership filter (request loaders check ownership)
+ */
+export async function getExtractionsByIds(ids: number[]): Promise<ExtractionRecord[]> {
   const db = await getDb();
-  if (!db) return undefined;
+  if (!db || ids.length === 0) return [];
+
+  return db.select().from(extractions).where(inArray(extractions.id, ids));
+}
+
+export type ExtractionExportRow = Pick<ExtractionRecord, "id" | "documentId" | "status" | "extractedData" | "createdAt"> & {
+  filename: string;
+};
 
-  await db.update(extractions)
-    .set(data)
+/**
+ * The user's extractions after `cursor` (oldest first), with their document's
+ * name: one batch of a streaming export. Walks the userId/createdAt index.
+ */
+export async function getExtractionExportBatch(
+  userId: number,
+  cursor: PageCursor | null,
+  limit: number
+): Promise<ExtractionExportRow[]> {
+  const db = await getDb();
+  if (!db) return [];
+
+  return db.select({
+      id: extractions.id,
+      documentId: extractions.documentId,
+      status: extractions.status,
+      extractedData: extractions.extractedData,
+      createdAt: extractions.createdAt,
+      filename: documents.filename,
+    })
+    .from(extractions)
+    .innerJoin(documents, eq(documents.id, extractions.documentId))
+    .where(and(
+      eq(extractions.userId, userId),
+      cursor ? keysetAfter(extractions.createdAt, extractions.id, "asc", cursor) : undefined
+    ))
+    .orderBy(...keysetOrderBy(extractions.createdAt, extractions.id, "asc"))
+    .limit(limit);
+}
+
+type ExtractionUpdate = Partial<Pick<ExtractionRecord, 'extractedData' | 'summary' | 'status' | 'processingTimeMs'>>;
+
+/**
+ * Update an extraction (and its extracted values when the data changes). Returns
+ * false if it doesn't match, else the new version when extractedData was written.
+ */
+async function writeExtractionUpdate(
+  id: number,
+  userId: number,
+  data: ExtractionUpdate,
+  updatedAt: Date,
+  previousData?: ExtractedData | null
+): Promise<{ version: number | null } | false> {
+  const db = await getDb();
+  if (!db) return false;
+
+  const writesData = data.extractedData !== undefined;
+  const result = await db.update(extractions)
+    .set({
+      ...data,
+      // LAST_INSERT_ID(expr) reports the new version as the insertId
+      ...(writesData ? { version: sql`LAST_INSERT_ID(${extractions.version} + 1)` } : {}),
+      updatedAt,
+    })
     .where(and(eq(extractions.id, id), eq(extractions.userId, userId)));
+  if (result[0].affectedRows === 0) return false;
+
+  if (!writesData) return { version: null };
+  await syncExtractedValues(id, "final", data.extractedData, previousData);
+  return { version: result[0].insertId };
+}
+
+/**
+ * Update an extraction; returns false if it doesn't exist for the user.
+ * Use updateExtractionRecord when the updated row is needed.
+ */
+export async function updateExtraction(id: number, userId: number, data: ExtractionUpdate): Promise<boolean> {
+  return (await writeExtractionUpdate(id, userId, data, currentTimestamp())) !== false;
+}
+
+/**
+ * Update an extraction the caller has already loaded and return the updated
+ * row without reading it back
+ */
+export async function updateExtractionRecord(
+  extraction: ExtractionRecord,
+  data: ExtractionUpdate
+): Promise<ExtractionRecord | undefined> {
+  const updatedAt = currentTimestamp();
+  const updated = await writeExtractionUpdate(extraction.id, extraction.userId, data, updatedAt, extraction.extractedData);
+  if (!updated) return undefined;
+  return applyUpdate(extraction, { ...data, version: updated.version ?? extraction.version }, updatedAt);
+}
+
+export type ExtractionFieldPatch = {
+  /** Fields to write, replacing their current data */
+  set?: ExtractedData;
+  /** Fields to remove */
+  remove?: string[];
+};
+
+export type ExtractionPatchResult =
+  | { status: "patched"; version: number; updatedAt: Date; fields: Record<string, ExtractedFieldData | null> }
+  | { status: "conflict"; version: number }
+  | { status: "not_found" };
+
+/** JSON path of a top-level extractedData field */
+const fieldPath = (fieldName: string) => `$.${JSON.stringify(fieldName)}`;
+
+/**
+ * Apply field-level changes to an extraction's data with one UPDATE (JSON_SET and
+ * JSON_REMOVE on the stored document), keeping concurrent edits of other fields.
+ * With `expectedVersion`, the patch only applies if the data is still at that version.
+ * Returns the changed fields only (removed ones as null).
+ */
+export async function patchExtractionFields(
+  id: number,
+  userId: number,
+  patch: ExtractionFieldPatch,
+  expectedVersion?: number
+): Promise<ExtractionPatchResult> {
+  const db = await getDb();
+  if (!db) throw new Error("Database not available");
+
+  const set = patch.set ?? {};
+  const remove = (patch.remove ?? []).filter(fieldName => !Object.hasOwn(set, fieldName));
+  let data = sql`coalesce(${extractions.extractedData}, json_object())`;
+  if (Object.keys(set).length > 0) {
+    const assignments = Object.entries(set).map(([fieldName, field]) =>
+      sql`${fieldPath(fieldName)}, cast(${JSON.stringify(field)} as json)`
+    );
+    data = sql`json_set(${data}, ${sql.join(assignments, sql`, `)})`;
+  }
+  if (remove.length > 0) {
+    data = sql`json_remove(${data}, ${sql.join(remove.map(fieldName => sql`${fieldPath(fieldName)}`), sql`, `)})`;
+  }
+
+  const owned = and(eq(extractions.id, id), eq(extractions.userId, userId));
+  const updatedAt = currentTimestamp();
+  const result = await db.update(extractions)
+    .set({ extractedData: data, version: sql`LAST_INSERT_ID(${extractions.version} + 1)`, updatedAt })
+    .where(and(owned, expectedVersion !== undefined ? eq(extractions.version, expectedVersion) : undefined));
+  if (result[0].affectedRows === 0) {
+    const [current] = await db.select({ version: extractions.version }).from(extractions).where(owned);
+    return current ? { status: "conflict", version: current.version } : { status: "not_found" };
+  }
 
-  return getExtractionById(id, userId);
+  await patchExtractedValues(id, set, remove);
+  return {
+    status: "patched",
+    version: result[0].insertId,
+    updatedAt,
+    fields: { ...Object.fromEntries(remove.map(fieldName => [fieldName, null])), ...set },
+  };
 }
 
 export async function deleteExtraction(id: number, userId: number): Promise<boolean> {
@@ -187,7 +552,10 @@ export async function deleteExtraction(id: number, userId: number): Promise<bool
 
   const result = await db.delete(extractions)
     .where(and(eq(extractions.id, id), eq(extractions.userId, userId)));
-  return result[0].affectedRows > 0;
+  if (result[0].affectedRows === 0) return false;
+
+  await db.delete(extractedValues).where(eq(extractedValues.extractionId, id));
+  return true;
 }
 
 // ============ Schema Template Queries ============
@@ -233,6 +601,54 @@ export async function getTemplatesByStudyType(userId: number, studyType: string)
     .orderBy(desc(schemaTemplates.isBuiltIn), desc(schemaTemplates.createdAt));
 }
 
+/** Template list columns: the schema is reduced to its field count */
+const templateSummaryColumns = {
+  id: schemaTemplates.id,
+  userId: schemaTemplates.userId,
+  name: schemaTemplates.name,
+  description: schemaTemplates.description,
+  studyType: schemaTemplates.studyType,
+  fieldCount: sql<number>`coalesce(json_length(${schemaTemplates.schema}, '$.fields'), 0)`.mapWith(Number),
+  isBuiltIn: schemaTemplates.isBuiltIn,
+  isPublic: schemaTemplates.isPublic,
+  createdAt: schemaTemplates.createdAt,
+  updatedAt: schemaTemplates.updatedAt,
+};
+
+export type TemplateSummary = Omit<SchemaTemplate, "schema"> & { fieldCount: number };
+
+export type TemplatePageOptions = PageOptions<"createdAt" | "name"> & {
+  studyType?: StudyType;
+  /** Part of the template name */
+  search?: string;
+};
+
+/**
+ * One page of the templates accessible to a user (their own + built-in + public), without schemas
+ */
+export async function listTemplatesPage(userId: number, options: TemplatePageOptions): Promise<Page<TemplateSummary>> {
+  const db = await getDb();
+  if (!db) return { items: [], nextCursor: null };
+
+  const sortColumn = schemaTemplates[options.sort];
+  const rows = await db.select(templateSummaryColumns).from(schemaTemplates)
+    .where(and(
+      or(
+        eq(schemaTemplates.userId, userId),
+        eq(schemaTemplates.isBuiltIn, true),
+        eq(schemaTemplates.isPublic, true)
+      ),
+      options.studyType ? eq(schemaTemplates.studyType, options.studyType) : undefined,
+      options.search ? like(schemaTemplates.name, containsPattern(options.search)) : undefined,
+      options.createdFrom ? gte(schemaTemplates.createdAt, options.createdFrom) : undefined,
+      options.createdTo ? lte(schemaTemplates.createdAt, options.createdTo) : undefined,
+      options.cursor ? keysetAfter(sortColumn, schemaTemplates.id, options.direction, options.cursor) : undefined
+    ))
+    .orderBy(...keysetOrderBy(sortColumn, schemaTemplates.id, options.direction))
+    .limit(options.limit + 1);
+  return toPage(rows, options.limit, row => row[options.sort]);
+}
+
 /**
  * Get a single template by ID (with access check)
  */
@@ -258,38 +674,28 @@ export async function getTemplateById(id: number, userId: number): Promise<Schem
  * Create a new template
  */
 export async function createTemplate(template: InsertSchemaTemplate): Promise<SchemaTemplate> {
-  const db = await getDb();
-  if (!db) throw new Error("Database not available");
-
-  const result = await db.insert(schemaTemplates).values(template);
-  const insertId = result[0].insertId;
-  const [created] = await db.select().from(schemaTemplates).where(eq(schemaTemplates.id, insertId));
-  return created;
+  return insertReturning(schemaTemplates, template);
 }
 
 /**
  * Update a template (only owner can update, built-in templates cannot be updated)
  */
 export async function updateTemplate(
-  id: number, 
+  template: SchemaTemplate,
   userId: number, 
   data: Partial<Pick<SchemaTemplate, 'name' | 'description' | 'studyType' | 'schema' | 'isPublic'>>
 ): Promise<SchemaTemplate | undefined> {
   const db = await getDb();
   if (!db) return undefined;
 
-  // Check ownership and not built-in
-  const [existing] = await db.select().from(schemaTemplates)
-    .where(and(eq(schemaTemplates.id, id), eq(schemaTemplates.userId, userId), eq(schemaTemplates.isBuiltIn, false)));
-  
-  if (!existing) return undefined;
-
-  await db.update(schemaTemplates)
-    .set(data)
-    .where(eq(schemaTemplates.id, id));
+  // The ownership and built-in checks are part of the update itself
+  const updatedAt = currentTimestamp();
+  const result = await db.update(schemaTemplates)
+    .set({ ...data, updatedAt })
+    .where(and(eq(schemaTemplates.id, template.id), eq(schemaTemplates.userId, userId), eq(schemaTemplates.isBuiltIn, false)));
+  if (result[0].affectedRows === 0) return undefined;
 
-  const [updated] = await db.select().from(schemaTemplates).where(eq(schemaTemplates.id, id));
-  return updated;
+  return applyUpdate(template, data, updatedAt);
 }
 
 /**
@@ -323,18 +729,70 @@ export async function getBuiltInTemplates(): Promise<SchemaTemplate[]> {
 // ============ Agent Extraction Queries ============
 
 /**
- * Create an agent extraction record
+ * Every mutable column of an agent extraction, as a (re)created row holds them.
+ * createdAt is not among them: a reset row keeps the time it was first created.
+ */
+function agentExtractionReset(data: Omit<InsertAgentExtraction, "extractionId" | "provider">) {
+  return {
+    modelName: data.modelName ?? null,
+    extractedData: data.extractedData ?? null,
+    processingTimeMs: data.processingTimeMs ?? null,
+    status: data.status ?? "pending",
+    errorMessage: data.errorMessage ?? null,
+    updatedAt: currentTimestamp(),
+  };
+}
+
+/**
+ * Create the agent extraction record for a provider, or reset the existing one
+ * (there is one row per extraction and provider). A new row is known without
+ * reading it back; a reset one is read for its original createdAt.
  */
 export async function createAgentExtraction(data: InsertAgentExtraction): Promise<AgentExtraction> {
   const db = await getDb();
   if (!db) throw new Error("Database not available");
 
-  const result = await db.insert(agentExtractions).values(data);
-  const insertId = result[0].insertId;
-  const [created] = await db.select().from(agentExtractions).where(eq(agentExtractions.id, insertId));
+  const reset = agentExtractionReset(data);
+  const result = await db.insert(agentExtractions)
+    .values({ extractionId: data.extractionId, provider: data.provider, ...reset, createdAt: reset.updatedAt })
+    .onDuplicateKeyUpdate({ set: reset });
+  // ON DUPLICATE KEY UPDATE reports 1 affected row for an insert, 2 (or 0) for a reset
+  const created: AgentExtraction = result[0].affectedRows === 1
+    ? { id: result[0].insertId, extractionId: data.extractionId, provider: data.provider, ...reset, createdAt: reset.updatedAt }
+    : (await getAgentExtractionByProvider(data.extractionId, data.provider))!;
+  // A reset row drops the values of the previous run
+  await syncExtractedValues(data.extractionId, data.provider, reset.extractedData);
   return created;
 }
 
+/**
+ * Create or reset the agent extraction records of several providers with one
+ * upsert and one read, in the order of `providers`
+ */
+export async function createAgentExtractions(
+  extractionId: number,
+  providers: AIProvider[],
+  status: AgentExtraction["status"] = "pending"
+): Promise<AgentExtraction[]> {
+  const db = await getDb();
+  if (!db) throw new Error("Database not available");
+  if (providers.length === 0) return [];
+
+  const reset = agentExtractionReset({ status });
+  await db.insert(agentExtractions)
+    .values(providers.map(provider => ({ extractionId, provider, ...reset, createdAt: reset.updatedAt })))
+    .onDuplicateKeyUpdate({ set: reset });
+  await db.delete(extractedValues)
+    .where(and(eq(extractedValues.extractionId, extractionId), inArray(extractedValues.provider, providers)));
+
+  const rows = await db.select().from(agentExtractions)
+    .where(and(
+      eq(agentExtractions.extractionId, extractionId),
+      inArray(agentExtractions.provider, providers)
+    ));
+  return providers.map(provider => rows.find(row => row.provider === provider)!);
+}
+
 /**
  * Get all agent extractions for an extraction session
  */
@@ -347,6 +805,18 @@ export async function getAgentExtractionsByExtractionId(extractionId: number): P
     .orderBy(agentExtractions.provider);
 }
 
+/**
+ * Get the agent extractions of several extraction sessions in one query
+ */
+export async function getAgentExtractionsByExtractionIds(extractionIds: number[]): Promise<AgentExtraction[]> {
+  const db = await getDb();
+  if (!db || extractionIds.length === 0) return [];
+
+  return db.select().from(agentExtractions)
+    .where(inArray(agentExtractions.extractionId, extractionIds))
+    .orderBy(agentExtractions.extractionId, agentExtractions.provider);
+}
+
 /**
  * Get agent extraction by extraction ID and provider
  */
@@ -365,22 +835,52 @@ export async function getAgentExtractionByProvider(
   return result;
 }
 
+type AgentExtractionUpdate = Partial<Pick<AgentExtraction, 'extractedData' | 'status' | 'errorMessage' | 'processingTimeMs' | 'modelName'>>;
+
 /**
- * Update an agent extraction
+ * Update an agent extraction; returns false if it doesn't exist.
+ * Use updateAgentExtractionRecord when the updated row is needed (or already
+ * loaded: writing extractedData by id costs a lookup of its extraction and provider).
  */
-export async function updateAgentExtraction(
-  id: number,
-  data: Partial<Pick<AgentExtraction, 'extractedData' | 'status' | 'errorMessage' | 'processingTimeMs' | 'modelName'>>
+export async function updateAgentExtraction(id: number, data: AgentExtractionUpdate): Promise<boolean> {
+  const db = await getDb();
+  if (!db) return false;
+
+  const result = await db.update(agentExtractions)
+    .set({ ...data, updatedAt: currentTimestamp() })
+    .where(eq(agentExtractions.id, id));
+  if (result[0].affectedRows === 0) return false;
+
+  if (data.extractedData !== undefined) {
+    const [record] = await db.select({ extractionId: agentExtractions.extractionId, provider: agentExtractions.provider })
+      .from(agentExtractions)
+      .where(eq(agentExtractions.id, id));
+    if (record) await syncExtractedValues(record.extractionId, record.provider, data.extractedData);
+  }
+  return true;
+}
+
+/**
+ * Update an agent extraction the caller has already loaded and return the
+ * updated row without reading it back
+ */
+export async function updateAgentExtractionRecord(
+  record: AgentExtraction,
+  data: AgentExtractionUpdate
 ): Promise<AgentExtraction | undefined> {
   const db = await getDb();
   if (!db) return undefined;
 
-  await db.update(agentExtractions)
-    .set(data)
-    .where(eq(agentExtractions.id, id));
+  const updatedAt = currentTimestamp();
+  const result = await db.update(agentExtractions)
+    .set({ ...data, updatedAt })
+    .where(eq(agentExtractions.id, record.id));
+  if (result[0].affectedRows === 0) return undefined;
 
-  const [updated] = await db.select().from(agentExtractions).where(eq(agentExtractions.id, id));
-  return updated;
+  if (data.extractedData !== undefined) {
+    await syncExtractedValues(record.extractionId, record.provider, data.extractedData, record.extractedData);
+  }
+  return applyUpdate(record, data, updatedAt);
 }
 
 /**
@@ -392,5 +892,819 @@ export async function deleteAgentExtractionsByExtractionId(extractionId: number)
 
   const result = await db.delete(agentExtractions)
     .where(eq(agentExtractions.extractionId, extractionId));
+  await db.delete(extractedValues)
+    .where(and(eq(extractedValues.extractionId, extractionId), ne(extractedValues.provider, "final")));
+  return result[0].affectedRows > 0;
+}
+
+// ============ Extracted Value Queries ============
+
+/** Rows per INSERT when writing extracted values */
+const VALUE_INSERT_BATCH_SIZE = 200;
+
+/** The extracted_values rows of one extraction and provider's data */
+function extractedValueRows(
+  extractionId: number,
+  provider: ExtractedValueProvider,
+  extractedData: ExtractedData | null | undefined
+): InsertExtractedValue[] {
+  return flattenExtractedData(extractedData).map(value => ({ ...value, extractionId, provider }));
+}
+
+/** `VALUES(column)`: the value an upsert tried to insert */
+const insertedValue = (column: AnyMySqlColumn) => sql.raw(`values(\`${column.name}\`)`);
+
+async function insertExtractedValues(rows: InsertExtractedValue[]): Promise<void> {
+  const db = await getDb();
+  if (!db) return;
+
+  for (let i = 0; i < rows.length; i += VALUE_INSERT_BATCH_SIZE) {
+    await db.insert(extractedValues)
+      .values(rows.slice(i, i + VALUE_INSERT_BATCH_SIZE))
+      // A concurrent write of the same extraction and provider may have stored the field first
+      .onDuplicateKeyUpdate({
+        set: {
+          valueType: insertedValue(extractedValues.valueType),
+          textValue: insertedValue(extractedValues.textValue),
+          textKey: insertedValue(extractedValues.textKey),
+          numberValue: insertedValue(extractedValues.numberValue),
+          booleanValue: insertedValue(extractedValues.booleanValue),
+          confidence: insertedValue(extractedValues.confidence),
+          page: insertedValue(extractedValues.page),
+        },
+      });
+  }
+}
+
+/** Rewrite the extracted values of the fields a patch changed in an extraction's own data */
+async function patchExtractedValues(extractionId: number, set: ExtractedData, removed: string[]): Promise<void> {
+  const db = await getDb();
+  if (!db) return;
+
+  const fieldNames = [...Object.keys(set), ...removed];
+  if (fieldNames.length === 0) return;
+  await db.delete(extractedValues)
+    .where(and(
+      eq(extractedValues.extractionId, extractionId),
+      eq(extractedValues.provider, "final"),
+      inArray(extractedValues.fieldName, fieldNames)
+    ));
+  await insertExtractedValues(extractedValueRows(extractionId, "final", set));
+}
+
+/**
+ * Replace the extracted values of an extraction and provider with the fields
+ * of `extractedData` (null leaves none). Called by every write of the JSON.
+ * When the caller passes the data the row held before (`previousData`), only
+ * the fields it no longer has are deleted, usually none, and the rest are
+ * upserted; otherwise all of the provider's values are deleted first.
+ */
+export async function syncExtractedValues(
+  extractionId: number,
+  provider: ExtractedValueProvider,
+  extractedData: ExtractedData | null | undefined,
+  previousData?: ExtractedData | null
+): Promise<void> {
+  const db = await getDb();
+  if (!db) return;
+
+  const rows = extractedValueRows(extractionId, provider, extractedData);
+  const owned = and(eq(extractedValues.extractionId, extractionId), eq(extractedValues.provider, provider));
+  if (previousData === undefined) {
+    await db.delete(extractedValues).where(owned);
+  } else {
+    const kept = new Set(rows.map(row => row.fieldName));
+    const stale = extractedValueRows(extractionId, provider, previousData)
+      .map(row => row.fieldName)
+      .filter(fieldName => !kept.has(fieldName));
+    if (stale.length > 0) {
+      await db.delete(extractedValues).where(and(owned, inArray(extractedValues.fieldName, stale)));
+    }
+  }
+  await insertExtractedValues(rows);
+}
+
+type ValueSource = {
+  id: number;
+  extractionId: number;
+  provider: ExtractedValueProvider;
+  extractedData: ExtractedData | null;
+};
+
+/** Backfill the rows `load` returns, walking them by id; returns how many it saw */
+async function backfillValueSource(
+  load: (afterId: number, limit: number) => Promise<ValueSource[]>,
+  batchSize: number
+): Promise<number> {
+  let backfilled = 0;
+  for (let afterId = 0; ; ) {
+    const rows = await load(afterId, batchSize);
+    await insertExtractedValues(rows.flatMap(row => extractedValueRows(row.extractionId, row.provider, row.extractedData)));
+    backfilled += rows.length;
+    if (rows.length < batchSize) return backfilled;
+    afterId = rows[rows.length - 1].id;
+  }
+}
+
+/**
+ * Write the extracted values of extractions and agent extractions saved before
+ * the table existed (JSON data but no values). Returns the number of rows backfilled.
+ */
+export async function backfillExtractedValues(batchSize = 200): Promise<number> {
+  const db = await getDb();
+  if (!db) return 0;
+
+  const finals = await backfillValueSource(
+    (afterId, limit) => db.select({
+        id: extractions.id,
+        extractionId: extractions.id,
+        provider: sql<ExtractedValueProvider>`'final'`,
+        extractedData: extractions.extractedData,
+      })
+      .from(extractions)
+      .where(and(
+        gt(extractions.id, afterId),
+        isNotNull(extractions.extractedData),
+        notExists(db.select({ id: extractedValues.id }).from(extractedValues).where(and(
+          eq(extractedValues.extractionId, extractions.id),
+          eq(extractedValues.provider, "final")
+        )))
+      ))
+      .orderBy(asc(extractions.id))
+      .limit(limit),
+    batchSize
+  );
+
+  const agents = await backfillValueSource(
+    (afterId, limit) => db.select({
+        id: agentExtractions.id,
+        extractionId: agentExtractions.extractionId,
+        provider: agentExtractions.provider,
+        extractedData: agentExtractions.extractedData,
+      })
+      .from(agentExtractions)
+      .where(and(
+        gt(agentExtractions.id, afterId),
+        isNotNull(agentExtractions.extractedData),
+        notExists(db.select({ id: extractedValues.id }).from(extractedValues).where(and(
+          eq(extractedValues.extractionId, agentExtractions.extractionId),
+          eq(extractedValues.provider, agentExtractions.provider)
+        )))
+      ))
+      .orderBy(asc(agentExtractions.id))
+      .limit(limit),
+    batchSize
+  );
+
+  return finals + agents;
+}
+
+/** A filter on one extracted field */
+export type ExtractedValueCondition =
+  | { field: string; op: "eq"; value: string | number | boolean }
+  | { field: string; op: "gt" | "gte" | "lt" | "lte"; value: number }
+  | { field: string; op: "contains"; value: string }
+  | { field: string; op: "exists" };
+
+const numberComparisons = { gt, gte, lt, lte };
+
+function extractedValueMatches(condition: ExtractedValueCondition): SQL {
+  switch (condition.op) {
+    case "eq":
+      if (typeof condition.value === "number") return eq(extractedValues.numberValue, condition.value);
+      if (typeof condition.value === "boolean") return eq(extractedValues.booleanValue, condition.value);
+      return eq(extractedValues.textKey, textKeyOf(condition.value));
+    case "contains":
+      // textKey is cut to its column length, so the full textValue is searched too;
+      // textKey still matches across the whitespace it collapses
+      return or(
+        like(extractedValues.textKey, containsPattern(textKeyOf(condition.value))),
+        like(extractedValues.textValue, containsPattern(condition.value.trim()))
+      )!;
+    case "exists":
+      return ne(extractedValues.valueType, "empty");
+    default:
+      return numberComparisons[condition.op](extractedValues.numberValue, condition.value);
+  }
+}
+
+export type ExtractedValueQuery = {
+  /** Every condition must hold */
+  conditions: ExtractedValueCondition[];
+  /** Whose values to filter: the extraction's own (default) or an agent's */
+  provider?: ExtractedValueProvider;
+  limit: number;
+  cursor?: PageCursor | null;
+};
+
+export type ExtractionValueMatch = ExtractionSummary & { values: ExtractedValue[] };
+
+/**
+ * One page of the user's extractions (newest first) whose values meet every
+ * condition, with the values of the filtered fields. Each field's conditions
+ * select its rows through the extracted_values indexes; an extraction matches
+ * when it has a selected row for every field.
+ */
+export async function findExtractionsByValues(
+  userId: number,
+  query: ExtractedValueQuery
+): Promise<Page<ExtractionValueMatch>> {
+  const db = await getDb();
+  if (!db || query.conditions.length === 0) return { items: [], nextCursor: null };
+
+  const provider = query.provider ?? "final";
+  const byField = new Map<string, SQL[]>();
+  for (const condition of query.conditions) {
+    byField.set(condition.field, [...(byField.get(condition.field) ?? []), extractedValueMatches(condition)]);
+  }
+  const fields = Array.from(byField.keys());
+
+  const rows = await db.select(extractionSummaryColumns)
+    .from(extractedValues)
+    .innerJoin(extractions, eq(extractions.id, extractedValues.extractionId))
+    .where(and(
+      eq(extractedValues.provider, provider),
+      or(...fields.map(field => and(eq(extractedValues.fieldName, field), ...byField.get(field)!))),
+      eq(extractions.userId, userId),
+      query.cursor ? lt(extractions.id, query.cursor.id) : undefined
+    ))
+    .groupBy(extractions.id)
+    .having(sql`count(*) = ${fields.length}`)
+    .orderBy(desc(extractions.id))
+    .limit(query.limit + 1);
+  const page = toPage(rows, query.limit, row => row.id);
+  if (page.items.length === 0) return { items: [], nextCursor: null };
+
+  const values = await db.select().from(extractedValues)
+    .where(and(
+      inArray(extractedValues.extractionId, page.items.map(row => row.id)),
+      eq(extractedValues.provider, provider),
+      inArray(extractedValues.fieldName, fields)
+    ))
+    .orderBy(extractedValues.fieldName);
+  return {
+    items: page.items.map(row => ({ ...row, values: values.filter(value => value.extractionId === row.id) })),
+    nextCursor: page.nextCursor,
+  };
+}
+
+export type ExtractedFieldStats = {
+  /** Extractions with a (non-empty) value for the field */
+  count: number;
+  /** Of those, the ones whose value is numeric */
+  numericCount: number;
+  min: number | null;
+  max: number | null;
+  avg: number | null;
+  /** Most frequent normalized values */
+  topValues: { value: string; count: number }[];
+};
+
+/**
+ * Distribution of one field's values across the user's extractions
+ */
+export async function getExtractedFieldStats(
+  userId: number,
+  field: string,
+  provider: ExtractedValueProvider = "final",
+  topValueCount = 10
+): Promise<ExtractedFieldStats> {
+  const db = await getDb();
+  if (!db) return { count: 0, numericCount: 0, min: null, max: null, avg: null, topValues: [] };
+
+  const fieldValues = and(
+    eq(extractedValues.fieldName, field),
+    eq(extractedValues.provider, provider),
+    ne(extractedValues.valueType, "empty"),
+    eq(extractions.userId, userId)
+  );
+  const [summary] = await db.select({
+      count: sql<number>`count(*)`.mapWith(Number),
+      numericCount: sql<number>`count(${extractedValues.numberValue})`.mapWith(Number),
+      min: sql<number | null>`min(${extractedValues.numberValue})`.mapWith(Number),
+      max: sql<number | null>`max(${extractedValues.numberValue})`.mapWith(Number),
+      avg: sql<number | null>`avg(${extractedValues.numberValue})`.mapWith(Number),
+    })
+    .from(extractedValues)
+    .innerJoin(extractions, eq(extractions.id, extractedValues.extractionId))
+    .where(fieldValues);
+
+  const valueCount = sql<number>`count(*)`.mapWith(Number);
+  const topValues = await db.select({ value: extractedValues.textKey, count: valueCount })
+    .from(extractedValues)
+    .innerJoin(extractions, eq(extractions.id, extractedValues.extractionId))
+    .where(fieldValues)
+    .groupBy(extractedValues.textKey)
+    .orderBy(desc(valueCount), asc(extractedValues.textKey))
+    .limit(topValueCount);
+
+  return { ...summary, topValues: topValues.map(row => ({ value: row.value ?? "", count: row.count })) };
+}
+
+/**
+ * The fields that have values in the user's extractions, with how many extractions have each
+ */
+export async function listExtractedFields(
+  userId: number,
+  provider: ExtractedValueProvider = "final"
+): Promise<{ field: string; count: number }[]> {
+  const db = await getDb();
+  if (!db) return [];
+
+  return db.select({ field: extractedValues.fieldName, count: sql<number>`count(*)`.mapWith(Number) })
+    .from(extractedValues)
+    .innerJoin(extractions, eq(extractions.id, extractedValues.extractionId))
+    .where(and(
+      eq(extractedValues.provider, provider),
+      ne(extractedValues.valueType, "empty"),
+      eq(extractions.userId, userId)
+    ))
+    .groupBy(extractedValues.fieldName)
+    .orderBy(extractedValues.fieldName);
+}
+
+// ============ Extraction Cache Queries ============
+
+/**
+ * Get a cached extraction result by its content-addressed key
+ */
+export async function getExtractionCacheEntry(cacheKey: string): Promise<ExtractionCacheEntry | undefined> {
+  const db = await getDb();
+  if (!db) return undefined;
+
+  const [entry] = await db.select().from(extractionCache)
+    .where(eq(extractionCache.cacheKey, cacheKey))
+    .limit(1);
+  return entry;
+}
+
+/**
+ * Insert or refresh a cached extraction result
+ */
+export async function upsertExtractionCacheEntry(entry: InsertExtractionCacheEntry): Promise<void> {
+  const db = await getDb();
+  if (!db) return;
+
+  await db.insert(extractionCache).values(entry).onDuplicateKeyUpdate({
+    set: {
+      extractedData: entry.extractedData,
+      modelName: entry.modelName,
+      expiresAt: entry.expiresAt,
+      lastAccessedAt: new Date(),
+    },
+  });
+}
+
+/**
+ * Record a cache hit (bumps hit count and LRU timestamp)
+ */
+export async function touchExtractionCacheEntry(id: number): Promise<void> {
+  const db = await getDb();
+  if (!db) return;
+
+  await db.update(extractionCache)
+    .set({ hitCount: sql`${extractionCache.hitCount} + 1`, lastAccessedAt: new Date() })
+    .where(eq(extractionCache.id, id));
+}
+
+/**
+ * Evict expired entries, then the least recently used entries above maxEntries.
+ * Returns the number of evicted rows.
+ */
+export async function pruneExtractionCache(maxEntries: number): Promise<number> {
+  const db = await getDb();
+  if (!db) return 0;
+
+  const expired = await db.delete(extractionCache)
+    .where(lt(extractionCache.expiresAt, new Date()));
+  let evicted = expired[0].affectedRows;
+
+  const [{ count }] = await db.select({ count: sql<number>`count(*)` }).from(extractionCache);
+  const overflow = Number(count) - maxEntries;
+  if (overflow > 0) {
+    const lru = await db.delete(extractionCache)
+      .orderBy(asc(extractionCache.lastAccessedAt))
+      .limit(overflow);
+    evicted += lru[0].affectedRows;
+  }
+
+  return evicted;
+}
+
+// ============ Extraction Job Queries ============
+
+/**
+ * Queue an extraction job
+ */
+export async function createExtractionJob(job: InsertExtractionJob): Promise<ExtractionJob> {
+  return insertReturning(extractionJobs, job);
+}
+
+/**
+ * Get all jobs for an extraction session
+ */
+export async function getExtractionJobsByExtractionId(extractionId: number): Promise<ExtractionJob[]> {
+  const db = await getDb();
+  if (!db) return [];
+
+  return db.select().from(extractionJobs)
+    .where(eq(extractionJobs.extractionId, extractionId))
+    .orderBy(asc(extractionJobs.id));
+}
+
+/**
+ * Claim the oldest runnable job for a worker. SKIP LOCKED lets several
+ * workers (or processes) claim concurrently without handing out a job twice.
+ */
+export async function claimNextExtractionJob(workerId: string): Promise<ExtractionJob | undefined> {
+  const db = await getDb();
+  if (!db) return undefined;
+
+  return db.transaction(async (tx) => {
+    const [job] = await tx.select().from(extractionJobs)
+      .where(and(
+        eq(extractionJobs.status, "queued"),
+        lte(extractionJobs.runAfter, new Date())
+      ))
+      .orderBy(asc(extractionJobs.runAfter), asc(extractionJobs.id))
+      .limit(1)
+      .for("update", { skipLocked: true });
+    if (!job) return undefined;
+
+    const lockedAt = new Date();
+    await tx.update(extractionJobs)
+      .set({
+        status: "running",
+        attempts: sql`${extractionJobs.attempts} + 1`,
+        lockedBy: workerId,
+        lockedAt,
+      })
+      .where(eq(extractionJobs.id, job.id));
+
+    return { ...job, status: "running" as const, attempts: job.attempts + 1, lockedBy: workerId, lockedAt };
+  });
+}
+
+/**
+ * Extend a running job's lease. Returns false if the worker no longer holds it.
+ */
+export async function heartbeatExtractionJob(id: number, workerId: string): Promise<boolean> {
+  const db = await getDb();
+  if (!db) return false;
+
+  const result = await db.update(extractionJobs)
+    .set({ lockedAt: new Date() })
+    .where(and(
+      eq(extractionJobs.id, id),
+      eq(extractionJobs.status, "running"),
+      eq(extractionJobs.lockedBy, workerId)
+    ));
+  return result[0].affectedRows > 0;
+}
+
+/**
+ * Mark a job completed and release its lease
+ */
+export async function completeExtractionJob(id: number, workerId: string): Promise<boolean> {
+  const db = await getDb();
+  if (!db) return false;
+
+  const result = await db.update(extractionJobs)
+    .set({ status: "completed", lockedBy: null, lockedAt: null, lastError: null, completedAt: new Date() })
+    .where(and(eq(extractionJobs.id, id), eq(extractionJobs.lockedBy, workerId)));
   return result[0].affectedRows > 0;
 }
+
+/**
+ * Record a failed attempt: requeue the job after retryAt, or fail it for good when retryAt is null
+ */
+export async function failExtractionJob(
+  id: number,
+  workerId: string,
+  error: string,
+  retryAt: Date | null
+): Promise<boolean> {
+  const db = await getDb();
+  if (!db) return false;
+
+  const result = await db.update(extractionJobs)
+    .set(retryAt
+      ? { status: "queued", runAfter: retryAt, lockedBy: null, lockedAt: null, lastError: error }
+      : { status: "failed", lockedBy: null, lockedAt: null, lastError: error, completedAt: new Date() })
+    .where(and(eq(extractionJobs.id, id), eq(extractionJobs.lockedBy, workerId)));
+  return result[0].affectedRows > 0;
+}
+
+/**
+ * Requeue running jobs whose lease is older than the cutoff (crashed or restarted worker).
+ * Returns the number of requeued jobs.
+ */
+export async function requeueStaleExtractionJobs(lockedBefore: Date): Promise<number> {
+  const db = await getDb();
+  if (!db) return 0;
+
+  const result = await db.update(extractionJobs)
+    .set({ status: "queued", lockedBy: null, lockedAt: null, runAfter: new Date() })
+    .where(and(
+      eq(extractionJobs.status, "running"),
+      lt(extractionJobs.lockedAt, lockedBefore)
+    ));
+  return result[0].affectedRows;
+}
+
+// ============ Batch Run Queries ============
+
+/** Rows per INSERT when adding the items of a batch run */
+const BATCH_ITEM_INSERT_BATCH_SIZE = 500;
+
+/**
+ * Create a batch run with one pending item per document
+ */
+export async function createBatchRun(run: InsertBatchRun, documentIds: number[]): Promise<BatchRun> {
+  const db = await getDb();
+  if (!db) throw new Error("Database not available");
+
+  const created = await insertReturning(batchRuns, run);
+  const items = documentIds.map(documentId => ({ batchRunId: created.id, userId: created.userId, documentId }));
+  for (let i = 0; i < items.length; i += BATCH_ITEM_INSERT_BATCH_SIZE) {
+    await db.insert(batchRunItems).values(items.slice(i, i + BATCH_ITEM_INSERT_BATCH_SIZE));
+  }
+  return created;
+}
+
+export async function getBatchRunById(id: number, userId: number): Promise<BatchRun | undefined> {
+  const db = await getDb();
+  if (!db) return undefined;
+
+  const [run] = await db.select().from(batchRuns)
+    .where(and(eq(batchRuns.id, id), eq(batchRuns.userId, userId)));
+  return run;
+}
+
+/**
+ * The user's most recent batch runs
+ */
+export async function getBatchRunsByUser(userId: number, limit = 50): Promise<BatchRun[]> {
+  const db = await getDb();
+  if (!db) return [];
+
+  return db.select().from(batchRuns)
+    .where(eq(batchRuns.userId, userId))
+    .orderBy(desc(batchRuns.createdAt), desc(batchRuns.id))
+    .limit(limit);
+}
+
+/** Item count and timings of one status of a batch run */
+export type BatchItemStatusCount = {
+  batchRunId: number;
+  status: BatchRunItem["status"];
+  count: number;
+  firstStartedAt: Date | null;
+  lastCompletedAt: Date | null;
+  /** Average start-to-finish time of the items with both timestamps */
+  avgDurationMs: number | null;
+};
+
+/**
+ * Item counts and timings per status of several batch runs
+ */
+export async function getBatchItemStatusCounts(batchRunIds: number[]): Promise<BatchItemStatusCount[]> {
+  const db = await getDb();
+  if (!db || batchRunIds.length === 0) return [];
+
+  const rows = await db.select({
+      batchRunId: batchRunItems.batchRunId,
+      status: batchRunItems.status,
+      count: sql<number>`count(*)`.mapWith(Number),
+      // Decoded like the columns themselves
+      firstStartedAt: sql<Date | null>`min(${batchRunItems.startedAt})`.mapWith(batchRunItems.startedAt),
+      lastCompletedAt: sql<Date | null>`max(${batchRunItems.completedAt})`.mapWith(batchRunItems.completedAt),
+      avgDurationSeconds: sql<number | null>`avg(timestampdiff(second, ${batchRunItems.startedAt}, ${batchRunItems.completedAt}))`.mapWith(Number),
+    })
+    .from(batchRunItems)
+    .where(inArray(batchRunItems.batchRunId, batchRunIds))
+    .groupBy(batchRunItems.batchRunId, batchRunItems.status);
+  return rows.map(({ avgDurationSeconds, ...row }) => ({
+    ...row,
+    avgDurationMs: avgDurationSeconds === null ? null : avgDurationSeconds * 1000,
+  }));
+}
+
+export type BatchItemPageOptions = {
+  status?: BatchRunItem["status"][];
+  limit: number;
+  cursor?: PageCursor | null;
+};
+
+/**
+ * One page of a batch run's items in document order
+ */
+export async function listBatchRunItemsPage(batchRunId: number, options: BatchItemPageOptions): Promise<Page<BatchRunItem>> {
+  const db = await getDb();
+  if (!db) return { items: [], nextCursor: null };
+
+  const rows = await db.select().from(batchRunItems)
+    .where(and(
+      eq(batchRunItems.batchRunId, batchRunId),
+      options.status?.length ? inArray(batchRunItems.status, options.status) : undefined,
+      options.cursor ? gt(batchRunItems.id, options.cursor.id) : undefined
+    ))
+    .orderBy(asc(batchRunItems.id))
+    .limit(options.limit + 1);
+  return toPage(rows, options.limit, row => row.id);
+}
+
+/**
+ * Running batch items, overall and per user (for the concurrency limits)
+ */
+export async function countRunningBatchItems(): Promise<{ total: number; byUser: Map<number, number> }> {
+  const db = await getDb();
+  if (!db) return { total: 0, byUser: new Map() };
+
+  const rows = await db.select({ userId: batchRunItems.userId, count: sql<number>`count(*)`.mapWith(Number) })
+    .from(batchRunItems)
+    .where(eq(batchRunItems.status, "running"))
+    .groupBy(batchRunItems.userId);
+  return {
+    total: rows.reduce((sum, row) => sum + row.count, 0),
+    byUser: new Map(rows.map(row => [row.userId, row.count])),
+  };
+}
+
+/**
+ * Running batch runs that still have pending items, oldest first
+ */
+export async function getBatchRunsWithPendingItems(): Promise<BatchRun[]> {
+  const db = await getDb();
+  if (!db) return [];
+
+  return db.select().from(batchRuns)
+    .where(and(
+      eq(batchRuns.status, "running"),
+      exists(db.select({ id: batchRunItems.id }).from(batchRunItems).where(and(
+        eq(batchRunItems.batchRunId, batchRuns.id),
+        eq(batchRunItems.status, "pending")
+      )))
+    ))
+    .orderBy(asc(batchRuns.id));
+}
+
+/**
+ * Mark up to `limit` pending items of a run as running and return them. SKIP
+ * LOCKED keeps schedulers in several processes from starting an item twice.
+ */
+export async function claimPendingBatchItems(batchRunId: number, limit: number): Promise<BatchRunItem[]> {
+  const db = await getDb();
+  if (!db || limit <= 0) return [];
+
+  return db.transaction(async (tx) => {
+    const items = await tx.select().from(batchRunItems)
+      .where(and(eq(batchRunItems.batchRunId, batchRunId), eq(batchRunItems.status, "pending")))
+      .orderBy(asc(batchRunItems.id))
+      .limit(limit)
+      .for("update", { skipLocked: true });
+    if (items.length === 0) return [];
+
+    const startedAt = currentTimestamp();
+    await tx.update(batchRunItems)
+      .set({ status: "running", attempts: sql`${batchRunItems.attempts} + 1`, startedAt, completedAt: null, lastError: null })
+      .where(inArray(batchRunItems.id, items.map(item => item.id)));
+
+    return items.map(item => ({
+      ...item,
+      status: "running" as const,
+      attempts: item.attempts + 1,
+      startedAt,
+      completedAt: null,
+      lastError: null,
+    }));
+  });
+}
+
+/**
+ * Record the extraction session a started item runs in
+ */
+export async function setBatchItemExtraction(id: number, extractionId: number): Promise<void> {
+  const db = await getDb();
+  if (!db) return;
+
+  await db.update(batchRunItems).set({ extractionId }).where(eq(batchRunItems.id, id));
+}
+
+/**
+ * Fail an item that could not be started
+ */
+export async function failBatchItem(id: number, error: string): Promise<void> {
+  const db = await getDb();
+  if (!db) return;
+
+  await db.update(batchRunItems)
+    .set({ status: "failed", lastError: error, completedAt: currentTimestamp() })
+    .where(eq(batchRunItems.id, id));
+}
+
+/**
+ * Copy the final status of finished extractions onto their running batch items.
+ * Returns the ids of the runs with items that finished.
+ */
+export async function finishBatchItems(): Promise<number[]> {
+  const db = await getDb();
+  if (!db) return [];
+
+  const finished = await db.select({ id: batchRunItems.id, batchRunId: batchRunItems.batchRunId, status: extractions.status })
+    .from(batchRunItems)
+    .innerJoin(extractions, eq(extractions.id, batchRunItems.extractionId))
+    .where(and(
+      eq(batchRunItems.status, "running"),
+      inArray(extractions.status, ["completed", "failed", "cancelled"])
+    ));
+
+  const completedAt = currentTimestamp();
+  for (const status of ["completed", "failed", "cancelled"] as const) {
+    const ids = finished.filter(item => item.status === status).map(item => item.id);
+    if (ids.length === 0) continue;
+    await db.update(batchRunItems)
+      .set({ status, completedAt, lastError: status === "failed" ? "No agent completed the extraction" : null })
+      .where(and(inArray(batchRunItems.id, ids), eq(batchRunItems.status, "running")));
+  }
+  return Array.from(new Set(finished.map(item => item.batchRunId)));
+}
+
+/**
+ * Mark runs completed once none of their items is pending or running
+ */
+export async function completeFinishedBatchRuns(batchRunIds: number[]): Promise<number> {
+  const db = await getDb();
+  if (!db || batchRunIds.length === 0) return 0;
+
+  const result = await db.update(batchRuns)
+    .set({ status: "completed", completedAt: currentTimestamp() })
+    .where(and(
+      inArray(batchRuns.id, batchRunIds),
+      eq(batchRuns.status, "running"),
+      notExists(db.select({ id: batchRunItems.id }).from(batchRunItems).where(and(
+        eq(batchRunItems.batchRunId, batchRuns.id),
+        inArray(batchRunItems.status, ["pending", "running"])
+      )))
+    ));
+  return result[0].affectedRows;
+}
+
+/**
+ * Return items that were claimed but never got an extraction (the process
+ * starting them stopped) to pending. Returns the number of requeued items.
+ */
+export async function requeueStaleBatchItems(startedBefore: Date): Promise<number> {
+  const db = await getDb();
+  if (!db) return 0;
+
+  const result = await db.update(batchRunItems)
+    .set({ status: "pending", startedAt: null })
+    .where(and(
+      eq(batchRunItems.status, "running"),
+      isNull(batchRunItems.extractionId),
+      lt(batchRunItems.startedAt, startedBefore)
+    ));
+  return result[0].affectedRows;
+}
+
+/**
+ * Cancel a run: its pending items are cancelled, running ones finish.
+ * Returns false if the run doesn't exist for the user or already ended.
+ */
+export async function cancelBatchRun(id: number, userId: number): Promise<boolean> {
+  const db = await getDb();
+  if (!db) return false;
+
+  const completedAt = currentTimestamp();
+  const result = await db.update(batchRuns)
+    .set({ status: "cancelled", completedAt })
+    .where(and(eq(batchRuns.id, id), eq(batchRuns.userId, userId), eq(batchRuns.status, "running")));
+  if (result[0].affectedRows === 0) return false;
+
+  await db.update(batchRunItems)
+    .set({ status: "cancelled", completedAt })
+    .where(and(eq(batchRunItems.batchRunId, id), eq(batchRunItems.status, "pending")));
+  return true;
+}
+
+/**
+ * Queue the failed items of a run again, each in a new extraction session, and
+ * reopen the run. Returns the number of requeued items (0 if the run isn't the user's).
+ */
+export async function retryFailedBatchItems(id: number, userId: number): Promise<number> {
+  const db = await getDb();
+  if (!db) return 0;
+
+  const run = await getBatchRunById(id, userId);
+  if (!run) return 0;
+
+  const result = await db.update(batchRunItems)
+    .set({ status: "pending", extractionId: null, startedAt: null, completedAt: null })
+    .where(and(eq(batchRunItems.batchRunId, id), eq(batchRunItems.status, "failed")));
+  const requeued = result[0].affectedRows;
+  if (requeued > 0) {
+    await db.update(batchRuns).set({ status: "running", completedAt: null }).where(eq(batchRuns.id, id));
+  }
+  return requeued;
+}
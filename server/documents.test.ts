@@ -1,6 +1,7 @@
 import { describe, expect, it, vi, beforeEach } from "vitest";
 import { appRouter } from "./routers";
 import type { TrpcContext } from "./_core/context";
+import { getTemplateById, listDocumentsPage, patchExtractionFields, updateExtractionRecord, updateTemplate } from "./db";
 
 // Mock storage
 vi.mock("./storage", () => ({
@@ -38,18 +39,21 @@ vi.mock("./db", () => ({
       updatedAt: new Date(),
     },
   ]),
-  getDocumentById: vi.fn().mockResolvedValue({
-    id: 1,
-    userId: 1,
-    filename: "test.pdf",
-    s3Url: "https://storage.example.com/documents/1/test.pdf",
-    fileKey: "documents/1/test.pdf",
-    fileSize: 1024,
-    mimeType: "application/pdf",
-    pageCount: null,
-    createdAt: new Date(),
-    updatedAt: new Date(),
-  }),
+  listDocumentsPage: vi.fn().mockResolvedValue({ items: [], nextCursor: null }),
+  getDocumentsByIds: vi.fn().mockResolvedValue([
+    {
+      id: 1,
+      userId: 1,
+      filename: "test.pdf",
+      s3Url: "https://storage.example.com/documents/1/test.pdf",
+      fileKey: "documents/1/test.pdf",
+      fileSize: 1024,
+      mimeType: "application/pdf",
+      pageCount: null,
+      createdAt: new Date(),
+      updatedAt: new Date(),
+    },
+  ]),
   deleteDocument: vi.fn().mockResolvedValue(true),
   createExtraction: vi.fn().mockResolvedValue({
     id: 1,
@@ -74,17 +78,24 @@ vi.mock("./db", () => ({
     createdAt: new Date(),
     updatedAt: new Date(),
   }),
-  updateExtraction: vi.fn().mockResolvedValue({
-    id: 1,
-    documentId: 1,
-    userId: 1,
-    schema: { fields: [] },
-    extractedData: { test: { value: "test" } },
-    summary: null,
-    status: "completed",
-    createdAt: new Date(),
-    updatedAt: new Date(),
-  }),
+  getExtractionsByIds: vi.fn().mockResolvedValue([
+    {
+      id: 1,
+      documentId: 1,
+      userId: 1,
+      schema: { fields: [] },
+      extractedData: null,
+      summary: null,
+      status: "pending",
+      createdAt: new Date(),
+      updatedAt: new Date(),
+    },
+  ]),
+  getAgentExtractionsByExtractionIds: vi.fn().mockResolvedValue([]),
+  getExtractionJobsByExtractionId: vi.fn().mockResolvedValue([]),
+  updateExtraction: vi.fn().mockResolvedValue(true),
+  updateExtractionRecord: vi.fn(async (extraction, data) => ({ ...extraction, ...data, updatedAt: new Date() })),
+  patchExtractionFields: vi.fn(),
   deleteExtraction: vi.fn().mockResolvedValue(true),
   upsertUser: vi.fn(),
   getUserByOpenId: vi.fn(),
@@ -196,6 +207,37 @@ describe("documents router", () => {
     expect(result.filename).toBe("test.pdf");
   });
 
+  it("lists a page of documents with server-side filters", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+    const cursor = Buffer.from(JSON.stringify(["paper.pdf", 12])).toString("base64url");
+
+    await caller.documents.listPage({ cursor, sort: "filename", direction: "asc", search: "  trial " });
+
+    expect(listDocumentsPage).toHaveBeenCalledWith(1, expect.objectContaining({
+      limit: 30,
+      sort: "filename",
+      direction: "asc",
+      search: "trial",
+      cursor: { value: "paper.pdf", id: 12 },
+    }));
+  });
+
+  it("rejects an invalid page cursor", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+
+    await expect(caller.documents.listPage({ cursor: "garbage" })).rejects.toThrow("Invalid page cursor");
+  });
+
+  it("hides documents owned by another user", async () => {
+    const ctx = createAuthContext();
+    ctx.user!.id = 2;
+    const caller = appRouter.createCaller(ctx);
+
+    await expect(caller.documents.get({ id: 1 })).rejects.toThrow("Document not found");
+  });
+
   it("uploads a document", async () => {
     const ctx = createAuthContext();
     const caller = appRouter.createCaller(ctx);
@@ -273,6 +315,76 @@ describe("extractions router", () => {
     });
 
     expect(result.status).toBe("completed");
+    expect(result.extractedData).toEqual({ study_id: { value: "NCT12345678" } });
+    expect(updateExtractionRecord).toHaveBeenCalledWith(
+      expect.objectContaining({ id: 1, userId: 1 }),
+      expect.objectContaining({ status: "completed" })
+    );
+  });
+
+  it("returns NOT_FOUND when updating a missing extraction", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+
+    await expect(caller.extractions.update({ id: 99, status: "completed" })).rejects.toThrow("Extraction not found");
+    expect(updateExtractionRecord).not.toHaveBeenCalled();
+  });
+
+  it("patches single fields and returns only those", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+    const updatedAt = new Date();
+    vi.mocked(patchExtractionFields).mockResolvedValueOnce({
+      status: "patched",
+      version: 4,
+      updatedAt,
+      fields: { total_n: { value: 240 }, notes: null },
+    });
+
+    const result = await caller.extractions.patchFields({
+      id: 1,
+      expectedVersion: 3,
+      set: { total_n: { value: 240 } },
+      remove: ["notes"],
+    });
+
+    expect(result).toEqual({ version: 4, updatedAt, fields: { total_n: { value: 240 }, notes: null } });
+    expect(patchExtractionFields).toHaveBeenCalledWith(1, 1, { set: { total_n: { value: 240 } }, remove: ["notes"] }, 3);
+  });
+
+  it("rejects a patch made against an outdated version", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+    vi.mocked(patchExtractionFields).mockResolvedValueOnce({ status: "conflict", version: 5 });
+
+    await expect(
+      caller.extractions.patchFields({ id: 1, expectedVersion: 3, set: { total_n: { value: 240 } } })
+    ).rejects.toMatchObject({ code: "CONFLICT" });
+  });
+
+  it("rejects field names that cannot be used in a JSON path", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+
+    await expect(caller.extractions.patchFields({ id: 1, remove: ['bad"name'] })).rejects.toThrow();
+    expect(patchExtractionFields).not.toHaveBeenCalled();
+  });
+
+  it("rejects an empty patch without writing", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+
+    await expect(caller.extractions.patchFields({ id: 1, set: {}, remove: [] })).rejects.toMatchObject({ code: "BAD_REQUEST" });
+    expect(patchExtractionFields).not.toHaveBeenCalled();
+  });
+
+  it("does not report an extraction without jobs as done", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+
+    const status = await caller.agents.jobStatus({ extractionId: 1 });
+
+    expect(status).toMatchObject({ done: false, jobs: [] });
   });
 
   it("gets default schema", async () => {
@@ -360,6 +472,18 @@ describe("templates router", () => {
   it("updates a template", async () => {
     const ctx = createAuthContext();
     const caller = appRouter.createCaller(ctx);
+    vi.mocked(getTemplateById).mockResolvedValueOnce({
+      id: 2,
+      userId: 1,
+      name: "My Custom Template",
+      description: "Custom extraction template",
+      studyType: "cohort",
+      schema: { fields: [{ name: "sample_size", label: "Sample Size", type: "number" }] },
+      isBuiltIn: false,
+      isPublic: false,
+      createdAt: new Date(),
+      updatedAt: new Date(),
+    });
 
     const result = await caller.templates.update({
       id: 2,
@@ -370,6 +494,14 @@ describe("templates router", () => {
     expect(result.name).toBe("Updated Template");
   });
 
+  it("does not update a built-in template", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+
+    await expect(caller.templates.update({ id: 1, name: "Renamed" })).rejects.toThrow("Template not found");
+    expect(updateTemplate).not.toHaveBeenCalled();
+  });
+
   it("deletes a template", async () => {
     const ctx = createAuthContext();
     const caller = appRouter.createCaller(ctx);
@@ -391,3 +523,18 @@ describe("templates router", () => {
     expect(result[0]).toHaveProperty("label");
   });
 });
+
+describe("batches router", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it("rejects documents whose text has not been parsed", async () => {
+    const ctx = createAuthContext();
+    const caller = appRouter.createCaller(ctx);
+
+    await expect(
+      caller.batches.create({ documentIds: [1], schema: { fields: [] } })
+    ).rejects.toThrow("Documents have no parsed text: 1");
+  });
+});
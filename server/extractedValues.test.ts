@@ -0,0 +1,71 @@
+import { describe, expect, it } from "vitest";
+import { flattenExtractedData, flattenExtractedField, parseNumericText } from "./extractedValues";
+
+describe("parseNumericText", () => {
+  it("reads plain, grouped and percent numbers", () => {
+    expect(parseNumericText("120")).toBe(120);
+    expect(parseNumericText(" 1,200 ")).toBe(1200);
+    expect(parseNumericText("45.5%")).toBe(45.5);
+    expect(parseNumericText("-0.3")).toBe(-0.3);
+  });
+
+  it("rejects text that only contains a number", () => {
+    expect(parseNumericText("120 participants")).toBeNull();
+    expect(parseNumericText("12,00")).toBeNull();
+    expect(parseNumericText("%")).toBeNull();
+    expect(parseNumericText("")).toBeNull();
+  });
+});
+
+describe("flattenExtractedField", () => {
+  it("types numbers, booleans and text", () => {
+    expect(flattenExtractedField("total_n", { value: 120, confidence: "high" })).toMatchObject({
+      fieldName: "total_n", valueType: "number", numberValue: 120, textKey: "120", confidence: "high",
+    });
+    expect(flattenExtractedField("blinded", { value: true })).toMatchObject({
+      valueType: "boolean", booleanValue: true, numberValue: null,
+    });
+    expect(flattenExtractedField("design", { value: "  Randomized   Trial " })).toMatchObject({
+      valueType: "text", textValue: "  Randomized   Trial ", textKey: "randomized trial", numberValue: null,
+    });
+  });
+
+  it("reads numbers and booleans written as text", () => {
+    expect(flattenExtractedField("total_n", { value: "1,200" })).toMatchObject({ valueType: "text", numberValue: 1200 });
+    expect(flattenExtractedField("blinded", { value: "Yes" })).toMatchObject({ valueType: "text", booleanValue: true });
+    expect(flattenExtractedField("design", { value: "constructor" }).booleanValue).toBeNull();
+  });
+
+  it("stores blank values as empty", () => {
+    expect(flattenExtractedField("design", { value: "  " })).toMatchObject({
+      valueType: "empty", textValue: null, textKey: null,
+    });
+  });
+
+  it("keeps the page of the source location", () => {
+    expect(flattenExtractedField("total_n", { value: 120, source_location: { page: 4 } }).page).toBe(4);
+    expect(flattenExtractedField("total_n", { value: 120 }).page).toBeNull();
+  });
+
+  it("truncates long text keys to the column length", () => {
+    const row = flattenExtractedField("notes", { value: "x".repeat(500) });
+    expect(row.textKey).toHaveLength(191);
+    expect(row.textValue).toHaveLength(500);
+  });
+});
+
+describe("flattenExtractedData", () => {
+  it("returns one row per field and skips names that do not fit", () => {
+    const rows = flattenExtractedData({
+      total_n: { value: 120 },
+      design: { value: "RCT" },
+      ["f".repeat(129)]: { value: "too long" },
+    });
+    expect(rows.map(row => row.fieldName)).toEqual(["total_n", "design"]);
+  });
+
+  it("returns nothing for missing data", () => {
+    expect(flattenExtractedData(null)).toEqual([]);
+    expect(flattenExtractedData(undefined)).toEqual([]);
+  });
+});
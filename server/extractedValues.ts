@@ -0,0 +1,78 @@
+import type { ExtractedData, ExtractedFieldData, InsertExtractedValue } from "../drizzle/schema";
+import { consensusKey } from "./consensus";
+
+/** Length of the fieldName and textKey columns */
+const FIELD_NAME_LENGTH = 128;
+const TEXT_KEY_LENGTH = 191;
+
+/** Plain numbers, optionally with thousands separators and a trailing percent sign */
+const NUMERIC_TEXT = /^[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)?(?:\.\d+)?(?:e[-+]?\d+)?%?$/i;
+
+const BOOLEAN_TEXT = new Map([["true", true], ["yes", true], ["false", false], ["no", false]]);
+
+/** Normalized value as stored in the textKey column (see consensusKey) */
+export function textKeyOf(value: unknown): string {
+  return consensusKey(value).slice(0, TEXT_KEY_LENGTH);
+}
+
+/** Number written in a text value, or null */
+export function parseNumericText(text: string): number | null {
+  const compact = text.trim();
+  if (!/\d/.test(compact) || !NUMERIC_TEXT.test(compact)) return null;
+  const value = Number(compact.replace(/[,%]/g, ""));
+  return Number.isFinite(value) ? value : null;
+}
+
+export type FlatExtractedValue = Omit<InsertExtractedValue, "id" | "extractionId" | "provider" | "createdAt">;
+
+/** One field as an extracted_values row (without the extraction and provider) */
+export function flattenExtractedField(fieldName: string, field: ExtractedFieldData): FlatExtractedValue {
+  const value = field.value;
+  const page = field.location?.page ?? field.source_location?.page ?? null;
+  const base = {
+    fieldName,
+    confidence: field.confidence ?? null,
+    page: Number.isInteger(page) ? page : null,
+  };
+
+  if (typeof value === "number") {
+    return {
+      ...base,
+      valueType: "number",
+      textValue: String(value),
+      textKey: textKeyOf(value),
+      numberValue: Number.isFinite(value) ? value : null,
+      booleanValue: null,
+    };
+  }
+  if (typeof value === "boolean") {
+    return { ...base, valueType: "boolean", textValue: String(value), textKey: String(value), numberValue: null, booleanValue: value };
+  }
+
+  const text = value === undefined || value === null ? "" : String(value);
+  const textKey = textKeyOf(text);
+  if (textKey === "") {
+    return { ...base, valueType: "empty", textValue: null, textKey: null, numberValue: null, booleanValue: null };
+  }
+  return {
+    ...base,
+    valueType: "text",
+    textValue: text,
+    textKey,
+    numberValue: parseNumericText(text),
+    booleanValue: BOOLEAN_TEXT.get(textKey) ?? null,
+  };
+}
+
+/**
+ * Flatten extracted data into extracted_values rows. Fields whose name does not
+ * fit the fieldName column are left out (they stay in the JSON).
+ */
+export function flattenExtractedData(extractedData: ExtractedData | null | undefined): FlatExtractedValue[] {
+  const rows: FlatExtractedValue[] = [];
+  for (const [fieldName, field] of Object.entries(extractedData ?? {})) {
+    if (!field || fieldName.length > FIELD_NAME_LENGTH) continue;
+    rows.push(flattenExtractedField(fieldName, field));
+  }
+  return rows;
+}
@@ -0,0 +1,112 @@
+import { describe, expect, it, vi, beforeEach } from "vitest";
+import type { ExtractionCacheEntry, ExtractionSchema } from "../drizzle/schema";
+import { buildExtractionCacheKey, withExtractionCache } from "./extractionCache";
+import { getExtractionCacheEntry, upsertExtractionCacheEntry, touchExtractionCacheEntry } from "./db";
+
+// In-memory stand-in for the extraction_cache table
+const entries = vi.hoisted(() => new Map<string, ExtractionCacheEntry>());
+
+vi.mock("./db", () => ({
+  getExtractionCacheEntry: vi.fn(async (cacheKey: string) => entries.get(cacheKey)),
+  upsertExtractionCacheEntry: vi.fn(async (entry: any) => {
+    entries.set(entry.cacheKey, {
+      id: entries.size + 1,
+      hitCount: 0,
+      lastAccessedAt: new Date(),
+      createdAt: new Date(),
+      ...entry,
+    });
+  }),
+  touchExtractionCacheEntry: vi.fn().mockResolvedValue(undefined),
+  pruneExtractionCache: vi.fn().mockResolvedValue(0),
+}));
+
+const schema: ExtractionSchema = {
+  fields: [
+    { name: "total_n", label: "Total N", type: "integer", description: "Total sample size" },
+  ],
+};
+
+const keyInput = {
+  documentText: "--- Page 1 ---\nA randomized trial of 120 patients.",
+  schema,
+  provider: "gemini" as const,
+  modelName: "gemini-1.5-flash",
+  variant: "agent",
+};
+
+const result = { total_n: { value: 120, confidence: "high" as const } };
+
+describe("extraction cache", () => {
+  beforeEach(() => {
+    entries.clear();
+    vi.clearAllMocks();
+  });
+
+  it("ignores whitespace differences in the document text", () => {
+    const a = buildExtractionCacheKey(keyInput);
+    const b = buildExtractionCacheKey({
+      ...keyInput,
+      documentText: "  --- Page 1 ---   A randomized\ttrial of 120 patients.\n",
+    });
+
+    expect(a.cacheKey).toBe(b.cacheKey);
+  });
+
+  it("uses different keys for different schemas and models", () => {
+    const base = buildExtractionCacheKey(keyInput).cacheKey;
+    const otherSchema = buildExtractionCacheKey({
+      ...keyInput,
+      schema: { fields: [...schema.fields, { name: "doi", label: "DOI", type: "text" }] },
+    }).cacheKey;
+    const otherModel = buildExtractionCacheKey({ ...keyInput, modelName: "gemini-2.5-flash" }).cacheKey;
+
+    expect(otherSchema).not.toBe(base);
+    expect(otherModel).not.toBe(base);
+  });
+
+  it("runs the extraction on a miss and serves the stored result on a hit", async () => {
+    const run = vi.fn().mockResolvedValue(result);
+
+    const first = await withExtractionCache(keyInput, run);
+    const second = await withExtractionCache(keyInput, run);
+
+    expect(first).toEqual({ extractedData: result, cacheHit: false });
+    expect(second).toEqual({ extractedData: result, cacheHit: true });
+    expect(run).toHaveBeenCalledTimes(1);
+    expect(touchExtractionCacheEntry).toHaveBeenCalledTimes(1);
+  });
+
+  it("skips the lookup but refreshes the entry when bypassed", async () => {
+    const run = vi.fn().mockResolvedValue(result);
+
+    await withExtractionCache(keyInput, run);
+    const bypassed = await withExtractionCache(keyInput, run, { bypass: true });
+
+    expect(bypassed.cacheHit).toBe(false);
+    expect(run).toHaveBeenCalledTimes(2);
+    expect(upsertExtractionCacheEntry).toHaveBeenCalledTimes(2);
+  });
+
+  it("treats expired entries as misses", async () => {
+    const run = vi.fn().mockResolvedValue(result);
+    await withExtractionCache(keyInput, run);
+
+    const { cacheKey } = buildExtractionCacheKey(keyInput);
+    entries.get(cacheKey)!.expiresAt = new Date(Date.now() - 1000);
+
+    const again = await withExtractionCache(keyInput, run);
+
+    expect(again.cacheHit).toBe(false);
+    expect(run).toHaveBeenCalledTimes(2);
+  });
+
+  it("still extracts when the cache lookup fails", async () => {
+    vi.mocked(getExtractionCacheEntry).mockRejectedValueOnce(new Error("Database not available"));
+    const run = vi.fn().mockResolvedValue(result);
+
+    const outcome = await withExtractionCache(keyInput, run);
+
+    expect(outcome).toEqual({ extractedData: result, cacheHit: false });
+  });
+});
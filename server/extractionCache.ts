@@ -0,0 +1,130 @@
+import { createHash } from "crypto";
+import type { AIProvider, ExtractedData, ExtractionSchema } from "../drizzle/schema";
+import {
+  getExtractionCacheEntry, upsertExtractionCacheEntry, touchExtractionCacheEntry, pruneExtractionCache
+} from "./db";
+import { ENV } from "./_core/env";
+
+/** Run LRU/TTL eviction after this many cache writes */
+const PRUNE_EVERY_WRITES = 50;
+
+let writesSinceLastPrune = 0;
+
+export type ExtractionCacheKeyInput = {
+  documentText: string;
+  schema: ExtractionSchema;
+  provider: AIProvider;
+  modelName: string;
+  /** Prompt family producing the result, so different prompts never share entries */
+  variant: string;
+};
+
+export type CachedExtractionResult = {
+  extractedData: ExtractedData;
+  cacheHit: boolean;
+};
+
+const sha256 = (value: string) => createHash("sha256").update(value).digest("hex");
+
+/**
+ * Normalize document text so that whitespace and unicode-form differences
+ * between PDF text passes do not produce different cache keys
+ */
+export function normalizeDocumentText(text: string): string {
+  return text.normalize("NFKC").replace(/\s+/g, " ").trim();
+}
+
+export function hashDocumentText(text: string): string {
+  return sha256(normalizeDocumentText(text));
+}
+
+/**
+ * Hash the parts of a schema that influence the prompt, independent of key order
+ */
+export function hashSchema(schema: ExtractionSchema): string {
+  const canonical = {
+    useClinicalMasterSchema: schema.useClinicalMasterSchema ?? false,
+    fields: schema.fields.map(f => ({
+      name: f.name,
+      label: f.label,
+      type: f.type,
+      description: f.description ?? null,
+      required: f.required ?? false,
+    })),
+  };
+  return sha256(JSON.stringify(canonical));
+}
+
+export function buildExtractionCacheKey(input: ExtractionCacheKeyInput) {
+  const documentHash = hashDocumentText(input.documentText);
+  const schemaHash = hashSchema(input.schema);
+  const cacheKey = sha256([documentHash, schemaHash, input.provider, input.modelName, input.variant].join(":"));
+  return { cacheKey, documentHash, schemaHash };
+}
+
+/**
+ * Look up a live cached result; lookup failures count as misses
+ */
+export async function readExtractionCache(input: ExtractionCacheKeyInput): Promise<ExtractedData | null> {
+  const { cacheKey } = buildExtractionCacheKey(input);
+  try {
+    const entry = await getExtractionCacheEntry(cacheKey);
+    if (entry && entry.expiresAt.getTime() > Date.now()) {
+      touchExtractionCacheEntry(entry.id).catch(error =>
+        console.warn("[ExtractionCache] Failed to record hit:", error)
+      );
+      return entry.extractedData;
+    }
+  } catch (error) {
+    console.warn("[ExtractionCache] Lookup failed, running extraction:", error);
+  }
+  return null;
+}
+
+/**
+ * Store (or refresh) a result, evicting old entries every PRUNE_EVERY_WRITES writes
+ */
+export async function writeExtractionCache(input: ExtractionCacheKeyInput, extractedData: ExtractedData): Promise<void> {
+  const { cacheKey, documentHash, schemaHash } = buildExtractionCacheKey(input);
+  try {
+    await upsertExtractionCacheEntry({
+      cacheKey,
+      provider: input.provider,
+      modelName: input.modelName,
+      documentHash,
+      schemaHash,
+      extractedData,
+      expiresAt: new Date(Date.now() + ENV.extractionCacheTtlMs),
+    });
+
+    writesSinceLastPrune++;
+    if (writesSinceLastPrune >= PRUNE_EVERY_WRITES) {
+      writesSinceLastPrune = 0;
+      pruneExtractionCache(ENV.extractionCacheMaxEntries).catch(error =>
+        console.warn("[ExtractionCache] Eviction failed:", error)
+      );
+    }
+  } catch (error) {
+    console.warn("[ExtractionCache] Failed to store result:", error);
+  }
+}
+
+/**
+ * Return a cached extraction for the same document/schema/model, or run the
+ * extraction and store its result. With `bypass` the lookup is skipped but
+ * the fresh result still replaces the stored entry.
+ */
+export async function withExtractionCache(
+  input: ExtractionCacheKeyInput,
+  run: () => Promise<ExtractedData>,
+  options: { bypass?: boolean } = {}
+): Promise<CachedExtractionResult> {
+  if (!options.bypass) {
+    const cached = await readExtractionCache(input);
+    if (cached) return { extractedData: cached, cacheHit: true };
+  }
+
+  const extractedData = await run();
+  await writeExtractionCache(input, extractedData);
+  return { extractedData, cacheHit: false };
+}
@@ -0,0 +1,151 @@
+import { describe, expect, it, vi, beforeEach, afterAll } from "vitest";
+import express from "express";
+import { createServer, type Server } from "http";
+import type { AddressInfo } from "net";
+import { escapeDelimited, flattenExportFields } from "@shared/extractionExport";
+import type { AgentExtraction } from "../drizzle/schema";
+import { getAgentExtractionsByExtractionIds, getExtractionExportBatch, type ExtractionExportRow } from "./db";
+import { libraryExportChunks, registerExportRoutes } from "./extractionExport";
+import { sdk } from "./_core/sdk";
+
+vi.mock("./db", () => ({
+  getExtractionExportBatch: vi.fn(),
+  getAgentExtractionsByExtractionIds: vi.fn().mockResolvedValue([]),
+}));
+
+vi.mock("./_core/sdk", () => ({
+  sdk: { authenticateRequest: vi.fn() },
+}));
+
+const makeRow = (id: number, overrides: Partial<ExtractionExportRow> = {}): ExtractionExportRow => ({
+  id,
+  documentId: id * 10,
+  status: "completed",
+  extractedData: { total_n: { value: 120, confidence: "high", source_location: { page: 3, section: "Methods" } } },
+  createdAt: new Date(Date.UTC(2026, 4, id)),
+  filename: `study-${id}.pdf`,
+  ...overrides,
+});
+
+const collect = async (chunks: AsyncGenerator<string>) => {
+  let text = "";
+  for await (const chunk of chunks) text += chunk;
+  return text;
+};
+
+const options = { format: "csv" as const, includeAgents: false, includeConfidence: true, includeSourceLocation: true };
+
+describe("export rows", () => {
+  it("flattens nested clinical data into dotted paths", () => {
+    const fields = flattenExportFields({
+      studyId: { citation: { content: "Smith 2020" } },
+      studyArms: [{ label: { content: "Control" } }],
+    });
+    expect(Object.keys(fields)).toEqual(["studyId.citation", "studyArms[0].label"]);
+  });
+
+  it("quotes cells with separators, quotes and line breaks", () => {
+    expect(escapeDelimited("a,b", ",")).toBe('"a,b"');
+    expect(escapeDelimited('say "hi"', "\t")).toBe('"say ""hi"""');
+    expect(escapeDelimited("line\r\nbreak", ",")).toBe('"line\r\nbreak"');
+    expect(escapeDelimited("a,b", "\t")).toBe("a,b");
+  });
+});
+
+describe("libraryExportChunks", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it("writes a header and one row per extraction and field", async () => {
+    vi.mocked(getExtractionExportBatch).mockResolvedValueOnce([makeRow(1), makeRow(2, { filename: "a, b.pdf" })]);
+
+    const text = await collect(libraryExportChunks(1, options));
+
+    expect(text.split("\n")).toEqual([
+      "Extraction ID,Document ID,Document,Status,Source,Field,Value,Confidence,Page,Section,Exact Text",
+      "1,10,study-1.pdf,completed,final,total_n,120,high,3,Methods,",
+      '2,20,"a, b.pdf",completed,final,total_n,120,high,3,Methods,',
+      "",
+    ]);
+    expect(getAgentExtractionsByExtractionIds).not.toHaveBeenCalled();
+  });
+
+  it("reads the library in batches after the last row", async () => {
+    vi.mocked(getExtractionExportBatch)
+      .mockResolvedValueOnce([makeRow(1), makeRow(2)])
+      .mockResolvedValueOnce([makeRow(3)]);
+
+    const chunks: string[] = [];
+    for await (const chunk of libraryExportChunks(1, options, 2)) chunks.push(chunk);
+
+    expect(chunks).toHaveLength(3);
+    expect(vi.mocked(getExtractionExportBatch).mock.calls).toEqual([
+      [1, null, 2],
+      [1, { value: Date.UTC(2026, 4, 2), id: 2 }, 2],
+    ]);
+  });
+
+  it("adds agent results to NDJSON lines", async () => {
+    vi.mocked(getExtractionExportBatch).mockResolvedValueOnce([makeRow(1)]);
+    vi.mocked(getAgentExtractionsByExtractionIds).mockResolvedValueOnce([
+      { extractionId: 1, provider: "gemini", extractedData: { total_n: { value: 118 } } } as AgentExtraction,
+      { extractionId: 1, provider: "claude", extractedData: null } as AgentExtraction,
+    ]);
+
+    const text = await collect(libraryExportChunks(1, { ...options, format: "ndjson", includeAgents: true }));
+    const lines = text.trim().split("\n").map(line => JSON.parse(line));
+
+    expect(lines).toHaveLength(1);
+    expect(lines[0]).toMatchObject({
+      extractionId: 1,
+      document: "study-1.pdf",
+      data: { total_n: { value: 120 } },
+      agents: { gemini: { total_n: { value: 118 } } },
+    });
+  });
+});
+
+describe("GET /api/export/extractions", () => {
+  let server: Server;
+  let origin: string;
+
+  afterAll(async () => {
+    await new Promise(resolve => server.close(resolve));
+  });
+
+  beforeEach(async () => {
+    vi.clearAllMocks();
+    if (server) return;
+    const app = express();
+    registerExportRoutes(app);
+    server = createServer(app);
+    await new Promise<void>(resolve => server.listen(0, "127.0.0.1", resolve));
+    origin = `http://127.0.0.1:${(server.address() as AddressInfo).port}`;
+  });
+
+  it("rejects requests without a session", async () => {
+    vi.mocked(sdk.authenticateRequest).mockRejectedValueOnce(new Error("Invalid session cookie"));
+
+    const response = await fetch(`${origin}/api/export/extractions`);
+
+    expect(response.status).toBe(401);
+  });
+
+  it("streams a gzipped TSV download", async () => {
+    vi.mocked(sdk.authenticateRequest).mockResolvedValueOnce({ id: 1 } as Awaited<ReturnType<typeof sdk.authenticateRequest>>);
+    vi.mocked(getExtractionExportBatch).mockResolvedValueOnce([makeRow(1)]);
+
+    const response = await fetch(`${origin}/api/export/extractions?format=tsv&source=false`, {
+      headers: { "accept-encoding": "gzip" },
+    });
+
+    expect(response.status).toBe(200);
+    expect(response.headers.get("content-encoding")).toBe("gzip");
+    expect(response.headers.get("content-disposition")).toMatch(/attachment; filename="extractions-.*\.tsv"/);
+    expect(await response.text()).toBe(
+      "Extraction ID\tDocument ID\tDocument\tStatus\tSource\tField\tValue\tConfidence\n" +
+      "1\t10\tstudy-1.pdf\tcompleted\tfinal\ttotal_n\t120\thigh\n"
+    );
+  });
+});
@@ -0,0 +1,196 @@
+import type { Express, Request, Response } from "express";
+import { Readable } from "stream";
+import { pipeline } from "stream/promises";
+import { createGzip } from "zlib";
+import { z } from "zod";
+import { UNAUTHED_ERR_MSG } from "@shared/const";
+import { RecordBatchStreamWriter, type RecordBatch } from "apache-arrow";
+import {
+  LIBRARY_EXPORT_FORMATS, delimitedLine, libraryExportHeader, libraryExportRows, separatorOf,
+  type LibraryExportColumns, type LibraryExportFormat, type LibraryExportSource, type TextExportFormat
+} from "@shared/extractionExport";
+import type { AgentExtraction, User } from "../drizzle/schema";
+import { getAgentExtractionsByExtractionIds, getExtractionExportBatch, type ExtractionExportRow } from "./db";
+import { arrowExportSchema, toArrowRecordBatch } from "./arrowExport";
+import type { PageCursor } from "./pagination";
+import { sdk } from "./_core/sdk";
+
+/** Extractions read per query; bounds the memory an export holds at once */
+export const EXPORT_BATCH_SIZE = 100;
+
+export type LibraryExportOptions = LibraryExportColumns & {
+  format: LibraryExportFormat;
+  /** Add the rows (or NDJSON data) of each agent's result */
+  includeAgents: boolean;
+};
+
+const CONTENT_TYPES: Record<LibraryExportFormat, string> = {
+  csv: "text/csv; charset=utf-8",
+  tsv: "text/tab-separated-values; charset=utf-8",
+  ndjson: "application/x-ndjson; charset=utf-8",
+  arrow: "application/vnd.apache.arrow.stream",
+};
+
+/** Arrow IPC streams use the .arrows extension */
+const FILE_EXTENSIONS: Record<LibraryExportFormat, string> = { csv: "csv", tsv: "tsv", ndjson: "ndjson", arrow: "arrows" };
+
+/** One batch of a library export: extractions with their agents' results (when asked for) */
+export type LibraryExportBatch = {
+  rows: ExtractionExportRow[];
+  agents: Map<number, AgentExtraction[]>;
+};
+
+/**
+ * Walk the user's extractions (oldest first) in batches, with the agent
+ * results that have data when `includeAgents` is set
+ */
+export async function* libraryExportBatches(
+  userId: number,
+  includeAgents: boolean,
+  batchSize = EXPORT_BATCH_SIZE
+): AsyncGenerator<LibraryExportBatch> {
+  let cursor: PageCursor | null = null;
+  for (;;) {
+    const rows = await getExtractionExportBatch(userId, cursor, batchSize);
+    if (rows.length === 0) return;
+
+    const agents = new Map<number, AgentExtraction[]>();
+    if (includeAgents) {
+      for (const agent of await getAgentExtractionsByExtractionIds(rows.map(row => row.id))) {
+        if (!agent.extractedData) continue;
+        agents.set(agent.extractionId, [...(agents.get(agent.extractionId) ?? []), agent]);
+      }
+    }
+    yield { rows, agents };
+
+    if (rows.length < batchSize) return;
+    const last = rows[rows.length - 1];
+    cursor = { value: last.createdAt.getTime(), id: last.id };
+  }
+}
+
+/** The final data and agent results of a batch, in export order */
+export function libraryExportSources(batch: LibraryExportBatch): LibraryExportSource[] {
+  return batch.rows.flatMap(row => {
+    const entry = { extractionId: row.id, documentId: row.documentId, document: row.filename, status: row.status };
+    return [
+      { ...entry, source: "final", data: row.extractedData },
+      ...(batch.agents.get(row.id) ?? []).map(agent => ({ ...entry, source: agent.provider, data: agent.extractedData })),
+    ];
+  });
+}
+
+/**
+ * The text of an export of all the user's extractions, one chunk per batch.
+ * CSV/TSV has one row per extraction, source (the final data or an agent) and
+ * field; NDJSON one line per extraction.
+ */
+export async function* libraryExportChunks(
+  userId: number,
+  options: LibraryExportOptions & { format: TextExportFormat },
+  batchSize = EXPORT_BATCH_SIZE
+): AsyncGenerator<string> {
+  const separator = options.format === "ndjson" ? null : separatorOf(options.format);
+  if (separator) yield delimitedLine(libraryExportHeader(options), separator);
+
+  for await (const batch of libraryExportBatches(userId, options.includeAgents, batchSize)) {
+    let chunk = "";
+    if (separator) {
+      for (const source of libraryExportSources(batch)) {
+        for (const cells of libraryExportRows(source, options)) chunk += delimitedLine(cells, separator);
+      }
+    } else {
+      for (const row of batch.rows) {
+        const agents = batch.agents.get(row.id) ?? [];
+        chunk += JSON.stringify({
+          extractionId: row.id,
+          documentId: row.documentId,
+          document: row.filename,
+          status: row.status,
+          createdAt: row.createdAt,
+          data: row.extractedData,
+          ...(options.includeAgents
+            ? { agents: Object.fromEntries(agents.map(agent => [agent.provider, agent.extractedData])) }
+            : {}),
+        }) + "\n";
+      }
+    }
+    if (chunk) yield chunk;
+  }
+}
+
+/**
+ * The library export as Arrow record batches, one per batch of extractions
+ * (an empty library still yields one batch, so the stream carries the schema)
+ */
+export async function* libraryArrowBatches(
+  userId: number,
+  options: Omit<LibraryExportOptions, "format">,
+  batchSize = EXPORT_BATCH_SIZE
+): AsyncGenerator<RecordBatch> {
+  const schema = arrowExportSchema(options);
+  let empty = true;
+  for await (const batch of libraryExportBatches(userId, options.includeAgents, batchSize)) {
+    yield toArrowRecordBatch(schema, libraryExportSources(batch));
+    empty = false;
+  }
+  if (empty) yield toArrowRecordBatch(schema, []);
+}
+
+const exportQuery = z.object({
+  format: z.enum(LIBRARY_EXPORT_FORMATS).default("csv"),
+  agents: z.stringbool().default(false),
+  confidence: z.stringbool().default(true),
+  source: z.stringbool().default(true),
+});
+
+async function authenticate(req: Request): Promise<User | null> {
+  try {
+    return await sdk.authenticateRequest(req);
+  } catch {
+    return null;
+  }
+}
+
+/**
+ * GET /api/export/extractions streams the signed-in user's library export as
+ * it is read (chunked, gzip when the client accepts it)
+ */
+export function registerExportRoutes(app: Express) {
+  app.get("/api/export/extractions", async (req: Request, res: Response) => {
+    const user = await authenticate(req);
+    if (!user) {
+      res.status(401).json({ error: UNAUTHED_ERR_MSG });
+      return;
+    }
+    const query = exportQuery.safeParse(req.query);
+    if (!query.success) {
+      res.status(400).json({ error: "Invalid export options" });
+      return;
+    }
+
+    const { format, agents, confidence, source } = query.data;
+    const filename = `extractions-${new Date().toISOString().slice(0, 10)}.${FILE_EXTENSIONS[format]}`;
+    res.setHeader("Content-Type", CONTENT_TYPES[format]);
+    res.setHeader("Content-Disposition", `attachment; filename="${filename}"`);
+    res.setHeader("Cache-Control", "no-store");
+    res.vary("Accept-Encoding");
+
+    const options = { includeAgents: agents, includeConfidence: confidence, includeSourceLocation: source };
+    const stages: Array<NodeJS.ReadableStream | NodeJS.ReadWriteStream> = format === "arrow"
+      // The IPC stream writer serializes the record batches
+      ? [Readable.from(libraryArrowBatches(user.id, options)), RecordBatchStreamWriter.throughNode()]
+      : [Readable.from(libraryExportChunks(user.id, { ...options, format }))];
+    if (req.acceptsEncodings("gzip") === "gzip") {
+      res.setHeader("Content-Encoding", "gzip");
+      stages.push(createGzip());
+    }
+    try {
+      // pipeline waits for the response to drain, so a slow client pauses the reads
+      await pipeline([...stages, res]);
+    } catch (error) {
+      // The client disconnected or a read failed; the response is cut short
+      console.warn(`[Export] Library export for user ${user.id} stopped:`, error instanceof Error ? error.message : error);
+    }
+  });
+}
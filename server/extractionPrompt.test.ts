@@ -0,0 +1,53 @@
+import { describe, expect, it } from "vitest";
+import type { ExtractionSchema } from "../drizzle/schema";
+import { compileExtractionSchema, parseModelJson, toExtractedData } from "./extractionPrompt";
+
+const schema = (): ExtractionSchema => ({
+  fields: [
+    { name: "total_n", label: "Total N", type: "integer", description: "Total sample size" },
+    { name: "blinded", label: "Blinded", type: "boolean" },
+  ],
+});
+
+describe("extraction prompt compiler", () => {
+  it("compiles the strict response schema once per schema content", () => {
+    const first = compileExtractionSchema(schema());
+    const second = compileExtractionSchema(schema());
+
+    expect(second).toBe(first);
+    expect(first.responseSchema).toMatchObject({ required: ["total_n", "blinded"], additionalProperties: false });
+    expect((first.responseSchema as any).properties.total_n.properties.content.type).toEqual(["number", "string"]);
+    expect(first.fieldsDescription).toBe('"total_n" (Total sample size)\n"blinded" (Blinded)');
+  });
+
+  it("recompiles when the schema changes", () => {
+    const changed = schema();
+    changed.fields[0].description = "Number randomized";
+
+    expect(compileExtractionSchema(changed)).not.toBe(compileExtractionSchema(schema()));
+  });
+
+  it("asks providers without structured output for bare JSON", () => {
+    const prompt = compileExtractionSchema(schema());
+
+    expect(prompt.buildUserPrompt("DOC", "gemini").endsWith("Document Text:\nDOC")).toBe(true);
+    expect(prompt.buildUserPrompt("DOC", "claude")).toContain("DOC\n\nRespond with valid JSON only");
+  });
+
+  it("parses fenced or prose-wrapped JSON into extracted data", () => {
+    const payload = '{"total_n": {"content": 120, "confidence": "high", "source_location": {"page": 2, "exact_text_reference": "120 patients"}}}';
+
+    expect(parseModelJson("```json\n" + payload + "\n```")).toEqual(JSON.parse(payload));
+    expect(parseModelJson("Here is the result: " + payload + " Done.")).toEqual(JSON.parse(payload));
+
+    expect(toExtractedData({ ...JSON.parse(payload), blinded: { value: true } })).toEqual({
+      total_n: {
+        value: 120,
+        confidence: "high",
+        source_location: { page: 2, exact_text_reference: "120 patients" },
+        notes: undefined,
+      },
+      blinded: { value: true, confidence: "low", source_location: undefined, notes: undefined },
+    });
+  });
+});
@@ -0,0 +1,187 @@
+import type { AIProvider, ExtractedData, ExtractionSchema } from "../drizzle/schema";
+import type { ResponseFormat } from "./_core/llm";
+import { hashSchema } from "./extractionCache";
+
+/**
+ * Prompt family identifier. Part of the extraction cache key, so bump it
+ * whenever the prompt text or response schema below changes.
+ */
+export const EXTRACTION_PROMPT_VERSION = "extraction-v2";
+
+/** Compiled prompts kept in memory (schemas are few; templates are reused constantly) */
+const MAX_COMPILED_SCHEMAS = 200;
+
+const SYSTEM_PROMPT = `You are an expert clinical data extractor following rigorous systematic review standards. Extract data from clinical trial documents with full provenance tracking.
+
+For EVERY field, you MUST return:
+- "content": The extracted value (clean, normalized)
+- "confidence": "high" (explicitly stated in text), "medium" (inferred from context), or "low" (ambiguous/uncertain)
+- "source_location": {
+    "page": Page number (estimate based on document structure if not explicit)
+    "section": Section heading where found (e.g., "Methods", "Results", "Table 1")
+    "specific_location": Precise location (e.g., "paragraph 2", "Table 2, Row 3, Column 4")
+    "exact_text_reference": VERBATIM quote (10-30 words) from document containing this data
+  }
+- "notes": Any issues with data quality, ambiguity, or assumptions made
+
+Guidelines:
+1. ACCURACY: Only extract explicitly stated information. Mark inferences as "medium" confidence.
+2. COMPLETENESS: Extract all instances, not just the first occurrence.
+3. TRANSPARENCY: Every extraction must have verifiable source location.
+4. For tables/figures: Note the specific table/figure number and row/column.
+5. If data is NOT found, set content to empty string and confidence to "low" with explanatory notes.`;
+
+/** Providers without strict structured output are asked for bare JSON */
+const JSON_ONLY_SUFFIX = "\n\nRespond with valid JSON only, no markdown.";
+
+export interface CompiledExtractionPrompt {
+  schemaHash: string;
+  fieldNames: string[];
+  /** One line per field: "name" (description) */
+  fieldsDescription: string;
+  systemPrompt: string;
+  /** Strict JSON schema of the expected response object */
+  responseSchema: Record<string, unknown>;
+  /** response_format for invokeLLM */
+  responseFormat: ResponseFormat;
+  /** User message for a document (or chunk) in the provider's variant */
+  buildUserPrompt: (documentText: string, provider: AIProvider) => string;
+}
+
+function buildFieldSchema(field: ExtractionSchema["fields"][number]) {
+  const description = `The extracted value for ${field.label}`;
+  const valueType = field.type === "number" || field.type === "integer"
+    ? { type: ["number", "string"], description }
+    : field.type === "boolean"
+    ? { type: ["boolean", "string"], description }
+    : { type: "string", description };
+
+  return {
+    type: "object",
+    properties: {
+      content: valueType,
+      confidence: {
+        type: "string",
+        enum: ["high", "medium", "low"],
+        description: "Confidence level: high (explicitly stated), medium (inferred from context), low (ambiguous or uncertain)"
+      },
+      source_location: {
+        type: "object",
+        properties: {
+          page: { type: "integer", description: "Page number where data was found (estimate if unsure)" },
+          section: { type: "string", description: "Section heading (e.g., Methods, Results, Table 1)" },
+          specific_location: { type: "string", description: "Specific location (e.g., paragraph 2, Table 2 Row 3)" },
+          exact_text_reference: { type: "string", description: "VERBATIM text snippet (10-30 words) from document containing this data" }
+        },
+        required: ["page", "exact_text_reference"],
+        additionalProperties: false
+      },
+      notes: { type: "string", description: "Any notes about ambiguity, assumptions, or data quality issues" }
+    },
+    required: ["content", "confidence", "source_location"],
+    additionalProperties: false
+  };
+}
+
+function compile(schema: ExtractionSchema, schemaHash: string): CompiledExtractionPrompt {
+  const fieldNames = schema.fields.map(f => f.name);
+  const fieldsDescription = schema.fields.map(f => `"${f.name}" (${f.description || f.label})`).join("\n");
+
+  const properties: Record<string, unknown> = {};
+  for (const field of schema.fields) {
+    properties[field.name] = buildFieldSchema(field);
+  }
+  const responseSchema = {
+    type: "object",
+    properties,
+    required: fieldNames,
+    additionalProperties: false
+  };
+
+  const userPrefix = `Extract the following fields from this clinical trial document with full provenance:
+
+Fields to extract:
+${fieldsDescription}
+
+Document Text:
+`;
+
+  return {
+    schemaHash,
+    fieldNames,
+    fieldsDescription,
+    systemPrompt: SYSTEM_PROMPT,
+    responseSchema,
+    responseFormat: {
+      type: "json_schema",
+      json_schema: { name: "extraction_result", strict: true, schema: responseSchema },
+    },
+    buildUserPrompt: (documentText, provider) =>
+      userPrefix + documentText + (provider === "gemini" ? "" : JSON_ONLY_SUFFIX),
+  };
+}
+
+const compiled = new Map<string, CompiledExtractionPrompt>();
+
+/**
+ * Compile a schema into its response schema and prompt templates, memoized by
+ * schema content hash
+ */
+export function compileExtractionSchema(schema: ExtractionSchema): CompiledExtractionPrompt {
+  const schemaHash = hashSchema(schema);
+  const hit = compiled.get(schemaHash);
+  if (hit) {
+    // Refresh recency
+    compiled.delete(schemaHash);
+    compiled.set(schemaHash, hit);
+    return hit;
+  }
+
+  const result = compile(schema, schemaHash);
+  compiled.set(schemaHash, result);
+  if (compiled.size > MAX_COMPILED_SCHEMAS) {
+    compiled.delete(compiled.keys().next().value as string);
+  }
+  return result;
+}
+
+/**
+ * Parse a model's JSON answer, tolerating markdown fences or surrounding prose
+ */
+export function parseModelJson(text: string): any {
+  const fenced = text.match(/```(?:json)?\n?([\s\S]*?)\n?```/);
+  if (fenced) return JSON.parse(fenced[1].trim());
+
+  const start = text.indexOf("{");
+  const end = text.lastIndexOf("}");
+  return JSON.parse(start >= 0 && end > start ? text.slice(start, end + 1) : text.trim());
+}
+
+/**
+ * Convert the response object ({ field: { content, confidence, source_location, notes } })
+ * into ExtractedData
+ */
+export function toExtractedData(parsed: Record<string, any>): ExtractedData {
+  const extractedData: ExtractedData = {};
+  for (const [key, data] of Object.entries(parsed ?? {})) {
+    const fieldData = (data ?? {}) as {
+      content?: string | number | boolean;
+      value?: string | number | boolean;
+      confidence?: "high" | "medium" | "low";
+      source_location?: {
+        page: number;
+        section?: string;
+        specific_location?: string;
+        exact_text_reference: string;
+      };
+      notes?: string;
+    };
+    extractedData[key] = {
+      value: fieldData.content ?? fieldData.value ?? "",
+      confidence: fieldData.confidence || "low",
+      source_location: fieldData.source_location,
+      notes: fieldData.notes,
+    };
+  }
+  return extractedData;
+}
@@ -0,0 +1,76 @@
+import { describe, expect, it, vi, beforeEach } from "vitest";
+import type { ExtractionSchema } from "../drizzle/schema";
+import { streamExtraction, type ExtractionStreamEvent } from "./extractionStream";
+import { getExtractionCacheEntry, upsertExtractionCacheEntry } from "./db";
+import { streamLLM } from "./_core/llm";
+
+vi.mock("./db", () => ({
+  getExtractionCacheEntry: vi.fn().mockResolvedValue(undefined),
+  upsertExtractionCacheEntry: vi.fn().mockResolvedValue(undefined),
+  touchExtractionCacheEntry: vi.fn().mockResolvedValue(undefined),
+  pruneExtractionCache: vi.fn().mockResolvedValue(0),
+}));
+
+vi.mock("./_core/llm", () => ({
+  invokeLLM: vi.fn(),
+  streamLLM: vi.fn(),
+}));
+
+const schema: ExtractionSchema = {
+  fields: [
+    { name: "total_n", label: "Total N", type: "integer" },
+    { name: "blinded", label: "Blinded", type: "boolean" },
+  ],
+};
+
+const response = JSON.stringify({
+  total_n: { content: 120, confidence: "high", source_location: { page: 1, exact_text_reference: "120 patients" } },
+  blinded: { content: true, confidence: "medium", source_location: { page: 1, exact_text_reference: "double-blind" } },
+});
+
+async function* pieces(text: string, size = 10) {
+  for (let i = 0; i < text.length; i += size) yield text.slice(i, i + size);
+}
+
+const collect = async (iterable: AsyncIterable<ExtractionStreamEvent>) => {
+  const events: ExtractionStreamEvent[] = [];
+  for await (const event of iterable) events.push(event);
+  return events;
+};
+
+describe("streaming extraction", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it("emits fields one by one, then the final result", async () => {
+    vi.mocked(streamLLM).mockImplementation(() => pieces(response));
+
+    const events = await collect(streamExtraction({ documentText: "--- Page 1 ---\nA trial.\n", schema }));
+
+    expect(events.map(e => e.type)).toEqual(["started", "field", "field", "done"]);
+    expect(events[1]).toMatchObject({ fieldName: "total_n", field: { value: 120, confidence: "high" } });
+    expect(events[3]).toMatchObject({ cacheHit: false, extractedData: { blinded: { value: true } } });
+    expect(upsertExtractionCacheEntry).toHaveBeenCalledTimes(1);
+  });
+
+  it("replays cached results without calling the model", async () => {
+    vi.mocked(getExtractionCacheEntry).mockResolvedValueOnce({
+      id: 1,
+      extractedData: { total_n: { value: 120, confidence: "high" } },
+      expiresAt: new Date(Date.now() + 60_000),
+    } as any);
+
+    const events = await collect(streamExtraction({ documentText: "A trial.", schema }));
+
+    expect(events.map(e => e.type)).toEqual(["started", "field", "done"]);
+    expect(events[2]).toMatchObject({ cacheHit: true });
+    expect(streamLLM).not.toHaveBeenCalled();
+  });
+
+  it("fails when the stream stops mid-object", async () => {
+    vi.mocked(streamLLM).mockImplementation(() => pieces(response.slice(0, 60)));
+
+    await expect(collect(streamExtraction({ documentText: "A trial.", schema }))).rejects.toThrow("ended before");
+  });
+});
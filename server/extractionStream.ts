@@ -0,0 +1,147 @@
+import type { ExtractedData, ExtractedFieldData, ExtractionSchema } from "../drizzle/schema";
+import { streamLLM } from "./_core/llm";
+import { ENV } from "./_core/env";
+import { getModelName } from "./agentExtraction";
+import { splitDocumentIntoChunks, mergeChunkResults, isBetterField, type DocumentChunk } from "./chunking";
+import { mapWithConcurrency } from "./concurrency";
+import { readExtractionCache, writeExtractionCache, type ExtractionCacheKeyInput } from "./extractionCache";
+import { compileExtractionSchema, toExtractedData, EXTRACTION_PROMPT_VERSION } from "./extractionPrompt";
+import { IncrementalObjectParser } from "./incrementalJson";
+
+export type ExtractionStreamEvent =
+  | {
+      type: "started";
+      cacheHit: boolean;
+      chunks: Array<{ index: number; pageStart: number | null; pageEnd: number | null }>;
+    }
+  /** Current best value for a field; sent again when another chunk's value beats it (see isBetterField) */
+  | { type: "field"; fieldName: string; field: ExtractedFieldData }
+  | { type: "done"; extractedData: ExtractedData; cacheHit: boolean };
+
+/**
+ * Minimal async queue bridging concurrent producers to one async iterator
+ */
+class EventQueue<T> implements AsyncIterableIterator<T> {
+  private items: T[] = [];
+  private waiters: Array<(result: IteratorResult<T>) => void> = [];
+  private closed = false;
+
+  push(item: T) {
+    const waiter = this.waiters.shift();
+    if (waiter) waiter({ value: item, done: false });
+    else this.items.push(item);
+  }
+
+  close() {
+    this.closed = true;
+    for (const waiter of this.waiters.splice(0)) waiter({ value: undefined, done: true });
+  }
+
+  next(): Promise<IteratorResult<T>> {
+    if (this.items.length > 0) return Promise.resolve({ value: this.items.shift()!, done: false });
+    if (this.closed) return Promise.resolve({ value: undefined, done: true });
+    return new Promise(resolve => this.waiters.push(resolve));
+  }
+
+  [Symbol.asyncIterator]() {
+    return this;
+  }
+}
+
+/**
+ * Stream-extract one chunk, reporting each field as soon as the model finishes it
+ */
+async function streamChunk(
+  chunk: DocumentChunk,
+  schema: ExtractionSchema,
+  options: { signal?: AbortSignal; userKey?: string },
+  onField: (fieldName: string, field: ExtractedFieldData) => void
+): Promise<ExtractedData> {
+  const prompt = compileExtractionSchema(schema);
+  const parser = new IncrementalObjectParser((key, value) => {
+    onField(key, toExtractedData({ [key]: value })[key]);
+  });
+
+  for await (const delta of streamLLM({
+    messages: [
+      { role: "system", content: prompt.systemPrompt },
+      { role: "user", content: prompt.buildUserPrompt(chunk.text, "gemini") }
+    ],
+    response_format: prompt.responseFormat,
+    signal: options.signal,
+    userKey: options.userKey,
+  })) {
+    parser.push(delta);
+  }
+
+  if (!parser.complete) throw new Error("LLM stream ended before the result was complete");
+  return toExtractedData(parser.value);
+}
+
+/**
+ * Field-by-field version of ai.extract. Shares the cache entries and prompt of
+ * the non-streaming path; long documents stream their chunks concurrently and
+ * a field is re-sent whenever a later chunk finds a better-supported value.
+ */
+export async function* streamExtraction(params: {
+  documentText: string;
+  schema: ExtractionSchema;
+  bypassCache?: boolean;
+  signal?: AbortSignal;
+  userKey?: string;
+}): AsyncGenerator<ExtractionStreamEvent> {
+  const { documentText, schema } = params;
+  const chunks = splitDocumentIntoChunks(documentText);
+  const chunkInfo = chunks.map(({ index, pageStart, pageEnd }) => ({ index, pageStart, pageEnd }));
+
+  const cacheInput: ExtractionCacheKeyInput = {
+    documentText,
+    schema,
+    provider: "gemini",
+    modelName: getModelName("gemini"),
+    variant: EXTRACTION_PROMPT_VERSION,
+  };
+
+  const cached = params.bypassCache ? null : await readExtractionCache(cacheInput);
+  if (cached) {
+    yield { type: "started", cacheHit: true, chunks: chunkInfo };
+    for (const [fieldName, field] of Object.entries(cached)) {
+      yield { type: "field", fieldName, field };
+    }
+    yield { type: "done", extractedData: cached, cacheHit: true };
+    return;
+  }
+
+  yield { type: "started", cacheHit: false, chunks: chunkInfo };
+
+  const queue = new EventQueue<ExtractionStreamEvent>();
+  const best: ExtractedData = {};
+  let failure: unknown = null;
+
+  const work = mapWithConcurrency(chunks, ENV.extractionChunkConcurrency, async chunk => {
+    const extractedData = await streamChunk(chunk, schema, params, (fieldName, field) => {
+      const candidate = chunks.length > 1
+        ? { ...field, chunk: { index: chunk.index, pageStart: chunk.pageStart, pageEnd: chunk.pageEnd } }
+        : field;
+      if (isBetterField(candidate, best[fieldName])) {
+        best[fieldName] = candidate;
+        queue.push({ type: "field", fieldName, field: candidate });
+      }
+    });
+    return { chunk, extractedData };
+  })
+    .catch(error => {
+      failure = error;
+      return null;
+    })
+    .finally(() => queue.close());
+
+  yield* queue;
+
+  const results = await work;
+  if (!results) throw failure;
+
+  const extractedData = results.length === 1 ? results[0].extractedData : mergeChunkResults(results);
+  await writeExtractionCache(cacheInput, extractedData);
+  yield { type: "done", extractedData, cacheHit: false };
+}
@@ -0,0 +1,110 @@
+import { describe, expect, it } from "vitest";
+import type { ExtractedData } from "../drizzle/schema";
+import { buildGroundingIndex, groundExtractedData, locateQuotes, normalizeQuote, QuoteMatcher } from "./grounding";
+import { buildPageText } from "./pdfText";
+
+const item = (str: string, x: number, y = 700, width = str.length * 5, height = 10) => ({
+  str,
+  transform: [1, 0, 0, 1, x, y],
+  width,
+  height,
+});
+
+const index = buildGroundingIndex([
+  buildPageText(1, [item("Randomized Controlled", 50), item("Trial of aspirin", 160)]),
+  buildPageText(2, [item("A total of 120", 50, 600), item("patients   were", 125, 600), item("enrolled.", 210, 600, 45, 0)]),
+  buildPageText(3, [item("Trial of aspirin", 80, 500)]),
+  buildPageText(4, [
+    item("Patients were rando-", 50, 400),
+    item("mized to intravenous alteplase", 50, 388),
+    item("or placebo; the \uFB01nal follow-up was at 90 days.", 50, 376),
+  ]),
+]);
+
+describe("QuoteMatcher", () => {
+  it("finds the first occurrence of overlapping patterns", () => {
+    const patterns = ["he", "she", "his", "hers"];
+    expect(new QuoteMatcher(patterns).firstOccurrences("ushers his")).toEqual([2, 1, 7, 2]);
+  });
+
+  it("reports patterns that do not occur", () => {
+    expect(new QuoteMatcher(["abc", "bcd"]).firstOccurrences("abxbcd")).toEqual([-1, 3]);
+  });
+});
+
+describe("normalizeQuote", () => {
+  it("folds case, spacing, ligatures, dashes and line-break hyphenation", () => {
+    expect(normalizeQuote("  Rando- mized\n  \uFB01nal \u2013 \u201Cdata\u201D ")).toBe('randomized final - "data"');
+  });
+});
+
+describe("locateQuotes", () => {
+  it("locates quotes across text items, ignoring case and spacing", () => {
+    const located = locateQuotes(index, { n: "120  patients were\nENROLLED" });
+
+    expect(located.n).toEqual({
+      page: 2,
+      exact: "120  patients were\nENROLLED",
+      rects: [[48, 598, 257, 612]],
+      selector: {
+        type: "FragmentSelector",
+        conformsTo: "http://tools.ietf.org/rfc/rfc3778",
+        value: "page=2&rect=48,598,257,612",
+      },
+      similarity: 1,
+    });
+  });
+
+  it("returns the first page a quote is on", () => {
+    expect(locateQuotes(index, { design: "trial of aspirin" }).design?.page).toBe(1);
+  });
+
+  it("does not match across pages or short quotes", () => {
+    const located = locateQuotes(index, { spanning: "aspirin A total", short: "of", number: "12" });
+    expect(located).toEqual({ spanning: null, short: null, number: expect.objectContaining({ page: 2 }) });
+  });
+});
+
+describe("approximate quote lookup", () => {
+  it("locates quotes that differ by a few edits, with their similarity", () => {
+    const located = locateQuotes(index, { arms: "patients were randomised to intravenous alteplase or placebo" });
+
+    expect(located.arms?.page).toBe(4);
+    expect(located.arms?.similarity).toBeGreaterThan(0.9);
+    expect(located.arms?.similarity).toBeLessThan(1);
+  });
+
+  it("matches quotes hyphenated across lines and with ligatures exactly", () => {
+    expect(locateQuotes(index, { q: "randomized to intravenous" }).q).toMatchObject({ page: 4, similarity: 1 });
+    expect(locateQuotes(index, { q: "the final follow-up" }).q).toMatchObject({ page: 4, similarity: 1 });
+  });
+
+  it("rejects quotes that are not similar enough", () => {
+    expect(locateQuotes(index, { q: "patients received oral aspirin daily for a year" }).q).toBeNull();
+  });
+
+  it("falls back to the next quote of a key", () => {
+    const located = locateQuotes(index, { n: ["no such sentence anywhere in the paper", "120"] });
+    expect(located.n?.page).toBe(2);
+  });
+});
+
+describe("groundExtractedData", () => {
+  it("locates every field by its source reference or value in one call", () => {
+    const data: ExtractedData = {
+      total_n: { value: 120, source_location: { page: 2, exact_text_reference: "A total of 120 patients" } },
+      design: { value: "Randomized controlled trial" },
+      funding: {
+        value: "Not reported",
+        location: { page: 9, exact: "old", rects: [], selector: { type: "FragmentSelector", value: "page=9" } },
+      },
+    };
+
+    const grounded = groundExtractedData(index, data);
+
+    expect(grounded.total_n.location?.page).toBe(2);
+    expect(grounded.total_n.source_location).toEqual(data.total_n.source_location);
+    expect(grounded.design.location?.page).toBe(1);
+    expect(grounded.funding.location).toBeUndefined();
+  });
+});
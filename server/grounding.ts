@@ -0,0 +1,24 @@
+import { LruCache } from "./_core/lruCache";
+import { getDocumentPages } from "./db";
+import { decodeDocumentPage } from "./pdfText";
+import { buildGroundingIndex, type GroundingIndex } from "@shared/grounding";
+
+export * from "@shared/grounding";
+
+/** Page text is immutable once parsed, so indexes only leave the cache to bound memory */
+const groundingIndexes = new LruCache<number, GroundingIndex>(32, 30 * 60_000);
+
+/**
+ * The grounding index of a document, built once from its stored pages; null
+ * when the document was not parsed on upload
+ */
+export async function getGroundingIndex(documentId: number): Promise<GroundingIndex | null> {
+  const cached = groundingIndexes.get(documentId);
+  if (cached) return cached;
+
+  const rows = await getDocumentPages(documentId);
+  if (rows.length === 0) return null;
+  const index = buildGroundingIndex(rows.map(decodeDocumentPage));
+  groundingIndexes.set(documentId, index);
+  return index;
+}
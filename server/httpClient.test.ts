@@ -0,0 +1,45 @@
+import { describe, expect, it, afterAll, vi } from "vitest";
+import { createServer, type Server } from "http";
+import type { AddressInfo } from "net";
+
+describe("pooled http client", () => {
+  const servers: Server[] = [];
+
+  const listen = async () => {
+    const server = createServer((_req, res) => {
+      res.setHeader("content-type", "application/json");
+      res.end(JSON.stringify({ ok: true }));
+    });
+    servers.push(server);
+    await new Promise<void>(resolve => server.listen(0, "127.0.0.1", resolve));
+    return (server.address() as AddressInfo).port;
+  };
+
+  afterAll(async () => {
+    await Promise.all(servers.map(server => new Promise(resolve => server.close(resolve))));
+  });
+
+  it("reuses keep-alive connections to configured upstreams only", async () => {
+    const port = await listen();
+    const origin = `http://127.0.0.1:${port}`;
+    const otherOrigin = `http://127.0.0.1:${await listen()}`;
+
+    // The upstreams are read when the client loads
+    vi.resetModules();
+    process.env.HTTP_POOL_OVERRIDES = `127.0.0.1:${port}=2`;
+    const { getHttpPoolStats, pooledFetch } = await import("./_core/httpClient");
+
+    for (let i = 0; i < 3; i++) {
+      const response = await pooledFetch(`${origin}/ping`);
+      expect(await response.json()).toEqual({ ok: true });
+    }
+    // Not an upstream: served by the default fetch, without a pool of its own
+    const other = await pooledFetch(`${otherOrigin}/ping`);
+    expect(await other.json()).toEqual({ ok: true });
+
+    const stats = getHttpPoolStats();
+    expect(stats.find(s => s.origin === origin)).toMatchObject({ requests: 3, connected: 1, maxConnections: 2 });
+    expect(stats.map(s => s.origin)).not.toContain(otherOrigin);
+    delete process.env.HTTP_POOL_OVERRIDES;
+  });
+});
@@ -0,0 +1,50 @@
+import { describe, expect, it } from "vitest";
+import { IncrementalObjectParser } from "./incrementalJson";
+
+const feed = (parser: IncrementalObjectParser, text: string, size: number) => {
+  for (let i = 0; i < text.length; i += size) parser.push(text.slice(i, i + size));
+};
+
+describe("incremental JSON parser", () => {
+  const doc = {
+    total_n: { content: 120, confidence: "high", source_location: { page: 2, exact_text_reference: 'said "120 {patients}"' } },
+    blinded: { content: true, confidence: "medium", source_location: { page: 3, exact_text_reference: "double-blind" } },
+    arms: [1, 2],
+    label: "a, b",
+    count: -4.5,
+    missing: null,
+  };
+  const text = JSON.stringify(doc, null, 2);
+
+  it("reports each property as soon as its value closes", () => {
+    const seen: string[] = [];
+    const parser = new IncrementalObjectParser(key => seen.push(key));
+
+    const firstEnd = text.indexOf('"blinded"');
+    parser.push(text.slice(0, firstEnd));
+    expect(seen).toEqual(["total_n"]);
+
+    parser.push(text.slice(firstEnd));
+    expect(seen).toEqual(["total_n", "blinded", "arms", "label", "count", "missing"]);
+    expect(parser.complete).toBe(true);
+    expect(parser.value).toEqual(doc);
+  });
+
+  it("handles arbitrary chunk boundaries, escapes and a markdown fence", () => {
+    for (const size of [1, 3, 7]) {
+      const parser = new IncrementalObjectParser();
+      feed(parser, "```json\n" + text + "\n```", size);
+
+      expect(parser.complete).toBe(true);
+      expect(parser.value).toEqual(doc);
+    }
+  });
+
+  it("is incomplete while the object is still open", () => {
+    const parser = new IncrementalObjectParser();
+    parser.push('{"a": {"content": 1}, "b": {"conte');
+
+    expect(parser.complete).toBe(false);
+    expect(parser.value).toEqual({ a: { content: 1 } });
+  });
+});
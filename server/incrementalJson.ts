@@ -0,0 +1,113 @@
+/**
+ * Incremental parser for a JSON object arriving in pieces (an LLM stream).
+ * Each top-level property is reported as soon as its value is complete, so
+ * callers can act on early fields while later ones are still being generated.
+ * Text before the opening brace (e.g. a markdown fence) is ignored.
+ */
+export class IncrementalObjectParser {
+  private buffer = "";
+  private pos = 0;
+  private depth = 0;
+  private inString = false;
+  private escaped = false;
+  private expecting: "key" | "colon" | "value" | "comma" = "key";
+  private keyStart = -1;
+  private valueStart = -1;
+  private key: string | null = null;
+  private closed = false;
+  /** Properties parsed so far */
+  readonly value: Record<string, unknown> = {};
+
+  constructor(private readonly onProperty: (key: string, value: unknown) => void = () => {}) {}
+
+  /** Whether the top-level object has been closed */
+  get complete(): boolean {
+    return this.closed;
+  }
+
+  push(chunk: string): void {
+    if (this.closed) return;
+    this.buffer += chunk;
+    this.scan();
+  }
+
+  private emit(end: number) {
+    const raw = this.buffer.slice(this.valueStart, end).trim();
+    const key = this.key!;
+    const parsed = JSON.parse(raw);
+    this.value[key] = parsed;
+    this.valueStart = -1;
+    this.key = null;
+    this.expecting = "comma";
+    this.onProperty(key, parsed);
+  }
+
+  private scan() {
+    const text = this.buffer;
+
+    for (; this.pos < text.length && !this.closed; this.pos++) {
+      const ch = text[this.pos];
+
+      if (this.depth === 0) {
+        if (ch === "{") this.depth = 1;
+        continue;
+      }
+
+      if (this.inString) {
+        if (this.escaped) {
+          this.escaped = false;
+        } else if (ch === "\\") {
+          this.escaped = true;
+        } else if (ch === '"') {
+          this.inString = false;
+          if (this.depth === 1 && this.expecting === "key" && this.keyStart >= 0) {
+            this.key = JSON.parse(text.slice(this.keyStart, this.pos + 1));
+            this.keyStart = -1;
+            this.expecting = "colon";
+          } else if (this.depth === 1 && this.expecting === "value" && this.valueStart >= 0) {
+            this.emit(this.pos + 1);
+          }
+        }
+        continue;
+      }
+
+      switch (ch) {
+        case '"':
+          this.inString = true;
+          if (this.depth === 1 && this.expecting === "key") this.keyStart = this.pos;
+          else if (this.depth === 1 && this.expecting === "value") this.valueStart = this.pos;
+          break;
+        case ":":
+          if (this.depth === 1 && this.expecting === "colon") this.expecting = "value";
+          break;
+        case "{":
+        case "[":
+          if (this.depth === 1 && this.expecting === "value") this.valueStart = this.pos;
+          this.depth++;
+          break;
+        case "}":
+        case "]":
+          this.depth--;
+          if (this.depth === 1 && this.valueStart >= 0) {
+            this.emit(this.pos + 1);
+          } else if (this.depth === 0) {
+            // Closing the top-level object may end a bare number/literal value
+            if (this.valueStart >= 0) this.emit(this.pos);
+            this.closed = true;
+          }
+          break;
+        case ",":
+          if (this.depth === 1) {
+            if (this.valueStart >= 0) this.emit(this.pos);
+            this.expecting = "key";
+          }
+          break;
+        default:
+          // Start of a number, true/false/null at the top level
+          if (this.depth === 1 && this.expecting === "value" && this.valueStart < 0 && !/\s/.test(ch)) {
+            this.valueStart = this.pos;
+          }
+      }
+    }
+  }
+}
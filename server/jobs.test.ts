@@ -0,0 +1,133 @@
+import { describe, expect, it, vi, beforeEach } from "vitest";
+import type { ExtractionJob } from "../drizzle/schema";
+import { ExtractionWorkerPool, runExtractionJob, encodeJobDocumentText } from "./jobs";
+import {
+  claimNextExtractionJob, completeExtractionJob, failExtractionJob, updateAgentExtraction, updateExtraction,
+  getExtractionJobsByExtractionId, getAgentExtractionsByExtractionId
+} from "./db";
+import { runCachedAgentExtraction } from "./agentExtraction";
+
+vi.mock("./db", () => ({
+  createAgentExtractions: vi.fn(),
+  updateAgentExtraction: vi.fn().mockResolvedValue(true),
+  getAgentExtractionsByExtractionId: vi.fn().mockResolvedValue([]),
+  getExtractionById: vi.fn(async (id: number, userId: number) => ({
+    id,
+    userId,
+    documentId: 5,
+    schema: { fields: [{ name: "total_n", label: "Total N", type: "integer" }] },
+  })),
+  updateExtraction: vi.fn().mockResolvedValue(true),
+  createExtractionJob: vi.fn(),
+  getExtractionJobsByExtractionId: vi.fn().mockResolvedValue([]),
+  claimNextExtractionJob: vi.fn(),
+  heartbeatExtractionJob: vi.fn().mockResolvedValue(true),
+  completeExtractionJob: vi.fn().mockResolvedValue(true),
+  failExtractionJob: vi.fn().mockResolvedValue(true),
+  requeueStaleExtractionJobs: vi.fn().mockResolvedValue(0),
+}));
+
+vi.mock("./agentExtraction", () => ({
+  getModelName: vi.fn(() => "gemini-1.5-flash"),
+  runCachedAgentExtraction: vi.fn(),
+}));
+
+vi.mock("./pdfText", () => ({
+  getDocumentText: vi.fn().mockResolvedValue("--- Page 1 ---\nStored text\n"),
+}));
+
+const makeJob = (overrides: Partial<ExtractionJob> = {}): ExtractionJob => ({
+  id: 1,
+  extractionId: 10,
+  userId: 1,
+  agentExtractionId: 100,
+  provider: "gemini",
+  status: "running",
+  attempts: 1,
+  maxAttempts: 3,
+  bypassCache: false,
+  documentTextData: null,
+  lockedBy: "worker",
+  lockedAt: new Date(),
+  runAfter: new Date(),
+  lastError: null,
+  completedAt: null,
+  createdAt: new Date(),
+  updatedAt: new Date(),
+  ...overrides,
+});
+
+const extractedData = { total_n: { value: 120, confidence: "high" as const } };
+
+describe("extraction jobs", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it("completes the job and its agent extraction", async () => {
+    vi.mocked(runCachedAgentExtraction).mockResolvedValueOnce({ extractedData, cacheHit: false });
+    vi.mocked(getAgentExtractionsByExtractionId).mockResolvedValueOnce([{ status: "completed" } as any]);
+
+    await runExtractionJob(makeJob(), "worker");
+
+    expect(runCachedAgentExtraction).toHaveBeenCalledWith("gemini", expect.anything(), "--- Page 1 ---\nStored text\n", false);
+    expect(updateAgentExtraction).toHaveBeenLastCalledWith(100, expect.objectContaining({ status: "completed", extractedData }));
+    expect(completeExtractionJob).toHaveBeenCalledWith(1, "worker");
+    expect(updateExtraction).toHaveBeenCalledWith(10, 1, { status: "completed" });
+  });
+
+  it("prefers the document text stored with the job", async () => {
+    vi.mocked(runCachedAgentExtraction).mockResolvedValueOnce({ extractedData, cacheHit: false });
+
+    await runExtractionJob(makeJob({ documentTextData: encodeJobDocumentText("Client text") }), "worker");
+
+    expect(runCachedAgentExtraction).toHaveBeenCalledWith("gemini", expect.anything(), "Client text", false);
+  });
+
+  it("requeues a failed attempt with backoff while attempts remain", async () => {
+    vi.mocked(runCachedAgentExtraction).mockRejectedValueOnce(new Error("rate limited"));
+    vi.mocked(getExtractionJobsByExtractionId).mockResolvedValueOnce([makeJob({ status: "queued" })]);
+
+    await runExtractionJob(makeJob({ attempts: 1 }), "worker");
+
+    expect(failExtractionJob).toHaveBeenCalledWith(1, "worker", "rate limited", expect.any(Date));
+    expect(updateAgentExtraction).toHaveBeenLastCalledWith(100, expect.objectContaining({ status: "pending" }));
+    expect(updateExtraction).not.toHaveBeenCalled();
+  });
+
+  it("fails the job and finalizes the extraction on the last attempt", async () => {
+    vi.mocked(runCachedAgentExtraction).mockRejectedValueOnce(new Error("rate limited"));
+    vi.mocked(getAgentExtractionsByExtractionId).mockResolvedValueOnce([{ status: "completed" } as any]);
+
+    await runExtractionJob(makeJob({ attempts: 3 }), "worker");
+
+    expect(failExtractionJob).toHaveBeenCalledWith(1, "worker", "rate limited", null);
+    expect(updateAgentExtraction).toHaveBeenLastCalledWith(100, expect.objectContaining({ status: "failed" }));
+    expect(updateExtraction).toHaveBeenCalledWith(10, 1, { status: "completed" });
+  });
+
+  it("never runs more jobs than the pool size", async () => {
+    const queue = [1, 2, 3, 4, 5].map(id => makeJob({ id }));
+    vi.mocked(claimNextExtractionJob).mockImplementation(async () => queue.shift());
+
+    let running = 0;
+    let peak = 0;
+    const finished: number[] = [];
+    const pool = new ExtractionWorkerPool(
+      { concurrency: 2, pollIntervalMs: 60_000, leaseMs: 60_000 },
+      async job => {
+        running++;
+        peak = Math.max(peak, running);
+        await new Promise(resolve => setTimeout(resolve, 5));
+        running--;
+        finished.push(job.id);
+      }
+    );
+
+    pool.start();
+    await vi.waitFor(() => expect(finished).toHaveLength(5));
+    pool.stop();
+
+    expect(peak).toBe(2);
+  });
+});
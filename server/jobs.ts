@@ -0,0 +1,234 @@
+import { hostname } from "os";
+import { gzipSync, gunzipSync } from "zlib";
+import type { AIProvider, ExtractionJob, ExtractionRecord, ExtractionSchema } from "../drizzle/schema";
+import {
+  createAgentExtractions, updateAgentExtraction, getAgentExtractionsByExtractionId,
+  getExtractionById, updateExtraction,
+  createExtractionJob, getExtractionJobsByExtractionId, claimNextExtractionJob, heartbeatExtractionJob,
+  completeExtractionJob, failExtractionJob, requeueStaleExtractionJobs
+} from "./db";
+import { getModelName, runCachedAgentExtraction } from "./agentExtraction";
+import { getDocumentText } from "./pdfText";
+import { ENV } from "./_core/env";
+import { runWithRateLimitUser } from "./_core/rateLimiter";
+
+/** Thrown for failures that retrying cannot fix */
+class PermanentJobError extends Error {}
+
+export const encodeJobDocumentText = (text: string) => gzipSync(Buffer.from(text, "utf8"));
+export const decodeJobDocumentText = (data: Buffer) => gunzipSync(data).toString("utf8");
+
+/** Exponential backoff before the next attempt (attempt is 1-based) */
+export const retryDelayMs = (attempt: number) =>
+  ENV.extractionJobRetryBaseMs * 2 ** Math.max(0, attempt - 1);
+
+/**
+ * Queue one agent extraction job per provider. Agent rows are created up front
+ * in "pending" so existing agent views show the run immediately.
+ * `documentText` is stored with the jobs only when the document has no parsed pages.
+ */
+export async function enqueueAgentExtractions(params: {
+  extraction: ExtractionRecord;
+  userId: number;
+  providers: AIProvider[];
+  documentText?: string;
+  bypassCache?: boolean;
+}): Promise<ExtractionJob[]> {
+  const documentTextData = params.documentText ? encodeJobDocumentText(params.documentText) : null;
+
+  const agentRecords = await createAgentExtractions(params.extraction.id, params.providers, "pending");
+  const jobs = await Promise.all(
+    agentRecords.map(agentRecord => {
+      const provider = agentRecord.provider as AIProvider;
+      return createExtractionJob({
+        extractionId: params.extraction.id,
+        userId: params.userId,
+        agentExtractionId: agentRecord.id,
+        provider,
+        bypassCache: params.bypassCache ?? false,
+        documentTextData,
+        maxAttempts: ENV.extractionJobMaxAttempts,
+      });
+    })
+  );
+
+  await updateExtraction(params.extraction.id, params.userId, { status: "extracting" });
+  extractionWorkers.wake();
+  return jobs;
+}
+
+type ExtractionFinalizedListener = (extractionId: number) => void;
+const finalizedListeners = new Set<ExtractionFinalizedListener>();
+
+/** Get called whenever a queued extraction reaches its final status; returns an unsubscribe function */
+export function onExtractionFinalized(listener: ExtractionFinalizedListener): () => void {
+  finalizedListeners.add(listener);
+  return () => finalizedListeners.delete(listener);
+}
+
+/**
+ * Once no job of the extraction is queued or running, mark it completed
+ * if any agent succeeded, failed otherwise
+ */
+export async function finalizeExtractionIfDone(extractionId: number, userId: number): Promise<void> {
+  const jobs = await getExtractionJobsByExtractionId(extractionId);
+  if (jobs.some(job => job.status === "queued" || job.status === "running")) return;
+
+  const agents = await getAgentExtractionsByExtractionId(extractionId);
+  const succeeded = agents.some(agent => agent.status === "completed");
+  await updateExtraction(extractionId, userId, { status: succeeded ? "completed" : "failed" });
+  for (const listener of finalizedListeners) listener(extractionId);
+}
+
+/**
+ * Run one claimed job and record the outcome on both the job and its agent extraction row
+ */
+export async function runExtractionJob(job: ExtractionJob, workerId: string): Promise<void> {
+  const provider = job.provider as AIProvider;
+  const startTime = Date.now();
+  const heartbeat = setInterval(() => {
+    heartbeatExtractionJob(job.id, workerId).catch(error =>
+      console.warn(`[Jobs] Heartbeat failed for job ${job.id}:`, error)
+    );
+  }, Math.max(1000, ENV.extractionJobLeaseMs / 3));
+  heartbeat.unref?.();
+
+  try {
+    if (job.attempts > job.maxAttempts) {
+      throw new PermanentJobError("Job exceeded its attempts (worker lease expired)");
+    }
+
+    const extraction = await getExtractionById(job.extractionId, job.userId);
+    if (!extraction) throw new PermanentJobError("Extraction not found");
+
+    const documentText = job.documentTextData
+      ? decodeJobDocumentText(job.documentTextData)
+      : await getDocumentText(extraction.documentId);
+    if (!documentText) throw new PermanentJobError("Document text is not available");
+
+    await updateAgentExtraction(job.agentExtractionId, { status: "extracting" });
+
+    const { extractedData } = await runCachedAgentExtraction(
+      provider,
+      extraction.schema as ExtractionSchema,
+      documentText,
+      job.bypassCache
+    );
+
+    await updateAgentExtraction(job.agentExtractionId, {
+      extractedData,
+      status: "completed",
+      processingTimeMs: Date.now() - startTime,
+      modelName: getModelName(provider),
+    });
+    await completeExtractionJob(job.id, workerId);
+  } catch (error) {
+    const message = error instanceof Error ? error.message : "Unknown error";
+    const retry = !(error instanceof PermanentJobError) && job.attempts < job.maxAttempts;
+    console.warn(`[Jobs] Job ${job.id} (${provider}) attempt ${job.attempts} failed:`, message);
+
+    await failExtractionJob(job.id, workerId, message, retry ? new Date(Date.now() + retryDelayMs(job.attempts)) : null);
+    await updateAgentExtraction(job.agentExtractionId, {
+      status: retry ? "pending" : "failed",
+      errorMessage: message,
+      processingTimeMs: Date.now() - startTime,
+    });
+  } finally {
+    clearInterval(heartbeat);
+  }
+
+  await finalizeExtractionIfDone(job.extractionId, job.userId);
+}
+
+export type ExtractionWorkerOptions = {
+  concurrency: number;
+  pollIntervalMs: number;
+  leaseMs: number;
+};
+
+/**
+ * Fixed-size pool of in-process workers pulling jobs from the extraction_jobs table.
+ * Several processes may run pools against the same database.
+ */
+export class ExtractionWorkerPool {
+  readonly workerId = `${hostname()}:${process.pid}`.slice(0, 64);
+  private active = 0;
+  private claiming = false;
+  private started = false;
+  private pollTimer: ReturnType<typeof setInterval> | null = null;
+  private recoveryTimer: ReturnType<typeof setInterval> | null = null;
+
+  constructor(
+    private readonly options: ExtractionWorkerOptions,
+    private readonly runJob: (job: ExtractionJob, workerId: string) => Promise<void> = runExtractionJob
+  ) {}
+
+  get stats() {
+    return { workerId: this.workerId, active: this.active, concurrency: this.options.concurrency, started: this.started };
+  }
+
+  start(): void {
+    if (this.started || this.options.concurrency <= 0) return;
+    this.started = true;
+
+    this.pollTimer = setInterval(() => this.wake(), this.options.pollIntervalMs);
+    this.recoveryTimer = setInterval(() => void this.recover(), this.options.leaseMs);
+    this.pollTimer.unref?.();
+    this.recoveryTimer.unref?.();
+
+    void this.recover().then(() => this.wake());
+    console.log(`[Jobs] Extraction workers started (${this.options.concurrency} slots, ${this.workerId})`);
+  }
+
+  /** Stop claiming new jobs; running jobs finish or are recovered after their lease */
+  stop(): void {
+    this.started = false;
+    if (this.pollTimer) clearInterval(this.pollTimer);
+    if (this.recoveryTimer) clearInterval(this.recoveryTimer);
+    this.pollTimer = this.recoveryTimer = null;
+  }
+
+  /** Claim jobs until all slots are busy or the queue is empty */
+  wake(): void {
+    if (!this.started) return;
+    void this.fill();
+  }
+
+  private async fill(): Promise<void> {
+    if (this.claiming) return;
+    this.claiming = true;
+    try {
+      while (this.started && this.active < this.options.concurrency) {
+        const job = await claimNextExtractionJob(this.workerId);
+        if (!job) break;
+
+        this.active++;
+        runWithRateLimitUser(String(job.userId), () => this.runJob(job, this.workerId))
+          .catch(error => console.error(`[Jobs] Job ${job.id} crashed:`, error))
+          .finally(() => {
+            this.active--;
+            this.wake();
+          });
+      }
+    } catch (error) {
+      console.warn("[Jobs] Failed to claim job:", error);
+    } finally {
+      this.claiming = false;
+    }
+  }
+
+  private async recover(): Promise<void> {
+    try {
+      const requeued = await requeueStaleExtractionJobs(new Date(Date.now() - this.options.leaseMs));
+      if (requeued > 0) console.log(`[Jobs] Requeued ${requeued} stale job(s)`);
+    } catch (error) {
+      console.warn("[Jobs] Stale job recovery failed:", error);
+    }
+  }
+}
+
+export const extractionWorkers = new ExtractionWorkerPool({
+  concurrency: ENV.extractionWorkerConcurrency,
+  pollIntervalMs: ENV.extractionWorkerPollMs,
+  leaseMs: ENV.extractionJobLeaseMs,
+});
@@ -0,0 +1,95 @@
+import { describe, expect, it, vi, beforeEach } from "vitest";
+import { BatchLoader, createRequestLoaders } from "./loaders";
+import { getAgentExtractionsByExtractionIds, getExtractionsByIds } from "./db";
+
+vi.mock("./db", () => ({
+  getDocumentsByIds: vi.fn().mockResolvedValue([]),
+  getExtractionsByIds: vi.fn(async (ids: number[]) =>
+    ids.filter(id => id < 100).map(id => ({ id, userId: id === 3 ? 2 : 1, documentId: 1 }))
+  ),
+  getAgentExtractionsByExtractionIds: vi.fn(async (ids: number[]) =>
+    ids.flatMap(extractionId => [
+      { id: extractionId * 10, extractionId, provider: "claude" },
+      { id: extractionId * 10 + 1, extractionId, provider: "gemini" },
+    ])
+  ),
+}));
+
+describe("BatchLoader", () => {
+  it("batches and dedupes keys requested together", async () => {
+    const batch = vi.fn(async (keys: number[]) => new Map(keys.map(key => [key, key * 2])));
+    const loader = new BatchLoader(batch);
+
+    const values = await Promise.all([loader.load(1), loader.load(2), loader.load(1)]);
+
+    expect(values).toEqual([2, 4, 2]);
+    expect(batch).toHaveBeenCalledTimes(1);
+    expect(batch).toHaveBeenCalledWith([1, 2]);
+  });
+
+  it("serves later loads from its cache until cleared", async () => {
+    const batch = vi.fn(async (keys: number[]) => new Map(keys.map(key => [key, key])));
+    const loader = new BatchLoader(batch);
+
+    await loader.load(1);
+    await loader.load(1);
+    expect(batch).toHaveBeenCalledTimes(1);
+
+    loader.clear(1);
+    await loader.load(1);
+    expect(batch).toHaveBeenCalledTimes(2);
+
+    loader.prime(5, 50);
+    expect(await loader.load(5)).toBe(50);
+    expect(batch).toHaveBeenCalledTimes(2);
+  });
+
+  it("rejects the batch on failure and retries on the next load", async () => {
+    const batch = vi.fn()
+      .mockRejectedValueOnce(new Error("connection lost"))
+      .mockImplementation(async (keys: number[]) => new Map(keys.map(key => [key, key])));
+    const loader = new BatchLoader<number, number>(batch);
+
+    await expect(loader.load(1)).rejects.toThrow("connection lost");
+    expect(await loader.load(1)).toBe(1);
+  });
+});
+
+describe("createRequestLoaders", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it("loads the extractions of a batched request with one query", async () => {
+    const loaders = createRequestLoaders();
+
+    const [first, again, second] = await Promise.all([
+      loaders.extraction(1, 1),
+      loaders.extraction(1, 1),
+      loaders.extraction(2, 1),
+    ]);
+
+    expect(first?.id).toBe(1);
+    expect(again).toBe(first);
+    expect(second?.id).toBe(2);
+    expect(getExtractionsByIds).toHaveBeenCalledTimes(1);
+    expect(getExtractionsByIds).toHaveBeenCalledWith([1, 2]);
+  });
+
+  it("hides rows owned by another user", async () => {
+    const loaders = createRequestLoaders();
+
+    expect(await loaders.extraction(3, 1)).toBeUndefined();
+    expect(await loaders.extraction(100, 1)).toBeUndefined();
+  });
+
+  it("groups agent extractions per extraction session", async () => {
+    const loaders = createRequestLoaders();
+
+    const [one, two] = await Promise.all([loaders.agentExtractionsOf(1), loaders.agentExtractionsOf(2)]);
+
+    expect(one.map(row => row.provider)).toEqual(["claude", "gemini"]);
+    expect(two.map(row => row.id)).toEqual([20, 21]);
+    expect(getAgentExtractionsByExtractionIds).toHaveBeenCalledTimes(1);
+  });
+});
@@ -0,0 +1,95 @@
+import type { AgentExtraction, Document, ExtractionRecord } from "../drizzle/schema";
+import { getAgentExtractionsByExtractionIds, getDocumentsByIds, getExtractionsByIds } from "./db";
+
+/**
+ * Minimal DataLoader: keys requested before the next event loop turn are
+ * deduped and fetched with one batch call. Results are cached for the
+ * loader's lifetime, which is one request.
+ */
+export class BatchLoader<K, V> {
+  private readonly cache = new Map<K, Promise<V | undefined>>();
+  private queue: Array<{ key: K; resolve: (value: V | undefined) => void; reject: (error: unknown) => void }> = [];
+
+  constructor(private readonly batch: (keys: K[]) => Promise<Map<K, V>>) {}
+
+  load(key: K): Promise<V | undefined> {
+    let promise = this.cache.get(key);
+    if (!promise) {
+      promise = new Promise((resolve, reject) => {
+        // setImmediate runs after pending I/O callbacks, so sibling procedures of a batched request join in
+        if (this.queue.length === 0) setImmediate(() => void this.dispatch());
+        this.queue.push({ key, resolve, reject });
+      });
+      this.cache.set(key, promise);
+    }
+    return promise;
+  }
+
+  /** Seed the cache with a row the request already has (e.g. after writing it) */
+  prime(key: K, value: V) {
+    this.cache.set(key, Promise.resolve(value));
+  }
+
+  /** Forget a key so the next load reads it again */
+  clear(key: K) {
+    this.cache.delete(key);
+  }
+
+  private async dispatch() {
+    const queue = this.queue;
+    this.queue = [];
+    try {
+      const values = await this.batch(queue.map(item => item.key));
+      for (const item of queue) item.resolve(values.get(item.key));
+    } catch (error) {
+      for (const item of queue) {
+        this.cache.delete(item.key);
+        item.reject(error);
+      }
+    }
+  }
+}
+
+const byId = <T extends { id: number }>(rows: T[]) => new Map(rows.map(row => [row.id, row]));
+
+/**
+ * Per-request loaders for rows looked up by id. Rows are fetched without an
+ * ownership filter so that one IN (...) query serves every procedure of a
+ * batched request; the accessors below check the owner.
+ */
+export function createRequestLoaders() {
+  const documents = new BatchLoader<number, Document>(async ids => byId(await getDocumentsByIds(ids)));
+  const extractions = new BatchLoader<number, ExtractionRecord>(async ids => byId(await getExtractionsByIds(ids)));
+  const agentExtractions = new BatchLoader<number, AgentExtraction[]>(async extractionIds => {
+    const grouped = new Map<number, AgentExtraction[]>(extractionIds.map(id => [id, []]));
+    for (const row of await getAgentExtractionsByExtractionIds(extractionIds)) {
+      grouped.get(row.extractionId)?.push(row);
+    }
+    return grouped;
+  });
+
+  return {
+    documents,
+    extractions,
+    agentExtractions,
+
+    /** The user's document, undefined when missing or owned by someone else */
+    async document(id: number, userId: number): Promise<Document | undefined> {
+      const document = await documents.load(id);
+      return document?.userId === userId ? document : undefined;
+    },
+
+    /** The user's extraction, undefined when missing or owned by someone else */
+    async extraction(id: number, userId: number): Promise<ExtractionRecord | undefined> {
+      const extraction = await extractions.load(id);
+      return extraction?.userId === userId ? extraction : undefined;
+    },
+
+    /** Agent extractions of an extraction session (check ownership of the session first) */
+    async agentExtractionsOf(extractionId: number): Promise<AgentExtraction[]> {
+      return (await agentExtractions.load(extractionId)) ?? [];
+    },
+  };
+}
+
+export type RequestLoaders = ReturnType<typeof createRequestLoaders>;
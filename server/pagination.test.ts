@@ -0,0 +1,35 @@
+import { describe, expect, it } from "vitest";
+import { decodeCursor, encodeCursor, toPage } from "./pagination";
+
+describe("page cursors", () => {
+  it("round-trips string, number and date sort values", () => {
+    expect(decodeCursor(encodeCursor("paper.pdf", 7))).toEqual({ value: "paper.pdf", id: 7 });
+    expect(decodeCursor(encodeCursor(2048, 8))).toEqual({ value: 2048, id: 8 });
+
+    const createdAt = new Date("2026-03-01T10:20:30Z");
+    const cursor = decodeCursor(encodeCursor(createdAt, 9));
+    expect(cursor).toEqual({ value: createdAt.getTime(), id: 9 });
+    expect(new Date(cursor!.value)).toEqual(createdAt);
+  });
+
+  it("rejects malformed cursors", () => {
+    expect(decodeCursor("not a cursor")).toBeNull();
+    expect(decodeCursor(Buffer.from('{"value":1}').toString("base64url"))).toBeNull();
+    expect(decodeCursor(Buffer.from('[1, "x"]').toString("base64url"))).toBeNull();
+  });
+});
+
+describe("toPage", () => {
+  const rows = [1, 2, 3].map(id => ({ id, name: `row-${id}` }));
+
+  it("returns every row and no cursor on the last page", () => {
+    expect(toPage(rows, 3, row => row.name)).toEqual({ items: rows, nextCursor: null });
+  });
+
+  it("drops the look-ahead row and points the cursor at the last item", () => {
+    const page = toPage(rows, 2, row => row.name);
+
+    expect(page.items.map(row => row.id)).toEqual([1, 2]);
+    expect(decodeCursor(page.nextCursor!)).toEqual({ value: "row-2", id: 2 });
+  });
+});
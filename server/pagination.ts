@@ -0,0 +1,67 @@
+import { and, asc, desc, eq, gt, lt, or, type SQL } from "drizzle-orm";
+import type { AnyMySqlColumn } from "drizzle-orm/mysql-core";
+
+export const DEFAULT_PAGE_SIZE = 30;
+export const MAX_PAGE_SIZE = 100;
+
+export type SortDirection = "asc" | "desc";
+
+/** Position after the last row of a page: its sort value and id (the tie-breaker) */
+export type PageCursor = { value: string | number; id: number };
+
+export type Page<T> = { items: T[]; nextCursor: string | null };
+
+/** Opaque cursor string handed to clients */
+export function encodeCursor(value: string | number | Date, id: number): string {
+  const sortValue = value instanceof Date ? value.getTime() : value;
+  return Buffer.from(JSON.stringify([sortValue, id]), "utf8").toString("base64url");
+}
+
+/** Parse a cursor from encodeCursor; null when it is malformed */
+export function decodeCursor(cursor: string): PageCursor | null {
+  try {
+    const parsed = JSON.parse(Buffer.from(cursor, "base64url").toString("utf8"));
+    if (!Array.isArray(parsed) || parsed.length !== 2) return null;
+    const [value, id] = parsed;
+    if ((typeof value !== "string" && typeof value !== "number") || !Number.isInteger(id)) return null;
+    return { value, id };
+  } catch {
+    return null;
+  }
+}
+
+const cursorValue = (column: AnyMySqlColumn, cursor: PageCursor) =>
+  column.columnType === "MySqlTimestamp" ? new Date(cursor.value) : cursor.value;
+
+/** ORDER BY for a keyset page: the sort column, then id to break ties */
+export function keysetOrderBy(column: AnyMySqlColumn, idColumn: AnyMySqlColumn, direction: SortDirection): SQL[] {
+  const order = direction === "asc" ? asc : desc;
+  return [order(column), order(idColumn)];
+}
+
+/** WHERE condition selecting the rows that come after the cursor in keysetOrderBy order */
+export function keysetAfter(
+  column: AnyMySqlColumn,
+  idColumn: AnyMySqlColumn,
+  direction: SortDirection,
+  cursor: PageCursor
+): SQL {
+  const after = direction === "asc" ? gt : lt;
+  const value = cursorValue(column, cursor);
+  return or(after(column, value), and(eq(column, value), after(idColumn, cursor.id)))!;
+}
+
+/**
+ * Turn `limit + 1` fetched rows into a page: the extra row only signals that
+ * another page exists
+ */
+export function toPage<T extends { id: number }>(
+  rows: T[],
+  limit: number,
+  sortValue: (row: T) => string | number | Date
+): Page<T> {
+  if (rows.length <= limit) return { items: rows, nextCursor: null };
+  const items = rows.slice(0, limit);
+  const last = items[items.length - 1];
+  return { items, nextCursor: encodeCursor(sortValue(last), last.id) };
+}
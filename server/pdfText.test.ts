@@ -0,0 +1,43 @@
+import { describe, expect, it, vi } from "vitest";
+import type { DocumentPage } from "../drizzle/schema";
+import { buildPageText, buildDocumentText, encodeDocumentPage, decodeDocumentPage } from "./pdfText";
+
+vi.mock("./db", () => ({
+  getDocumentPages: vi.fn().mockResolvedValue([]),
+}));
+
+const rawItems = [
+  { str: "Methods", transform: [1, 0, 0, 1, 72, 700], width: 40, height: 12 },
+  { str: "   ", transform: [1, 0, 0, 1, 112, 700], width: 5, height: 12 },
+  { str: "120 patients were randomized", transform: [1, 0, 0, 1, 72, 680.123], width: 150.456, height: 10 },
+];
+
+describe("pdf text", () => {
+  it("joins non-empty items and records their offsets and positions", () => {
+    const page = buildPageText(1, rawItems);
+
+    expect(page.text).toBe("Methods 120 patients were randomized");
+    expect(page.items).toEqual([
+      [0, 7, 72, 700, 40, 12],
+      [8, 36, 72, 680.12, 150.46, 10],
+    ]);
+    expect(page.text.slice(page.items[1][0], page.items[1][1])).toBe("120 patients were randomized");
+  });
+
+  it("round-trips pages through the compressed row format", () => {
+    const page = buildPageText(3, rawItems);
+    const row = encodeDocumentPage(7, page);
+
+    expect(row.documentId).toBe(7);
+    expect(row.charCount).toBe(page.text.length);
+
+    const decoded = decodeDocumentPage({ ...row, id: 1, createdAt: new Date() } as DocumentPage);
+    expect(decoded).toEqual(page);
+  });
+
+  it("builds document text with page markers", () => {
+    const text = buildDocumentText([buildPageText(1, rawItems), { pageNumber: 2, text: "Results", items: [] }]);
+
+    expect(text).toBe("--- Page 1 ---\nMethods 120 patients were randomized\n--- Page 2 ---\nResults\n");
+  });
+});
@@ -0,0 +1,58 @@
+import { gzipSync, gunzipSync } from "zlib";
+import type { DocumentPage, InsertDocumentPage } from "../drizzle/schema";
+import { getDocumentPages } from "./db";
+import { buildDocumentText, buildPageText, type ParsedPdfPage, type RawTextItem } from "@shared/pdfPageText";
+
+export { buildDocumentText, buildPageText, type ParsedPdfPage, type PdfTextItem } from "@shared/pdfPageText";
+
+/**
+ * Parse every page of a PDF into text plus item positions
+ */
+export async function parsePdf(data: Uint8Array): Promise<ParsedPdfPage[]> {
+  const pdfjs = await import("pdfjs-dist/legacy/build/pdf.mjs");
+  const pdf = await pdfjs.getDocument({
+    data: new Uint8Array(data),
+    isEvalSupported: false,
+    disableFontFace: true,
+  }).promise;
+
+  try {
+    const pages: ParsedPdfPage[] = [];
+    for (let i = 1; i <= pdf.numPages; i++) {
+      const page = await pdf.getPage(i);
+      const content = await page.getTextContent();
+      pages.push(buildPageText(i, content.items as RawTextItem[]));
+      page.cleanup();
+    }
+    return pages;
+  } finally {
+    await pdf.destroy();
+  }
+}
+
+export function encodeDocumentPage(documentId: number, page: ParsedPdfPage): InsertDocumentPage {
+  return {
+    documentId,
+    pageNumber: page.pageNumber,
+    charCount: page.text.length,
+    textData: gzipSync(Buffer.from(page.text, "utf8")),
+    itemsData: gzipSync(Buffer.from(JSON.stringify(page.items), "utf8")),
+  };
+}
+
+export function decodeDocumentPage(row: DocumentPage): ParsedPdfPage {
+  return {
+    pageNumber: row.pageNumber,
+    text: gunzipSync(row.textData).toString("utf8"),
+    items: JSON.parse(gunzipSync(row.itemsData).toString("utf8")),
+  };
+}
+
+/**
+ * Load the persisted text of a document, or null if it was never parsed
+ */
+export async function getDocumentText(documentId: number): Promise<string | null> {
+  const rows = await getDocumentPages(documentId);
+  if (rows.length === 0) return null;
+  return buildDocumentText(rows.map(decodeDocumentPage));
+}
@@ -0,0 +1,188 @@
+import { afterAll, beforeAll, describe, expect, it, vi } from "vitest";
+import mysql from "mysql2/promise";
+
+/**
+ * Query-plan regression suite: runs the hot db.ts queries against a seeded
+ * MySQL database and fails when EXPLAIN shows a full table scan.
+ *
+ * Needs a disposable database (all of its tables are dropped):
+ *   EXPLAIN_DATABASE_URL=mysql://root@localhost:3306/extraction_explain pnpm test queryPlans
+ */
+const EXPLAIN_DATABASE_URL = process.env.EXPLAIN_DATABASE_URL;
+
+const recorded = vi.hoisted(() => ({ queries: [] as Array<{ sql: string; params: unknown[] }> }));
+
+// Record the SQL db.ts actually sends so the suite follows the real queries
+vi.mock("drizzle-orm/mysql2", async importOriginal => {
+  const actual = await importOriginal<typeof import("drizzle-orm/mysql2")>();
+  return {
+    ...actual,
+    drizzle: (url: string) =>
+      actual.drizzle({
+        connection: url,
+        logger: { logQuery: (sql: string, params: unknown[]) => void recorded.queries.push({ sql, params }) },
+      }),
+  };
+});
+
+import * as db from "./db";
+import { resetTestDatabase } from "./testDatabase";
+import { decodeCursor } from "./pagination";
+import { STUDY_TYPES } from "../drizzle/schema";
+
+const USERS = 250;
+const DOCUMENTS = 5000;
+const AGENT_EXTRACTIONS_FOR = 2000;
+const USER_TEMPLATES = 2000;
+
+type PlanRow = { table: string | null; type: string | null; key: string | null };
+
+describe.skipIf(!EXPLAIN_DATABASE_URL)("query plans for hot queries", () => {
+  let connection: mysql.Connection;
+  const previousDatabaseUrl = process.env.DATABASE_URL;
+
+  const bulkInsert = async (table: string, columns: string[], rows: unknown[][]) => {
+    for (let i = 0; i < rows.length; i += 1000) {
+      await connection.query(
+        `INSERT INTO \`${table}\` (${columns.map(c => `\`${c}\``).join(", ")}) VALUES ?`,
+        [rows.slice(i, i + 1000)]
+      );
+    }
+  };
+
+  beforeAll(async () => {
+    connection = await mysql.createConnection(EXPLAIN_DATABASE_URL!);
+    await resetTestDatabase(connection, EXPLAIN_DATABASE_URL!);
+
+    const userOf = (documentId: number) => (documentId % USERS) + 1;
+    const schema = JSON.stringify({ fields: [] });
+
+    await bulkInsert(
+      "documents",
+      ["userId", "filename", "s3Url", "fileKey", "fileSize"],
+      Array.from({ length: DOCUMENTS }, (_, i) => [userOf(i + 1), `paper-${i}.pdf`, "https://example.com", `key-${i}`, 1024])
+    );
+    await bulkInsert(
+      "extractions",
+      ["documentId", "userId", "schema", "status"],
+      Array.from({ length: DOCUMENTS }, (_, i) => [i + 1, userOf(i + 1), schema, "completed"])
+    );
+    await bulkInsert(
+      "agent_extractions",
+      ["extractionId", "provider", "status"],
+      Array.from({ length: AGENT_EXTRACTIONS_FOR }, (_, i) =>
+        ["gemini", "claude", "openrouter"].map(provider => [i + 1, provider, "completed"])
+      ).flat()
+    );
+    await bulkInsert(
+      "schema_templates",
+      ["userId", "name", "studyType", "schema", "isBuiltIn", "isPublic"],
+      [
+        ...Array.from({ length: 10 }, (_, i) => [null, `Built-in ${i}`, "rct", schema, true, true]),
+        ...Array.from({ length: USER_TEMPLATES }, (_, i) => [
+          (i % USERS) + 1, `Template ${i}`, STUDY_TYPES[i % STUDY_TYPES.length], schema, false, i % 100 === 0,
+        ]),
+      ]
+    );
+    await bulkInsert(
+      "extracted_values",
+      ["extractionId", "provider", "fieldName", "valueType", "textValue", "textKey", "numberValue"],
+      Array.from({ length: DOCUMENTS }, (_, i) => [
+        [i + 1, "final", "total_n", "number", String(i % 500), String(i % 500), i % 500],
+        [i + 1, "final", "study_design", "text", i % 3 ? "Cohort" : "RCT", i % 3 ? "cohort" : "rct", null],
+      ]).flat()
+    );
+    await connection.query(
+      "ANALYZE TABLE `documents`, `extractions`, `agent_extractions`, `schema_templates`, `extracted_values`"
+    );
+
+    process.env.DATABASE_URL = EXPLAIN_DATABASE_URL;
+  }, 120_000);
+
+  afterAll(async () => {
+    process.env.DATABASE_URL = previousDatabaseUrl;
+    await connection?.end();
+  });
+
+  /** EXPLAIN every SELECT issued by `run` */
+  const explain = async (run: () => Promise<unknown>): Promise<PlanRow[]> => {
+    recorded.queries.length = 0;
+    await run();
+
+    const plans: PlanRow[] = [];
+    for (const query of recorded.queries.filter(q => /^\s*select/i.test(q.sql))) {
+      const [rows] = await connection.query(`EXPLAIN ${query.sql}`, query.params);
+      plans.push(...(rows as PlanRow[]));
+    }
+    expect(plans.length).toBeGreaterThan(0);
+    return plans;
+  };
+
+  const expectIndexed = (plans: PlanRow[]) => {
+    for (const row of plans) {
+      expect(row.type, `full scan on ${row.table}: ${JSON.stringify(row)}`).not.toBe("ALL");
+    }
+  };
+
+  it("getDocumentsByUser", async () => {
+    expectIndexed(await explain(() => db.getDocumentsByUser(17)));
+  });
+
+  it("getExtractionsByDocument", async () => {
+    expectIndexed(await explain(() => db.getExtractionsByDocument(42, 43)));
+  });
+
+  it("getAgentExtractionsByExtractionId", async () => {
+    expectIndexed(await explain(() => db.getAgentExtractionsByExtractionId(100)));
+  });
+
+  it("getAgentExtractionByProvider", async () => {
+    const plans = await explain(() => db.getAgentExtractionByProvider(100, "claude"));
+    expectIndexed(plans);
+    expect(plans[0].key).toBe("agent_extractions_extractionId_provider_unique");
+  });
+
+  it("listDocumentsPage", async () => {
+    const first = await db.listDocumentsPage(17, { limit: 10, cursor: null, sort: "createdAt", direction: "desc" });
+    const cursor = decodeCursor(first.nextCursor!);
+    expectIndexed(await explain(() =>
+      db.listDocumentsPage(17, { limit: 10, cursor, sort: "createdAt", direction: "desc" })
+    ));
+  });
+
+  it("listExtractionsPage", async () => {
+    expectIndexed(await explain(() =>
+      db.listExtractionsPage(17, { limit: 10, cursor: null, sort: "createdAt", direction: "desc", status: ["completed"] })
+    ));
+  });
+
+  it("getExtractionExportBatch", async () => {
+    expectIndexed(await explain(() =>
+      db.getExtractionExportBatch(17, { value: Date.UTC(2026, 0, 1), id: 1 }, 100)
+    ));
+  });
+
+  it("findExtractionsByValues", async () => {
+    expectIndexed(await explain(() =>
+      db.findExtractionsByValues(17, {
+        conditions: [
+          { field: "study_design", op: "eq", value: "RCT" },
+          { field: "total_n", op: "gt", value: 200 },
+        ],
+        limit: 10,
+      })
+    ));
+  });
+
+  it("getExtractedFieldStats", async () => {
+    expectIndexed(await explain(() => db.getExtractedFieldStats(17, "total_n")));
+  });
+
+  it("getTemplatesForUser", async () => {
+    expectIndexed(await explain(() => db.getTemplatesForUser(17)));
+  });
+
+  it("getTemplatesByStudyType", async () => {
+    expectIndexed(await explain(() => db.getTemplatesByStudyType(17, "rct")));
+  });
+});
@@ -0,0 +1,34 @@
+import { describe, expect, it } from "vitest";
+import { QuoteIndex } from "@shared/quoteIndex";
+
+const text =
+  "the randomized controlled trial enrolled 120 patients with acute ischemic stroke\u0000" +
+  "outcomes were measured at ninety days using the modified rankin scale";
+
+describe("QuoteIndex", () => {
+  const index = new QuoteIndex(text, "\u0000");
+
+  it("finds the best span within the edit budget", () => {
+    const match = index.find("randomised controlled trial enroled 120 patients", 0.85);
+
+    expect(match).toMatchObject({ start: text.indexOf("randomized"), distance: 2 });
+    expect(text.slice(match!.start, match!.end)).toBe("randomized controlled trial enrolled 120 patients");
+    expect(match!.similarity).toBeCloseTo(1 - 2 / 48);
+  });
+
+  it("finds exact matches with distance 0", () => {
+    expect(index.find("modified rankin scale", 0.9)).toMatchObject({ distance: 0, similarity: 1 });
+  });
+
+  it("returns null when nothing is similar enough", () => {
+    expect(index.find("patients received oral aspirin daily", 0.85)).toBeNull();
+  });
+
+  it("does not match across the boundary", () => {
+    expect(index.find("ischemic stroke outcomes were measured", 0.9)).toBeNull();
+  });
+
+  it("gives up when the edit budget is too large to filter by grams", () => {
+    expect(index.find("stroke", 0.2)).toBeNull();
+  });
+});
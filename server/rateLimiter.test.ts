@@ -0,0 +1,118 @@
+import { describe, expect, it, vi, afterEach } from "vitest";
+import { ProviderLimiter, TokenBucket, rateLimitPauseMs } from "./_core/rateLimiter";
+
+const deferred = () => {
+  let resolve!: () => void;
+  const promise = new Promise<void>(r => { resolve = r; });
+  return { promise, resolve };
+};
+
+const flush = () => new Promise(resolve => setImmediate(resolve));
+
+describe("llm rate limiter", () => {
+  afterEach(() => {
+    vi.useRealTimers();
+  });
+
+  it("refills token buckets continuously up to one minute of quota", () => {
+    let now = 0;
+    const bucket = new TokenBucket(60, () => now);
+
+    bucket.take(60);
+    expect(bucket.delayFor(1)).toBe(1000);
+
+    now = 30_000;
+    expect(Math.round(bucket.level)).toBe(30);
+    expect(bucket.delayFor(1000)).toBe(30_000);
+  });
+
+  it("caps concurrent calls at maxInFlight", async () => {
+    const limiter = new ProviderLimiter("test", { requestsPerMinute: 1000, tokensPerMinute: 1_000_000, maxInFlight: 2 });
+    const gates = [deferred(), deferred(), deferred()];
+    const started: number[] = [];
+
+    const runs = gates.map((gate, i) =>
+      limiter.run(async () => { started.push(i); await gate.promise; }, { promptTokens: 10, userKey: "u1" })
+    );
+    await flush();
+
+    expect(started).toEqual([0, 1]);
+    expect(limiter.stats()).toMatchObject({ inFlight: 2, queueDepth: 1 });
+
+    gates[0].resolve();
+    await flush();
+    expect(started).toEqual([0, 1, 2]);
+
+    gates[1].resolve();
+    gates[2].resolve();
+    await Promise.all(runs);
+    expect(limiter.stats()).toMatchObject({ inFlight: 0, queueDepth: 0, completed: 3 });
+  });
+
+  it("admits queued users round-robin", async () => {
+    const limiter = new ProviderLimiter("test", { requestsPerMinute: 1000, tokensPerMinute: 1_000_000, maxInFlight: 1 });
+    const blocker = deferred();
+    const order: string[] = [];
+
+    const first = limiter.run(() => blocker.promise, { promptTokens: 1, userKey: "busy" });
+    const runs = [
+      ...["a1", "a2", "a3"].map(id => limiter.run(async () => { order.push(id); }, { promptTokens: 1, userKey: "busy" })),
+      limiter.run(async () => { order.push("b1"); }, { promptTokens: 1, userKey: "other" }),
+    ];
+
+    blocker.resolve();
+    await Promise.all([first, ...runs]);
+
+    expect(order).toEqual(["a1", "b1", "a2", "a3"]);
+  });
+
+  it("drops aborted calls from the queue without running them", async () => {
+    const limiter = new ProviderLimiter("test", { requestsPerMinute: 1000, tokensPerMinute: 1_000_000, maxInFlight: 1 });
+    const blocker = deferred();
+    const controller = new AbortController();
+    const call = vi.fn(async () => {});
+
+    const first = limiter.run(() => blocker.promise, { promptTokens: 1 });
+    const queued = limiter.run(call, { promptTokens: 1, signal: controller.signal });
+    await flush();
+    expect(limiter.stats().queueDepth).toBe(1);
+
+    controller.abort(new Error("stop"));
+    await expect(queued).rejects.toThrow("stop");
+    expect(limiter.stats().queueDepth).toBe(0);
+
+    blocker.resolve();
+    await first;
+    expect(call).not.toHaveBeenCalled();
+    expect(limiter.stats()).toMatchObject({ started: 1, completed: 1 });
+  });
+
+  it("holds calls until the request bucket refills", async () => {
+    vi.useFakeTimers();
+    const limiter = new ProviderLimiter("test", { requestsPerMinute: 1, tokensPerMinute: 1_000_000, maxInFlight: 5 });
+    const calls: number[] = [];
+
+    await limiter.run(async () => { calls.push(1); }, { promptTokens: 1 });
+    const second = limiter.run(async () => { calls.push(2); }, { promptTokens: 1 });
+
+    await vi.advanceTimersByTimeAsync(30_000);
+    expect(calls).toEqual([1]);
+
+    await vi.advanceTimersByTimeAsync(30_000);
+    await second;
+    expect(calls).toEqual([1, 2]);
+    expect(limiter.stats().maxWaitMs).toBeGreaterThanOrEqual(60_000);
+  });
+
+  it("pauses the provider after a 429", async () => {
+    const limiter = new ProviderLimiter("test", { requestsPerMinute: 1000, tokensPerMinute: 1_000_000, maxInFlight: 5 });
+    const error = Object.assign(new Error("Too many requests"), { status: 429, headers: { "retry-after": "3" } });
+
+    await expect(limiter.run(() => Promise.reject(error), { promptTokens: 1 })).rejects.toThrow("Too many requests");
+
+    expect(rateLimitPauseMs(error)).toBe(3000);
+    expect(rateLimitPauseMs(new Error("boom"))).toBeNull();
+    expect(limiter.stats()).toMatchObject({ rateLimited: 1, failed: 1 });
+    expect(limiter.stats().pausedForMs).toBeGreaterThan(0);
+  });
+});
@@ -0,0 +1,186 @@
+import { afterAll, beforeAll, describe, expect, it, vi } from "vitest";
+import mysql from "mysql2/promise";
+import type { TrpcContext } from "./_core/context";
+
+/**
+ * Round-trip benchmark: counts the queries each write-heavy procedure sends
+ * to MySQL and fails when one goes over its budget. LLM calls are mocked.
+ *
+ * Needs a disposable database (all of its tables are dropped):
+ *   BENCH_DATABASE_URL=mysql://root@localhost:3306/extraction_bench pnpm test roundTrips
+ */
+const BENCH_DATABASE_URL = process.env.BENCH_DATABASE_URL;
+
+const recorded = vi.hoisted(() => ({ queries: 0 }));
+
+vi.mock("drizzle-orm/mysql2", async importOriginal => {
+  const actual = await importOriginal<typeof import("drizzle-orm/mysql2")>();
+  return {
+    ...actual,
+    drizzle: (url: string) =>
+      actual.drizzle({
+        connection: url,
+        logger: { logQuery: () => void recorded.queries++ },
+      }),
+  };
+});
+
+const extractedData = vi.hoisted(() => ({ total_n: { value: 120, confidence: "high" as const } }));
+
+vi.mock("./agentExtraction", async importOriginal => ({
+  ...(await importOriginal<typeof import("./agentExtraction")>()),
+  runCachedAgentExtraction: vi.fn(async () => ({ extractedData, cacheHit: false })),
+}));
+
+vi.mock("./_core/llm", async importOriginal => ({
+  ...(await importOriginal<typeof import("./_core/llm")>()),
+  invokeLLM: vi.fn(async () => ({ choices: [{ message: { content: JSON.stringify(extractedData) } }] })),
+}));
+
+import * as db from "./db";
+import { appRouter } from "./routers";
+import { resetTestDatabase } from "./testDatabase";
+
+/**
+ * Maximum queries per call; the counts before in-memory rows and batching are
+ * noted. Writing extractedData also rewrites its extracted_values rows, included
+ * below: one INSERT per write, plus a DELETE when the write drops fields or the
+ * previous data is unknown, and one DELETE per agent reset.
+ */
+const BUDGETS = {
+  "extractions.create": 2, // was 3
+  "extractions.update": 2, // was 2
+  "ai.extract": 5, // was 5
+  "ai.summarize": 2, // was 3
+  "extractions.patchFields": 3, // new: one UPDATE + the patched fields' extracted values
+  "agents.extractWithAllAgents": 15, // was 23 with 3 providers
+  "agents.extractWithAgent": 6, // was 6 on a re-run
+  "templates.create": 1, // was 2
+  "templates.update": 2, // was 3
+} as const;
+
+const documentText = "--- Page 1 ---\nA randomized trial of 120 participants.";
+const schema = { fields: [{ name: "total_n", label: "Total N", type: "integer" as const }] };
+
+describe.skipIf(!BENCH_DATABASE_URL)("database round trips per procedure", () => {
+  let connection: mysql.Connection;
+  const previousDatabaseUrl = process.env.DATABASE_URL;
+  const counts: Record<string, number> = {};
+
+  const caller = appRouter.createCaller({
+    user: {
+      id: 1,
+      openId: "bench-user",
+      email: "bench@example.com",
+      name: "Bench User",
+      loginMethod: "manus",
+      role: "user",
+      createdAt: new Date(),
+      updatedAt: new Date(),
+      lastSignedIn: new Date(),
+    },
+    req: { protocol: "https", headers: {} } as TrpcContext["req"],
+    res: {} as TrpcContext["res"],
+  });
+
+  /** Run a procedure call and record how many queries it sent */
+  const measure = async <T>(name: keyof typeof BUDGETS, run: () => Promise<T>): Promise<T> => {
+    recorded.queries = 0;
+    const result = await run();
+    counts[name] = recorded.queries;
+    expect(recorded.queries, `${name} round trips`).toBeLessThanOrEqual(BUDGETS[name]);
+    return result;
+  };
+
+  beforeAll(async () => {
+    connection = await mysql.createConnection(BENCH_DATABASE_URL!);
+    await resetTestDatabase(connection, BENCH_DATABASE_URL!);
+    process.env.DATABASE_URL = BENCH_DATABASE_URL;
+  }, 60_000);
+
+  afterAll(async () => {
+    process.env.DATABASE_URL = previousDatabaseUrl;
+    await connection?.end();
+    console.table(
+      Object.entries(counts).map(([procedure, queries]) => ({
+        procedure,
+        queries,
+        budget: BUDGETS[procedure as keyof typeof BUDGETS],
+      }))
+    );
+  });
+
+  it("extraction procedures", async () => {
+    const document = await db.createDocument({
+      userId: 1,
+      filename: "trial.pdf",
+      s3Url: "https://example.com/trial.pdf",
+      fileKey: "documents/1/trial.pdf",
+      fileSize: 1024,
+    });
+    expect(document).toEqual(await db.getDocumentById(document.id, 1));
+
+    const extraction = await measure("extractions.create", () =>
+      caller.extractions.create({ documentId: document.id, schema })
+    );
+    // Rows built from the insert must match what MySQL stored
+    expect(extraction).toEqual(await db.getExtractionById(extraction.id, 1));
+
+    await measure("extractions.update", () =>
+      caller.extractions.update({ id: extraction.id, status: "pending" })
+    );
+
+    const extracted = await measure("ai.extract", () =>
+      caller.ai.extract({ extractionId: extraction.id, documentText, bypassCache: true })
+    );
+    expect(extracted.extraction).toEqual(await db.getExtractionById(extraction.id, 1));
+    expect(await db.getExtractedFieldStats(1, "total_n")).toMatchObject({ count: 1, min: 120, max: 120 });
+
+    const patched = await measure("extractions.patchFields", () =>
+      caller.extractions.patchFields({
+        id: extraction.id,
+        expectedVersion: extracted.extraction!.version,
+        set: { total_n: { value: 240, confidence: "high" } },
+      })
+    );
+    const stored = await db.getExtractionById(extraction.id, 1);
+    expect(stored).toMatchObject({ version: patched.version, updatedAt: patched.updatedAt });
+    expect(stored!.extractedData!.total_n.value).toBe(240);
+    expect(await db.getExtractedFieldStats(1, "total_n")).toMatchObject({ count: 1, max: 240 });
+
+    await measure("ai.summarize", () => caller.ai.summarize({ extractionId: extraction.id, documentText }));
+  });
+
+  it("agent procedures", async () => {
+    const document = await db.createDocument({
+      userId: 1,
+      filename: "agents.pdf",
+      s3Url: "https://example.com/agents.pdf",
+      fileKey: "documents/1/agents.pdf",
+      fileSize: 1024,
+    });
+    const extraction = await db.createExtraction({ documentId: document.id, userId: 1, schema });
+
+    const all = await measure("agents.extractWithAllAgents", () =>
+      caller.agents.extractWithAllAgents({ extractionId: extraction.id, documentText })
+    );
+    expect(all.success).toBe(true);
+
+    const single = await measure("agents.extractWithAgent", () =>
+      caller.agents.extractWithAgent({ extractionId: extraction.id, documentText, provider: "claude" })
+    );
+    expect(single.agentExtraction).toEqual(await db.getAgentExtractionByProvider(extraction.id, "claude"));
+  });
+
+  it("template procedures", async () => {
+    const template = await measure("templates.create", () =>
+      caller.templates.create({ name: "Bench template", studyType: "rct", schema })
+    );
+    expect(template).toEqual(await db.getTemplateById(template.id, 1));
+
+    const updated = await measure("templates.update", () =>
+      caller.templates.update({ id: template.id, name: "Renamed template" })
+    );
+    expect(updated.name).toBe("Renamed template");
+  });
+});
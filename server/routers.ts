@@ -1,19 +1,39 @@
 import { COOKIE_NAME } from "@shared/const";
 import { getSessionCookieOptions } from "./_core/cookies";
 import { systemRouter } from "./_core/systemRouter";
-import { publicProcedure, protectedProcedure, router } from "./_core/trpc";
+import { publicProcedure, optionalUserProcedure, protectedProcedure, router } from "./_core/trpc";
+import { sdk } from "./_core/sdk";
 import { z } from "zod";
 import { TRPCError } from "@trpc/server";
 import { 
-  createDocument, getDocumentsByUser, getDocumentById, deleteDocument,
-  createExtraction, getExtractionsByDocument, getExtractionById, updateExtraction, deleteExtraction,
+  createDocument, getDocumentsByUser, deleteDocument,
+  createExtraction, getExtractionsByDocument, updateExtraction, updateExtractionRecord, deleteExtraction,
   getTemplatesForUser, getTemplatesByStudyType, getTemplateById, createTemplate, updateTemplate, deleteTemplate, getBuiltInTemplates,
-  createAgentExtraction, getAgentExtractionsByExtractionId, getAgentExtractionByProvider, updateAgentExtraction, deleteAgentExtractionsByExtractionId
+  createAgentExtraction, createAgentExtractions, getAgentExtractionByProvider,
+  updateAgentExtraction, updateAgentExtractionRecord, deleteAgentExtractionsByExtractionId,
+  saveDocumentPages, hasDocumentPages, getExtractionJobsByExtractionId,
+  listDocumentsPage, listExtractionsPage, listTemplatesPage,
+  findExtractionsByValues, getExtractedFieldStats, listExtractedFields, patchExtractionFields,
+  getDocumentsByIds, createBatchRun, getBatchRunById, getBatchRunsByUser, getBatchItemStatusCounts,
+  listBatchRunItemsPage, cancelBatchRun, retryFailedBatchItems
 } from "./db";
+import { decodeCursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, type PageCursor } from "./pagination";
 import { storagePut } from "./storage";
+import { withExtractionCache } from "./extractionCache";
+import { parsePdf, encodeDocumentPage, getDocumentText, type ParsedPdfPage } from "./pdfText";
+import { extractInChunks, describeChunks, splitDocumentIntoChunks } from "./chunking";
+import { mapWithConcurrency } from "./concurrency";
+import { getModelName, runCachedAgentExtraction } from "./agentExtraction";
+import { compileExtractionSchema, toExtractedData, EXTRACTION_PROMPT_VERSION } from "./extractionPrompt";
+import { streamExtraction } from "./extractionStream";
+import { runWithQuorum } from "./consensus";
+import { beginExtractionRun, cancelExtractionRuns } from "./cancellation";
+import { enqueueAgentExtractions } from "./jobs";
+import { batchScheduler, summarizeBatchProgress } from "./batches";
+import { getGroundingIndex, groundExtractedData, locateQuotes } from "./grounding";
+import { ENV } from "./_core/env";
 import { invokeLLM } from "./_core/llm";
-import { DEFAULT_EXTRACTION_SCHEMA, ExtractionSchema, ExtractedData, LocationData, STUDY_TYPES, StudyType, AI_PROVIDERS, AIProvider } from "../drizzle/schema";
-import Anthropic from "@anthropic-ai/sdk";
+import { DEFAULT_EXTRACTION_SCHEMA, ExtractionSchema, ExtractedData, LocationData, STUDY_TYPES, StudyType, AI_PROVIDERS, AIProvider, EXTRACTED_VALUE_PROVIDERS } from "../drizzle/schema";
 import { nanoid } from "nanoid";
 
 // Schema validators
@@ -48,6 +68,7 @@ const locationValidator = z.object({
     conformsTo: z.string().optional(),
     value: z.string(),
   }),
+  similarity: z.number().min(0).max(1).optional(),
 });
 
 // Extracted field data validator with confidence and source tracking
@@ -57,14 +78,48 @@ const extractedFieldDataValidator = z.object({
   source_location: sourceLocationValidator.optional(),
   location: locationValidator.optional(),
   notes: z.string().optional(),
+  chunk: z.object({
+    index: z.number(),
+    pageStart: z.number().nullable(),
+    pageEnd: z.number().nullable(),
+  }).optional(),
 });
 
+// Top-level extractedData key a patch can address (used in a JSON path, so no quotes or backslashes)
+const patchFieldName = z.string().min(1).max(128).regex(/^[^"\\]+$/, "Field names cannot contain quotes or backslashes");
+
+// Input shared by the keyset-paginated list procedures (`cursor` is the nextCursor of the previous page)
+const pageInputShape = {
+  cursor: z.string().nullish(),
+  limit: z.number().int().min(1).max(MAX_PAGE_SIZE).default(DEFAULT_PAGE_SIZE),
+  direction: z.enum(["asc", "desc"]).default("desc"),
+  createdFrom: z.date().optional(),
+  createdTo: z.date().optional(),
+};
+
+// A filter on one extracted field (see findExtractionsByValues)
+const extractedFieldName = z.string().min(1).max(128);
+const extractedValueConditionValidator = z.discriminatedUnion("op", [
+  z.object({ field: extractedFieldName, op: z.literal("eq"), value: z.union([z.string().max(512), z.number(), z.boolean()]) }),
+  z.object({ field: extractedFieldName, op: z.enum(["gt", "gte", "lt", "lte"]), value: z.number() }),
+  z.object({ field: extractedFieldName, op: z.literal("contains"), value: z.string().trim().min(1).max(512) }),
+  z.object({ field: extractedFieldName, op: z.literal("exists") }),
+]);
+
+const parsePageCursor = (cursor: string | null | undefined): PageCursor | null => {
+  if (!cursor) return null;
+  const decoded = decodeCursor(cursor);
+  if (!decoded) throw new TRPCError({ code: "BAD_REQUEST", message: "Invalid page cursor" });
+  return decoded;
+};
+
 export const appRouter = router({
   system: systemRouter,
   
   auth: router({
-    me: publicProcedure.query(opts => opts.ctx.user),
+    me: optionalUserProcedure.query(opts => opts.ctx.user),
     logout: publicProcedure.mutation(({ ctx }) => {
+      sdk.invalidateSession(sdk.getSessionCookie(ctx.req));
       const cookieOptions = getSessionCookieOptions(ctx.req);
       ctx.res.clearCookie(COOKIE_NAME, { ...cookieOptions, maxAge: -1 });
       return { success: true } as const;
@@ -77,10 +132,25 @@ export const appRouter = router({
       return getDocumentsByUser(ctx.user.id);
     }),
 
+    /** Paginated, filterable document list (for infinite scroll) */
+    listPage: protectedProcedure
+      .input(z.object({
+        ...pageInputShape,
+        sort: z.enum(["createdAt", "filename", "fileSize"]).default("createdAt"),
+        search: z.string().trim().max(256).optional(),
+      }))
+      .query(async ({ ctx, input }) => {
+        return listDocumentsPage(ctx.user.id, {
+          ...input,
+          cursor: parsePageCursor(input.cursor),
+          search: input.search || undefined,
+        });
+      }),
+
     get: protectedProcedure
       .input(z.object({ id: z.number() }))
       .query(async ({ ctx, input }) => {
-        const doc = await getDocumentById(input.id, ctx.user.id);
+        const doc = await ctx.loaders.document(input.id, ctx.user.id);
         if (!doc) throw new TRPCError({ code: "NOT_FOUND", message: "Document not found" });
         return doc;
       }),
@@ -97,6 +167,16 @@ export const appRouter = router({
         const fileKey = `documents/${ctx.user.id}/${nanoid()}-${input.filename}`;
         
         const { url } = await storagePut(fileKey, buffer, input.mimeType);
+
+        // Parse the text once here so AI procedures don't need it from the client
+        let pages: ParsedPdfPage[] = [];
+        if (input.mimeType === "application/pdf") {
+          try {
+            pages = await parsePdf(buffer);
+          } catch (error) {
+            console.warn("[Documents] PDF text parsing failed:", error);
+          }
+        }
         
         const doc = await createDocument({
           userId: ctx.user.id,
@@ -105,11 +185,46 @@ export const appRouter = router({
           fileKey,
           fileSize: input.fileSize,
           mimeType: input.mimeType,
+          pageCount: pages.length > 0 ? pages.length : null,
         });
+
+        if (pages.length > 0) {
+          await saveDocumentPages(pages.map(page => encodeDocumentPage(doc.id, page)));
+        }
         
         return doc;
       }),
 
+    /**
+     * Locate every field's quote in the document's stored text in one pass.
+     * `grounded` is false when the document was not parsed on upload.
+     */
+    ground: protectedProcedure
+      .input(z.object({
+        documentId: z.number(),
+        data: z.record(z.string(), extractedFieldDataValidator),
+      }))
+      .mutation(async ({ ctx, input }) => {
+        const doc = await ctx.loaders.document(input.documentId, ctx.user.id);
+        if (!doc) throw new TRPCError({ code: "NOT_FOUND", message: "Document not found" });
+
+        const index = await getGroundingIndex(doc.id);
+        if (!index) return { grounded: false, data: input.data as ExtractedData };
+        return { grounded: true, data: groundExtractedData(index, input.data as ExtractedData) };
+      }),
+
+    /** Locate one quote; `location` is null when it is not found */
+    locate: protectedProcedure
+      .input(z.object({ documentId: z.number(), quote: z.string().max(4000) }))
+      .query(async ({ ctx, input }) => {
+        const doc = await ctx.loaders.document(input.documentId, ctx.user.id);
+        if (!doc) throw new TRPCError({ code: "NOT_FOUND", message: "Document not found" });
+
+        const index = await getGroundingIndex(doc.id);
+        if (!index) return { available: false, location: null };
+        return { available: true, location: locateQuotes(index, { quote: input.quote }).quote };
+      }),
+
     delete: protectedProcedure
       .input(z.object({ id: z.number() }))
       .mutation(async ({ ctx, input }) => {
@@ -127,10 +242,22 @@ export const appRouter = router({
         return getExtractionsByDocument(input.documentId, ctx.user.id);
       }),
 
+    /** Paginated extraction list across documents, without schema and extracted data */
+    listPage: protectedProcedure
+      .input(z.object({
+        ...pageInputShape,
+        sort: z.enum(["createdAt", "updatedAt"]).default("createdAt"),
+        documentId: z.number().optional(),
+        status: z.array(z.enum(["pending", "extracting", "completed", "failed", "cancelled"])).optional(),
+      }))
+      .query(async ({ ctx, input }) => {
+        return listExtractionsPage(ctx.user.id, { ...input, cursor: parsePageCursor(input.cursor) });
+      }),
+
     get: protectedProcedure
       .input(z.object({ id: z.number() }))
       .query(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.id, ctx.user.id);
+        const extraction = await ctx.loaders.extraction(input.id, ctx.user.id);
         if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
         return extraction;
       }),
@@ -142,7 +269,7 @@ export const appRouter = router({
       }))
       .mutation(async ({ ctx, input }) => {
         // Verify document exists and belongs to user
-        const doc = await getDocumentById(input.documentId, ctx.user.id);
+        const doc = await ctx.loaders.document(input.documentId, ctx.user.id);
         if (!doc) throw new TRPCError({ code: "NOT_FOUND", message: "Document not found" });
 
         const extraction = await createExtraction({
@@ -160,15 +287,53 @@ export const appRouter = router({
         id: z.number(),
         extractedData: z.record(z.string(), extractedFieldDataValidator).optional(),
         summary: z.string().optional(),
-        status: z.enum(["pending", "extracting", "completed", "failed"]).optional(),
+        status: z.enum(["pending", "extracting", "completed", "failed", "cancelled"]).optional(),
       }))
       .mutation(async ({ ctx, input }) => {
         const { id, ...data } = input;
-        const updated = await updateExtraction(id, ctx.user.id, data as any);
+        const extraction = await ctx.loaders.extraction(id, ctx.user.id);
+        const updated = extraction ? await updateExtractionRecord(extraction, data as any) : undefined;
         if (!updated) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        ctx.loaders.extractions.prime(id, updated);
         return updated;
       }),
 
+    /**
+     * Set or remove single fields of the extracted data without sending the whole
+     * object. Returns the new version and the changed fields.
+     */
+    patchFields: protectedProcedure
+      .input(z.object({
+        id: z.number(),
+        /** Version the client's copy is at; CONFLICT if the data changed since */
+        expectedVersion: z.number().int().optional(),
+        set: z.record(patchFieldName, extractedFieldDataValidator).optional(),
+        remove: z.array(patchFieldName).optional(),
+      }))
+      .mutation(async ({ ctx, input }) => {
+        // An empty patch would still bump the version and conflict other editors
+        if (Object.keys(input.set ?? {}).length === 0 && (input.remove ?? []).length === 0) {
+          throw new TRPCError({ code: "BAD_REQUEST", message: "Pass fields to set or remove" });
+        }
+        const result = await patchExtractionFields(
+          input.id,
+          ctx.user.id,
+          { set: input.set as ExtractedData | undefined, remove: input.remove },
+          input.expectedVersion
+        );
+        if (result.status === "not_found") {
+          throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        }
+        if (result.status === "conflict") {
+          throw new TRPCError({
+            code: "CONFLICT",
+            message: `Extraction data changed since version ${input.expectedVersion} (now ${result.version})`,
+          });
+        }
+        ctx.loaders.extractions.clear(input.id);
+        return { version: result.version, updatedAt: result.updatedAt, fields: result.fields };
+      }),
+
     delete: protectedProcedure
       .input(z.object({ id: z.number() }))
       .mutation(async ({ ctx, input }) => {
@@ -183,148 +348,151 @@ export const appRouter = router({
     extract: protectedProcedure
       .input(z.object({
         extractionId: z.number(),
-        documentText: z.string(),
+        /** Optional when the document was parsed server-side on upload */
+        documentText: z.string().optional(),
+        bypassCache: z.boolean().optional(),
       }))
-      .mutation(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.extractionId, ctx.user.id);
+      .mutation(async ({ ctx, input, signal }) => {
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
         if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        const documentText = await resolveDocumentText(extraction.documentId, input.documentText);
 
         // Update status to extracting
         await updateExtraction(input.extractionId, ctx.user.id, { status: "extracting" });
+        const run = beginExtractionRun(input.extractionId, ctx.user.id, { res: ctx.res, signal });
 
         try {
           const schema = extraction.schema as ExtractionSchema;
-          const fieldsDescription = schema.fields.map(f => 
-            `"${f.name}" (${f.description || f.label})`
-          ).join("\n");
-
-          // Build JSON schema for structured output with confidence and source tracking
-          const properties: Record<string, any> = {};
-          schema.fields.forEach(field => {
-            const valueType = field.type === 'number' || field.type === 'integer' 
-              ? { type: ["number", "string"], description: `The extracted value for ${field.label}` }
-              : field.type === 'boolean'
-              ? { type: ["boolean", "string"], description: `The extracted value for ${field.label}` }
-              : { type: "string", description: `The extracted value for ${field.label}` };
-
-            properties[field.name] = {
-              type: "object",
-              properties: {
-                content: valueType,
-                confidence: { 
-                  type: "string", 
-                  enum: ["high", "medium", "low"],
-                  description: "Confidence level: high (explicitly stated), medium (inferred from context), low (ambiguous or uncertain)"
-                },
-                source_location: {
-                  type: "object",
-                  properties: {
-                    page: { type: "integer", description: "Page number where data was found (estimate if unsure)" },
-                    section: { type: "string", description: "Section heading (e.g., Methods, Results, Table 1)" },
-                    specific_location: { type: "string", description: "Specific location (e.g., paragraph 2, Table 2 Row 3)" },
-                    exact_text_reference: { type: "string", description: "VERBATIM text snippet (10-30 words) from document containing this data" }
-                  },
-                  required: ["page", "exact_text_reference"],
-                  additionalProperties: false
-                },
-                notes: { type: "string", description: "Any notes about ambiguity, assumptions, or data quality issues" }
-              },
-              required: ["content", "confidence", "source_location"],
-              additionalProperties: false
-            };
-          });
-
-          const response = await invokeLLM({
-            messages: [
-              {
-                role: "system",
-                content: `You are an expert clinical data extractor following rigorous systematic review standards. Extract data from clinical trial documents with full provenance tracking.
-
-For EVERY field, you MUST return:
-- "content": The extracted value (clean, normalized)
-- "confidence": "high" (explicitly stated in text), "medium" (inferred from context), or "low" (ambiguous/uncertain)
-- "source_location": {
-    "page": Page number (estimate based on document structure if not explicit)
-    "section": Section heading where found (e.g., "Methods", "Results", "Table 1")
-    "specific_location": Precise location (e.g., "paragraph 2", "Table 2, Row 3, Column 4")
-    "exact_text_reference": VERBATIM quote (10-30 words) from document containing this data
-  }
-- "notes": Any issues with data quality, ambiguity, or assumptions made
-
-Guidelines:
-1. ACCURACY: Only extract explicitly stated information. Mark inferences as "medium" confidence.
-2. COMPLETENESS: Extract all instances, not just the first occurrence.
-3. TRANSPARENCY: Every extraction must have verifiable source location.
-4. For tables/figures: Note the specific table/figure number and row/column.
-5. If data is NOT found, set content to empty string and confidence to "low" with explanatory notes.`
-              },
-              {
-                role: "user",
-                content: `Extract the following fields from this clinical trial document with full provenance:
-
-Fields to extract:
-${fieldsDescription}
+          const { extractedData, cacheHit } = await withExtractionCache(
+            {
+              documentText,
+              schema,
+              provider: "gemini",
+              modelName: getModelName("gemini"),
+              variant: EXTRACTION_PROMPT_VERSION,
+            },
+            async () => {
+              const prompt = compileExtractionSchema(schema);
 
-Document Text:
-${input.documentText.substring(0, 50000)}`
-              }
-            ],
-            response_format: {
-              type: "json_schema",
-              json_schema: {
-                name: "extraction_result",
-                strict: true,
-                schema: {
-                  type: "object",
-                  properties,
-                  required: schema.fields.map(f => f.name),
-                  additionalProperties: false
-                }
-              }
-            }
-          });
+              // Long documents are extracted chunk by chunk and merged per field
+              return extractInChunks(documentText, async chunkText => {
+                const response = await invokeLLM({
+                  messages: [
+                    { role: "system", content: prompt.systemPrompt },
+                    { role: "user", content: prompt.buildUserPrompt(chunkText, "gemini") }
+                  ],
+                  response_format: prompt.responseFormat,
+                  signal: run.signal,
+                });
 
-          const content = response.choices[0]?.message?.content;
-          if (!content || typeof content !== 'string') throw new Error("No response from LLM");
+                const content = response.choices[0]?.message?.content;
+                if (!content || typeof content !== 'string') throw new Error("No response from LLM");
 
-          const parsed = JSON.parse(content);
-          
-          // Transform to ExtractedData format with full provenance
-          const extractedData: ExtractedData = {};
-          for (const [key, data] of Object.entries(parsed)) {
-            const fieldData = data as { 
-              content: string | number | boolean; 
-              confidence: 'high' | 'medium' | 'low';
-              source_location: {
-                page: number;
-                section?: string;
-                specific_location?: string;
-                exact_text_reference: string;
-              };
-              notes?: string;
-            };
-            extractedData[key] = {
-              value: fieldData.content ?? "",
-              confidence: fieldData.confidence || 'low',
-              source_location: fieldData.source_location,
-              notes: fieldData.notes,
-              // Location will be populated by frontend after text grounding for PDF highlighting
-            };
-          }
+                // Location will be populated by frontend after text grounding for PDF highlighting
+                return toExtractedData(JSON.parse(content));
+              });
+            },
+            { bypass: input.bypassCache }
+          );
 
-          const updated = await updateExtraction(input.extractionId, ctx.user.id, {
+          const updated = await updateExtractionRecord(extraction, {
             extractedData,
-            status: "completed"
+            status: "completed",
+            processingTimeMs: run.elapsedMs(),
           });
 
-          return { success: true, extractedData, extraction: updated };
+          return { success: true, extractedData, extraction: updated, cacheHit, chunks: describeChunks(documentText) };
         } catch (error) {
-          await updateExtraction(input.extractionId, ctx.user.id, { status: "failed" });
+          const cancelReason = run.cancelReason();
+          await updateExtraction(input.extractionId, ctx.user.id, {
+            status: cancelReason ? "cancelled" : "failed",
+            processingTimeMs: run.elapsedMs(),
+          });
+          if (cancelReason) {
+            throw new TRPCError({ code: "CLIENT_CLOSED_REQUEST", message: cancelReason });
+          }
           console.error("Extraction failed:", error);
           throw new TRPCError({ 
             code: "INTERNAL_SERVER_ERROR", 
             message: error instanceof Error ? error.message : "Extraction failed" 
           });
+        } finally {
+          run.end();
+        }
+      }),
+
+    /** Abort the caller's in-flight AI runs for an extraction */
+    cancel: protectedProcedure
+      .input(z.object({ extractionId: z.number() }))
+      .mutation(async ({ ctx, input }) => {
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
+        if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+
+        const cancelled = cancelExtractionRuns(input.extractionId, ctx.user.id);
+        return { success: true, cancelled };
+      }),
+
+    /**
+     * Streaming variant of extract (SSE subscription): emits each field as soon
+     * as the model has produced it. Uses the text stored at upload, since
+     * subscription input travels in the URL.
+     */
+    extractStream: protectedProcedure
+      .input(z.object({
+        extractionId: z.number(),
+        bypassCache: z.boolean().optional(),
+      }))
+      .subscription(async function* ({ ctx, input, signal }) {
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
+        if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        const documentText = await resolveDocumentText(extraction.documentId);
+
+        await updateExtraction(input.extractionId, ctx.user.id, { status: "extracting" });
+        const run = beginExtractionRun(input.extractionId, ctx.user.id, { signal });
+        let finished = false;
+
+        try {
+          for await (const event of streamExtraction({
+            documentText,
+            schema: extraction.schema as ExtractionSchema,
+            bypassCache: input.bypassCache,
+            signal: run.signal,
+            userKey: String(ctx.user.id),
+          })) {
+            if (event.type === "done") {
+              await updateExtraction(input.extractionId, ctx.user.id, {
+                extractedData: event.extractedData,
+                status: "completed",
+                processingTimeMs: run.elapsedMs(),
+              });
+              finished = true;
+            }
+            yield event;
+          }
+        } catch (error) {
+          const cancelReason = run.cancelReason();
+          if (cancelReason) {
+            throw new TRPCError({ code: "CLIENT_CLOSED_REQUEST", message: cancelReason });
+          }
+          finished = true;
+          await updateExtraction(input.extractionId, ctx.user.id, {
+            status: "failed",
+            processingTimeMs: run.elapsedMs(),
+          });
+          console.error("Streaming extraction failed:", error);
+          throw new TRPCError({
+            code: "INTERNAL_SERVER_ERROR",
+            message: error instanceof Error ? error.message : "Extraction failed"
+          });
+        } finally {
+          run.end();
+          // Cancelled, or the client unsubscribed mid-stream
+          if (!finished) {
+            await updateExtraction(input.extractionId, ctx.user.id, {
+              status: "cancelled",
+              processingTimeMs: run.elapsedMs(),
+            });
+          }
         }
       }),
 
@@ -332,169 +500,78 @@ ${input.documentText.substring(0, 50000)}`
     multiAgentExtract: protectedProcedure
       .input(z.object({
         extractionId: z.number(),
-        documentText: z.string(),
+        /** Optional when the document was parsed server-side on upload */
+        documentText: z.string().optional(),
         providers: z.array(z.enum(["gemini", "claude", "openrouter"])).default(["gemini", "claude", "openrouter"]),
+        bypassCache: z.boolean().optional(),
       }))
-      .mutation(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.extractionId, ctx.user.id);
+      .mutation(async ({ ctx, input, signal }) => {
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
         if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        const documentText = await resolveDocumentText(extraction.documentId, input.documentText);
 
         const schema = extraction.schema as ExtractionSchema;
-        const fieldsDescription = schema.fields.map(f => `- ${f.label}: ${f.description || f.type}`).join('\n');
-
-        // Build JSON schema for structured output
-        const properties: Record<string, any> = {};
-        schema.fields.forEach(field => {
-          const valueType = field.type === 'number' || field.type === 'integer' 
-            ? { type: ["number", "string"], description: `The extracted value for ${field.label}` }
-            : field.type === 'boolean'
-            ? { type: ["boolean", "string"], description: `The extracted value for ${field.label}` }
-            : { type: "string", description: `The extracted value for ${field.label}` };
-
-          properties[field.name] = {
-            type: "object",
-            properties: {
-              content: valueType,
-              confidence: { type: "string", enum: ["high", "medium", "low"] },
-              source_location: {
-                type: "object",
-                properties: {
-                  page: { type: "integer" },
-                  section: { type: "string" },
-                  specific_location: { type: "string" },
-                  exact_text_reference: { type: "string" }
-                },
-                required: ["page", "exact_text_reference"],
-                additionalProperties: false
-              },
-              notes: { type: "string" }
-            },
-            required: ["content", "confidence", "source_location"],
-            additionalProperties: false
-          };
-        });
 
-        const systemPrompt = `You are an expert clinical data extractor. Extract data with full provenance tracking.
-For EVERY field return: content, confidence (high/medium/low), source_location (page, section, exact_text_reference), and notes.`;
-
-        const userPrompt = `Extract these fields from the clinical document:\n${fieldsDescription}\n\nDocument:\n${input.documentText.substring(0, 50000)}`;
-
-        const results: Array<{ provider: AIProvider; extractedData: ExtractedData | null; status: string; error?: string }> = [];
+        const results: Array<{ provider: AIProvider; extractedData: ExtractedData | null; status: string; error?: string; cacheHit?: boolean }> = [];
+        const run = beginExtractionRun(input.extractionId, ctx.user.id, { res: ctx.res, signal });
 
         // Extract with each provider in parallel
         const extractionPromises = input.providers.map(async (provider: AIProvider) => {
+          const startTime = Date.now();
           try {
-            let extractedData: ExtractedData = {};
-
-            if (provider === 'gemini') {
-              // Use built-in LLM (Gemini)
-              const response = await invokeLLM({
-                messages: [
-                  { role: "system", content: systemPrompt },
-                  { role: "user", content: userPrompt }
-                ],
-                response_format: {
-                  type: "json_schema",
-                  json_schema: {
-                    name: "extraction_result",
-                    strict: true,
-                    schema: { type: "object", properties, required: schema.fields.map(f => f.name), additionalProperties: false }
-                  }
-                }
-              });
-              const content = response.choices[0]?.message?.content;
-              if (content && typeof content === 'string') {
-                const parsed = JSON.parse(content);
-                for (const [key, data] of Object.entries(parsed)) {
-                  const fieldData = data as any;
-                  extractedData[key] = {
-                    value: fieldData.content ?? "",
-                    confidence: fieldData.confidence || 'low',
-                    source_location: fieldData.source_location,
-                    notes: fieldData.notes,
-                  };
-                }
-              }
-            } else if (provider === 'claude') {
-              // Use Anthropic Claude
-              const anthropic = new Anthropic();
-              const response = await anthropic.messages.create({
-                model: "claude-sonnet-4-20250514",
-                max_tokens: 8192,
-                system: systemPrompt,
-                messages: [{ role: "user", content: userPrompt + "\n\nRespond with valid JSON only." }]
-              });
-              const textBlock = response.content.find((b: any) => b.type === 'text');
-              if (textBlock && 'text' in textBlock) {
-                const jsonMatch = textBlock.text.match(/\{[\s\S]*\}/);
-                if (jsonMatch) {
-                  const parsed = JSON.parse(jsonMatch[0]);
-                  for (const [key, data] of Object.entries(parsed)) {
-                    const fieldData = data as any;
-                    extractedData[key] = {
-                      value: fieldData.content ?? fieldData.value ?? "",
-                      confidence: fieldData.confidence || 'low',
-                      source_location: fieldData.source_location,
-                      notes: fieldData.notes,
-                    };
-                  }
-                }
-              }
-            } else if (provider === 'openrouter') {
-              // Use OpenRouter API
-              const openrouterKey = process.env.OPENROUTER_API_KEY;
-              if (!openrouterKey) throw new Error('OpenRouter API key not configured');
-              
-              const response = await fetch('https://openrouter.ai/api/v1/chat/completions', {
-                method: 'POST',
-                headers: {
-                  'Authorization': `Bearer ${openrouterKey}`,
-                  'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                  model: 'openai/gpt-4o',
-                  messages: [
-                    { role: "system", content: systemPrompt },
-                    { role: "user", content: userPrompt + "\n\nRespond with valid JSON only." }
-                  ],
-                  response_format: { type: "json_object" }
-                })
-              });
-              const data = await response.json();
-              const content = data.choices?.[0]?.message?.content;
-              if (content) {
-                const parsed = JSON.parse(content);
-                for (const [key, fieldData] of Object.entries(parsed)) {
-                  const fd = fieldData as any;
-                  extractedData[key] = {
-                    value: fd.content ?? fd.value ?? "",
-                    confidence: fd.confidence || 'low',
-                    source_location: fd.source_location,
-                    notes: fd.notes,
-                  };
-                }
-              }
-            }
+            const { extractedData, cacheHit } = await runCachedAgentExtraction(
+              provider, schema, documentText, input.bypassCache, run.signal
+            );
 
             // Save agent extraction to database
             await createAgentExtraction({
               extractionId: input.extractionId,
               provider,
-              modelName: provider === 'gemini' ? 'gemini-pro' : provider === 'claude' ? 'claude-sonnet-4' : 'gpt-4o',
+              modelName: getModelName(provider),
               extractedData,
               status: 'completed',
+              processingTimeMs: Date.now() - startTime,
             });
 
-            return { provider, extractedData, status: 'completed' };
+            return { provider, extractedData, status: 'completed', cacheHit };
           } catch (error) {
+            const cancelReason = run.cancelReason();
+            if (cancelReason) {
+              await createAgentExtraction({
+                extractionId: input.extractionId,
+                provider,
+                status: 'cancelled',
+                errorMessage: cancelReason,
+                processingTimeMs: Date.now() - startTime,
+              });
+              return { provider, extractedData: null, status: 'cancelled', error: cancelReason };
+            }
             console.error(`${provider} extraction failed:`, error);
-            return { provider, extractedData: null, status: 'failed', error: error instanceof Error ? error.message : 'Unknown error' };
+            const errorMessage = error instanceof Error ? error.message : 'Unknown error';
+            await createAgentExtraction({
+              extractionId: input.extractionId,
+              provider,
+              modelName: getModelName(provider),
+              status: 'failed',
+              errorMessage,
+              processingTimeMs: Date.now() - startTime,
+            });
+            return { provider, extractedData: null, status: 'failed', error: errorMessage };
           }
         });
 
-        const extractionResults = await Promise.all(extractionPromises);
+        const extractionResults = await Promise.all(extractionPromises).finally(() => run.end());
         results.push(...extractionResults);
 
+        const cancelReason = run.cancelReason();
+        if (cancelReason) {
+          await updateExtraction(input.extractionId, ctx.user.id, {
+            status: "cancelled",
+            processingTimeMs: run.elapsedMs(),
+          });
+          throw new TRPCError({ code: "CLIENT_CLOSED_REQUEST", message: cancelReason });
+        }
+
         // Build consensus from successful extractions
         const successfulExtractions = results.filter(r => r.status === 'completed' && r.extractedData);
         let consensus: ExtractedData = {};
@@ -519,19 +596,42 @@ For EVERY field return: content, confidence (high/medium/low), source_location (
           }
         }
 
-        return { success: true, results, consensus };
+        return { success: true, results, consensus, chunks: describeChunks(documentText) };
       }),
 
     summarize: protectedProcedure
       .input(z.object({
         extractionId: z.number(),
-        documentText: z.string(),
+        /** Optional when the document was parsed server-side on upload */
+        documentText: z.string().optional(),
       }))
       .mutation(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.extractionId, ctx.user.id);
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
         if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        const documentText = await resolveDocumentText(extraction.documentId, input.documentText);
 
         try {
+          // Long documents: condense each chunk in parallel, then summarize the notes
+          const chunks = splitDocumentIntoChunks(documentText);
+          const summarySource = chunks.length === 1 ? documentText : (
+            await mapWithConcurrency(chunks, ENV.extractionChunkConcurrency, async chunk => {
+              const chunkResponse = await invokeLLM({
+                messages: [
+                  {
+                    role: "system",
+                    content: "You condense parts of clinical trial documents into factual notes for a later summary."
+                  },
+                  {
+                    role: "user",
+                    content: `Write concise notes (max 150 words) on the objective, methods, results and conclusions covered in this part of the document:\n\n${chunk.text}`
+                  }
+                ]
+              });
+              const notes = chunkResponse.choices[0]?.message?.content;
+              return `--- Pages ${chunk.pageStart ?? "?"}-${chunk.pageEnd ?? "?"} ---\n${typeof notes === 'string' ? notes : ""}`;
+            })
+          ).join("\n");
+
           const response = await invokeLLM({
             messages: [
               {
@@ -551,7 +651,7 @@ Structure your response with these sections:
 Keep the summary concise (max 200 words).
 
 Document Text:
-${input.documentText.substring(0, 50000)}`
+${summarySource}`
               }
             ]
           });
@@ -559,7 +659,7 @@ ${input.documentText.substring(0, 50000)}`
           const summaryContent = response.choices[0]?.message?.content;
           const summary = typeof summaryContent === 'string' ? summaryContent : "";
           
-          const updated = await updateExtraction(input.extractionId, ctx.user.id, { summary });
+          const updated = await updateExtractionRecord(extraction, { summary });
 
           return { success: true, summary, extraction: updated };
         } catch (error) {
@@ -586,6 +686,22 @@ ${input.documentText.substring(0, 50000)}`
         return getTemplatesForUser(ctx.user.id);
       }),
 
+    /** Paginated template list without schemas; fetch a template with `get` to edit it */
+    listPage: protectedProcedure
+      .input(z.object({
+        ...pageInputShape,
+        sort: z.enum(["createdAt", "name"]).default("createdAt"),
+        studyType: z.enum(["rct", "cohort", "case_control", "cross_sectional", "meta_analysis", "systematic_review", "case_report", "qualitative", "other"]).optional(),
+        search: z.string().trim().max(256).optional(),
+      }))
+      .query(async ({ ctx, input }) => {
+        return listTemplatesPage(ctx.user.id, {
+          ...input,
+          cursor: parsePageCursor(input.cursor),
+          search: input.search || undefined,
+        });
+      }),
+
     /** Get a single template by ID */
     get: protectedProcedure
       .input(z.object({ id: z.number() }))
@@ -629,7 +745,10 @@ ${input.documentText.substring(0, 50000)}`
       }))
       .mutation(async ({ ctx, input }) => {
         const { id, ...data } = input;
-        const updated = await updateTemplate(id, ctx.user.id, data as any);
+        const template = await getTemplateById(id, ctx.user.id);
+        const updated = template && template.userId === ctx.user.id && !template.isBuiltIn
+          ? await updateTemplate(template, ctx.user.id, data as any)
+          : undefined;
         if (!updated) throw new TRPCError({ code: "NOT_FOUND", message: "Template not found or you don't have permission to edit it" });
         return updated;
       }),
@@ -754,63 +873,72 @@ Create a comprehensive schema with all relevant fields.`
     list: protectedProcedure
       .input(z.object({ extractionId: z.number() }))
       .query(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.extractionId, ctx.user.id);
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
         if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
-        return getAgentExtractionsByExtractionId(input.extractionId);
+        return ctx.loaders.agentExtractionsOf(input.extractionId);
       }),
 
     /** Run multi-agent extraction with all 3 providers */
     extractWithAllAgents: protectedProcedure
       .input(z.object({
         extractionId: z.number(),
-        documentText: z.string(),
+        /** Optional when the document was parsed server-side on upload */
+        documentText: z.string().optional(),
         providers: z.array(z.enum(["gemini", "claude", "openrouter"])).optional(),
+        bypassCache: z.boolean().optional(),
+        /** Return once this many agents agree on every field, cancelling the rest */
+        quorum: z.number().int().min(1).optional(),
       }))
-      .mutation(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.extractionId, ctx.user.id);
+      .mutation(async ({ ctx, input, signal }) => {
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
         if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        const documentText = await resolveDocumentText(extraction.documentId, input.documentText);
 
         const providers = input.providers || ["gemini", "claude", "openrouter"] as AIProvider[];
         const schema = extraction.schema as ExtractionSchema;
         
-        // Create agent extraction records for each provider
-        const agentRecords = await Promise.all(
-          providers.map(provider => 
-            createAgentExtraction({
-              extractionId: input.extractionId,
-              provider,
-              status: "pending",
-            })
-          )
-        );
+        // Create agent extraction records for each provider, already extracting
+        const agentRecords = await createAgentExtractions(input.extractionId, providers, "extracting");
 
         // Update main extraction status
         await updateExtraction(input.extractionId, ctx.user.id, { status: "extracting" });
+        const run = beginExtractionRun(input.extractionId, ctx.user.id, { res: ctx.res, signal });
 
-        // Run extractions in parallel
-        const results = await Promise.allSettled(
-          agentRecords.map(async (record) => {
+        // Run extractions in parallel, stopping early once the quorum agrees
+        const { results, consensus } = await runWithQuorum(
+          agentRecords.length,
+          async (index, signal) => {
+            const record = agentRecords[index];
             const startTime = Date.now();
             try {
-              await updateAgentExtraction(record.id, { status: "extracting" });
-              
-              const extractedData = await runAgentExtraction(
+              const { extractedData, cacheHit } = await runCachedAgentExtraction(
                 record.provider as AIProvider,
                 schema,
-                input.documentText
+                documentText,
+                input.bypassCache,
+                signal
               );
               
               const processingTimeMs = Date.now() - startTime;
-              await updateAgentExtraction(record.id, {
+              await updateAgentExtractionRecord(record, {
                 extractedData,
                 status: "completed",
                 processingTimeMs,
                 modelName: getModelName(record.provider as AIProvider),
               });
               
-              return { provider: record.provider, extractedData, success: true };
+              return { provider: record.provider, extractedData, success: true, cacheHit };
             } catch (error) {
               const processingTimeMs = Date.now() - startTime;
+              if (signal.aborted) {
+                const reason = signal.reason instanceof Error ? signal.reason.message : "Cancelled";
+                await updateAgentExtraction(record.id, {
+                  status: "cancelled",
+                  errorMessage: reason,
+                  processingTimeMs,
+                });
+                return { provider: record.provider, error: reason, success: false, cancelled: true };
+              }
               await updateAgentExtraction(record.id, {
                 status: "failed",
                 errorMessage: error instanceof Error ? error.message : "Unknown error",
@@ -818,17 +946,35 @@ Create a comprehensive schema with all relevant fields.`
               });
               return { provider: record.provider, error: error instanceof Error ? error.message : "Unknown error", success: false };
             }
-          })
-        );
+          },
+          {
+            quorum: input.quorum ?? null,
+            fieldNames: schema.fields.map(f => f.name),
+            dataOf: result => (result.success ? result.extractedData ?? null : null),
+            signal: run.signal,
+          }
+        ).finally(() => run.end());
+
+        const cancelReason = run.cancelReason();
+        if (cancelReason) {
+          await updateExtraction(input.extractionId, ctx.user.id, {
+            status: "cancelled",
+            processingTimeMs: run.elapsedMs(),
+          });
+          throw new TRPCError({ code: "CLIENT_CLOSED_REQUEST", message: cancelReason });
+        }
 
         // Check if at least one succeeded
-        const successCount = results.filter(r => r.status === "fulfilled" && (r.value as any).success).length;
+        const successCount = results.filter(r => r.status === "fulfilled" && r.value.success).length;
         await updateExtraction(input.extractionId, ctx.user.id, { 
-          status: successCount > 0 ? "completed" : "failed" 
+          status: successCount > 0 ? "completed" : "failed",
+          processingTimeMs: run.elapsedMs(),
         });
 
         return {
           success: successCount > 0,
+          quorumReached: consensus !== null,
+          consensus,
           results: results.map((r, i) => {
             const baseResult = r.status === "fulfilled" ? r.value : { success: false, error: (r as any).reason?.message };
             return {
@@ -843,66 +989,143 @@ Create a comprehensive schema with all relevant fields.`
     extractWithAgent: protectedProcedure
       .input(z.object({
         extractionId: z.number(),
-        documentText: z.string(),
+        /** Optional when the document was parsed server-side on upload */
+        documentText: z.string().optional(),
         provider: z.enum(["gemini", "claude", "openrouter"]),
+        bypassCache: z.boolean().optional(),
       }))
-      .mutation(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.extractionId, ctx.user.id);
+      .mutation(async ({ ctx, input, signal }) => {
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
         if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        const documentText = await resolveDocumentText(extraction.documentId, input.documentText);
 
         const schema = extraction.schema as ExtractionSchema;
         
-        // Check if agent extraction already exists
-        let agentRecord = await getAgentExtractionByProvider(input.extractionId, input.provider);
-        if (!agentRecord) {
-          agentRecord = await createAgentExtraction({
-            extractionId: input.extractionId,
-            provider: input.provider,
-            status: "pending",
-          });
-        }
+        // Create the agent record, or reset the one from a previous run
+        const agentRecord = await createAgentExtraction({
+          extractionId: input.extractionId,
+          provider: input.provider,
+          status: "extracting",
+        });
 
         const startTime = Date.now();
+        const run = beginExtractionRun(input.extractionId, ctx.user.id, { res: ctx.res, signal });
         try {
-          await updateAgentExtraction(agentRecord.id, { status: "extracting" });
-          
-          const extractedData = await runAgentExtraction(
+          const { extractedData, cacheHit } = await runCachedAgentExtraction(
             input.provider,
             schema,
-            input.documentText
+            documentText,
+            input.bypassCache,
+            run.signal
           );
           
           const processingTimeMs = Date.now() - startTime;
-          const updated = await updateAgentExtraction(agentRecord.id, {
+          const updated = await updateAgentExtractionRecord(agentRecord, {
             extractedData,
             status: "completed",
             processingTimeMs,
             modelName: getModelName(input.provider),
           });
           
-          return { success: true, agentExtraction: updated };
+          return { success: true, agentExtraction: updated, cacheHit };
         } catch (error) {
           const processingTimeMs = Date.now() - startTime;
+          const cancelReason = run.cancelReason();
           await updateAgentExtraction(agentRecord.id, {
-            status: "failed",
-            errorMessage: error instanceof Error ? error.message : "Unknown error",
+            status: cancelReason ? "cancelled" : "failed",
+            errorMessage: cancelReason ?? (error instanceof Error ? error.message : "Unknown error"),
             processingTimeMs,
           });
+          if (cancelReason) {
+            throw new TRPCError({ code: "CLIENT_CLOSED_REQUEST", message: cancelReason });
+          }
           throw new TRPCError({
             code: "INTERNAL_SERVER_ERROR",
             message: error instanceof Error ? error.message : "Extraction failed"
           });
+        } finally {
+          run.end();
+        }
+      }),
+
+    /** Queue multi-agent extraction for the background workers and return immediately */
+    enqueueExtraction: protectedProcedure
+      .input(z.object({
+        extractionId: z.number(),
+        /** Optional when the document was parsed server-side on upload */
+        documentText: z.string().optional(),
+        providers: z.array(z.enum(["gemini", "claude", "openrouter"])).optional(),
+        bypassCache: z.boolean().optional(),
+      }))
+      .mutation(async ({ ctx, input }) => {
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
+        if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        if (!input.documentText && !(await hasDocumentPages(extraction.documentId))) {
+          throw new TRPCError({ code: "BAD_REQUEST", message: "Document text is not available; send documentText" });
         }
+
+        const jobs = await enqueueAgentExtractions({
+          extraction,
+          userId: ctx.user.id,
+          providers: input.providers || ["gemini", "claude", "openrouter"] as AIProvider[],
+          documentText: input.documentText,
+          bypassCache: input.bypassCache,
+        });
+
+        return {
+          extractionId: input.extractionId,
+          jobs: jobs.map(job => ({
+            id: job.id,
+            provider: job.provider,
+            agentExtractionId: job.agentExtractionId,
+            status: job.status,
+          })),
+        };
+      }),
+
+    /** Job progress for a queued extraction, joined with the agent extraction status */
+    jobStatus: protectedProcedure
+      .input(z.object({ extractionId: z.number() }))
+      .query(async ({ ctx, input }) => {
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
+        if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+
+        const [jobs, agentExtractions] = await Promise.all([
+          getExtractionJobsByExtractionId(input.extractionId),
+          ctx.loaders.agentExtractionsOf(input.extractionId),
+        ]);
+        const agentsById = new Map(agentExtractions.map(ae => [ae.id, ae]));
+
+        return {
+          extractionStatus: extraction.status,
+          // Not done before the jobs are queued (or after they were pruned)
+          done: jobs.length > 0 && jobs.every(job =>
+            job.status === "completed" || job.status === "failed" ||
+            agentsById.get(job.agentExtractionId)?.status === "cancelled"
+          ),
+          jobs: jobs.map(job => ({
+            id: job.id,
+            provider: job.provider,
+            status: job.status,
+            attempts: job.attempts,
+            maxAttempts: job.maxAttempts,
+            lastError: job.lastError,
+            runAfter: job.runAfter,
+            completedAt: job.completedAt,
+            agentExtractionId: job.agentExtractionId,
+            agentStatus: agentsById.get(job.agentExtractionId)?.status ?? null,
+          })),
+        };
       }),
 
     /** Get comparison metrics for agent extractions */
     getComparison: protectedProcedure
       .input(z.object({ extractionId: z.number() }))
       .query(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.extractionId, ctx.user.id);
+        const extraction = await ctx.loaders.extraction(input.extractionId, ctx.user.id);
         if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
 
-        const agentExtractions = await getAgentExtractionsByExtractionId(input.extractionId);
+        const agentExtractions = await ctx.loaders.agentExtractionsOf(input.extractionId);
         const schema = extraction.schema as ExtractionSchema;
         
         // Calculate field-level agreement
@@ -985,14 +1208,11 @@ Create a comprehensive schema with all relevant fields.`
     acceptValue: protectedProcedure
       .input(z.object({
         extractionId: z.number(),
-        fieldName: z.string(),
+        fieldName: patchFieldName,
         value: z.any(),
         sourceProvider: z.string().optional(), // Which agent's value to use
       }))
       .mutation(async ({ ctx, input }) => {
-        const extraction = await getExtractionById(input.extractionId, ctx.user.id);
-        if (!extraction) throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
-
         // Get source agent's full data if specified
         let fieldData: any = { value: input.value, confidence: "high" };
         if (input.sourceProvider) {
@@ -1008,18 +1228,16 @@ Create a comprehensive schema with all relevant fields.`
           }
         }
 
-        // Update main extraction with accepted value
-        const currentData = (extraction.extractedData || {}) as ExtractedData;
-        const updatedData = {
-          ...currentData,
-          [input.fieldName]: fieldData
-        };
-
-        const updated = await updateExtraction(input.extractionId, ctx.user.id, {
-          extractedData: updatedData
+        // Write only the accepted field (the patch also checks ownership)
+        const result = await patchExtractionFields(input.extractionId, ctx.user.id, {
+          set: { [input.fieldName]: fieldData },
         });
+        if (result.status !== "patched") {
+          throw new TRPCError({ code: "NOT_FOUND", message: "Extraction not found" });
+        }
+        ctx.loaders.extractions.clear(input.extractionId);
 
-        return { success: true, extraction: updated };
+        return { success: true, version: result.version, fields: result.fields };
       }),
 
     /** Get available AI providers */
@@ -1034,196 +1252,156 @@ Create a comprehensive schema with all relevant fields.`
       }));
     }),
   }),
-});
 
-// Helper function to get model name for each provider
-function getModelName(provider: AIProvider): string {
-  switch (provider) {
-    case "gemini": return "gemini-1.5-flash";
-    case "claude": return "claude-3-5-sonnet-20241022";
-    case "openrouter": return "anthropic/claude-3.5-sonnet";
-    default: return "unknown";
-  }
-}
+  // ============ Batch Runs ============
+  // One schema extracted from many documents by the background job workers
+  batches: router({
+    /** Start a batch run over the user's documents (they must have been parsed on upload) */
+    create: protectedProcedure
+      .input(z.object({
+        name: z.string().trim().min(1).max(255).optional(),
+        documentIds: z.array(z.number().int()).min(1).max(1000),
+        /** Template to take the schema from; or pass `schema` */
+        templateId: z.number().optional(),
+        schema: extractionSchemaValidator.optional(),
+        providers: z.array(z.enum(["gemini", "claude", "openrouter"])).min(1).optional(),
+        bypassCache: z.boolean().optional(),
+      }))
+      .mutation(async ({ ctx, input }) => {
+        let schema: ExtractionSchema | undefined = input.schema;
+        let name = input.name;
+        if (input.templateId !== undefined) {
+          const template = await getTemplateById(input.templateId, ctx.user.id);
+          if (!template) throw new TRPCError({ code: "NOT_FOUND", message: "Template not found" });
+          schema = template.schema as ExtractionSchema;
+          name ??= template.name;
+        }
+        if (!schema) throw new TRPCError({ code: "BAD_REQUEST", message: "Pass a templateId or a schema" });
 
-// Helper function to run extraction with a specific provider
-async function runAgentExtraction(
-  provider: AIProvider,
-  schema: ExtractionSchema,
-  documentText: string
-): Promise<ExtractedData> {
-  const fieldsDescription = schema.fields.map(f => 
-    `"${f.name}" (${f.description || f.label})`
-  ).join("\n");
-
-  const systemPrompt = `You are an expert clinical data extractor following rigorous systematic review standards. Extract data from clinical trial documents with full provenance tracking.
-
-For EVERY field, you MUST return:
-- "content": The extracted value (clean, normalized)
-- "confidence": "high" (explicitly stated in text), "medium" (inferred from context), or "low" (ambiguous/uncertain)
-- "source_location": {
-    "page": Page number (estimate based on document structure if not explicit)
-    "section": Section heading where found (e.g., "Methods", "Results", "Table 1")
-    "specific_location": Precise location (e.g., "paragraph 2", "Table 2, Row 3, Column 4")
-    "exact_text_reference": VERBATIM quote (10-30 words) from document containing this data
-  }
-- "notes": Any issues with data quality, ambiguity, or assumptions made
+        const documentIds = Array.from(new Set(input.documentIds));
+        const owned = new Map(
+          (await getDocumentsByIds(documentIds)).filter(doc => doc.userId === ctx.user.id).map(doc => [doc.id, doc])
+        );
+        const missing = documentIds.filter(id => !owned.has(id));
+        if (missing.length > 0) {
+          throw new TRPCError({ code: "NOT_FOUND", message: `Documents not found: ${missing.slice(0, 20).join(", ")}` });
+        }
+        // pageCount is set once the upload's text has been parsed
+        const unparsed = documentIds.filter(id => owned.get(id)!.pageCount === null);
+        if (unparsed.length > 0) {
+          throw new TRPCError({
+            code: "BAD_REQUEST",
+            message: `Documents have no parsed text: ${unparsed.slice(0, 20).join(", ")}`,
+          });
+        }
 
-Guidelines:
-1. ACCURACY: Only extract explicitly stated information. Mark inferences as "medium" confidence.
-2. COMPLETENESS: Extract all instances, not just the first occurrence.
-3. TRANSPARENCY: Every extraction must have verifiable source location.
-4. For tables/figures: Note the specific table/figure number and row/column.
-5. If data is NOT found, set content to empty string and confidence to "low" with explanatory notes.`;
+        const run = await createBatchRun({
+          userId: ctx.user.id,
+          name: name ?? `Batch of ${documentIds.length} documents`,
+          templateId: input.templateId ?? null,
+          schema,
+          providers: input.providers ?? ["gemini", "claude", "openrouter"],
+          bypassCache: input.bypassCache ?? false,
+        }, documentIds);
+        batchScheduler.wake();
+        return { ...run, itemCount: documentIds.length };
+      }),
 
-  const userPrompt = `Extract the following fields from this clinical trial document with full provenance:
+    /** The user's recent batch runs with their progress */
+    list: protectedProcedure.query(async ({ ctx }) => {
+      const runs = await getBatchRunsByUser(ctx.user.id);
+      const counts = await getBatchItemStatusCounts(runs.map(run => run.id));
+      return runs.map(({ schema, ...run }) => ({
+        ...run,
+        fieldCount: schema.fields.length,
+        progress: summarizeBatchProgress(counts.filter(row => row.batchRunId === run.id)),
+      }));
+    }),
 
-Fields to extract:
-${fieldsDescription}
+    /** A batch run with its progress, throughput and estimated time left */
+    get: protectedProcedure
+      .input(z.object({ id: z.number() }))
+      .query(async ({ ctx, input }) => {
+        const run = await getBatchRunById(input.id, ctx.user.id);
+        if (!run) throw new TRPCError({ code: "NOT_FOUND", message: "Batch run not found" });
+        return { ...run, progress: summarizeBatchProgress(await getBatchItemStatusCounts([run.id])) };
+      }),
 
-Document Text:
-${documentText.substring(0, 50000)}`;
-
-  // Build JSON schema for structured output
-  const properties: Record<string, any> = {};
-  schema.fields.forEach(field => {
-    const valueType = field.type === 'number' || field.type === 'integer' 
-      ? { type: ["number", "string"], description: `The extracted value for ${field.label}` }
-      : field.type === 'boolean'
-      ? { type: ["boolean", "string"], description: `The extracted value for ${field.label}` }
-      : { type: "string", description: `The extracted value for ${field.label}` };
-
-    properties[field.name] = {
-      type: "object",
-      properties: {
-        content: valueType,
-        confidence: { 
-          type: "string", 
-          enum: ["high", "medium", "low"],
-          description: "Confidence level"
-        },
-        source_location: {
-          type: "object",
-          properties: {
-            page: { type: "integer" },
-            section: { type: "string" },
-            specific_location: { type: "string" },
-            exact_text_reference: { type: "string" }
-          },
-          required: ["page", "exact_text_reference"],
-          additionalProperties: false
-        },
-        notes: { type: "string" }
-      },
-      required: ["content", "confidence", "source_location"],
-      additionalProperties: false
-    };
-  });
-
-  let parsed: any;
-
-  if (provider === "gemini") {
-    // Use built-in LLM (Gemini)
-    const response = await invokeLLM({
-      messages: [
-        { role: "system", content: systemPrompt },
-        { role: "user", content: userPrompt }
-      ],
-      response_format: {
-        type: "json_schema",
-        json_schema: {
-          name: "extraction_result",
-          strict: true,
-          schema: {
-            type: "object",
-            properties,
-            required: schema.fields.map(f => f.name),
-            additionalProperties: false
-          }
-        }
-      }
-    });
-
-    const content = response.choices[0]?.message?.content;
-    if (!content || typeof content !== 'string') throw new Error("No response from Gemini");
-    parsed = JSON.parse(content);
-
-  } else if (provider === "claude") {
-    // Use Anthropic Claude
-    const anthropic = new Anthropic();
-    const response = await anthropic.messages.create({
-      model: "claude-3-5-sonnet-20241022",
-      max_tokens: 8192,
-      system: systemPrompt,
-      messages: [
-        { role: "user", content: userPrompt + "\n\nRespond with valid JSON only, no markdown." }
-      ]
-    });
-
-    const content = response.content[0];
-    if (content.type !== 'text') throw new Error("No text response from Claude");
-    // Extract JSON from response (Claude might wrap in markdown)
-    let jsonStr = content.text;
-    const jsonMatch = jsonStr.match(/```json\n?([\s\S]*?)\n?```/) || jsonStr.match(/```\n?([\s\S]*?)\n?```/);
-    if (jsonMatch) jsonStr = jsonMatch[1];
-    parsed = JSON.parse(jsonStr.trim());
-
-  } else if (provider === "openrouter") {
-    // Use OpenRouter API
-    const response = await fetch("https://openrouter.ai/api/v1/chat/completions", {
-      method: "POST",
-      headers: {
-        "Authorization": `Bearer ${process.env.OPENROUTER_API_KEY}`,
-        "Content-Type": "application/json",
-        "HTTP-Referer": process.env.VITE_FRONTEND_FORGE_API_URL || "https://manus.im",
-      },
-      body: JSON.stringify({
-        model: "anthropic/claude-3.5-sonnet",
-        messages: [
-          { role: "system", content: systemPrompt },
-          { role: "user", content: userPrompt + "\n\nRespond with valid JSON only, no markdown." }
-        ],
-        max_tokens: 8192,
-      })
-    });
-
-    if (!response.ok) {
-      const error = await response.text();
-      throw new Error(`OpenRouter API error: ${error}`);
-    }
-
-    const data = await response.json();
-    let jsonStr = data.choices?.[0]?.message?.content || "";
-    const jsonMatch = jsonStr.match(/```json\n?([\s\S]*?)\n?```/) || jsonStr.match(/```\n?([\s\S]*?)\n?```/);
-    if (jsonMatch) jsonStr = jsonMatch[1];
-    parsed = JSON.parse(jsonStr.trim());
-  } else {
-    throw new Error(`Unknown provider: ${provider}`);
-  }
+    /** One page of a batch run's items, in document order */
+    items: protectedProcedure
+      .input(z.object({
+        id: z.number(),
+        status: z.array(z.enum(["pending", "running", "completed", "failed", "cancelled"])).optional(),
+        cursor: z.string().nullish(),
+        limit: z.number().int().min(1).max(MAX_PAGE_SIZE).default(DEFAULT_PAGE_SIZE),
+      }))
+      .query(async ({ ctx, input }) => {
+        const run = await getBatchRunById(input.id, ctx.user.id);
+        if (!run) throw new TRPCError({ code: "NOT_FOUND", message: "Batch run not found" });
+        return listBatchRunItemsPage(run.id, { ...input, cursor: parsePageCursor(input.cursor) });
+      }),
 
-  // Transform to ExtractedData format
-  const extractedData: ExtractedData = {};
-  for (const [key, data] of Object.entries(parsed)) {
-    const fieldData = data as { 
-      content: string | number | boolean; 
-      confidence: 'high' | 'medium' | 'low';
-      source_location: {
-        page: number;
-        section?: string;
-        specific_location?: string;
-        exact_text_reference: string;
-      };
-      notes?: string;
-    };
-    extractedData[key] = {
-      value: fieldData.content ?? "",
-      confidence: fieldData.confidence || 'low',
-      source_location: fieldData.source_location,
-      notes: fieldData.notes,
-    };
-  }
+    /** Stop starting new items; items already running finish */
+    cancel: protectedProcedure
+      .input(z.object({ id: z.number() }))
+      .mutation(async ({ ctx, input }) => {
+        const cancelled = await cancelBatchRun(input.id, ctx.user.id);
+        if (!cancelled) throw new TRPCError({ code: "NOT_FOUND", message: "No running batch run found" });
+        return { success: true };
+      }),
+
+    /** Run the failed items again, each in a new extraction session */
+    retryFailed: protectedProcedure
+      .input(z.object({ id: z.number() }))
+      .mutation(async ({ ctx, input }) => {
+        const run = await getBatchRunById(input.id, ctx.user.id);
+        if (!run) throw new TRPCError({ code: "NOT_FOUND", message: "Batch run not found" });
+        const requeued = await retryFailedBatchItems(run.id, ctx.user.id);
+        if (requeued > 0) batchScheduler.wake();
+        return { requeued };
+      }),
+  }),
 
-  return extractedData;
+  // Cross-study queries over the extracted_values table
+  analytics: router({
+    fields: protectedProcedure
+      .input(z.object({ provider: z.enum(EXTRACTED_VALUE_PROVIDERS).default("final") }).optional())
+      .query(async ({ ctx, input }) => {
+        return listExtractedFields(ctx.user.id, input?.provider);
+      }),
+
+    fieldStats: protectedProcedure
+      .input(z.object({
+        field: extractedFieldName,
+        provider: z.enum(EXTRACTED_VALUE_PROVIDERS).default("final"),
+        topValues: z.number().int().min(1).max(50).default(10),
+      }))
+      .query(async ({ ctx, input }) => {
+        return getExtractedFieldStats(ctx.user.id, input.field, input.provider, input.topValues);
+      }),
+
+    findExtractions: protectedProcedure
+      .input(z.object({
+        conditions: z.array(extractedValueConditionValidator).min(1).max(10),
+        provider: z.enum(EXTRACTED_VALUE_PROVIDERS).default("final"),
+        cursor: z.string().nullish(),
+        limit: z.number().int().min(1).max(MAX_PAGE_SIZE).default(DEFAULT_PAGE_SIZE),
+      }))
+      .query(async ({ ctx, input }) => {
+        return findExtractionsByValues(ctx.user.id, { ...input, cursor: parsePageCursor(input.cursor) });
+      }),
+  }),
+});
+
+// Helper to use the request's text, falling back to the pages parsed on upload
+async function resolveDocumentText(documentId: number, documentText?: string): Promise<string> {
+  if (documentText) return documentText;
+
+  const storedText = await getDocumentText(documentId);
+  if (!storedText) {
+    throw new TRPCError({ code: "BAD_REQUEST", message: "Document text is not available; send documentText" });
+  }
+  return storedText;
 }
 
 export type AppRouter = typeof appRouter;
@@ -0,0 +1,17 @@
+import type mysql from "mysql2/promise";
+import { drizzle } from "drizzle-orm/mysql2";
+import { migrate } from "drizzle-orm/mysql2/migrator";
+
+/**
+ * Drop every table of a disposable test database and apply the migrations.
+ * Used by the suites that run against a real MySQL server.
+ */
+export async function resetTestDatabase(connection: mysql.Connection, url: string): Promise<void> {
+  const [tables] = await connection.query(
+    "SELECT table_name AS name FROM information_schema.tables WHERE table_schema = DATABASE()"
+  );
+  for (const { name } of tables as Array<{ name: string }>) {
+    await connection.query(`DROP TABLE \`${name}\``);
+  }
+  await migrate(drizzle(url), { migrationsFolder: "drizzle" });
+}
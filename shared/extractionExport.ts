@@ -0,0 +1,123 @@
+/**
+ * Row building for extraction exports, shared by the client's single-extraction
+ * export and the server's streaming library export.
+ */
+
+export type DelimitedFormat = "csv" | "tsv";
+export type TextExportFormat = DelimitedFormat | "ndjson";
+/** `arrow` is an Arrow IPC stream: typed columns, dictionary-encoded strings */
+export type LibraryExportFormat = TextExportFormat | "arrow";
+
+export const LIBRARY_EXPORT_FORMATS = ["csv", "tsv", "ndjson", "arrow"] as const satisfies readonly LibraryExportFormat[];
+
+/** An extracted field as it appears in the data: flat or nested (clinical schema) */
+export type ExportableField = {
+  value?: unknown;
+  content?: unknown;
+  confidence?: string;
+  source_location?: { page?: number; section?: string; exact_text_reference?: string };
+  location?: { page?: number; exact?: string };
+};
+
+export const separatorOf = (format: DelimitedFormat) => (format === "tsv" ? "\t" : ",");
+
+/**
+ * Flatten extracted data into dotted field paths. Objects with a `value` or
+ * `content` key are fields; other objects and arrays are walked.
+ */
+export function flattenExportFields(data: unknown, prefix = ""): Record<string, ExportableField> {
+  const result: Record<string, ExportableField> = {};
+  if (!data || typeof data !== "object") return result;
+
+  for (const [key, value] of Object.entries(data)) {
+    const fullKey = prefix ? `${prefix}.${key}` : key;
+
+    if (Array.isArray(value)) {
+      value.forEach((item, idx) => {
+        if (item && typeof item === "object") {
+          Object.assign(result, flattenExportFields(item, `${fullKey}[${idx}]`));
+        }
+      });
+    } else if (value && typeof value === "object") {
+      if ("content" in value || "value" in value) {
+        result[fullKey] = value as ExportableField;
+      } else {
+        Object.assign(result, flattenExportFields(value, fullKey));
+      }
+    }
+  }
+
+  return result;
+}
+
+export function exportFieldValue(field: ExportableField | undefined): string {
+  const value = field?.content ?? field?.value;
+  return value === undefined || value === null ? "" : String(value);
+}
+
+export function exportFieldLocation(field: ExportableField | undefined) {
+  const loc = field?.source_location ?? field?.location;
+  return {
+    page: loc?.page?.toString() ?? "",
+    section: field?.source_location?.section ?? "",
+    exactText: field?.source_location?.exact_text_reference ?? field?.location?.exact ?? "",
+  };
+}
+
+/** Quote a cell that contains the separator, a line break or a quote */
+export function escapeDelimited(value: string, separator: string): string {
+  if (!value) return "";
+  if (value.includes(separator) || value.includes("\n") || value.includes("\r") || value.includes('"')) {
+    return `"${value.replace(/"/g, '""')}"`;
+  }
+  return value;
+}
+
+/** One delimited line, with its line break */
+export function delimitedLine(cells: string[], separator: string): string {
+  return cells.map(cell => escapeDelimited(cell, separator)).join(separator) + "\n";
+}
+
+export type LibraryExportColumns = {
+  includeConfidence: boolean;
+  includeSourceLocation: boolean;
+};
+
+/** Header of the long-format library export: one row per extraction, source and field */
+export function libraryExportHeader(columns: LibraryExportColumns): string[] {
+  const header = ["Extraction ID", "Document ID", "Document", "Status", "Source", "Field", "Value"];
+  if (columns.includeConfidence) header.push("Confidence");
+  if (columns.includeSourceLocation) header.push("Page", "Section", "Exact Text");
+  return header;
+}
+
+export type LibraryExportSource = {
+  extractionId: number;
+  documentId: number;
+  document: string;
+  status: string;
+  /** "final" for the extraction's own data, otherwise the agent's provider */
+  source: string;
+  data: unknown;
+};
+
+/** The rows of one extraction source, matching libraryExportHeader */
+export function libraryExportRows(entry: LibraryExportSource, columns: LibraryExportColumns): string[][] {
+  return Object.entries(flattenExportFields(entry.data)).map(([fieldName, field]) => {
+    const row = [
+      String(entry.extractionId),
+      String(entry.documentId),
+      entry.document,
+      entry.status,
+      entry.source,
+      fieldName,
+      exportFieldValue(field),
+    ];
+    if (columns.includeConfidence) row.push(field.confidence ?? "");
+    if (columns.includeSourceLocation) {
+      const loc = exportFieldLocation(field);
+      row.push(loc.page, loc.section, loc.exactText);
+    }
+    return row;
+  });
+}
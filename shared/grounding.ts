@@ -0,0 +1,302 @@
+/**
+ * Locating quotes in PDF text, shared by the server (text stored on upload)
+ * and the client's text worker (documents without stored text).
+ */
+
+import type { ExtractedData, ExtractedFieldData, LocationData } from "../drizzle/schema";
+import type { ParsedPdfPage, PdfTextItem } from "./pdfPageText";
+import { QuoteIndex } from "./quoteIndex";
+
+/** Separates pages in the index text; never part of a normalized quote, so matches stay on one page */
+const PAGE_BREAK = "\u0000";
+
+/** Padding around highlight rects, in PDF user space (as the client-side locator draws them) */
+const RECT_PADDING = 2;
+/** Height of text items that report none */
+const DEFAULT_ITEM_HEIGHT = 10;
+
+/** Approximate matches must be at least this similar to the quote */
+export const MIN_QUOTE_SIMILARITY = 0.85;
+/** Shorter quotes are only located exactly (a few edits would match almost anything) */
+const MIN_APPROXIMATE_LENGTH = 16;
+
+const DASHES = /[\u2010-\u2015\u2212]/;
+const TYPOGRAPHIC_QUOTES: Record<string, string> = { "\u2018": "'", "\u2019": "'", "\u201C": '"', "\u201D": '"' };
+
+/** Searchable form of one char: lowercase, ligatures expanded (ﬁ → fi), dashes and quotes made plain */
+function foldChar(char: string): string {
+  if (char < "\u0080") return char.toLowerCase();
+  if (DASHES.test(char)) return "-";
+  return TYPOGRAPHIC_QUOTES[char] ?? char.normalize("NFKC").toLowerCase();
+}
+
+const isSpace = (char: string) => /[\s\u0000]/.test(char);
+
+/** Normalized text and, for each of its chars, the offset of the char it came from */
+export type NormalizedText = { text: string; offsets: number[] };
+
+/**
+ * Normalize text for searching: chars folded (see foldChar), whitespace runs
+ * collapsed to one space and words hyphenated across a line break joined
+ * ("rando- mized" → "randomized")
+ */
+export function normalizeText(text: string): NormalizedText {
+  let normalized = "";
+  const offsets: number[] = [];
+
+  for (let i = 0; i < text.length; i++) {
+    const char = text[i];
+    if (isSpace(char)) {
+      if (normalized.length === 0 || normalized.endsWith(" ")) continue;
+      normalized += " ";
+      offsets.push(i);
+      continue;
+    }
+
+    const folded = foldChar(char);
+    if (folded === "-" && /\p{L}$/u.test(normalized)) {
+      let next = i + 1;
+      while (next < text.length && isSpace(text[next])) next++;
+      if (next > i + 1 && /\p{Ll}/u.test(text[next] ?? "")) {
+        i = next - 1;
+        continue;
+      }
+    }
+    normalized += folded;
+    for (let j = 0; j < folded.length; j++) offsets.push(i);
+  }
+
+  if (normalized.endsWith(" ")) {
+    normalized = normalized.slice(0, -1);
+    offsets.pop();
+  }
+  return { text: normalized, offsets };
+}
+
+/** Quote as it is searched (see normalizeText) */
+export const normalizeQuote = (text: string) => normalizeText(text).text;
+
+/** Quotes shorter than this are too ambiguous to locate, unless they are numbers */
+const isSearchable = (quote: string) => quote.length >= 3 || /^\d+$/.test(quote);
+
+/**
+ * Multi-pattern matcher (Aho–Corasick): finds the first occurrence of every
+ * pattern in one pass over the text
+ */
+export class QuoteMatcher {
+  /** Trie transitions by char code; node 0 is the root */
+  private readonly next: Map<number, number>[] = [new Map()];
+  private readonly fail: number[] = [0];
+  /** Pattern ending at each node, or -1 */
+  private readonly pattern: number[] = [-1];
+  /** Nearest node on the failure chain that ends a pattern, or -1 */
+  private readonly outputLink: number[] = [-1];
+
+  constructor(private readonly patterns: string[]) {
+    patterns.forEach((text, index) => {
+      let node = 0;
+      for (let i = 0; i < text.length; i++) {
+        const code = text.charCodeAt(i);
+        let child = this.next[node].get(code);
+        if (child === undefined) {
+          child = this.next.length;
+          this.next.push(new Map());
+          this.fail.push(0);
+          this.pattern.push(-1);
+          this.outputLink.push(-1);
+          this.next[node].set(code, child);
+        }
+        node = child;
+      }
+      // Duplicate patterns share a node; callers deduplicate them
+      if (this.pattern[node] === -1) this.pattern[node] = index;
+    });
+
+    // Breadth-first: a node's failure link is set before its children need it
+    const queue = Array.from(this.next[0].values());
+    for (let head = 0; head < queue.length; head++) {
+      const node = queue[head];
+      for (const [code, child] of Array.from(this.next[node])) {
+        let fallback = this.fail[node];
+        while (fallback !== 0 && !this.next[fallback].has(code)) fallback = this.fail[fallback];
+        const failNode = this.next[fallback].get(code) ?? 0;
+        this.fail[child] = failNode;
+        this.outputLink[child] = this.pattern[failNode] !== -1 ? failNode : this.outputLink[failNode];
+        queue.push(child);
+      }
+    }
+  }
+
+  /** Start offset of each pattern's first occurrence in `text`, or -1 */
+  firstOccurrences(text: string): number[] {
+    const starts = new Array<number>(this.patterns.length).fill(-1);
+    let remaining = this.patterns.length;
+    let node = 0;
+
+    for (let i = 0; i < text.length && remaining > 0; i++) {
+      const code = text.charCodeAt(i);
+      while (node !== 0 && !this.next[node].has(code)) node = this.fail[node];
+      node = this.next[node].get(code) ?? 0;
+
+      for (let out = this.pattern[node] !== -1 ? node : this.outputLink[node]; out !== -1; out = this.outputLink[out]) {
+        const index = this.pattern[out];
+        if (starts[index] === -1) {
+          starts[index] = i + 1 - this.patterns[index].length;
+          remaining--;
+        }
+      }
+    }
+    return starts;
+  }
+}
+
+/**
+ * Normalized text of a whole document with, for every character, its page
+ * and offset in that page's text (so matches map back to text items)
+ */
+export type GroundingIndex = {
+  text: string;
+  /** Index into `pages` for each character of `text` (-1 at page breaks) */
+  pageIndex: Int32Array;
+  /** Offset in the page text for each character of `text` */
+  pageOffset: Int32Array;
+  pages: ParsedPdfPage[];
+  /** q-gram index of `text` for approximate lookups, built on the first quote without an exact match */
+  quoteIndex?: QuoteIndex;
+};
+
+export function buildGroundingIndex(pages: ParsedPdfPage[]): GroundingIndex {
+  const normalized = pages.map(page => normalizeText(page.text));
+  const length = normalized.reduce((sum, page) => sum + page.text.length + 1, 0);
+  const pageIndex = new Int32Array(length);
+  const pageOffset = new Int32Array(length);
+
+  let position = 0;
+  normalized.forEach((page, index) => {
+    for (let i = 0; i < page.text.length; i++, position++) {
+      pageIndex[position] = index;
+      pageOffset[position] = page.offsets[i];
+    }
+    pageIndex[position] = -1;
+    pageOffset[position] = pages[index].text.length;
+    position++;
+  });
+
+  return { text: normalized.map(page => page.text + PAGE_BREAK).join(""), pageIndex, pageOffset, pages };
+}
+
+/** Bounding rect of the text items overlapping [start, end) of a page's text */
+function itemsRect(items: PdfTextItem[], start: number, end: number): number[] | null {
+  // Items are in text order: binary search the first one that ends after `start`
+  let low = 0;
+  let high = items.length;
+  while (low < high) {
+    const mid = (low + high) >> 1;
+    if (items[mid][1] <= start) low = mid + 1;
+    else high = mid;
+  }
+
+  let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+  for (let i = low; i < items.length && items[i][0] < end; i++) {
+    const [, , x, y, width, height] = items[i];
+    minX = Math.min(minX, x);
+    minY = Math.min(minY, y);
+    maxX = Math.max(maxX, x + width);
+    maxY = Math.max(maxY, y + (height || DEFAULT_ITEM_HEIGHT));
+  }
+  if (minX === Infinity) return null;
+  return [minX - RECT_PADDING, minY - RECT_PADDING, maxX + RECT_PADDING, maxY + RECT_PADDING];
+}
+
+type QuoteSpan = { start: number; end: number; similarity: number };
+
+/** PDF location of a span of the index text, or null when it covers no text item */
+function spanLocation(index: GroundingIndex, span: QuoteSpan, quote: string): LocationData | null {
+  const page = index.pages[index.pageIndex[span.start]];
+  const rect = itemsRect(page.items, index.pageOffset[span.start], index.pageOffset[span.end - 1] + 1);
+  if (!rect) return null;
+
+  return {
+    page: page.pageNumber,
+    exact: quote,
+    rects: [rect],
+    selector: {
+      type: "FragmentSelector",
+      conformsTo: "http://tools.ietf.org/rfc/rfc3778",
+      value: `page=${page.pageNumber}&rect=${rect.join(",")}`,
+    },
+    similarity: Math.round(span.similarity * 1000) / 1000,
+  };
+}
+
+/**
+ * Locate quotes in a document. Each key has one quote or several in order of
+ * preference; the first that is found wins. All quotes are matched exactly in
+ * one pass; long quotes without an exact match are then looked up
+ * approximately (q-gram index, at least MIN_QUOTE_SIMILARITY similar).
+ * Returns the page, rect, W3C fragment selector and similarity per key, or null.
+ */
+export function locateQuotes(
+  index: GroundingIndex,
+  quotes: Record<string, string | string[]>
+): Record<string, LocationData | null> {
+  const candidates = Object.entries(quotes).map(([key, quote]) => [
+    key,
+    (Array.isArray(quote) ? quote : [quote])
+      .map(text => ({ text, normalized: normalizeQuote(text) }))
+      .filter(candidate => isSearchable(candidate.normalized)),
+  ] as const);
+
+  const patterns = Array.from(new Set(candidates.flatMap(([, list]) => list.map(candidate => candidate.normalized))));
+  const starts = patterns.length > 0 ? new QuoteMatcher(patterns).firstOccurrences(index.text) : [];
+  const exactStarts = new Map(patterns.map((pattern, i) => [pattern, starts[i]]));
+  const approximate = new Map<string, QuoteSpan | null>();
+
+  const findSpan = (pattern: string): QuoteSpan | null => {
+    const start = exactStarts.get(pattern)!;
+    if (start !== -1) return { start, end: start + pattern.length, similarity: 1 };
+    if (pattern.length < MIN_APPROXIMATE_LENGTH) return null;
+    if (!approximate.has(pattern)) {
+      index.quoteIndex ??= new QuoteIndex(index.text, PAGE_BREAK);
+      approximate.set(pattern, index.quoteIndex.find(pattern, MIN_QUOTE_SIMILARITY));
+    }
+    return approximate.get(pattern)!;
+  };
+
+  const located: Record<string, LocationData | null> = {};
+  for (const [key, list] of candidates) {
+    located[key] = null;
+    for (const candidate of list) {
+      const span = findSpan(candidate.normalized);
+      const location = span && spanLocation(index, span, candidate.text);
+      if (location) {
+        located[key] = location;
+        break;
+      }
+    }
+  }
+  return located;
+}
+
+/** Texts a field is located by: its verbatim source reference, then its value */
+export function fieldQuotes(field: ExtractedFieldData): string[] {
+  const reference = field.source_location?.exact_text_reference;
+  const value = String(field.value);
+  return reference && reference !== value ? [reference, value] : [value];
+}
+
+/**
+ * Set the PDF location of every field whose quote is found (and drop stale
+ * locations of the others)
+ */
+export function groundExtractedData(index: GroundingIndex, data: ExtractedData): ExtractedData {
+  const quotes = Object.fromEntries(Object.entries(data).map(([key, field]) => [key, fieldQuotes(field)]));
+  const located = locateQuotes(index, quotes);
+
+  const grounded: ExtractedData = {};
+  for (const [key, field] of Object.entries(data)) {
+    const { location: _stale, ...rest } = field;
+    grounded[key] = located[key] ? { ...rest, location: located[key]! } : rest;
+  }
+  return grounded;
+}
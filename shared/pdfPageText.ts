@@ -0,0 +1,61 @@
+/**
+ * Page text with the position of every PDF text item, as the server stores it
+ * on upload and the client's text worker builds it.
+ */
+
+/**
+ * Position of one PDF text item inside its page text:
+ * [start offset, end offset, x, y, width, height] in PDF user space
+ */
+export type PdfTextItem = [number, number, number, number, number, number];
+
+export interface ParsedPdfPage {
+  pageNumber: number;
+  text: string;
+  items: PdfTextItem[];
+}
+
+export type RawTextItem = {
+  str?: string;
+  transform?: number[];
+  width?: number;
+  height?: number;
+};
+
+const round = (value: number) => Math.round(value * 100) / 100;
+
+/**
+ * Build the searchable page string and item offset map, joining non-empty
+ * text items with single spaces (the text quotes are located in)
+ */
+export function buildPageText(pageNumber: number, rawItems: RawTextItem[]): ParsedPdfPage {
+  let text = "";
+  const items: PdfTextItem[] = [];
+
+  for (const item of rawItems) {
+    const str = item.str;
+    if (!str || !str.trim() || !item.transform) continue;
+
+    if (text.length > 0) text += " ";
+    const start = text.length;
+    text += str;
+
+    items.push([
+      start,
+      text.length,
+      round(item.transform[4]),
+      round(item.transform[5]),
+      round(item.width ?? 0),
+      round(item.height ?? 0),
+    ]);
+  }
+
+  return { pageNumber, text, items };
+}
+
+/**
+ * Assemble the full document text with the page markers the prompts expect
+ */
+export function buildDocumentText(pages: Pick<ParsedPdfPage, "pageNumber" | "text">[]): string {
+  return pages.map(p => `--- Page ${p.pageNumber} ---\n${p.text}\n`).join("");
+}
@@ -0,0 +1,137 @@
+/** Length of the indexed substrings */
+const GRAM_LENGTH = 3;
+/** Grams that occur more often than this are too common to narrow the search, so lookups skip them */
+const MAX_GRAM_POSTINGS = 2000;
+/** Candidate regions verified per lookup, best filtered first */
+const MAX_CANDIDATES = 8;
+
+export type ApproximateMatch = {
+  /** Span of the match in the indexed text: [start, end) */
+  start: number;
+  end: number;
+  /** Edit distance between the pattern and the span */
+  distance: number;
+  /** 1 - distance / pattern length */
+  similarity: number;
+};
+
+/**
+ * q-gram index of a text for approximate substring lookup. A lookup counts the
+ * pattern's grams per alignment (diagonal) through the posting lists, which
+ * only touches the positions of those grams. The few regions that can hold a
+ * match within the edit budget are then verified with a banded edit-distance
+ * alignment.
+ *
+ * Matches never span a `boundary` character (e.g. a page break).
+ */
+export class QuoteIndex {
+  private readonly postings = new Map<string, number[]>();
+
+  constructor(private readonly text: string, private readonly boundary?: string) {
+    for (let i = 0; i + GRAM_LENGTH <= text.length; i++) {
+      const gram = text.slice(i, i + GRAM_LENGTH);
+      if (boundary && gram.includes(boundary)) continue;
+      const positions = this.postings.get(gram);
+      if (positions) positions.push(i);
+      else this.postings.set(gram, [i]);
+    }
+  }
+
+  /**
+   * Best span of the text within `1 - minSimilarity` relative edit distance of
+   * `pattern`, or null. Returns null too when the edit budget is so large that
+   * the grams cannot narrow the search.
+   */
+  find(pattern: string, minSimilarity: number): ApproximateMatch | null {
+    const length = pattern.length;
+    if (length < GRAM_LENGTH) return null;
+    const maxEdits = Math.floor(length * (1 - minSimilarity));
+
+    // q-gram lemma: a span within k edits shares all but at most k·q of the pattern's grams
+    let usedGrams = 0;
+    const hits: [positions: number[], offset: number][] = [];
+    for (let offset = 0; offset + GRAM_LENGTH <= length; offset++) {
+      const positions = this.postings.get(pattern.slice(offset, offset + GRAM_LENGTH));
+      if (positions && positions.length > MAX_GRAM_POSTINGS) continue;
+      usedGrams++;
+      if (positions) hits.push([positions, offset]);
+    }
+    const threshold = usedGrams - maxEdits * GRAM_LENGTH;
+    if (threshold < 1) return null;
+
+    // A match's grams sit on diagonals within 2k+1 of each other, so within one
+    // window of two consecutive buckets
+    const width = 2 * maxEdits + 1;
+    const counts = new Map<number, number>();
+    for (const [positions, offset] of hits) {
+      for (const position of positions) {
+        const bucket = Math.floor((position - offset) / width);
+        counts.set(bucket - 1, (counts.get(bucket - 1) ?? 0) + 1);
+        counts.set(bucket, (counts.get(bucket) ?? 0) + 1);
+      }
+    }
+
+    const candidates = Array.from(counts)
+      .filter(([, count]) => count >= threshold)
+      .sort((a, b) => b[1] - a[1])
+      .slice(0, MAX_CANDIDATES);
+
+    let best: Omit<ApproximateMatch, "similarity"> | null = null;
+    for (const [window] of candidates) {
+      const from = Math.max(0, window * width - maxEdits);
+      const to = Math.min(this.text.length, (window + 2) * width + length + 2 * maxEdits);
+      const match = this.align(pattern, from, to);
+      if (match && match.distance <= maxEdits && (!best || match.distance < best.distance)) best = match;
+    }
+    return best && { ...best, similarity: 1 - best.distance / length };
+  }
+
+  /**
+   * Semi-global alignment of the whole pattern against text[from, to): the
+   * span with the lowest edit distance (Sellers' algorithm, tracking starts)
+   */
+  private align(pattern: string, from: number, to: number): Omit<ApproximateMatch, "similarity"> | null {
+    const length = pattern.length;
+    let prev = new Int32Array(length + 1);
+    let prevStart = new Int32Array(length + 1);
+    let cur = new Int32Array(length + 1);
+    let curStart = new Int32Array(length + 1);
+    for (let i = 0; i <= length; i++) {
+      prev[i] = i;
+      prevStart[i] = from;
+    }
+
+    let best: Omit<ApproximateMatch, "similarity"> | null = null;
+    for (let t = from; t < to; t++) {
+      const char = this.text[t];
+      cur[0] = 0;
+      curStart[0] = t + 1;
+      for (let i = 1; i <= length; i++) {
+        if (char === this.boundary) {
+          // Restart after a boundary: no span crosses it
+          cur[i] = i;
+          curStart[i] = t + 1;
+          continue;
+        }
+        let cost = prev[i - 1] + (pattern[i - 1] === char ? 0 : 1);
+        let start = prevStart[i - 1];
+        if (prev[i] + 1 < cost) {
+          cost = prev[i] + 1;
+          start = prevStart[i];
+        }
+        if (cur[i - 1] + 1 < cost) {
+          cost = cur[i - 1] + 1;
+          start = curStart[i - 1];
+        }
+        cur[i] = cost;
+        curStart[i] = start;
+      }
+      if (char !== this.boundary && (!best || cur[length] < best.distance)) {
+        best = { start: curStart[length], end: t + 1, distance: cur[length] };
+      }
+      [prev, cur] = [cur, prev];
+      [prevStart, curStart] = [curStart, prevStart];
+    }
+    return best;
+  }
+}